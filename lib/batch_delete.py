@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+batch_delete.py - Delete many elements in few API calls.
+
+All the IDs are first deleted with a single call. If that call fails the
+batch is split in two halves and each half is tried again, down to single
+elements, so one element that cannot be deleted does not stop the others.
+With k failures among n elements this takes about 2 * k * log2(n) calls
+instead of n.
+
+Pure Python: the Revit call is passed in as 'delete_batch', which should
+delete the whole list or raise (e.g. inside a SubTransaction that is
+rolled back on error).
+"""
+
+
+def bisect_delete(ids, delete_batch):
+	"""
+	Delete 'ids' with delete_batch(list_of_ids), bisecting on failure.
+	Return (deleted, failed): the list of deleted IDs and the list of
+	(id, error message) for the elements that could not be deleted.
+	"""
+	deleted = []
+	failed = []
+	pending = [list(ids)] if ids else []
+	while pending:
+		batch = pending.pop()
+		try:
+			delete_batch(batch)
+		except Exception as delete_error:
+			if len(batch) == 1:
+				failed.append((batch[0], str(delete_error)))
+			else:
+				middle = len(batch) // 2
+				# Second half pushed first, so batches are tried in order
+				pending.append(batch[middle:])
+				pending.append(batch[:middle])
+			continue
+		deleted.extend(batch)
+	return deleted, failed
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+broad_phase.py - Find the pairs of boxes that overlap, without testing all pairs.
+
+Sweep and prune: the boxes (expanded by a tolerance) are sorted by their
+minimum along the axis where they are most spread out, then swept once; a
+box is only compared with the boxes whose interval on that axis is still
+open. For n elements spread over a model this is about n log n + k
+comparisons (k = overlapping pairs) instead of n * (n - 1) / 2.
+
+Pure Python: no Revit API imports. Boxes are ((minx, miny, minz),
+(maxx, maxy, maxz)) tuples; the caller reads them from get_BoundingBox(None).
+"""
+
+
+def _spread_axis(boxes):
+	"""Axis (0, 1, 2) along which the box centres are most spread out."""
+	best_axis, best_spread = 0, -1.0
+	for axis in range(3):
+		centres = [(b[0][axis] + b[1][axis]) * 0.5 for b in boxes]
+		spread = max(centres) - min(centres)
+		if spread > best_spread:
+			best_axis, best_spread = axis, spread
+	return best_axis
+
+
+def overlapping_pairs(boxes, tolerance=0.0):
+	"""
+	Return the (i, j) index pairs, i < j, of the boxes that overlap once
+	each is expanded by 'tolerance' on every side. Touching boxes overlap.
+	Entries that are None (no bounding box) are ignored. Pairs are sorted.
+	"""
+	indexed = [(i, b) for i, b in enumerate(boxes) if b is not None]
+	if len(indexed) < 2:
+		return []
+	axis = _spread_axis([b for _, b in indexed])
+	other = [a for a in range(3) if a != axis]
+	# Expanding both boxes by t is the same as comparing them with a gap of 2t
+	gap = 2.0 * tolerance
+	indexed.sort(key=lambda item: item[1][0][axis])
+
+	pairs = []
+	active = []
+	for i, (bmin, bmax) in indexed:
+		start = bmin[axis] - gap
+		active = [item for item in active if item[1][1][axis] >= start]
+		for j, (omin, omax) in active:
+			if all(bmin[a] - gap <= omax[a] and omin[a] - gap <= bmax[a] for a in other):
+				pairs.append((j, i) if j < i else (i, j))
+		active.append((i, (bmin, bmax)))
+	pairs.sort()
+	return pairs
+
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+job_journal.py - Append-only JSONL journal for resumable batch processing.
+
+Every job (usually one RVT file) writes a 'start' record when it begins and
+a 'finish' record (outcome 'ok' or 'error') when it ends. A Watchdog can add
+a 'timeout' record while the job is still running, so hung files are visible
+even if Revit has to be killed. After a crash the journal is simply read back:
+a truncated last line is ignored and jobs without a 'finish' record are
+reported as interrupted.
+
+Pure Python: no Revit API imports.
+"""
+
+import datetime
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+
+JOURNAL_VERSION = 1
+
+OUTCOME_OK = 'ok'
+OUTCOME_ERROR = 'error'
+
+EVENT_START = 'start'
+EVENT_FINISH = 'finish'
+EVENT_TIMEOUT = 'timeout'
+
+
+# =============================================================================
+# HASHES
+# =============================================================================
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """Return the SHA-1 of a file, read in chunks. None if it does not exist."""
+    if not path or not os.path.isfile(path):
+        return None
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def source_fingerprint(path):
+    """
+    Cheap fingerprint of an input file: 'mtime:size'. None if it does not exist.
+    Used when hashing the whole input would cost too much.
+    """
+    if not path or not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    return '{:.3f}:{}'.format(stat.st_mtime, stat.st_size)
+
+
+def options_hash(options):
+    """Return a stable SHA-1 of a JSON-serialisable options object."""
+    text = json.dumps(options, sort_keys=True, separators=(',', ':'))
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return hashlib.sha1(text).hexdigest()
+
+
+def job_key(path):
+    """Normalise a file path so the same file always maps to the same job."""
+    return os.path.normcase(os.path.abspath(path))
+
+
+# =============================================================================
+# JOURNAL
+# =============================================================================
+
+class JobJournal(object):
+    """Append-only JSONL journal stored at 'path'."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    # ---- writing -------------------------------------------------------------
+
+    def append(self, record):
+        """Append a single record as one JSON line and flush it to disk."""
+        record = dict(record)
+        record.setdefault('v', JOURNAL_VERSION)
+        record.setdefault('time', _now())
+        line = json.dumps(record, sort_keys=True)
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+
+        with self._lock:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            # A crash during a previous write may have left a partial
+            # line without newline: start on a fresh line in that case
+            broken_tail = (
+                os.path.exists(self.path)
+                and os.path.getsize(self.path) > 0
+                and not self._ends_with_newline()
+            )
+            with io.open(self.path, 'a', encoding='utf-8') as f:
+                if broken_tail:
+                    f.write(u'\n')
+                f.write(line + u'\n')
+                f.flush()
+                try:
+                    os.fsync(f.fileno())
+                except (AttributeError, OSError):
+                    pass
+        return record
+
+    def start(self, job, **extra):
+        """Record the start of a job. Return the start time (time.time())."""
+        started = time.time()
+        record = {'event': EVENT_START, 'job': job_key(job), 'file': job}
+        record.update(extra)
+        self.append(record)
+        return started
+
+    def finish(self, job, started, outcome, **extra):
+        """Record the end of a job with its outcome and duration in seconds."""
+        record = {
+            'event': EVENT_FINISH,
+            'job': job_key(job),
+            'file': job,
+            'outcome': outcome,
+            'duration': round(time.time() - started, 3),
+        }
+        record.update(extra)
+        return self.append(record)
+
+    def mark_timeout(self, job, started, timeout):
+        """Record that a job is still running after 'timeout' seconds."""
+        return self.append({
+            'event': EVENT_TIMEOUT,
+            'job': job_key(job),
+            'file': job,
+            'timeout': timeout,
+            'duration': round(time.time() - started, 3),
+        })
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    # ---- reading -------------------------------------------------------------
+
+    def read(self):
+        """Return all valid records in order, skipping corrupted lines."""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with io.open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and record.get('job') and record.get('event'):
+                    records.append(record)
+        return records
+
+    def state(self):
+        """Return a JournalState built from the current content of the journal."""
+        return JournalState(self.read())
+
+
+class JournalState(object):
+    """Latest status of every job found in a journal."""
+
+    def __init__(self, records):
+        self.last_finish = {}
+        self.last_event = {}
+        self.timed_out = set()
+        for record in records:
+            key = record['job']
+            event = record['event']
+            if event == EVENT_START:
+                self.timed_out.discard(key)
+            elif event == EVENT_TIMEOUT:
+                self.timed_out.add(key)
+            elif event == EVENT_FINISH:
+                self.last_finish[key] = record
+            self.last_event[key] = record
+
+    def status(self, job):
+        """
+        Return the status of a job:
+        'new', 'ok', 'error', 'interrupted' (started but never finished)
+        or 'hung' (interrupted after the watchdog fired).
+        """
+        key = job_key(job)
+        last = self.last_event.get(key)
+        if last is None:
+            return 'new'
+        if last['event'] == EVENT_FINISH:
+            return last.get('outcome', OUTCOME_ERROR)
+        if key in self.timed_out:
+            return 'hung'
+        return 'interrupted'
+
+    def is_completed(self, job, current_hash, options_signature=None, fingerprint_field='hash'):
+        """
+        True if the last finished run of the job was successful, nothing was
+        started after it, and the fingerprint stored in 'fingerprint_field'
+        (by default the output file hash) and the options, if given, still match.
+        'current_hash' may be a callable: it is only called once every other
+        check passed, so an expensive hash is skipped for jobs never completed.
+        """
+        key = job_key(job)
+        record = self.last_finish.get(key)
+        if record is None or self.last_event.get(key) is not record:
+            return False
+        if record.get('outcome') != OUTCOME_OK:
+            return False
+        if options_signature is not None and record.get('options') != options_signature:
+            return False
+        if callable(current_hash):
+            current_hash = current_hash()
+        if not current_hash or record.get(fingerprint_field) != current_hash:
+            return False
+        return True
+
+
+# =============================================================================
+# WATCHDOG
+# =============================================================================
+
+class Watchdog(object):
+    """
+    Calls 'on_timeout()' from a background thread if the job is still running
+    after 'timeout' seconds. The Revit API call itself cannot be interrupted,
+    but the journal gets the mark before the user has to kill Revit.
+    Use as a context manager around the job.
+    """
+
+    def __init__(self, timeout, on_timeout):
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.fired = False
+        self._timer = None
+
+    def _fire(self):
+        self.fired = True
+        try:
+            self.on_timeout()
+        except Exception:
+            pass
+
+    def start(self):
+        if self.timeout and self.timeout > 0:
+            self._timer = threading.Timer(self.timeout, self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cancel()
+        return False
+
+
+def _now():
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
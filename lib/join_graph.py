@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+join_graph.py - Joined pairs among a set of elements, from their join lists.
+
+JoinGeometryUtils.GetJoinedElements gives the elements joined to one element,
+so the joined pairs of a selection come from one call per element instead of
+one AreElementsJoined call per pair. A join is symmetric: each pair is listed
+once, in selection order.
+
+Pure Python: no Revit API imports. Elements are identified by any hashable key
+(e.g. the integer value of their ElementId).
+"""
+
+
+def join_edges(keys, get_joined):
+	"""
+	Return the (a, b) pairs of 'keys' that are joined, each pair once, with a
+	before b in 'keys'. get_joined(key) returns the keys joined to 'key'
+	(keys outside the selection are ignored); it is called once per key.
+	"""
+	order = dict((key, index) for index, key in enumerate(keys))
+	edges = []
+	for key in keys:
+		index = order[key]
+		others = set(other for other in get_joined(key) if order.get(other, -1) > index)
+		for other in sorted(others, key=order.get):
+			edges.append((key, other))
+	return edges
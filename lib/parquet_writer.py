@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""
+parquet_writer.py - Minimal pure-Python Parquet writer.
+
+Writes flat tables with typed columns, readable by Power BI, pandas/pyarrow
+and DuckDB, without any native dependency (it runs in IronPython too):
+- 'double' -> DOUBLE, PLAIN encoding
+- 'int64'  -> INT64, PLAIN encoding
+- 'string' -> BYTE_ARRAY (UTF8), dictionary encoded
+Every column is OPTIONAL: None (or '') is written as a null.
+
+Rows are buffered and flushed as one row group every 'row_group_rows' rows,
+each column chunk being a single uncompressed data page (preceded by its
+dictionary page for strings). The file metadata is
+Thrift compact protocol, written by the few helpers below.
+
+Reference: https://github.com/apache/parquet-format
+"""
+
+import itertools
+import struct
+
+
+MAGIC = b'PAR1'
+CREATED_BY = 'pyESA parquet_writer'
+
+TYPE_DOUBLE = 'double'
+TYPE_INT64 = 'int64'
+TYPE_STRING = 'string'
+
+ROW_GROUP_ROWS = 100000
+
+# Parquet enums (parquet.thrift)
+_PQ_INT64 = 2
+_PQ_DOUBLE = 5
+_PQ_BYTE_ARRAY = 6
+_PQ_OPTIONAL = 1
+_PQ_UTF8 = 0
+_PQ_PLAIN = 0
+_PQ_PLAIN_DICTIONARY = 2
+_PQ_RLE = 3
+_PQ_UNCOMPRESSED = 0
+_PQ_DATA_PAGE = 0
+_PQ_DICTIONARY_PAGE = 2
+
+_PHYSICAL_TYPES = {
+    TYPE_DOUBLE: _PQ_DOUBLE,
+    TYPE_INT64: _PQ_INT64,
+    TYPE_STRING: _PQ_BYTE_ARRAY,
+}
+
+# Thrift compact protocol field types
+_T_I32 = 5
+_T_I64 = 6
+_T_BINARY = 8
+_T_LIST = 9
+_T_STRUCT = 12
+
+_TEXT_TYPE = type(u'')
+
+
+# =============================================================================
+# THRIFT COMPACT PROTOCOL
+# =============================================================================
+
+def _byte(value):
+    return struct.pack('B', value)
+
+
+def _varint(value):
+    out = []
+    while True:
+        if value < 0x80:
+            out.append(_byte(value))
+            return b''.join(out)
+        out.append(_byte((value & 0x7F) | 0x80))
+        value >>= 7
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _utf8(value):
+    if not isinstance(value, _TEXT_TYPE):
+        if isinstance(value, bytes):
+            return value
+        value = _TEXT_TYPE(value)
+    return value.encode('utf-8')
+
+
+def _thrift_value(ttype, value):
+    if ttype in (_T_I32, _T_I64):
+        return _varint(_zigzag(value))
+    if ttype == _T_BINARY:
+        data = _utf8(value)
+        return _varint(len(data)) + data
+    if ttype == _T_STRUCT:
+        return _thrift_struct(value)
+    if ttype == _T_LIST:
+        elem_type, items = value
+        if len(items) < 15:
+            header = _byte((len(items) << 4) | elem_type)
+        else:
+            header = _byte(0xF0 | elem_type) + _varint(len(items))
+        return header + b''.join(_thrift_value(elem_type, item) for item in items)
+    raise ValueError('Unsupported thrift type {}'.format(ttype))
+
+
+def _thrift_struct(fields):
+    """
+    Encode a struct given as a list of (field id, thrift type, value);
+    fields with a None value are skipped.
+    """
+    out = []
+    last_id = 0
+    for field_id, ttype, value in sorted(fields, key=lambda f: f[0]):
+        if value is None:
+            continue
+        payload = _thrift_value(ttype, value)
+        delta = field_id - last_id
+        if 0 < delta <= 15:
+            out.append(_byte((delta << 4) | ttype))
+        else:
+            out.append(_byte(ttype) + _varint(_zigzag(field_id)))
+        out.append(payload)
+        last_id = field_id
+    out.append(b'\x00')
+    return b''.join(out)
+
+
+# =============================================================================
+# RLE / BIT-PACKING HYBRID
+# =============================================================================
+
+def _pack_groups(values, bit_width):
+    """Bit-pack values (a multiple of 8, LSB first): 'bit_width' bytes per 8 values."""
+    s1, s2, s3, s4, s5, s6, s7 = [i * bit_width for i in range(1, 8)]
+    words = (bit_width + 7) // 8
+    out = []
+    for v0, v1, v2, v3, v4, v5, v6, v7 in zip(*[iter(values)] * 8):
+        acc = v0 | v1 << s1 | v2 << s2 | v3 << s3 | v4 << s4 | v5 << s5 | v6 << s6 | v7 << s7
+        if words == 1:
+            out.append(struct.pack('<Q', acc)[:bit_width])
+        else:
+            out.append(b''.join(
+                struct.pack('<Q', (acc >> (64 * k)) & 0xFFFFFFFFFFFFFFFF) for k in range(words)
+            )[:bit_width])
+    return b''.join(out)
+
+
+def encode_hybrid(values, bit_width):
+    """
+    Encode non-negative integers with the RLE / bit-packing hybrid:
+    runs of 8 or more equal values become RLE runs, the rest bit-packed
+    groups of 8 (the last group is padded with zeros).
+    """
+    out = []
+    value_bytes = (bit_width + 7) // 8
+    literal = []
+
+    def flush_literal():
+        if not literal:
+            return
+        padded = literal + [0] * (-len(literal) % 8)
+        groups = len(padded) // 8
+        out.append(_varint((groups << 1) | 1))
+        out.append(_pack_groups(padded, bit_width))
+        del literal[:]
+
+    for value, group in itertools.groupby(values):
+        run = len(list(group))
+        if run >= 8 and len(literal) % 8:
+            # Complete the current bit-packed group first
+            take = 8 - len(literal) % 8
+            literal.extend([value] * take)
+            run -= take
+        if run >= 8:
+            flush_literal()
+            out.append(_varint(run << 1))
+            out.append(b''.join(_byte((value >> (8 * k)) & 0xFF) for k in range(value_bytes)))
+        else:
+            literal.extend([value] * run)
+    flush_literal()
+    return b''.join(out)
+
+
+def bit_width_for(max_value):
+    width = 0
+    while max_value >> width:
+        width += 1
+    return width
+
+
+# =============================================================================
+# COLUMN CHUNKS
+# =============================================================================
+
+def _plain_values(ptype, values):
+    if ptype == TYPE_DOUBLE:
+        return struct.pack('<{}d'.format(len(values)), *values)
+    if ptype == TYPE_INT64:
+        return struct.pack('<{}q'.format(len(values)), *values)
+    return b''.join(struct.pack('<i', len(v)) + v for v in values)
+
+
+def _page(page_type, payload, num_values, encoding):
+    if page_type == _PQ_DICTIONARY_PAGE:
+        header_field = (7, _T_STRUCT, [(1, _T_I32, num_values), (2, _T_I32, encoding)])
+    else:
+        header_field = (5, _T_STRUCT, [
+            (1, _T_I32, num_values),
+            (2, _T_I32, encoding),
+            (3, _T_I32, _PQ_RLE),
+            (4, _T_I32, _PQ_RLE),
+        ])
+    header = _thrift_struct([
+        (1, _T_I32, page_type),
+        (2, _T_I32, len(payload)),
+        (3, _T_I32, len(payload)),
+        header_field,
+    ])
+    return header + payload
+
+
+def encode_column_chunk(ptype, values):
+    """
+    Encode one column chunk. Return (pages bytes, dictionary page size or
+    None, encodings) - the dictionary page, if any, comes first.
+    """
+    def_levels = [0 if v is None else 1 for v in values]
+    levels = encode_hybrid(def_levels, 1)
+    levels = struct.pack('<i', len(levels)) + levels
+    present = [v for v in values if v is not None]
+
+    if ptype != TYPE_STRING:
+        payload = levels + _plain_values(ptype, present)
+        return _page(_PQ_DATA_PAGE, payload, len(values), _PQ_PLAIN), None, [_PQ_PLAIN, _PQ_RLE]
+
+    dictionary = {}
+    entries = []
+    indices = []
+    for value in present:
+        index = dictionary.get(value)
+        if index is None:
+            index = dictionary[value] = len(entries)
+            entries.append(value)
+        indices.append(index)
+    dict_page = _page(_PQ_DICTIONARY_PAGE, _plain_values(ptype, entries), len(entries), _PQ_PLAIN_DICTIONARY)
+    width = bit_width_for(max(len(entries) - 1, 0))
+    payload = levels + _byte(width) + encode_hybrid(indices, width)
+    data_page = _page(_PQ_DATA_PAGE, payload, len(values), _PQ_PLAIN_DICTIONARY)
+    return dict_page + data_page, len(dict_page), [_PQ_PLAIN_DICTIONARY, _PQ_RLE]
+
+
+# =============================================================================
+# WRITER
+# =============================================================================
+
+class ParquetWriter(object):
+    """
+    Streams rows into a Parquet file.
+    columns: list of (name, type) with type TYPE_DOUBLE, TYPE_INT64 or TYPE_STRING.
+    """
+
+    def __init__(self, path, columns, row_group_rows=ROW_GROUP_ROWS):
+        self.path = path
+        self.columns = [(name, ptype) for name, ptype in columns]
+        for name, ptype in self.columns:
+            if ptype not in _PHYSICAL_TYPES:
+                raise ValueError('Unsupported type {} for column {}'.format(ptype, name))
+        self.row_group_rows = row_group_rows
+        self.rows_written = 0
+        self._names = [name for name, _ in self.columns]
+        self._rows = []
+        self._row_groups = []
+        self._file = None
+        self._offset = 0
+
+    def open(self):
+        self._file = open(self.path, 'wb')
+        self._write(MAGIC)
+        return self
+
+    def _write(self, data):
+        self._file.write(data)
+        self._offset += len(data)
+
+    def write(self, row):
+        """Write a row dict; missing columns are null."""
+        self.write_values([row.get(name) for name in self._names])
+
+    def write_values(self, values):
+        """Write a row given as a list of values in column order."""
+        # Rows are only buffered here: values are converted column by
+        # column when the row group is flushed
+        self._rows.append(values)
+        self.rows_written += 1
+        if len(self._rows) >= self.row_group_rows:
+            self._flush_row_group()
+
+    def _flush_row_group(self):
+        num_rows = len(self._rows)
+        if not num_rows:
+            return
+        columns = zip(*self._rows)
+        self._rows = []
+        chunks = []
+        total_size = 0
+        for (name, ptype), raw_values in zip(self.columns, columns):
+            start = self._offset
+            pages, dict_size, encodings = encode_column_chunk(ptype, _CONVERTERS[ptype](raw_values))
+            self._write(pages)
+            size = len(pages)
+            total_size += size
+            metadata = [
+                (1, _T_I32, _PHYSICAL_TYPES[ptype]),
+                (2, _T_LIST, (_T_I32, encodings)),
+                (3, _T_LIST, (_T_BINARY, [name])),
+                (4, _T_I32, _PQ_UNCOMPRESSED),
+                (5, _T_I64, num_rows),
+                (6, _T_I64, size),
+                (7, _T_I64, size),
+                (9, _T_I64, start + (dict_size or 0)),
+                (11, _T_I64, start if dict_size else None),
+            ]
+            chunks.append([(2, _T_I64, start), (3, _T_STRUCT, metadata)])
+        self._row_groups.append([
+            (1, _T_LIST, (_T_STRUCT, chunks)),
+            (2, _T_I64, total_size),
+            (3, _T_I64, num_rows),
+        ])
+
+    def close(self):
+        if self._file is None:
+            return
+        self._flush_row_group()
+        schema = [[(4, _T_BINARY, 'schema'), (5, _T_I32, len(self.columns))]]
+        for name, ptype in self.columns:
+            schema.append([
+                (1, _T_I32, _PHYSICAL_TYPES[ptype]),
+                (3, _T_I32, _PQ_OPTIONAL),
+                (4, _T_BINARY, name),
+                (6, _T_I32, _PQ_UTF8 if ptype == TYPE_STRING else None),
+            ])
+        footer = _thrift_struct([
+            (1, _T_I32, 1),
+            (2, _T_LIST, (_T_STRUCT, schema)),
+            (3, _T_I64, self.rows_written),
+            (4, _T_LIST, (_T_STRUCT, self._row_groups)),
+            (6, _T_BINARY, CREATED_BY),
+        ])
+        self._write(footer)
+        self._write(struct.pack('<i', len(footer)))
+        self._write(MAGIC)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def _to_doubles(values):
+    return [None if v is None or v == '' else float(v) for v in values]
+
+
+def _to_int64s(values):
+    return [None if v is None or v == '' else int(v) for v in values]
+
+
+def _to_strings(values):
+    return [None if v is None or v == '' else _utf8(v) for v in values]
+
+
+_CONVERTERS = {
+    TYPE_DOUBLE: _to_doubles,
+    TYPE_INT64: _to_int64s,
+    TYPE_STRING: _to_strings,
+}
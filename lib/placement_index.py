@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+placement_index.py - Sheet <-> View placement index shared by the pyESA tools.
+
+Two document-wide collectors (Viewport and ScheduleSheetInstance) replace the
+per-sheet FilteredElementCollector(doc, sheet.Id) queries: afterwards
+"which views are on this sheet" and "on which sheets is this view" are
+plain dictionary lookups.
+
+IDs are stored as integer values, so the index can be queried with either
+ElementIds or integers.
+"""
+
+
+def id_value(element_id):
+    """
+    Return the integer value of an ElementId (or of an integer).
+    Revit 2024+ exposes .Value (Int64), older versions .IntegerValue.
+    """
+    if hasattr(element_id, 'Value'):
+        return element_id.Value
+    if hasattr(element_id, 'IntegerValue'):
+        return element_id.IntegerValue
+    return int(element_id)
+
+
+class PlacementIndex(object):
+    """Maps sheets to the views/schedules placed on them and back."""
+
+    def __init__(self):
+        self._sheet_views = {}
+        self._view_sheets = {}
+
+    @classmethod
+    def from_document(cls, doc):
+        """Build the index with one Viewport and one ScheduleSheetInstance collector."""
+        from pyrevit import DB
+
+        viewports = DB.FilteredElementCollector(doc).OfClass(DB.Viewport).ToElements()
+        schedule_instances = DB.FilteredElementCollector(doc).OfClass(DB.ScheduleSheetInstance).ToElements()
+        return cls.from_elements(viewports, schedule_instances)
+
+    @classmethod
+    def from_elements(cls, viewports, schedule_instances):
+        """
+        Build the index from already collected elements:
+        - viewports: objects with .SheetId and .ViewId
+        - schedule_instances: objects with .OwnerViewId (the sheet) and .ScheduleId
+          (Revision Schedules in title blocks are included)
+        """
+        index = cls()
+        for vp in viewports:
+            index.add(vp.SheetId, vp.ViewId)
+        for ssi in schedule_instances:
+            index.add(ssi.OwnerViewId, ssi.ScheduleId)
+        return index
+
+    def add(self, sheet_id, view_id):
+        """Record that 'view_id' is placed on 'sheet_id'."""
+        sheet_key = id_value(sheet_id)
+        view_key = id_value(view_id)
+        self._sheet_views.setdefault(sheet_key, set()).add(view_key)
+        self._view_sheets.setdefault(view_key, set()).add(sheet_key)
+
+    def views_on_sheet(self, sheet_id):
+        """Return the set of view/schedule integer IDs placed on the sheet."""
+        return set(self._sheet_views.get(id_value(sheet_id), ()))
+
+    def views_on_sheets(self, sheet_ids):
+        """Return the union of the views placed on any of the sheets."""
+        views = set()
+        for sheet_id in sheet_ids:
+            views.update(self._sheet_views.get(id_value(sheet_id), ()))
+        return views
+
+    def sheets_of_view(self, view_id):
+        """Return the set of sheet integer IDs the view/schedule is placed on."""
+        return set(self._view_sheets.get(id_value(view_id), ()))
+
+    def is_on_sheet(self, view_id):
+        """True if the view/schedule is placed on at least one sheet."""
+        return id_value(view_id) in self._view_sheets
+
+    def placed_view_ids(self):
+        """Return the set of all view/schedule integer IDs placed on any sheet."""
+        return set(self._view_sheets)
@@ -1,6 +1,7 @@
 __context__ = "zero-doc"
 
 # REFERENCES
+import os
 import shutil
 import time
 import pyrevit
@@ -16,10 +17,16 @@ from System.Collections.Generic import List, HashSet
 import clr
 import sys
 
+import cleanup_plan
+import job_journal
+from placement_index import PlacementIndex
+
 hostapp = pyrevit._HostApplication()
 app = hostapp.app
 rvt_version = int(hostapp.version)
 
+JOURNAL_FILENAME = 'ModelCleanup_journal.jsonl'
+
 # ============================================================================
 # COMPATIBILITY LAYER FOR REVIT 2024+ (ElementId changes from Int32 to Int64)
 # ============================================================================
@@ -58,10 +65,10 @@ def purge_using_native_api(doc, iterations=3):
 	"""
 	Purge unused elements using the native GetUnusedElements API.
 	Available in Revit 2024+.
-	Returns tuple: (success, message)
+	Returns tuple: (success, message, purged_count)
 	"""
 	if rvt_version < 2024:
-		return (False, "Native API not available (Revit < 2024)")
+		return (False, "Native API not available (Revit < 2024)", 0)
 	
 	try:
 		total_deleted = 0
@@ -76,15 +83,15 @@ def purge_using_native_api(doc, iterations=3):
 			else:
 				break
 		
-		return (True, "Purged {} elements (Native API)".format(total_deleted))
+		return (True, "Purged {} elements (Native API)".format(total_deleted), total_deleted)
 	except Exception as e:
-		return (False, "Native API Error: " + str(e))
+		return (False, "Native API Error: " + str(e), 0)
 
 def purge_using_performance_adviser(doc, iterations=3):
 	"""
 	Purge unused elements using PerformanceAdviser.
 	Available in Revit 2017+.
-	Returns tuple: (success, message)
+	Returns tuple: (success, message, purged_count)
 	"""
 	try:
 		# GUID for "Project contains unused families and types" rule
@@ -100,7 +107,7 @@ def purge_using_performance_adviser(doc, iterations=3):
 				break
 		
 		if purge_rule_id is None:
-			return (False, "PerformanceAdviser purge rule not found")
+			return (False, "PerformanceAdviser purge rule not found", 0)
 		
 		total_deleted = 0
 		for i in range(iterations):
@@ -121,15 +128,16 @@ def purge_using_performance_adviser(doc, iterations=3):
 			else:
 				break
 		
-		return (True, "Purged {} elements (PerformanceAdviser)".format(total_deleted))
+		return (True, "Purged {} elements (PerformanceAdviser)".format(total_deleted), total_deleted)
 	except Exception as e:
-		return (False, "PerformanceAdviser Error: " + str(e))
+		return (False, "PerformanceAdviser Error: " + str(e), 0)
 
 def purge_using_etransmit(doc, app_instance, model_path):
 	"""
 	Purge unused elements using eTransmit API.
 	Fallback method - may not work in Revit 2025+ due to .NET 8.
-	Returns tuple: (success, message)
+	Returns tuple: (success, message, purged_count) - the count is not
+	reported by eTransmit and is always 0.
 	"""
 	# Try to load eTransmit
 	etransmit_paths = [
@@ -152,13 +160,13 @@ def purge_using_etransmit(doc, app_instance, model_path):
 			result = etuom.purgeUnused(doc)
 			
 			if str(result) == "UpgradeSucceeded":
-				return (True, "Purged (eTransmit)")
+				return (True, "Purged (eTransmit)", 0)
 			else:
-				return (False, "eTransmit result: " + str(result))
+				return (False, "eTransmit result: " + str(result), 0)
 		except:
 			continue
 	
-	return (False, "eTransmit not available")
+	return (False, "eTransmit not available", 0)
 
 def purge_document(doc, app_instance=None, model_path=None, iterations=3):
 	"""
@@ -167,26 +175,55 @@ def purge_document(doc, app_instance=None, model_path=None, iterations=3):
 	2. PerformanceAdviser (Revit 2017+)
 	3. eTransmit (fallback)
 	
-	Returns tuple: (success, message)
+	Returns tuple: (success, message, purged_count)
 	"""
 	# Method 1: Try Native API first (Revit 2024+)
 	if rvt_version >= 2024:
-		success, message = purge_using_native_api(doc, iterations)
+		success, message, purged = purge_using_native_api(doc, iterations)
 		if success:
-			return (success, message)
+			return (success, message, purged)
 	
 	# Method 2: Try PerformanceAdviser
-	success, message = purge_using_performance_adviser(doc, iterations)
+	success, message, purged = purge_using_performance_adviser(doc, iterations)
 	if success:
-		return (success, message)
+		return (success, message, purged)
 	
 	# Method 3: Try eTransmit as last resort
 	if app_instance and model_path:
-		success, message = purge_using_etransmit(doc, app_instance, model_path)
+		success, message, purged = purge_using_etransmit(doc, app_instance, model_path)
 		if success:
-			return (success, message)
+			return (success, message, purged)
 	
-	return (False, "All purge methods failed")
+	return (False, "All purge methods failed", 0)
+
+def count_purge_candidates(doc):
+	"""
+	Count the elements the purge would delete in its first iteration,
+	without deleting anything (no transaction is needed).
+	Returns 0 when neither the Native API nor PerformanceAdviser is available.
+	"""
+	if rvt_version >= 2024:
+		try:
+			unused_ids = doc.GetUnusedElements(HashSet[DB.ElementId]())
+			return len(unused_ids) if unused_ids else 0
+		except:
+			pass
+
+	try:
+		purge_guid = "e8c63650-70b7-435a-9010-ec97660c1bda"
+		adviser = DB.PerformanceAdviser.GetPerformanceAdviser()
+		for rule_id in adviser.GetAllRuleIds():
+			if str(rule_id.Guid) == purge_guid:
+				rule_ids = List[DB.PerformanceAdviserRuleId]()
+				rule_ids.Add(rule_id)
+				failure_messages = adviser.ExecuteRules(doc, rule_ids)
+				if failure_messages and failure_messages.Count > 0:
+					return failure_messages[0].GetFailingElements().Count
+				break
+	except:
+		pass
+
+	return 0
 
 # ============================================================================
 # HELPER DEFINITIONS (Updated for ElementId compatibility)
@@ -227,30 +264,173 @@ def f_id_to_elem(doc, id):
 	"""
 	return doc.GetElement(create_element_id(id))
 
-def f_get_all_views_on_sheet(doc, sheet, elemID=True):
+# ============================================================================
+# CLEANUP PLAN
+# ============================================================================
+
+def f_build_cleanup_plan(doc, rvt_file, worksets_name, views_param_name, views_param_values,
+						sheets_param_name, sheets_param_values, collect_elements=True,
+						count_elements=False):
 	"""
-	Return Views and Schedules (OR their IDs as Integer Values
-	if 'elemID' is set to True) placed on the Sheet.
-	Updated to use compatibility functions.
+	Compute what ModelCleanup would delete from 'doc' without modifying it.
+	Elements on the Worksets to delete are collected when 'collect_elements'
+	is True (needed for RVT < 2023), otherwise only counted when
+	'count_elements' is True.
+	Returns a cleanup_plan.CleanupPlan.
 	"""
-	sheet_views_all = []
-	sheet_views = sheet.GetAllPlacedViews()
-	
-	if elemID:
-		sheet_views_all = [get_element_id_value(item) for item in sheet_views]
-	else:
-		sheet_views_all = [doc.GetElement(item) for item in sheet_views]
-	
-	# Get Schedules placed on the sheet (Revision Schedule is included)
-	sheet_schedules_placed = DB.FilteredElementCollector(doc, sheet.Id).OfClass(DB.ScheduleSheetInstance).ToElements()
+	plan = cleanup_plan.CleanupPlan(rvt_file)
+	plan.model_elements = DB.FilteredElementCollector(doc).WhereElementIsNotElementType().GetElementCount()
+
+	# Find sheets to delete/keep
+	sheets_all = revit.query.get_sheets(doc=doc)
+	sheets_all_ids = [get_element_id_value(item.Id) for item in sheets_all]
+
+	sheets_keep_set, plan.sheets_delete = cleanup_plan.resolve_keep_delete(
+		sheets_all_ids,
+		sheets_param_name,
+		sheets_param_values,
+		lambda elemid: f_param_check(f_id_to_elem(doc, elemid), sheets_param_name, sheets_param_values)
+	)
+
+	# Get the ID of views and schedules (Revision Schedules included)
+	# placed on Sheets to keep
+	placement_index = PlacementIndex.from_document(doc)
+	views_on_sheets_set = placement_index.views_on_sheets(sheets_keep_set)
+
+	# Find views to delete/keep
+	views_all = revit.query.get_all_views(doc=doc)
+	views_all = [va for va in views_all if va.GetType().ToString() != 'Autodesk.Revit.DB.ViewSheet']
+	views_all_ids = [get_element_id_value(item.Id) for item in views_all]
+
+	views_keep_set, plan.views_delete = cleanup_plan.resolve_keep_delete(
+		views_all_ids,
+		views_param_name,
+		views_param_values,
+		lambda elemid: f_param_check(f_id_to_elem(doc, elemid), views_param_name, views_param_values),
+		keep_ids=views_on_sheets_set
+	)
+
+	# Get all ViewTemplates
+	viewtemplates_all = revit.query.get_all_view_templates(doc=doc)
+	viewtemplates_all_set = set()
+
+	if len(viewtemplates_all) > 0:
+		viewtemplates_all_ids = [get_element_id_value(item.Id) for item in viewtemplates_all]
+		viewtemplates_all_set = set(viewtemplates_all_ids)
+
+		# Get ViewTemplates applied to Views to keep
+		viewtemplates_keep_ids = [get_element_id_value(f_id_to_elem(doc, elemid).ViewTemplateId) for elemid in views_keep_set]
+		viewtemplates_keep_set = set(viewtemplates_keep_ids)
+
+		# Get ViewTemplates to delete
+		plan.viewtemplates_delete = viewtemplates_all_set - viewtemplates_keep_set
+
+	# Get all ParameterFilterElements
+	paramfilters_all = revit.query.get_rule_filters(doc=doc)
+	paramfilters_all_set = set()
+
+	if len(paramfilters_all) > 0:
+		paramfilters_all_ids = [get_element_id_value(item.Id) for item in paramfilters_all]
+		paramfilters_all_set = set(paramfilters_all_ids)
+
+		# Get ParameterFilterElements applied to Views to keep
+		paramfilters_keep_set = set()
+
+		for elemid in views_keep_set:
+			if f_id_to_elem(doc, elemid).AreGraphicsOverridesAllowed():
+				view_filters = f_id_to_elem(doc, elemid).GetFilters()
+				for vf in view_filters:
+					paramfilters_keep_set.add(get_element_id_value(vf))
+
+		# Get ParameterFilterElements to delete
+		plan.paramfilters_delete = paramfilters_all_set - paramfilters_keep_set
 
-	if elemID:
-		sheet_schedules = [get_element_id_value(item.ScheduleId) for item in sheet_schedules_placed]
 	else:
-		sheet_schedules = [doc.GetElement(item.ScheduleId) for item in sheet_schedules_placed]
+		plan.viewtemplates_delete = viewtemplates_all_set
+		plan.paramfilters_delete = paramfilters_all_set
+
+	# Find Worksets to delete/keep and Elements on Worksets
+	if doc.IsWorkshared and worksets_name:
+
+		# Collect user-created worksets only and filter according to provided inputs
+		user_worksets = DB.FilteredWorksetCollector(doc).OfKind(DB.WorksetKind.UserWorkset).ToWorksets()
+		plan.worksets_delete = [uw for uw in user_worksets if any(wn in uw.Name for wn in worksets_name)]
+
+	if plan.worksets_delete and (collect_elements or count_elements):
+
+		# Construct MultiCategory Filter #1
+		categories_ids_1 = List[DB.ElementId]()
+		for cat in doc.Settings.Categories:
+			if (
+				cat.CategoryType == DB.CategoryType.Model
+				or cat.CategoryType == DB.CategoryType.Annotation
+			):
+				categories_ids_1.Add(cat.Id)
+		categories_filter_1 = DB.ElementMulticategoryFilter(categories_ids_1)
+
+		# Collect or count elements on Worksets
+		for wtd in plan.worksets_delete:
+			worksets_filter = DB.ElementWorksetFilter(wtd.Id)
+			composed_filter_1 = DB.LogicalAndFilter(categories_filter_1, worksets_filter)
+			elems_worksets = DB.FilteredElementCollector(doc).WhereElementIsNotElementType().WherePasses(composed_filter_1)
+			if collect_elements:
+				elems_worksets = list(elems_worksets)
+				plan.elements_delete.extend(elems_worksets)
+				plan.elements_count += len(elems_worksets)
+			else:
+				plan.elements_count += elems_worksets.GetElementCount()
+
+	return plan
+
+def f_delete_elem_ids(doc, elem_ids, error_elems):
+	"""
+	Delete the elements with the given integer IDs one by one,
+	appending (Id, Category, Name) to 'error_elems' for failures.
+	"""
+	for elemid in elem_ids:
+		item = f_id_to_elem(doc, elemid)
+		if item:
+			if item.IsValidObject:
+				try:
+					doc.Delete(item.Id)
+				except:
+					error_elems.append((get_element_id_value(item.Id), item.Category.Name, item.Name))
+
+def f_open_options(rvt_file_info):
+	"""
+	OpenOptions used by ModelCleanup: workshared files are opened detached
+	(preserving worksets) with all worksets closed.
+	"""
+	open_opt = DB.OpenOptions()
+
+	if rvt_file_info.IsWorkshared:
+		open_config = DB.WorksetConfiguration(DB.WorksetConfigurationOption.CloseAllWorksets)
+		open_opt.DetachFromCentralOption = DB.DetachFromCentralOption.DetachAndPreserveWorksets
+		open_opt.SetOpenWorksetsConfiguration(open_config)
+
+	return open_opt
+
+def f_get_run_history():
+	"""Return the local RunHistory used to calibrate the run-time estimates."""
+	history_path = script.get_universal_data_file(file_id='ModelCleanup_history', file_ext='json')
+	return cleanup_plan.RunHistory(history_path)
+
+def f_get_journal(rvt_file, journals):
+	"""
+	Return the JobJournal stored next to 'rvt_file' (one per folder),
+	caching it in the 'journals' dict.
+	"""
+	journal_path = os.path.join(os.path.dirname(rvt_file), JOURNAL_FILENAME)
+	if journal_path not in journals:
+		journals[journal_path] = job_journal.JobJournal(journal_path)
+	return journals[journal_path]
 
-	sheet_views_all.extend(sheet_schedules)
-	return sheet_views_all
+def f_timeout_seconds(entry_string):
+	"""Convert the timeout in minutes typed in the form to seconds (0 = none)."""
+	try:
+		return max(float(l_string_clean(entry_string).replace(',', '.')) * 60, 0)
+	except (TypeError, ValueError, AttributeError):
+		return 0
 
 # ============================================================================
 # INPUTS
@@ -283,6 +463,11 @@ if rvt_files[0] != None:
 		CheckBox('cb_purge', 'Purge Unused'),
 		CheckBox('cb_detach', 'Create Transmit'),
 		Separator(),
+		CheckBox('cb_dryrun', 'Dry Run (plan and time estimate only, no save)'),
+		CheckBox('cb_resume', 'Skip files already cleaned (job journal)', default=True),
+		Label('Mark files as hung after [min] (empty for no limit):'),
+		TextBox('txt_timeout'),
+		Separator(),
 		Button('OK')
 	]
 
@@ -301,291 +486,257 @@ if rvt_files[0] != None:
 		views_param_values = f_param_value_list(flex_form.values['txt_view_contains'])
 		sheets_param_name = l_string_clean(flex_form.values['txt_sheet_param'])
 		sheets_param_values = f_param_value_list(flex_form.values['txt_sheet_contains'])
+		do_purge = flex_form.values.get('cb_purge', False)
+		dry_run = flex_form.values.get('cb_dryrun', False)
+
+		run_history = f_get_run_history()
+
+		# ====================================================================
+		# DRY RUN - compute the plan and estimate the run time, save nothing
+		# ====================================================================
+		if dry_run:
+
+			estimator = cleanup_plan.RunTimeEstimator.calibrate(run_history.load())
+			total_estimate = 0.0
+
+			for rvt_file in rvt_files:
+
+				with forms.ProgressBar(title='Dry Run - ' + rvt_file.split('\\')[-1]) as pb:
+
+					rvt_file_info = revit.files.get_file_info(rvt_file)
+					pb.update_progress(5, 100)
+
+					# Open the original RVT file: no transaction is started
+					# and the document is closed without saving
+					model_path = DB.ModelPathUtils.ConvertUserVisiblePathToModelPath(rvt_file)
+					temp_doc = __revit__.Application.OpenDocumentFile(model_path, f_open_options(rvt_file_info))
+
+					try:
+						pb.update_progress(30, 100)
+						plan = f_build_cleanup_plan(
+							temp_doc, rvt_file, worksets_name,
+							views_param_name, views_param_values,
+							sheets_param_name, sheets_param_values,
+							collect_elements=False, count_elements=True
+						)
+
+						pb.update_progress(70, 100)
+						if do_purge:
+							plan.purge_count = count_purge_candidates(temp_doc)
+					finally:
+						temp_doc.Close(False)
+						temp_doc.Dispose()
+
+					pb.update_progress(100, 100)
+
+				counts = plan.counts()
+				estimate = estimator.estimate(counts)
+				total_estimate += estimate
+				out_rows.append(
+					[rvt_file]
+					+ [counts[key] for key in cleanup_plan.PLAN_KEYS]
+					+ [cleanup_plan.format_duration(estimate)]
+				)
+
+			# Print the output
+			table_headers = (
+				['File Path']
+				+ [cleanup_plan.PLAN_LABELS[key] for key in cleanup_plan.PLAN_KEYS]
+				+ ['Estimated Time [h:mm:ss]']
+			)
+
+			script_output.print_table(
+				table_data=out_rows,
+				title='Model(s) Cleanup - Dry Run',
+				columns=table_headers
+			)
+			if estimator.runs:
+				calibration = 'calibrated on {} previous run(s)'.format(estimator.runs)
+			else:
+				calibration = 'default coefficients, no previous runs'
+			script_output.print_md('**Estimated batch time:** {} ({})'.format(
+				cleanup_plan.format_duration(total_estimate), calibration))
+
+			script.exit()
+
+		# Job journal: one JSONL file next to the cleaned models
+		resume = flex_form.values.get('cb_resume', False)
+		timeout_s = f_timeout_seconds(flex_form.values.get('txt_timeout', ''))
+		options_signature = job_journal.options_hash({
+			'worksets': worksets_name,
+			'views_param': views_param_name,
+			'views_values': views_param_values,
+			'sheets_param': sheets_param_name,
+			'sheets_values': sheets_param_values,
+			'purge': do_purge,
+			'detach': flex_form.values.get('cb_detach', False),
+			'rvt_version': rvt_version,
+		})
+		journals, journal_states = {}, {}
 
 		# Iterate over each selected RVT file
 		for rvt_file in rvt_files:
-			
-			start = time.time()
-			with forms.ProgressBar(title=rvt_file.split('\\')[-1]) as pb:
 
-				temp_name = rvt_file.split('\\')[-1]
-				rvt_file_info = revit.files.get_file_info(rvt_file)
+			# Skip files already cleaned with the same settings in a previous session
+			# (the RVT is only hashed when the journal has a matching completed run)
+			journal = f_get_journal(rvt_file, journals)
+			journal_state = journal_states.setdefault(journal.path, journal.state())
+			previous_status = journal_state.status(rvt_file)
+			if resume and journal_state.is_completed(rvt_file, lambda: job_journal.file_hash(rvt_file), options_signature):
+				out_rows.append((rvt_file, 'Skipped - already cleaned', 0, []))
+				continue
+			if previous_status in ('interrupted', 'hung'):
+				script_output.print_md('**{}**: previous run {}, restarting'.format(rvt_file, previous_status))
+
+			started = journal.start(rvt_file, options=options_signature)
+			watchdog = job_journal.Watchdog(
+				timeout_s,
+				lambda journal=journal, rvt_file=rvt_file, started=started: journal.mark_timeout(rvt_file, started, timeout_s)
+			).start()
 
-				pb.update_progress(5, 100)
+			try:
+				start = time.time()
+				with forms.ProgressBar(title=rvt_file.split('\\')[-1]) as pb:
 
-				# Specify options when opening the original RVT file
-				open_opt = DB.OpenOptions()
+					temp_name = rvt_file.split('\\')[-1]
+					rvt_file_info = revit.files.get_file_info(rvt_file)
 
-				# Add opening options for Workshared RVT file
-				if rvt_file_info.IsWorkshared:
-					open_config = DB.WorksetConfiguration(DB.WorksetConfigurationOption.CloseAllWorksets)
-					open_opt = DB.OpenOptions()
-					open_opt.DetachFromCentralOption = DB.DetachFromCentralOption.DetachAndPreserveWorksets
-					open_opt.SetOpenWorksetsConfiguration(open_config)
-	
-				# Open the original RVT file
-				model_path = DB.ModelPathUtils.ConvertUserVisiblePathToModelPath(rvt_file)
-				temp_doc = __revit__.Application.OpenDocumentFile(model_path, open_opt)
-
-				# Instantiate the containers for Views and Sheets
-				sheets_keep_set, sheets_delete_set = set(), set()
-				views_keep_set, views_delete_set = set(), set()
-
-				# Find sheets to delete/keep
-				sheets_all = revit.query.get_sheets(doc=temp_doc)
-				sheets_all_ids = [get_element_id_value(item.Id) for item in sheets_all]
-				sheets_all_set = set(sheets_all_ids)
-
-				if sheets_param_name:
-					if sheets_param_values:
-						for elemid in sheets_all_set:
-							if f_param_check(f_id_to_elem(temp_doc, elemid), sheets_param_name, sheets_param_values):
-								sheets_keep_set.add(elemid)
-					else:
-						sheets_delete_set = sheets_all_set
-				else:
-					sheets_keep_set = sheets_all_set
-				sheets_delete_set = sheets_all_set - sheets_keep_set
-
-				# Get the ID of views placed on Sheets and add them to the views_keep_set
-				for elemid in sheets_keep_set:
-					views_on_sheet = f_get_all_views_on_sheet(temp_doc, f_id_to_elem(temp_doc, elemid), elemID=True)
-					views_on_sheet_set = set(views_on_sheet)
-					views_keep_set.update(views_on_sheet_set)
-
-				pb.update_progress(10, 100)
-
-				# Find views to delete/keep
-				views_all = revit.query.get_all_views(doc=temp_doc)
-				views_all = [va for va in views_all if va.GetType().ToString() != 'Autodesk.Revit.DB.ViewSheet']
-				views_all_ids = [get_element_id_value(item.Id) for item in views_all]
-				views_all_set = set(views_all_ids)
-
-				if views_param_name:
-					if views_param_values:
-						for elemid in views_all_set:
-							if f_param_check(f_id_to_elem(temp_doc, elemid), views_param_name, views_param_values):
-								views_keep_set.add(elemid)
-					else:
-						views_delete_set = views_all_set - views_keep_set
-				else:
-					views_keep_set = views_all_set
-				views_delete_set = views_all_set - views_keep_set
+					pb.update_progress(5, 100)
 
-				pb.update_progress(15, 100)
+					# Open the original RVT file
+					model_path = DB.ModelPathUtils.ConvertUserVisiblePathToModelPath(rvt_file)
+					temp_doc = __revit__.Application.OpenDocumentFile(model_path, f_open_options(rvt_file_info))
 
-				# Find ViewTemplates and ParameterFilterElements to delete/keep
-				viewtemplates_delete_set, paramfilters_delete_set = set(), set()
+					pb.update_progress(10, 100)
 
-				# Get all ViewTemplates
-				viewtemplates_all = revit.query.get_all_view_templates(doc=temp_doc)
-				viewtemplates_all_set = set()
+					# Find Sheets, Views, ViewTemplates, ParameterFilterElements and
+					# Worksets to delete (Elements on Worksets for RVT < 2023).
+					# Elements are always counted: the run history must hold the
+					# same features the Dry Run estimate uses
+					plan = f_build_cleanup_plan(
+						temp_doc, rvt_file, worksets_name,
+						views_param_name, views_param_values,
+						sheets_param_name, sheets_param_values,
+						collect_elements=(rvt_version < 2023), count_elements=True
+					)
 
-				if len(viewtemplates_all) > 0:
-					viewtemplates_all_ids = [get_element_id_value(item.Id) for item in viewtemplates_all]
-					viewtemplates_all_set = set(viewtemplates_all_ids)
+					pb.update_progress(25, 100)
 
-					# Get ViewTemplates applied to Views to keep
-					viewtemplates_keep_ids = [get_element_id_value(f_id_to_elem(temp_doc, elemid).ViewTemplateId) for elemid in views_keep_set]
-					viewtemplates_keep_set = set(viewtemplates_keep_ids)
+					# Delete Sheets, Views, ViewTemplates, ParameterFilterElements and Worksets
+					# (Elements on Worksets for RVT < 2023)
+					error_elems = []
 
-					# Get ViewTemplates to delete
-					viewtemplates_delete_set = viewtemplates_all_set - viewtemplates_keep_set
+					with revit.Transaction(name='CleanupModel', doc=temp_doc, swallow_errors=False):
 
-				# Get all ParameterFilterElements
-				paramfilters_all = revit.query.get_rule_filters(doc=temp_doc)
-				paramfilters_all_set = set()
-				
-				if len(paramfilters_all) > 0:
-					paramfilters_all_ids = [get_element_id_value(item.Id) for item in paramfilters_all]
-					paramfilters_all_set = set(paramfilters_all_ids)
+						# Delete Sheets
+						f_delete_elem_ids(temp_doc, plan.sheets_delete, error_elems)
 
-					# Get ParameterFilterElements applied to Views to keep
-					paramfilters_keep_set = set()
+						# Delete Views
+						f_delete_elem_ids(temp_doc, plan.views_delete, error_elems)
 
-					for elemid in views_keep_set:
-						if f_id_to_elem(temp_doc, elemid).AreGraphicsOverridesAllowed():
-							view_filters = f_id_to_elem(temp_doc, elemid).GetFilters()
-							for vf in view_filters:
-								paramfilters_keep_set.add(get_element_id_value(vf))
+						# Delete ViewTemplates
+						f_delete_elem_ids(temp_doc, plan.viewtemplates_delete, error_elems)
 
-					# Get ParameterFilterElements to delete
-					paramfilters_delete_set = paramfilters_all_set - paramfilters_keep_set
-				
-				else:
-					viewtemplates_delete_set = viewtemplates_all_set
-					paramfilters_delete_set = paramfilters_all_set
+						# Delete ParameterFilterElements
+						f_delete_elem_ids(temp_doc, plan.paramfilters_delete, error_elems)
 
-				pb.update_progress(20, 100)
+						# Delete Worksets (Elements on Worksets for RVT < 2023)
+						if plan.worksets_delete:
+							if rvt_version < 2023:
+								for item in plan.elements_delete:
+									if item:
+										if item.IsValidObject:
+											try:
+												temp_doc.Delete(item.Id)
+											except:
+												error_elems.append((get_element_id_value(item.Id), item.Category.Name, item.Name))
 
-				# Find Worksets to delete/keep or Elements on Worksets (for RVT < 2023)
-				worksets_delete = None
-				elements_delete = []
-				
-				if temp_doc.IsWorkshared:
-
-					if worksets_name:
-
-						# Collect user-created worksets only and filter according to provided inputs
-						user_worksets = DB.FilteredWorksetCollector(temp_doc).OfKind(DB.WorksetKind.UserWorkset).ToWorksets()
-						worksets_delete = [uw for uw in user_worksets if any(wn in uw.Name for wn in worksets_name)]
-
-						# If RVT version is > 2022 the Workset (and its elements) will be deleted,
-						# otherwise only the Workset's elements will be deleted
-						if rvt_version < 2023:
-
-							# Construct MultiCategory Filter #1
-							categories_filter_1 = []
-							for cat in temp_doc.Settings.Categories:
-								if (
-									cat.CategoryType == DB.CategoryType.Model
-									or cat.CategoryType == DB.CategoryType.Annotation
-								):
-									categories_filter_1.append(cat)
-							
-							categories_ids_1 = List[DB.ElementId]()
-							for fc1 in categories_filter_1:
-								categories_ids_1.Add(fc1.Id)
-							categories_filter_1 = DB.ElementMulticategoryFilter(categories_ids_1)
-
-							# Collect elements on Worksets
-							for wtd in worksets_delete:
-								worksets_filter = DB.ElementWorksetFilter(wtd.Id)
-								composed_filter_1 = DB.LogicalAndFilter(categories_filter_1, worksets_filter)
-								elems_worksets = DB.FilteredElementCollector(temp_doc).WhereElementIsNotElementType().WherePasses(composed_filter_1)
-								elements_delete.extend(elems_worksets)
-
-				pb.update_progress(25, 100)
-
-				# Delete Sheets, Views, ViewTemplates, ParameterFilterElements and Worksets
-				# (Elements on Worksets for RVT < 2023)
-				error_elems = []
-
-				with revit.Transaction(name='CleanupModel', doc=temp_doc, swallow_errors=False):
-
-					# Delete Sheets
-					if sheets_delete_set:
-						for elemid in sheets_delete_set:
-							item = f_id_to_elem(temp_doc, elemid)
-							if item.IsValidObject:
-								try:
-									temp_doc.Delete(item.Id)
-								except:
-									error_elems.append((get_element_id_value(item.Id), item.Category.Name, item.Name))
-
-					# Delete Views
-					if views_delete_set:
-						for elemid in views_delete_set:
-							item = f_id_to_elem(temp_doc, elemid)
-							if item:
-								if item.IsValidObject:
-									try:
-										temp_doc.Delete(item.Id)
-									except:
-										error_elems.append((get_element_id_value(item.Id), item.Category.Name, item.Name))
-
-					# Delete ViewTemplates
-					if viewtemplates_delete_set:
-						for elemid in viewtemplates_delete_set:
-							item = f_id_to_elem(temp_doc, elemid)
-							if item:
-								if item.IsValidObject:
-									try:
-										temp_doc.Delete(item.Id)
-									except:
-										error_elems.append((get_element_id_value(item.Id), item.Category.Name, item.Name))
-
-					# Delete ParameterFilterElements
-					if paramfilters_delete_set:
-						for elemid in paramfilters_delete_set:
-							item = f_id_to_elem(temp_doc, elemid)
-							if item:
-								if item.IsValidObject:
+							else:
+								dws = DB.DeleteWorksetSettings()
+								for item in plan.worksets_delete:
 									try:
-										temp_doc.Delete(item.Id)
+										DB.WorksetTable.DeleteWorkset(temp_doc, item.Id, dws)
 									except:
-										error_elems.append((get_element_id_value(item.Id), item.Category.Name, item.Name))
-
-					# Delete Worksets (Elements on Worksets for RVT < 2023)
-					if worksets_delete:
-						if rvt_version < 2023:
-							for item in elements_delete:
-								if item:
-									if item.IsValidObject:
-										try:
-											temp_doc.Delete(item.Id)
-										except:
-											error_elems.append((get_element_id_value(item.Id), item.Category.Name, item.Name))
-
-						else:
-							dws = DB.DeleteWorksetSettings()
-							for item in worksets_delete:
-								try:
-									DB.WorksetTable.DeleteWorkset(temp_doc, item.Id, dws)
-								except:
-									error_elems.append((item.Name, get_element_id_value(item.Id)))
-
-				pb.update_progress(35, 100)
-
-				# Specify options when saving and overwrite the RVT file
-				save_opt = DB.SaveAsOptions()
-				save_opt.Compact = True
-				save_opt.OverwriteExistingFile = True
-
-				# Add saving options for Workshared RVT file
-				if temp_doc.IsWorkshared:
-					worksharing_save_opt = DB.WorksharingSaveAsOptions()
-					worksharing_save_opt.SaveAsCentral = True
-					save_opt.SetWorksharingOptions(worksharing_save_opt)
-					relinquish_opt = DB.RelinquishOptions(True)
-					transact_opts = DB.TransactWithCentralOptions()
-					DB.WorksharingUtils.RelinquishOwnership(temp_doc, relinquish_opt, transact_opts)
-
-				# Check if there is at least one view in the project,
-				# otherwise create an empty drafting view
-				views_check = revit.query.get_all_views(doc=temp_doc)
-				if not views_check:
-					view_fam_types = DB.FilteredElementCollector(temp_doc).OfClass(DB.ViewFamilyType).ToElements()
-					view_draft_type = [item for item in view_fam_types if item.ViewFamily == DB.ViewFamily.Drafting][0]
-					with revit.Transaction(name='CreateView', doc=temp_doc, swallow_errors=True):
-						view_draft = DB.ViewDrafting.Create(temp_doc, view_draft_type.Id)
-						view_draft.Name = 'Empty Drafting View'
-
-				pb.update_progress(40, 100)
-
-				# Purge Document if selected
-				purge_result = None
-				if flex_form.values.get('cb_purge', False):
-					try:
-						with revit.Transaction(name='PurgeUnused', doc=temp_doc, swallow_errors=False):
-							success, purge_result = purge_document(
-								temp_doc, 
-								app_instance=app, 
-								model_path=model_path,
-								iterations=3
-							)
-					except Exception as purge_error:
-						purge_result = "Error: " + str(purge_error)
-
-				pb.update_progress(85, 100)
+										error_elems.append((item.Name, get_element_id_value(item.Id)))
+
+					pb.update_progress(35, 100)
+
+					# Specify options when saving and overwrite the RVT file
+					save_opt = DB.SaveAsOptions()
+					save_opt.Compact = True
+					save_opt.OverwriteExistingFile = True
+
+					# Add saving options for Workshared RVT file
+					if temp_doc.IsWorkshared:
+						worksharing_save_opt = DB.WorksharingSaveAsOptions()
+						worksharing_save_opt.SaveAsCentral = True
+						save_opt.SetWorksharingOptions(worksharing_save_opt)
+						relinquish_opt = DB.RelinquishOptions(True)
+						transact_opts = DB.TransactWithCentralOptions()
+						DB.WorksharingUtils.RelinquishOwnership(temp_doc, relinquish_opt, transact_opts)
+
+					# Check if there is at least one view in the project,
+					# otherwise create an empty drafting view
+					views_check = revit.query.get_all_views(doc=temp_doc)
+					if not views_check:
+						view_fam_types = DB.FilteredElementCollector(temp_doc).OfClass(DB.ViewFamilyType).ToElements()
+						view_draft_type = [item for item in view_fam_types if item.ViewFamily == DB.ViewFamily.Drafting][0]
+						with revit.Transaction(name='CreateView', doc=temp_doc, swallow_errors=True):
+							view_draft = DB.ViewDrafting.Create(temp_doc, view_draft_type.Id)
+							view_draft.Name = 'Empty Drafting View'
+
+					pb.update_progress(40, 100)
+
+					# Purge Document if selected
+					purge_result = None
+					if do_purge:
+						try:
+							with revit.Transaction(name='PurgeUnused', doc=temp_doc, swallow_errors=False):
+								success, purge_result, plan.purge_count = purge_document(
+									temp_doc, 
+									app_instance=app, 
+									model_path=model_path,
+									iterations=3
+								)
+						except Exception as purge_error:
+							purge_result = "Error: " + str(purge_error)
+
+					pb.update_progress(85, 100)
 	
-				temp_doc.SaveAs(rvt_file, save_opt)
+					temp_doc.SaveAs(rvt_file, save_opt)
 
-				# Save as detached if selected
-				if flex_form.values['cb_detach'] and rvt_file_info.IsWorkshared:
-					tr_data = DB.TransmissionData.ReadTransmissionData(model_path)
-					tr_data.IsTransmitted = True
-					DB.TransmissionData.WriteTransmissionData(model_path, tr_data)
+					# Save as detached if selected
+					if flex_form.values['cb_detach'] and rvt_file_info.IsWorkshared:
+						tr_data = DB.TransmissionData.ReadTransmissionData(model_path)
+						tr_data.IsTransmitted = True
+						DB.TransmissionData.WriteTransmissionData(model_path, tr_data)
 
-				temp_doc.Close(False)
-				temp_doc.Dispose()
+					temp_doc.Close(False)
+					temp_doc.Dispose()
 
-				pb.update_progress(100, 100)
+					pb.update_progress(100, 100)
 				
-				end = time.time()
-				exec_time = end - start
+					end = time.time()
+					exec_time = end - start
+
+			except Exception as job_error:
+				journal.finish(rvt_file, started, job_journal.OUTCOME_ERROR,
+							options=options_signature, message=str(job_error))
+				raise
+			finally:
+				watchdog.cancel()
+
+			journal.finish(rvt_file, started, job_journal.OUTCOME_OK,
+						options=options_signature, hash=job_journal.file_hash(rvt_file),
+						timed_out=watchdog.fired)
 
 			out_rows.append((rvt_file, purge_result, exec_time, error_elems))
+
+			# Store the run to calibrate future Dry Run estimates
+			try:
+				run_history.append(rvt_file, plan.counts(), exec_time)
+			except Exception:
+				pass  # History is optional
 			
 			# Delete backup folder for Workshared RVT file
 			bk_folder_path = rvt_file.replace('.rvt', '_backup')
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+cleanup_plan.py - Deletion plan and run-time estimator for ModelCleanup.
+No Revit API imports: the plan is filled by the script and the estimator
+only works on plain element counts, so both can run outside Revit.
+"""
+
+import io
+import json
+import os
+
+
+# =============================================================================
+# PLAN
+# =============================================================================
+
+# Counted quantities, in the order they are shown in the output table
+PLAN_KEYS = (
+	'model_elements',
+	'sheets',
+	'views',
+	'viewtemplates',
+	'paramfilters',
+	'worksets',
+	'elements',
+	'purge',
+)
+
+PLAN_LABELS = {
+	'model_elements': 'Model Elements',
+	'sheets': 'Sheets',
+	'views': 'Views',
+	'viewtemplates': 'View Templates',
+	'paramfilters': 'Filters',
+	'worksets': 'Worksets',
+	'elements': 'Elements on Worksets',
+	'purge': 'Purge Candidates',
+}
+
+
+def resolve_keep_delete(all_ids, param_name, param_values, predicate, keep_ids=None):
+	"""
+	Split 'all_ids' into (keep, delete) sets following the ModelCleanup rules:
+	- no parameter name: keep everything
+	- parameter name without values: keep only 'keep_ids'
+	- parameter name and values: keep 'keep_ids' plus the IDs
+	  for which 'predicate(id)' is True
+	"""
+	all_set = set(all_ids)
+	keep_set = set(keep_ids or ())
+
+	if param_name:
+		if param_values:
+			for elemid in all_set:
+				if predicate(elemid):
+					keep_set.add(elemid)
+	else:
+		keep_set = set(all_set)
+
+	return keep_set, all_set - keep_set
+
+
+class CleanupPlan(object):
+	"""Sets of element IDs ModelCleanup would delete from a single model."""
+
+	def __init__(self, file_path):
+		self.file_path = file_path
+		self.model_elements = 0
+		self.sheets_delete = set()
+		self.views_delete = set()
+		self.viewtemplates_delete = set()
+		self.paramfilters_delete = set()
+		self.worksets_delete = []
+		self.elements_delete = []
+		self.elements_count = 0
+		self.purge_count = 0
+
+	def counts(self):
+		"""Return a dict {PLAN_KEY: count} used by the estimator."""
+		return {
+			'model_elements': self.model_elements,
+			'sheets': len(self.sheets_delete),
+			'views': len(self.views_delete),
+			'viewtemplates': len(self.viewtemplates_delete),
+			'paramfilters': len(self.paramfilters_delete),
+			'worksets': len(self.worksets_delete or []),
+			'elements': max(self.elements_count, len(self.elements_delete)),
+			'purge': self.purge_count,
+		}
+
+
+# =============================================================================
+# RUN HISTORY
+# =============================================================================
+
+# Version 2: 'elements' is counted in every run. Version 1 records of runs
+# that deleted Worksets may hold elements=0 (not counted on RVT >= 2023)
+HISTORY_VERSION = 2
+
+
+class RunHistory(object):
+	"""
+	Local JSON history of completed ModelCleanup runs.
+	Each record is {'file': str, 'counts': {PLAN_KEY: int}, 'duration': float,
+	'version': int}.
+	"""
+
+	def __init__(self, path, max_records=200):
+		self.path = path
+		self.max_records = max_records
+
+	def load(self):
+		"""Return the stored records, or an empty list if the file is missing or corrupted."""
+		if not self.path or not os.path.exists(self.path):
+			return []
+		try:
+			with io.open(self.path, 'r', encoding='utf-8') as f:
+				data = json.load(f)
+		except (IOError, OSError, ValueError):
+			return []
+		records = data.get('runs', []) if isinstance(data, dict) else []
+		return [r for r in records if _is_valid_record(r)]
+
+	def append(self, file_path, counts, duration):
+		"""Add a run and rewrite the file, keeping only the latest 'max_records' runs."""
+		records = self.load()
+		records.append({
+			'file': file_path,
+			'counts': dict((k, int(counts.get(k, 0))) for k in PLAN_KEYS),
+			'duration': float(duration),
+			'version': HISTORY_VERSION,
+		})
+		records = records[-self.max_records:]
+
+		folder = os.path.dirname(self.path)
+		if folder and not os.path.exists(folder):
+			os.makedirs(folder)
+
+		# Write to a temporary file first, so a crash never leaves half a JSON
+		tmp_path = self.path + '.tmp'
+		with io.open(tmp_path, 'w', encoding='utf-8') as f:
+			f.write(_to_unicode(json.dumps({'runs': records}, indent=2)))
+		if os.path.exists(self.path):
+			os.remove(self.path)
+		os.rename(tmp_path, self.path)
+		return records
+
+
+def _is_valid_record(record):
+	try:
+		if not (
+			isinstance(record.get('counts'), dict)
+			and float(record.get('duration')) >= 0
+		):
+			return False
+		# Old runs that deleted Worksets did not count their elements
+		return (
+			int(record.get('version', 1)) >= HISTORY_VERSION
+			or not record['counts'].get('worksets')
+		)
+	except (AttributeError, TypeError, ValueError):
+		return False
+
+
+def _to_unicode(text):
+	if isinstance(text, bytes):
+		return text.decode('utf-8')
+	return text
+
+
+# =============================================================================
+# RUN-TIME ESTIMATOR
+# =============================================================================
+
+# Seconds per deleted/purged item, plus a fixed 'base' cost per file
+# (open, save, compact and close). Used until the history has enough runs.
+DEFAULT_COEFFICIENTS = {
+	'base': 30.0,
+	'model_elements': 0.0002,
+	'sheets': 0.05,
+	'views': 0.03,
+	'viewtemplates': 0.02,
+	'paramfilters': 0.02,
+	'worksets': 2.0,
+	'elements': 0.002,
+	'purge': 0.005,
+}
+
+COEFFICIENT_KEYS = ('base',) + PLAN_KEYS
+
+
+class RunTimeEstimator(object):
+	"""
+	Linear run-time model: seconds = base + sum(coefficient[k] * count[k]).
+	"""
+
+	def __init__(self, coefficients=None, runs=0):
+		self.coefficients = dict(DEFAULT_COEFFICIENTS)
+		if coefficients:
+			self.coefficients.update(coefficients)
+		self.runs = runs
+
+	@classmethod
+	def calibrate(cls, records, ridge=1.0):
+		"""
+		Fit the coefficients on past runs with a ridge regression pulled towards
+		DEFAULT_COEFFICIENTS, so a handful of runs already refines the estimate
+		without producing wild values. Negative coefficients are clamped to 0.
+		"""
+		rows, targets = [], []
+		for record in records:
+			if not _is_valid_record(record):
+				continue
+			rows.append(_features(record['counts']))
+			targets.append(float(record['duration']))
+
+		if not rows:
+			return cls()
+
+		size = len(COEFFICIENT_KEYS)
+		prior = [DEFAULT_COEFFICIENTS[k] for k in COEFFICIENT_KEYS]
+
+		# Penalty weight per coefficient, scaled with the mean magnitude of its
+		# feature so that the prior costs "seconds" for every key alike
+		scales = []
+		for j in range(size):
+			mean_abs = sum(abs(row[j]) for row in rows) / float(len(rows))
+			scales.append(max(mean_abs, 1.0) ** 2)
+
+		# Normal equations: (XtX + ridge*S) c = Xty + ridge*S*prior
+		matrix = [[0.0] * size for _ in range(size)]
+		vector = [0.0] * size
+		for row, target in zip(rows, targets):
+			for i in range(size):
+				if not row[i]:
+					continue
+				vector[i] += row[i] * target
+				for j in range(size):
+					matrix[i][j] += row[i] * row[j]
+		for i in range(size):
+			matrix[i][i] += ridge * scales[i]
+			vector[i] += ridge * scales[i] * prior[i]
+
+		solution = _solve(matrix, vector)
+		if solution is None:
+			return cls(runs=len(rows))
+
+		coefficients = dict(
+			(key, max(value, 0.0)) for key, value in zip(COEFFICIENT_KEYS, solution)
+		)
+		return cls(coefficients, runs=len(rows))
+
+	def estimate(self, counts):
+		"""Return the estimated run time in seconds for a single model."""
+		features = _features(counts)
+		return sum(
+			self.coefficients[key] * value
+			for key, value in zip(COEFFICIENT_KEYS, features)
+		)
+
+
+def _features(counts):
+	return [1.0] + [float(counts.get(key, 0) or 0) for key in PLAN_KEYS]
+
+
+def _solve(matrix, vector):
+	"""Gaussian elimination with partial pivoting. Return None if singular."""
+	size = len(vector)
+	a = [list(row) + [vector[i]] for i, row in enumerate(matrix)]
+
+	for col in range(size):
+		pivot = max(range(col, size), key=lambda r: abs(a[r][col]))
+		if abs(a[pivot][col]) < 1e-12:
+			return None
+		a[col], a[pivot] = a[pivot], a[col]
+		for r in range(col + 1, size):
+			factor = a[r][col] / a[col][col]
+			if factor:
+				for c in range(col, size + 1):
+					a[r][c] -= factor * a[col][c]
+
+	solution = [0.0] * size
+	for r in range(size - 1, -1, -1):
+		acc = a[r][size] - sum(a[r][c] * solution[c] for c in range(r + 1, size))
+		solution[r] = acc / a[r][r]
+	return solution
+
+
+def format_duration(seconds):
+	"""Format seconds as 'h:mm:ss'."""
+	seconds = int(round(max(seconds, 0)))
+	hours, rest = divmod(seconds, 3600)
+	minutes, secs = divmod(rest, 60)
+	return '{}:{:02d}:{:02d}'.format(hours, minutes, secs)
@@ -19,6 +19,8 @@ from Autodesk.Revit.UI import TaskDialog, TaskDialogCommonButtons, TaskDialogRes
 from pyrevit import revit, DB, forms, script
 from System.Collections.Generic import List
 
+from placement_index import PlacementIndex
+
 doc = revit.doc
 uidoc = revit.uidoc
 output = script.get_output()
@@ -34,24 +36,9 @@ def get_element_id_value(eid):
 
 
 def get_sheets_with_views():
-    """Restituisce un set con le viste contenute nelle tavole."""
-    views_on_sheets = set()
-    
-    # Raccoglie tutte le tavole
-    all_sheets = FilteredElementCollector(doc).OfClass(ViewSheet).ToElements()
-    
-    for sheet in all_sheets:
-        # Raccoglie i viewports in ogni tavola (viste grafiche e legende)
-        viewports = FilteredElementCollector(doc, sheet.Id).OfClass(Viewport).ToElements()
-        for vp in viewports:
-            views_on_sheets.add(vp.ViewId)
-        
-        # Raccoglie schedules sulla tavola
-        schedules = FilteredElementCollector(doc, sheet.Id).OfClass(ScheduleSheetInstance).ToElements()
-        for sched in schedules:
-            views_on_sheets.add(sched.ScheduleId)
-    
-    return views_on_sheets
+    """Restituisce un PlacementIndex con le viste contenute nelle tavole."""
+    # Due soli collector (Viewport e ScheduleSheetInstance) per tutto il documento
+    return PlacementIndex.from_document(doc)
 
 
 def get_views_with_templates():
@@ -163,15 +150,15 @@ def delete_schedules():
     # Testa la possibilità di eliminazione
     schedules_data = []
     
-    # Ottiene le viste contenute nelle tavole
-    views_on_sheets = get_sheets_with_views()
+    # Indice delle viste e schedule inserite nelle tavole
+    placement_index = get_sheets_with_views()
     
     # Raccogli tutte le schedule con un nome
     for s in all_schedules:
         try:
             name = s.Name
             # Se la schedule ha un nome, considerala potenzialmente eliminabile
-            on_sheet = s.Id in views_on_sheets
+            on_sheet = placement_index.is_on_sheet(s.Id)
             schedules_data.append({
                 'name': name,
                 'id': s.Id,
@@ -255,13 +242,13 @@ def delete_legends():
         forms.alert("Non ci sono legende nel progetto.", title="Nessuna Legenda")
         return
     
-    # Ottiene le viste contenute nelle tavole
-    views_on_sheets = get_sheets_with_views()
+    # Indice delle viste e schedule inserite nelle tavole
+    placement_index = get_sheets_with_views()
     
     # Crea lista di legende con indicazione se sono in tavola
     legends_data = []
     for legend in all_legends:
-        in_sheet = legend.Id in views_on_sheets
+        in_sheet = placement_index.is_on_sheet(legend.Id)
         legends_data.append({
             'name': legend.Name,
             'id': legend.Id,
@@ -17,6 +17,8 @@ from pyrevit import forms
 
 from System.Collections.Generic import List
 
+import model_report
+
 uidoc = __revit__.ActiveUIDocument
 time_start = datetime.datetime.now()
 
@@ -402,22 +404,11 @@ if csv_path:
 	row_04_01 = []
 	if rvtdoc.IsWorkshared:
 		user_worksets = DB.FilteredWorksetCollector(rvtdoc).OfKind(DB.WorksetKind.UserWorkset).ToWorksets()
-		worksets_categories = []
-		for uw in user_worksets:
-			user_worksets_filter = DB.ElementWorksetFilter(uw.Id)
-			composed_filter_1 = DB.LogicalAndFilter(categories_filter_1,user_worksets_filter)	
-			elems_worksets = DB.FilteredElementCollector(rvtdoc).WhereElementIsNotElementType().WherePasses(composed_filter_1)
-			elems_category_name = []
-			for ew in elems_worksets:
-				if ew.Category.Name not in elems_category_name:
-					elems_category_name.append(l_safe_str(ew.Category.Name))
-					ew.Dispose()
-			worksets_categories.append(elems_category_name)
-
-		for uw,w_categories in zip(user_worksets, worksets_categories):
-			for wc in w_categories:
-				row_04_01.append((chapter_04, 'Categories per Workset', '', uw.Id.IntegerValue,
-				'Workset Name',  l_safe_str(uw.Name), 'Category Name', wc))
+		elems_categories = DB.FilteredElementCollector(rvtdoc).WhereElementIsNotElementType().WherePasses(categories_filter_1)
+		###	{workset id: {category name: nr of elements}} in a single pass
+		worksets_categories = model_report.worksets_categories(elems_categories, l_safe_str)
+		row_04_01.extend(model_report.categories_per_workset_rows(
+			chapter_04, user_worksets, worksets_categories, l_safe_str))
 	else:
 		row_04_01.append((chapter_04, 'Categories per Workset'))
 	csv_list.extend(row_04_01)
@@ -480,29 +471,17 @@ if csv_path:
 	with open(warnings_path,'rb') as csv_warnings:
 		warnings_reader = csv.reader(csv_warnings, delimiter=';')
 		warnings_headers = next(warnings_reader)
-		warnings_data = zip(*[wr for wr in warnings_reader])
-
-	wd_description = [wd for wd in warnings_data[0]]
+		###	Description -> Classification (first occurrence wins, as with list.index)
+		warnings_classes = model_report.warning_classes(warnings_reader)
 
 	warnings = rvtdoc.GetWarnings()
-	wrvt_description = []
-	wrvt_score = []
-	wrvt_elements = []
-	wrvt_levels = []
-	for wrn in warnings:
-		wrvt_description.append(wrn.GetDescriptionText())
-		if wrn.GetDescriptionText() in wd_description:
-			wrvt_score.append(warnings_data[1][wd_description.index(wrn.GetDescriptionText())])
-		else:
-			wrvt_score.append('04_Unclassified')
-		wrvt_elements.append(';'.join([str(x.IntegerValue) for x in wrn.GetFailingElements()]))
-		if len(wrn.GetFailingElements())>0:
-			wrvt_levels.append(l_safe_str(f_elem_level(rvtdoc.GetElement(wrn.GetFailingElements()[0]))))
-		else:
-			wrvt_levels.append('Undefined')
+	###	Level of each failing element, resolved once per element
+	wrvt_rows = model_report.classify_warnings(
+		warnings, warnings_classes,
+		lambda elem_id: l_safe_str(f_elem_level(rvtdoc.GetElement(elem_id))))
 
 	if warnings:
-		for wd, ws, we, wl in zip(wrvt_description, wrvt_score, wrvt_elements, wrvt_levels):
+		for wd, ws, we, wl in wrvt_rows:
 			row_06_01.append((chapter_06, 'Warnings', l_safe_str(wd), '',
 			'Classification', ws, 'Elements', we, 'Level', wl))
 		###	10_XX Record
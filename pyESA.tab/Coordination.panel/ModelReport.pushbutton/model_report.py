@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+model_report.py - Pure helpers of the Model Report chapters.
+
+Chapter 04 groups the elements of the model categories by workset and
+category in a single pass and counts them per cell.
+Chapter 06 classifies the warnings of the document through the
+ClassifiedWarnings.csv table (description -> classification), loaded once
+into a dictionary, and resolves the level of each failing element once.
+
+Pure Python: no Revit API imports. Elements only need .WorksetId,
+.Category.Name and Dispose(), worksets .Id and .Name, warnings
+GetDescriptionText() and GetFailingElements(), element ids .IntegerValue.
+"""
+from collections import OrderedDict
+
+
+UNCLASSIFIED = '04_Unclassified'
+UNDEFINED_LEVEL = 'Undefined'
+
+
+def worksets_categories(elems, safe_str):
+	"""
+	Group 'elems' by workset and category in a single pass:
+	{workset id: {category name: nr of elements}}, both in first-seen
+	order. Every element is disposed once counted.
+	"""
+	matrix = OrderedDict()
+	for elem in elems:
+		w_categories = matrix.setdefault(elem.WorksetId.IntegerValue, OrderedDict())
+		cat_name = safe_str(elem.Category.Name)
+		w_categories[cat_name] = w_categories.get(cat_name, 0) + 1
+		elem.Dispose()
+	return matrix
+
+
+def categories_per_workset_rows(chapter, user_worksets, matrix, safe_str):
+	"""
+	Return the 'Categories per Workset' rows: one per category of each
+	user workset, in the order of 'user_worksets', with the number of
+	elements of the cell in the 'Nr Elements' column.
+	"""
+	rows = []
+	for uw in user_worksets:
+		w_categories = matrix.get(uw.Id.IntegerValue, {})
+		for wc, wc_count in w_categories.items():
+			rows.append((chapter, 'Categories per Workset', '', uw.Id.IntegerValue,
+			'Workset Name', safe_str(uw.Name), 'Category Name', wc, '', '',
+			'Nr Elements', wc_count))
+	return rows
+
+
+def warning_classes(rows):
+	"""
+	Return {description: classification} from the rows of
+	ClassifiedWarnings.csv (header excluded). The first occurrence of a
+	description wins, as with list.index; rows without a classification
+	are skipped.
+	"""
+	classes = {}
+	for row in rows:
+		if len(row) > 1:
+			classes.setdefault(row[0], row[1])
+	return classes
+
+
+def classify_warnings(warnings, classes, element_level):
+	"""
+	Return one (description, classification, failing element ids joined
+	by ';', level) tuple per warning, in the order of 'warnings'.
+	element_level(element_id) returns the level of the first failing
+	element; it is called once per element id.
+	"""
+	levels = {}
+	rows = []
+	for wrn in warnings:
+		description = wrn.GetDescriptionText()
+		elements = wrn.GetFailingElements()
+		level = UNDEFINED_LEVEL
+		if len(elements) > 0:
+			first_id = elements[0].IntegerValue
+			if first_id not in levels:
+				levels[first_id] = element_level(elements[0])
+			level = levels[first_id]
+		rows.append((
+			description,
+			classes.get(description, UNCLASSIFIED),
+			';'.join([str(x.IntegerValue) for x in elements]),
+			level
+		))
+	return rows
@@ -12,9 +12,11 @@ clr.AddReference("WindowsBase")
 from Autodesk.Revit.DB import (
     FilteredElementCollector,
     ImportInstance,
+    Level,
     BuiltInParameter,
     WorksharingUtils,
     Transaction,
+    SubTransaction,
     ElementId,
     UnitUtils,
     UnitTypeId,
@@ -27,17 +29,23 @@ from System.Windows import Window, MessageBox, MessageBoxButton, MessageBoxResul
 from System.Windows.Markup import XamlReader
 from System.IO import StreamReader
 
+from batch_delete import bisect_delete
+
 # pyRevit entry points
 uidoc = __revit__.ActiveUIDocument
 doc = uidoc.Document
 
 
 class DwgRow(object):
-    """Data model for a single DWG import instance row."""
+    """
+    Data model for a single DWG import instance row.
+    If created_by is None, the creator is read the first time the DataGrid
+    shows the row (rows out of view are never realized).
+    """
     def __init__(self, dwg_name, created_by, element_id, workset_name,
                  hosted_level, offset_z, view_specific, view_name):
         self.DwgName = dwg_name
-        self.CreatedBy = created_by
+        self._created_by = created_by
         self.ElementId = element_id
         self.WorksetName = workset_name
         self.HostedLevel = hosted_level
@@ -45,6 +53,50 @@ class DwgRow(object):
         self.ViewSpecific = view_specific
         self.ViewName = view_name
 
+    @property
+    def CreatedBy(self):
+        if self._created_by is None:
+            self._created_by = get_creator(ElementId(int(self.ElementId)))
+        return self._created_by
+
+
+def get_creator(element_id):
+    """Return the creator of the element from the worksharing tooltip info."""
+    try:
+        return WorksharingUtils.GetWorksharingTooltipInfo(doc, element_id).Creator
+    except Exception:
+        return "N/A"
+
+
+def get_level_names():
+    """Return {level id integer: level name}, read once per load."""
+    levels = FilteredElementCollector(doc).OfClass(Level).ToElements()
+    return dict((level.Id.IntegerValue, level.Name) for level in levels)
+
+
+class WorksetNames(object):
+    """Workset names read from a single workset table, cached by workset id."""
+    def __init__(self):
+        self._names = {}
+        try:
+            self._table = doc.GetWorksetTable()
+        except Exception:
+            self._table = None
+
+    def get(self, workset_id):
+        key = workset_id.IntegerValue
+        if key not in self._names:
+            name = "N/A"
+            try:
+                if self._table is not None:
+                    ws = self._table.GetWorkset(workset_id)
+                    if ws is not None:
+                        name = ws.Name
+            except Exception:
+                pass
+            self._names[key] = name
+        return self._names[key]
+
 
 def collect_dwg_rows():
     """Collect all imported DWG instances and return a list of DwgRow objects."""
@@ -54,6 +106,8 @@ def collect_dwg_rows():
         .WhereElementIsNotElementType()
         .ToElements()
     )
+    workset_names = WorksetNames()
+    level_names = get_level_names()
 
     rows = []
     for dwg in dwgs:
@@ -62,29 +116,16 @@ def collect_dwg_rows():
 
         dwg_name = dwg.Parameter[BuiltInParameter.IMPORT_SYMBOL_NAME].AsString()
 
-        try:
-            created_by = WorksharingUtils.GetWorksharingTooltipInfo(
-                doc, dwg.Id
-            ).Creator
-        except Exception:
-            created_by = "N/A"
+        # Creator: read lazily by DwgRow.CreatedBy
+        created_by = None
 
         element_id = dwg.Id.IntegerValue
 
         # Workset
-        workset_name = "N/A"
-        try:
-            wt = doc.GetWorksetTable()
-            if wt is not None:
-                ws = wt.GetWorkset(dwg.WorksetId)
-                if ws is not None:
-                    workset_name = ws.Name
-        except Exception:
-            pass
+        workset_name = workset_names.get(dwg.WorksetId)
 
         # Hosted level
-        level = doc.GetElement(dwg.LevelId)
-        hosted_level = level.Name if level else "N/A"
+        hosted_level = level_names.get(dwg.LevelId.IntegerValue, "N/A")
 
         # Offset Z
         offset_z = "N/A"
@@ -115,6 +156,33 @@ def collect_dwg_rows():
     return rows
 
 
+def delete_elements(element_ids):
+    """
+    Delete the elements with one doc.Delete(ICollection) call, bisecting on
+    failure. Each attempt runs in a SubTransaction, so a failed batch leaves
+    the open Transaction untouched. Return (deleted ids, [(id, error)]).
+    """
+    def delete_batch(batch):
+        ids = List[ElementId]()
+        for eid in batch:
+            # Already gone, e.g. deleted together with another element
+            if doc.GetElement(eid) is not None:
+                ids.Add(eid)
+        if ids.Count == 0:
+            return
+        st = SubTransaction(doc)
+        st.Start()
+        try:
+            doc.Delete(ids)
+            st.Commit()
+        except Exception:
+            if st.HasStarted() and not st.HasEnded():
+                st.RollBack()
+            raise
+
+    return bisect_delete(element_ids, delete_batch)
+
+
 class DwgManagerForm(Window):
     """Modal WPF window for managing imported DWGs."""
 
@@ -209,8 +277,7 @@ class DwgManagerForm(Window):
         t = Transaction(doc, "Delete imported DWGs")
         t.Start()
         try:
-            for eid in ids_to_delete:
-                doc.Delete(eid)
+            deleted, failed = delete_elements(ids_to_delete)
             t.Commit()
         except Exception as ex:
             if t.HasStarted():
@@ -222,13 +289,23 @@ class DwgManagerForm(Window):
             return
 
         # Remove from collection
+        deleted_values = set(eid.IntegerValue for eid in deleted)
         for row in selected_items:
-            self._collection.Remove(row)
+            if int(row.ElementId) in deleted_values:
+                self._collection.Remove(row)
 
         remaining = self._collection.Count
         self.lbl_status.Text = "Deleted {} DWG(s). {} imported DWG(s) remaining".format(
-            count, remaining
+            len(deleted), remaining
         )
+        if failed:
+            MessageBox.Show(
+                "{} DWG(s) could not be deleted:\n{}".format(
+                    len(failed),
+                    "\n".join("{}: {}".format(eid.IntegerValue, error) for eid, error in failed)
+                ),
+                "Error"
+            )
 
     def _on_close_click(self, sender, args):
         self.Close()
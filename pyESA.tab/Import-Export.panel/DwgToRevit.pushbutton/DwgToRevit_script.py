@@ -8,9 +8,18 @@ from rpw.ui.forms import TaskDialog
 
 from System.Collections.Generic import *
 
+from ctb_colors import ColorMatcher, unique_by_id
+
 doc = revit.doc
 
 #DEFINITIONS
+def get_id_value(eid):
+	"""Return the integer value of an ElementId (works in Revit 2022-2026+)."""
+	try:
+		return eid.Value
+	except AttributeError:
+		return eid.IntegerValue
+
 def f_flatten(x):
 	result = []
 	for el in x:
@@ -44,14 +53,16 @@ def f_getColors(item):
 	return [item.LineColor.Red,item.LineColor.Green,item.LineColor.Blue]
 
 def f_matchcolor(colors0,colors1):
-	indices = []
-	for col0 in colors0:
-		ind = 'NotFound'
-		for i,col1 in enumerate(colors1):
-			if col0 == col1:
-				ind = i
-		indices.append(ind)
-	return indices
+	"""
+	Return the index in colors1 (CTB rows) of each colour of colors0:
+	exact RGB match first, then the nearest CTB colour in CIELAB.
+	None if no CTB colour is close enough.
+	"""
+	return ColorMatcher(colors1).match_all(colors0)
+
+def f_unique_subcategories(sub_cats):
+	"""Drop subcategories listed more than once (shared by the selected DWGs)."""
+	return unique_by_id(sub_cats, lambda sc: get_id_value(sc.Id))
 
 #INPUTS
 ##Get CSV file
@@ -82,7 +93,7 @@ else:
 ##Get information from UI input
 if dwgs_names_sel:
 	dwgs_sel = [dwgs_dic[k] for k in dwgs_names_sel]
-	sub_cats = f_flatten([dwg_sel.Category.SubCategories for dwg_sel in dwgs_sel])
+	sub_cats = f_unique_subcategories(f_flatten([dwg_sel.Category.SubCategories for dwg_sel in dwgs_sel]))
 	sub_cats_color = [f_getColors(sc) for sc in sub_cats]
 
 	##Read ;delimited CSV file data
@@ -99,20 +110,27 @@ if dwgs_names_sel:
 
 		##Change object styles
 		n_mod = 0
-		ok1 = False
-		ok2 = False
+		n_notfound = 0
 		with revit.Transaction('DwgToRevit'):
 			for ind,sc in zip(indices,sub_cats):
-				try:
-					sc.LineColor = DB.Color(color_plot[ind][0],color_plot[ind][1],color_plot[ind][2])
-					ok1 = True
-				except: pass
-				try:
-					sc.SetLineWeight(weight_rvt[ind], DB.GraphicsStyleType.Projection)
-					ok2 = True
-				except:
+				ok1 = False
+				ok2 = False
+				if ind is None:
+					###Colour not in the CTB: keep the colour, thinnest line weight
+					n_notfound += 1
 					sc.SetLineWeight(1, DB.GraphicsStyleType.Projection)
 					ok2 = True
+				else:
+					try:
+						sc.LineColor = DB.Color(color_plot[ind][0],color_plot[ind][1],color_plot[ind][2])
+						ok1 = True
+					except: pass
+					try:
+						sc.SetLineWeight(weight_rvt[ind], DB.GraphicsStyleType.Projection)
+						ok2 = True
+					except:
+						sc.SetLineWeight(1, DB.GraphicsStyleType.Projection)
+						ok2 = True
 				if any([ok1,ok2]):
 					n_mod += 1
 
@@ -125,7 +143,7 @@ if dwgs_names_sel:
 				v.UnhideElements(vId)
 
 		##Create output message
-		msg1 = '{0} Object Styles changed'.format(n_mod)
+		msg1 = '{0} Object Styles changed\n{1} Colours not found in the CTB'.format(n_mod, n_notfound)
 		dialog1 = TaskDialog('Dwg To Revit', content = msg1, buttons = ['OK'], footer = '', show_close = True)
 		dialog1.show(exit = True)
 else:
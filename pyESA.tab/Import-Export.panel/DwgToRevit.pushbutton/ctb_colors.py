@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+ctb_colors.py - Match DWG layer colours against the rows of a CTB CSV.
+
+Exact RGB matches are a dictionary lookup. Other colours are matched to the
+nearest CTB colour in CIELAB space (CIE76 delta E) if it is closer than
+'max_delta_e': the CTB colours are binned once in a 3D grid of cells as
+large as 'max_delta_e', so a query only looks at the 27 cells around it.
+
+Also deduplicates the layer subcategories shared by several DWGs.
+
+Pure Python: no Revit API imports.
+"""
+
+import math
+
+
+# Farther than this, a colour is reported as not found (about a clearly
+# visible difference; 2.3 is the 'just noticeable' one)
+MAX_DELTA_E = 10.0
+
+
+def _srgb_to_linear(channel):
+	c = channel / 255.0
+	if c <= 0.04045:
+		return c / 12.92
+	return ((c + 0.055) / 1.055) ** 2.4
+
+
+def _lab_f(t):
+	if t > 216.0 / 24389.0:
+		return t ** (1.0 / 3.0)
+	return (24389.0 / 27.0 * t + 16.0) / 116.0
+
+
+def rgb_to_lab(rgb):
+	"""Convert an sRGB (0-255) triple to CIELAB (D65 white point)."""
+	r, g, b = [_srgb_to_linear(c) for c in rgb]
+	x = (0.4124564 * r + 0.3575761 * g + 0.1804375 * b) / 0.95047
+	y = (0.2126729 * r + 0.7151522 * g + 0.0721750 * b) / 1.00000
+	z = (0.0193339 * r + 0.1191920 * g + 0.9503041 * b) / 1.08883
+	fx, fy, fz = _lab_f(x), _lab_f(y), _lab_f(z)
+	return (116.0 * fy - 16.0, 500.0 * (fx - fy), 200.0 * (fy - fz))
+
+
+def delta_e(lab0, lab1):
+	"""CIE76 colour difference."""
+	return math.sqrt(sum((a - b) ** 2 for a, b in zip(lab0, lab1)))
+
+
+class ColorMatcher(object):
+	"""
+	Finds the index of a colour in a list of CTB colours.
+	'colors' is the list of [R, G, B] of the CTB rows (other values are ignored).
+	As the old nested loop did, the last row wins when a colour is repeated.
+	"""
+
+	def __init__(self, colors, max_delta_e=MAX_DELTA_E):
+		self.max_delta_e = max_delta_e
+		self._exact = {}
+		self._labs = []
+		self._grid = {}
+		self._cache = {}
+		for index, color in enumerate(colors):
+			if not isinstance(color, (list, tuple)) or len(color) != 3:
+				continue
+			self._exact[tuple(color)] = index
+		for rgb, index in self._exact.items():
+			lab = rgb_to_lab(rgb)
+			self._labs.append((lab, index))
+			if max_delta_e > 0:
+				self._grid.setdefault(self._cell(lab), []).append((lab, index))
+
+	def _cell(self, lab):
+		size = self.max_delta_e
+		return tuple(int(math.floor(v / size)) for v in lab)
+
+	def match(self, rgb):
+		"""Return the CTB index of the colour, or None if nothing is close enough."""
+		key = tuple(rgb)
+		if key in self._exact:
+			return self._exact[key]
+		if key not in self._cache:
+			self._cache[key] = self._nearest(key)
+		return self._cache[key]
+
+	def _nearest(self, rgb):
+		if self.max_delta_e <= 0:
+			return None
+		lab = rgb_to_lab(rgb)
+		cx, cy, cz = self._cell(lab)
+		best_index, best_distance = None, self.max_delta_e
+		for dx in (-1, 0, 1):
+			for dy in (-1, 0, 1):
+				for dz in (-1, 0, 1):
+					for other, index in self._grid.get((cx + dx, cy + dy, cz + dz), ()):
+						distance = delta_e(lab, other)
+						# Ties go to the lower CTB index, whatever the grid order
+						if distance < best_distance or (
+							distance == best_distance and best_index is not None and index < best_index
+						):
+							best_index, best_distance = index, distance
+		return best_index
+
+	def match_all(self, colors):
+		return [self.match(color) for color in colors]
+
+
+def unique_by_id(items, id_value):
+	"""
+	Drop the items whose id_value(item) was already seen, keeping the first
+	one of each id and the order of the list.
+	"""
+	seen = set()
+	unique = []
+	for item in items:
+		key = id_value(item)
+		if key not in seen:
+			seen.add(key)
+			unique.append(item)
+	return unique
@@ -1,10 +1,35 @@
 #REFERENCES
 import datetime
-from pyrevit import revit, DB, UI, forms
+import os
+from pyrevit import revit, DB, UI, forms, script
 from rpw.ui.forms import TaskDialog
+import schedule_export
 #DEFINITIONS
 tolist = lambda x : x if hasattr(x, '__iter__') else [x]
 
+MODE_TXT = 'One TXT per Schedule'
+MODE_FORMATS = {
+	'Consolidated CSV': schedule_export.FORMAT_CSV,
+	'Consolidated SQLite': schedule_export.FORMAT_SQLITE,
+	'Consolidated Parquet': schedule_export.FORMAT_PARQUET,
+}
+
+def body_section(s):
+	return s.GetTableData().GetSectionData(DB.SectionType.Body)
+
+def read_body_rows(s):
+	"""Return the body of the schedule as a list of rows of cell texts."""
+	body = body_section(s)
+	columns = range(body.FirstColumnNumber, body.LastColumnNumber + 1)
+	return [
+		[s.GetCellText(DB.SectionType.Body, r, c) for c in columns]
+		for r in range(body.FirstRowNumber, body.LastRowNumber + 1)
+	]
+
+def schedule_source(s):
+	"""(name, column count, rows reader) as expected by schedule_export."""
+	return (s.Name, body_section(s).NumberOfColumns, lambda: read_body_rows(s))
+
 #CODE
 doc = revit.doc
 tday = datetime.date.today().strftime('%y%m%d')
@@ -14,6 +39,28 @@ if __shiftclick__:
 else:
 	schedules = tolist(doc.ActiveView)
 
+##Consolidated export is offered when several schedules are selected
+mode = MODE_TXT
+if len(schedules) > 1:
+	modes = [MODE_TXT] + [m for m, f in sorted(MODE_FORMATS.items()) if f in schedule_export.available_formats()]
+	mode = forms.CommandSwitchWindow.show(modes, message='Export mode:')
+	if not mode: script.exit()
+
+if mode != MODE_TXT:
+	folder_path = forms.pick_folder()
+	if not folder_path: script.exit()
+	fmt = MODE_FORMATS[mode]
+	out_path = os.path.join(folder_path, '{0}_Schedules{1}'.format(str(tday), schedule_export.output_extension(fmt)))
+	##One manifest per folder and document, so changes are tracked across days
+	manifest_file = schedule_export.document_manifest_path(folder_path, os.path.splitext(doc.Title)[0])
+	entries = schedule_export.export_consolidated([schedule_source(s) for s in schedules], out_path, fmt, manifest_file=manifest_file)
+	changed = len([e for e in entries if e['changed']])
+	msg = '{0} Schedules Exported to {1}\n{2} Changed since last export\nManifest: {3}'.format(
+		str(len(entries)), os.path.basename(out_path), str(changed),
+		os.path.basename(manifest_file))
+	dialog = TaskDialog('Schedule Export', content=msg, buttons=['OK'], footer='', show_close=True)
+	dialog.show(exit=True)
+
 try:
 	s_names = ['{0}_{1}.txt'.format(str(tday),s.Name) for s in schedules]
 	folder_path = forms.pick_folder()
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+schedule_export.py - Consolidated export of many schedules into one file.
+
+Every schedule body is streamed, one schedule at a time, into a single CSV,
+Parquet or SQLite file with a 'ScheduleName' column in front of the cells. A JSON
+manifest next to the output records, for each schedule, rows, columns,
+export duration and a hash of the content. On the next export the hashes
+are compared: unchanged schedules are flagged in the manifest. The SQLite
+database stores the hash of each schedule it holds and keeps the rows of
+the schedules whose hash did not change, whatever the manifest says (other
+formats may have updated it in between). Outputs with a changing name (e.g.
+dated) share one manifest per folder and document (document_manifest_path).
+
+Pure Python: no Revit API imports. A schedule source is
+(name, column count, callable returning the rows as lists of strings).
+"""
+
+import csv
+import datetime
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+from parquet_writer import ParquetWriter, TYPE_INT64, TYPE_STRING
+
+try:
+	import sqlite3
+except ImportError:
+	# IronPython ships without sqlite3
+	sqlite3 = None
+
+
+PY2 = sys.version_info[0] == 2
+
+MANIFEST_VERSION = 1
+
+FORMAT_CSV = 'csv'
+FORMAT_SQLITE = 'sqlite'
+FORMAT_PARQUET = 'parquet'
+
+NAME_COLUMN = 'ScheduleName'
+ROW_COLUMN = 'Row'
+DELIMITER = ';'
+SQLITE_TABLE = 'ScheduleRows'
+SQLITE_DIGEST_TABLE = 'ScheduleDigests'
+HASH_COLUMN = 'Hash'
+
+
+def available_formats():
+	"""Formats supported by this Python (SQLite only if sqlite3 imports)."""
+	if sqlite3 is None:
+		return [FORMAT_CSV, FORMAT_PARQUET]
+	return [FORMAT_CSV, FORMAT_PARQUET, FORMAT_SQLITE]
+
+
+def output_extension(fmt):
+	return {FORMAT_SQLITE: '.sqlite', FORMAT_PARQUET: '.parquet'}.get(fmt, '.csv')
+
+
+def cell_columns(count):
+	"""Names of the cell columns: Col1..ColN."""
+	return ['Col{}'.format(i) for i in range(1, count + 1)]
+
+
+def content_hash(rows):
+	"""SHA-1 of the schedule rows (cells joined with unit/record separators)."""
+	sha = hashlib.sha1()
+	for row in rows:
+		sha.update(b'\x1f'.join(_utf8(cell) for cell in row) + b'\x1e')
+	return sha.hexdigest()
+
+
+# =============================================================================
+# MANIFEST
+# =============================================================================
+
+def manifest_path(output_path):
+	return os.path.splitext(output_path)[0] + '.manifest.json'
+
+
+def document_manifest_path(folder, document_name):
+	"""Manifest shared by all the exports of a document into 'folder'."""
+	name = re.sub(r'[\\/:*?"<>|]+', '_', document_name).strip() or 'Document'
+	return os.path.join(folder, name + '_Schedules.manifest.json')
+
+
+class ScheduleManifest(object):
+	"""
+	JSON manifest of a consolidated export:
+	{'version', 'output', 'format', 'exported', 'duration',
+	 'schedules': [{'name', 'rows', 'columns', 'hash', 'duration', 'changed'}]}
+	"""
+
+	def __init__(self, path):
+		self.path = path
+		self.previous = self._load_hashes()
+		self.schedules = []
+
+	def _load_hashes(self):
+		"""Return {schedule name: hash} of the previous export, empty if missing or corrupted."""
+		if not self.path or not os.path.exists(self.path):
+			return {}
+		try:
+			with io.open(self.path, 'r', encoding='utf-8') as f:
+				data = json.load(f)
+		except (IOError, OSError, ValueError):
+			return {}
+		if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+			return {}
+		hashes = {}
+		for entry in data.get('schedules', []):
+			if isinstance(entry, dict) and entry.get('name') and entry.get('hash'):
+				hashes[entry['name']] = entry['hash']
+		return hashes
+
+	def is_unchanged(self, name, digest):
+		return self.previous.get(name) == digest
+
+	def record(self, name, rows, columns, digest, duration, changed):
+		entry = {
+			'name': name,
+			'rows': rows,
+			'columns': columns,
+			'hash': digest,
+			'duration': round(duration, 3),
+			'changed': changed,
+		}
+		self.schedules.append(entry)
+		return entry
+
+	def save(self, output_path, fmt, duration):
+		data = {
+			'version': MANIFEST_VERSION,
+			'output': os.path.basename(output_path),
+			'format': fmt,
+			'exported': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+			'duration': round(duration, 3),
+			'schedules': self.schedules,
+		}
+		# Write to a temporary file first, so a crash never leaves half a JSON
+		tmp_path = self.path + '.tmp'
+		with io.open(tmp_path, 'w', encoding='utf-8') as f:
+			f.write(_to_unicode(json.dumps(data, indent=2)))
+		if os.path.exists(self.path):
+			os.remove(self.path)
+		os.rename(tmp_path, self.path)
+
+
+# =============================================================================
+# WRITERS
+# =============================================================================
+
+class ConsolidatedCsvWriter(object):
+	"""
+	Single CSV with 'ScheduleName;Row;Col1..ColN'; shorter rows are padded.
+	The file is rewritten on every export, unchanged schedules included.
+	"""
+
+	def __init__(self, path, column_count):
+		self.path = path
+		self.column_count = column_count
+		self._file = None
+		self._writer = None
+
+	def open(self):
+		if PY2:
+			self._file = open(self.path, 'wb')
+		else:
+			self._file = io.open(self.path, 'w', encoding='utf-8', newline='')
+		self._writer = csv.writer(self._file, delimiter=DELIMITER, lineterminator='\n')
+		self._writer.writerow([NAME_COLUMN, ROW_COLUMN] + cell_columns(self.column_count))
+		return self
+
+	def write_schedule(self, name, rows, changed, digest=None):
+		for index, row in enumerate(rows):
+			cells = list(row) + [''] * (self.column_count - len(row))
+			self._writer.writerow([_csv_cell(name), index] + [_csv_cell(c) for c in cells])
+
+	def close(self):
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+			self._writer = None
+
+	def __enter__(self):
+		return self.open()
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+		return False
+
+
+class ConsolidatedParquetWriter(object):
+	"""
+	Single Parquet file with 'ScheduleName', 'Row' (int64) and Col1..ColN;
+	cell texts are dictionary encoded, empty cells are nulls.
+	"""
+
+	def __init__(self, path, column_count):
+		columns = [(NAME_COLUMN, TYPE_STRING), (ROW_COLUMN, TYPE_INT64)]
+		columns += [(column, TYPE_STRING) for column in cell_columns(column_count)]
+		self._writer = ParquetWriter(path, columns)
+		self.column_count = column_count
+
+	def open(self):
+		self._writer.open()
+		return self
+
+	def write_schedule(self, name, rows, changed, digest=None):
+		for index, row in enumerate(rows):
+			cells = list(row) + [None] * (self.column_count - len(row))
+			self._writer.write_values([name, index] + cells)
+
+	def close(self):
+		self._writer.close()
+
+	def __enter__(self):
+		return self.open()
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+		return False
+
+
+class ConsolidatedSqliteWriter(object):
+	"""
+	Single SQLite table 'ScheduleRows(ScheduleName, Row, Col1..ColN)'.
+	The database is kept between exports: only the schedules whose hash
+	differs from the one in 'ScheduleDigests' are deleted and inserted
+	again, schedules no longer exported are removed.
+	"""
+
+	def __init__(self, path, column_count):
+		if sqlite3 is None:
+			raise RuntimeError('sqlite3 is not available in this Python')
+		self.path = path
+		self.column_count = column_count
+		self._conn = None
+		self._names = set()
+
+	def open(self):
+		self._conn = sqlite3.connect(self.path)
+		self._conn.execute(
+			'CREATE TABLE IF NOT EXISTS {} ("{}" TEXT, "{}" INTEGER)'.format(SQLITE_TABLE, NAME_COLUMN, ROW_COLUMN)
+		)
+		existing = set(r[1] for r in self._conn.execute('PRAGMA table_info({})'.format(SQLITE_TABLE)))
+		for column in cell_columns(self.column_count):
+			if column not in existing:
+				self._conn.execute('ALTER TABLE {} ADD COLUMN "{}" TEXT'.format(SQLITE_TABLE, column))
+		self._conn.execute(
+			'CREATE INDEX IF NOT EXISTS idx_schedule_name ON {} ("{}")'.format(SQLITE_TABLE, NAME_COLUMN)
+		)
+		self._conn.execute(
+			'CREATE TABLE IF NOT EXISTS {} ("{}" TEXT PRIMARY KEY, "{}" TEXT)'.format(
+				SQLITE_DIGEST_TABLE, NAME_COLUMN, HASH_COLUMN)
+		)
+		return self
+
+	def write_schedule(self, name, rows, changed, digest=None):
+		"""
+		'changed' comes from the shared manifest and is not trusted here:
+		the rows are kept only if 'digest' matches the stored one.
+		"""
+		self._names.add(name)
+		if digest is not None and self._stored_digest(name) == digest:
+			return
+		columns = [NAME_COLUMN, ROW_COLUMN] + cell_columns(self.column_count)
+		insert = 'INSERT INTO {} ({}) VALUES ({})'.format(
+			SQLITE_TABLE, ', '.join('"{}"'.format(c) for c in columns), ', '.join('?' * len(columns))
+		)
+		self._conn.execute('DELETE FROM {} WHERE "{}" = ?'.format(SQLITE_TABLE, NAME_COLUMN), (name,))
+		self._conn.executemany(insert, (
+			[name, index] + list(row) + [''] * (self.column_count - len(row))
+			for index, row in enumerate(rows)
+		))
+		self._conn.execute(
+			'INSERT OR REPLACE INTO {} ("{}", "{}") VALUES (?, ?)'.format(
+				SQLITE_DIGEST_TABLE, NAME_COLUMN, HASH_COLUMN),
+			(name, digest)
+		)
+
+	def _stored_digest(self, name):
+		cursor = self._conn.execute(
+			'SELECT "{}" FROM {} WHERE "{}" = ?'.format(HASH_COLUMN, SQLITE_DIGEST_TABLE, NAME_COLUMN), (name,)
+		)
+		row = cursor.fetchone()
+		return row[0] if row is not None else None
+
+	def close(self):
+		if self._conn is None:
+			return
+		stale = [
+			r[0] for r in self._conn.execute('SELECT DISTINCT "{}" FROM {}'.format(NAME_COLUMN, SQLITE_TABLE))
+			if r[0] not in self._names
+		]
+		stale += [
+			r[0] for r in self._conn.execute('SELECT "{}" FROM {}'.format(NAME_COLUMN, SQLITE_DIGEST_TABLE))
+			if r[0] not in self._names and r[0] not in stale
+		]
+		for name in stale:
+			self._conn.execute('DELETE FROM {} WHERE "{}" = ?'.format(SQLITE_TABLE, NAME_COLUMN), (name,))
+			self._conn.execute('DELETE FROM {} WHERE "{}" = ?'.format(SQLITE_DIGEST_TABLE, NAME_COLUMN), (name,))
+		self._conn.commit()
+		self._conn.close()
+		self._conn = None
+
+	def __enter__(self):
+		return self.open()
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is not None and self._conn is not None:
+			self._conn.rollback()
+			self._conn.close()
+			self._conn = None
+		else:
+			self.close()
+		return False
+
+
+WRITERS = {
+	FORMAT_CSV: ConsolidatedCsvWriter,
+	FORMAT_SQLITE: ConsolidatedSqliteWriter,
+	FORMAT_PARQUET: ConsolidatedParquetWriter,
+}
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+def export_consolidated(sources, output_path, fmt=FORMAT_CSV, on_progress=None, manifest_file=None):
+	"""
+	Export all the schedules into 'output_path' and write the manifest
+	'manifest_file' (by default manifest_path(output_path)).
+
+	- sources: list of (name, column count, read_rows) where read_rows()
+	  returns the body rows of the schedule; it is called once, when the
+	  schedule is written, so only one schedule is in memory at a time
+	- on_progress(done, total) is called after every schedule
+
+	Return the list of manifest entries (one per schedule).
+	"""
+	started = time.time()
+	column_count = max([count for _, count, _ in sources] or [0])
+	manifest = ScheduleManifest(manifest_file or manifest_path(output_path))
+	with WRITERS[fmt](output_path, column_count) as writer:
+		for done, (name, _, read_rows) in enumerate(sources, 1):
+			schedule_started = time.time()
+			rows = read_rows()
+			digest = content_hash(rows)
+			changed = not manifest.is_unchanged(name, digest)
+			writer.write_schedule(name, rows, changed, digest)
+			columns = max([len(row) for row in rows] or [0])
+			manifest.record(name, len(rows), columns, digest, time.time() - schedule_started, changed)
+			if on_progress is not None:
+				on_progress(done, len(sources))
+	manifest.save(output_path, fmt, time.time() - started)
+	return manifest.schedules
+
+
+_TEXT_TYPE = type(u'')
+
+
+def _to_unicode(text):
+	if isinstance(text, bytes):
+		return text.decode('utf-8')
+	return text
+
+
+def _utf8(value):
+	"""UTF-8 bytes of a cell (IronPython strings are unicode, CPython 2 ones may be bytes)."""
+	if not isinstance(value, _TEXT_TYPE):
+		if isinstance(value, bytes):
+			return value
+		value = _TEXT_TYPE(value)
+	return value.encode('utf-8')
+
+
+def _csv_cell(value):
+	"""The csv module of Python 2 wants byte strings."""
+	if PY2:
+		return _utf8(value)
+	return value
@@ -6,6 +6,7 @@ __author__ = 'Antonio Miano'
 #REFERENCES
 import pyrevit
 import json
+import os
 
 from pyrevit import revit, DB, UI, script, output
 from pyrevit import PyRevitException, PyRevitIOError
@@ -13,9 +14,129 @@ from pyrevit import forms
 
 from rpw.ui.forms import TaskDialog, CheckBox, FlexForm, Label, TextBox, Separator, Button
 
+from System.Collections.Generic import List
+
+import ifc_queue
+import workset_cache
+
 #DEFINITIONS
 l_tolist = lambda x: x if hasattr(x, '__iter__') else [x]
 
+def f_ifc_options(json_dict):
+	"""New IFCExportOptions for every file, so a FilterViewId never leaks to the next one."""
+	ifc_options = DB.IFCExportOptions()
+	for item in json_dict.items():
+		ifc_options.AddOption(item[0],str(item[1]))
+	return ifc_options
+
+def f_open_options(rvt_file, workset_ids=None):
+	"""
+	Options when opening the original RVT file.
+	workset_ids: worksets to open (workshared files only); None opens all of them.
+	"""
+	rvt_file_info = revit.files.get_file_info(rvt_file)
+	open_opt = DB.OpenOptions()
+	if rvt_file_info.IsWorkshared:
+		####Add opening options for Workshared RVT file
+		if workset_ids is None:
+			open_config = DB.WorksetConfiguration(DB.WorksetConfigurationOption.OpenAllWorksets)
+		else:
+			open_config = DB.WorksetConfiguration(DB.WorksetConfigurationOption.CloseAllWorksets)
+			open_config.Open(List[DB.WorksetId](workset_ids))
+		open_opt.DetachFromCentralOption = DB.DetachFromCentralOption.DetachAndPreserveWorksets
+		open_opt.SetOpenWorksetsConfiguration(open_config)
+	return open_opt
+
+def f_workset_previews(rvt_file):
+	"""
+	User worksets of 'rvt_file' read before opening it, for the workset
+	cache. None (= open all) if there is no view filter, the file is not
+	workshared or the worksets cannot be read.
+	"""
+	if not user_view_name or not revit.files.get_file_info(rvt_file).IsWorkshared:
+		return None
+	try:
+		model_path = DB.ModelPathUtils.ConvertUserVisiblePathToModelPath(rvt_file)
+		return DB.WorksharingUtils.GetUserWorksetInfo(model_path)
+	except Exception:
+		return None
+
+def f_user_worksets(doc):
+	return DB.FilteredWorksetCollector(doc).OfKind(DB.WorksetKind.UserWorkset).ToWorksets()
+
+def f_export_ifc(rvt_file, out_folder, out_name):
+	"""
+	Open 'rvt_file', export the IFC 'out_name' to 'out_folder' and close it.
+	Return (status, view name) as expected by IfcExportQueue.run.
+	"""
+	###Open only the worksets cached for the view; reopen with all of them if stale
+	return workset_visibility.export(
+		rvt_file,
+		user_view_name,
+		lambda: f_workset_previews(rvt_file),
+		lambda workset_ids: f_export_ifc_once(rvt_file, out_folder, out_name, workset_ids)
+	)
+
+def f_export_ifc_once(rvt_file, out_folder, out_name, workset_ids):
+	"""
+	Export with the given worksets open (None = all).
+	Return None if the export view needs worksets that were not opened.
+	"""
+	model_path = DB.ModelPathUtils.ConvertUserVisiblePathToModelPath(rvt_file)
+	###The original RVT file is always closed, whatever happens in the export
+	return ifc_queue.with_document(
+		lambda: __revit__.Application.OpenDocumentFile(model_path, f_open_options(rvt_file, workset_ids)),
+		lambda temp_doc: f_export_from_document(temp_doc, rvt_file, out_folder, out_name, workset_ids)
+	)
+
+def f_export_from_document(temp_doc, rvt_file, out_folder, out_name, workset_ids):
+	"""Export the IFC of the open 'temp_doc'; see f_export_ifc_once."""
+	ifc_options = f_ifc_options(json_dict)
+	###Collect the view for IFC export (if not found, default view will be used)
+	temp_doc_3Dviews_1 = DB.FilteredElementCollector(temp_doc).OfClass(DB.View3D).ToElements()
+	temp_doc_3Dviews_2 = [view for view in temp_doc_3Dviews_1 if not view.IsTemplate]
+	view_found = False
+	if len(user_view_name)>0:
+		ifc_views = [view for view in temp_doc_3Dviews_2 if user_view_name in view.Name]
+		if len(ifc_views)>0:
+			view_found = True
+			ifc_view = ifc_views[0]
+			ifc_view_name = ifc_view.Name
+			ifc_options.FilterViewId = ifc_view.Id
+		else:
+			ifc_view_name = 'View for export not found!'
+			if not flex_form.values['cb_pass']: return ifc_queue.STATUS_NO_VIEW, ifc_view_name
+	else:
+		ifc_view_name = 'View for export not specified!'
+
+	###Learn (or check) the worksets visible in the export view
+	if view_found and temp_doc.IsWorkshared:
+		user_worksets = f_user_worksets(temp_doc)
+		visible_names = [ws.Name for ws in user_worksets if ifc_view.IsWorksetVisible(ws.Id)]
+		if workset_ids is not None:
+			opened_names = [ws.Name for ws in user_worksets if ws.IsOpen]
+			if workset_cache.missing_worksets(visible_names, opened_names):
+				return None
+		workset_visibility.store(rvt_file, user_view_name, visible_names)
+
+	###Export IFC
+	export_test = False
+	with revit.Transaction(name='IFC(s) Export', doc=temp_doc, swallow_errors=True, clear_after_rollback=True):
+		if view_found:
+			ifc_view.IsSectionBoxActive = False
+			# rvt_links_cat = DB.Category.GetCategory(temp_doc, DB.BuiltInCategory.OST_RvtLinks)
+			# ifc_view.SetCategoryHidden(rvt_links_cat.Id, True)
+		export_test = temp_doc.Export(out_folder,out_name,ifc_options)
+	if export_test:
+		return ifc_queue.STATUS_EXPORTED, ifc_view_name
+	return ifc_queue.STATUS_FAILED, ifc_view_name
+
+def f_format_size(size):
+	"""Format a size in bytes for the output table."""
+	if size is None:
+		return '-'
+	return '{:.1f} MB'.format(size / (1024.0 * 1024.0))
+
 #INPUTS
 ##Collect RVT files
 rvt_files = l_tolist(forms.pick_file(files_filter=	'Revit Files |*.rvt',
@@ -31,86 +152,66 @@ Separator(),
 CheckBox('cb_pass', 'Export IFC even if view is not found'),
 CheckBox('json_pass', 'Select JSON file', default=True),
 Separator(),
+CheckBox('cb_resume', 'Skip IFCs already exported (job journal)', default=True),
+Label('Shard i/n to split the files across sessions (empty = all):'),
+TextBox('txt_shard'),
+Separator(),
 Button('Continue')	
 ]
 flex_form = FlexForm('IFC(s) Export', components)
 flex_form.show()
 if not flex_form.values.items(): script.exit()
 
+try:
+	shard = ifc_queue.parse_shard(flex_form.values.get('txt_shard', ''))
+except ValueError as shard_error:
+	forms.alert(str(shard_error), exitscript=True)
+
 ##Collect JSON file
 json_name = 'Not specified!'
+json_dict = {}
 if flex_form.values['json_pass']:
 	json_path = forms.pick_file(files_filter='Json Files |*.json', multi_file=False, title='Select Json File')
-	json_name = json_path.split('\\')[-1]
 	if not json_path: script.exit()
+	json_name = json_path.split('\\')[-1]
 	with open(json_path) as json_file:
 		json_dict = json.load(json_file)
 
 #CODE
 # app = __revit__.Application
 script_output = script.get_output()
+user_view_name = flex_form.values['txt_viewname']
 
-##Define IFC export options based on json settings
-ifc_options = DB.IFCExportOptions()
-if flex_form.values['json_pass']:
-	for item in json_dict.items():
-		ifc_options.AddOption(item[0],str(item[1]))
-
-##Loop through RVT files
-out_rows = []
-for rvt_file in rvt_files:
-	temp_folder = '\\'.join(rvt_files[0].split('\\')[:-1])
-	temp_name = rvt_file.split('\\')[-1].replace('.rvt','.ifc')
-	rvt_file_info = revit.files.get_file_info(rvt_file)
-
-	###Specify options when opening the original RVT file
-	open_opt = DB.OpenOptions()
-	if rvt_file_info.IsWorkshared:
-		####Add opening options for Workshared RVT file
-		open_config = DB.WorksetConfiguration(DB.WorksetConfigurationOption.OpenAllWorksets)
-		open_opt = DB.OpenOptions()
-		open_opt.DetachFromCentralOption = DB.DetachFromCentralOption.DetachAndPreserveWorksets
-		open_opt.SetOpenWorksetsConfiguration(open_config)
-	
-	###Open the original RVT file
-	model_path = DB.ModelPathUtils.ConvertUserVisiblePathToModelPath(rvt_file)
-	temp_doc = __revit__.Application.OpenDocumentFile(model_path, open_opt)
+##Worksets visible in the export view, learned on previous runs
+workset_visibility = workset_cache.WorksetCache(
+	script.get_universal_data_file(file_id='IfcExport_worksets', file_ext='json')
+)
 
-	###Collect the view for IFC export (if not found, default view will be used)
-	temp_doc_3Dviews_1 = DB.FilteredElementCollector(temp_doc).OfClass(DB.View3D).ToElements()
-	temp_doc_3Dviews_2 = [view for view in temp_doc_3Dviews_1 if not view.IsTemplate]
-	user_view_name = flex_form.values['txt_viewname']
-	view_found = False
-	if len(user_view_name)>0:
-		ifc_views = [view for view in temp_doc_3Dviews_2 if user_view_name in view.Name]
-		if len(ifc_views)>0:
-			view_found = True
-			ifc_view = ifc_views[0]
-			ifc_view_name = ifc_view.Name
-			ifc_options.FilterViewId = ifc_view.Id
-		else:
-			ifc_view_name = 'View for export not found!'
-			if not flex_form.values['cb_pass']: continue
-	else:
-		ifc_view_name = 'View for export not specified!'
+##Export queue: IFCs and journals go next to the first selected RVT file
+out_folder = os.path.dirname(rvt_files[0])
+queue = ifc_queue.IfcExportQueue(
+	rvt_files,
+	out_folder,
+	{'json': json_dict, 'view': user_view_name, 'pass': bool(flex_form.values['cb_pass'])},
+	shard=shard,
+	resume=flex_form.values.get('cb_resume', False)
+)
 
-	###Export IFC
-	out_path = 'None'
-	with revit.Transaction(name='IFC(s) Export', doc=temp_doc, swallow_errors=True, clear_after_rollback=True):
-		if view_found:
-			ifc_view.IsSectionBoxActive = False
-			# rvt_links_cat = DB.Category.GetCategory(temp_doc, DB.BuiltInCategory.OST_RvtLinks)
-			# ifc_view.SetCategoryHidden(rvt_links_cat.Id, True)
-		export_test = temp_doc.Export(temp_folder,temp_name,ifc_options)
-		if export_test:
-			out_path = temp_folder + '\\' + temp_name
+##Loop through RVT files
+results = queue.run(f_export_ifc, on_progress=script_output.update_progress)
 
-	out_rows.append([out_path, ifc_view_name])
-	temp_doc.Close(False)
-	# temp_doc.Dispose()
+out_rows = []
+for result in results:
+	out_rows.append([
+		result.out_path or 'None',
+		result.view_name or result.message or '-',
+		result.status,
+		'{:.1f} s'.format(result.duration),
+		f_format_size(result.size)
+	])
 
 ##Print the output
-table_headers = ['Saved File Path', 'IFC Export View']
+table_headers = ['Saved File Path', 'IFC Export View', 'Status', 'Duration', 'Size']
 table_body = out_rows
 
 script_output.print_table(
@@ -118,3 +219,5 @@ script_output.print_table(
 	title = 'JSON file: ' + json_name,
 	columns = table_headers
 )
+script_output.print_md('**Shard {}/{}**: {} of {} file(s). Journal: `{}`'.format(
+	shard[0] + 1, shard[1], len(results), len(rvt_files), queue.journal.path))
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+ifc_queue.py - Resumable export queue for IfcExport.
+
+The queue walks the selected RVT files (optionally only one shard of them, so
+several Revit sessions can share a batch) and hands every file to an
+'export_file' callable that does the Revit work. Each file gets a 'start' and
+a 'finish' record in a JSONL journal (lib/job_journal.py) with status,
+duration and output size. On the next run, files whose RVT mtime/size and
+export options are unchanged since a successful export are skipped.
+
+Pure Python: no Revit API imports.
+"""
+
+import glob
+import os
+import time
+
+import job_journal
+
+
+JOURNAL_PREFIX = 'IfcExport_journal'
+
+STATUS_EXPORTED = 'exported'
+STATUS_UP_TO_DATE = 'up to date'
+STATUS_NO_VIEW = 'view not found'
+STATUS_FAILED = 'failed'
+
+
+# =============================================================================
+# SHARDS
+# =============================================================================
+
+def parse_shard(text):
+	"""
+	Parse a shard typed as 'i/n' (1-based, e.g. '2/3').
+	Return (index, count) with a 0-based index; empty text means (0, 1).
+	Raise ValueError if the text is not a valid shard.
+	"""
+	text = (text or '').strip()
+	if not text:
+		return 0, 1
+	parts = text.split('/')
+	if len(parts) != 2:
+		raise ValueError('Shard must be written as i/n, e.g. 1/3')
+	index, count = int(parts[0]), int(parts[1])
+	if count < 1 or not 1 <= index <= count:
+		raise ValueError('Shard i/n needs 1 <= i <= n')
+	return index - 1, count
+
+
+def shard_files(files, index, count):
+	"""
+	Return the files of shard 'index' (0-based) out of 'count', in the original
+	order. Files are dealt round-robin after sorting by path, so every session
+	gets the same split as long as the same files are selected.
+	"""
+	if count <= 1:
+		return list(files)
+	ranked = sorted(files, key=job_journal.job_key)
+	mine = set(ranked[index::count])
+	return [f for f in files if f in mine]
+
+
+# =============================================================================
+# JOURNAL
+# =============================================================================
+
+def journal_path(folder, index=0, count=1):
+	"""One journal per shard, so sessions never write to the same file."""
+	if count <= 1:
+		return os.path.join(folder, JOURNAL_PREFIX + '.jsonl')
+	return os.path.join(folder, '{}_shard{}of{}.jsonl'.format(JOURNAL_PREFIX, index + 1, count))
+
+
+def read_state(folder):
+	"""
+	Return a JournalState merging every IfcExport journal of the folder,
+	so a file exported by another shard (or another split) is also skipped.
+	"""
+	records = []
+	for path in sorted(glob.glob(os.path.join(folder, JOURNAL_PREFIX + '*.jsonl'))):
+		records.extend(job_journal.JobJournal(path).read())
+	records.sort(key=lambda record: record.get('time', ''))
+	return job_journal.JournalState(records)
+
+
+def output_name(rvt_file):
+	"""Name of the IFC written for 'rvt_file'."""
+	return os.path.splitext(os.path.basename(rvt_file))[0] + '.ifc'
+
+
+def with_document(open_document, export):
+	"""
+	Open a document with open_document(), return export(doc) and close the
+	document without saving, whatever export does (return or raise).
+	"""
+	doc = open_document()
+	try:
+		return export(doc)
+	finally:
+		doc.Close(False)
+
+
+# =============================================================================
+# QUEUE
+# =============================================================================
+
+class ExportResult(object):
+	"""Outcome of one file of the queue."""
+
+	def __init__(self, rvt_file, status, out_path=None, view_name='', duration=0.0, size=None, message=''):
+		self.rvt_file = rvt_file
+		self.status = status
+		self.out_path = out_path
+		self.view_name = view_name
+		self.duration = duration
+		self.size = size
+		self.message = message
+
+	@property
+	def ok(self):
+		return self.status in (STATUS_EXPORTED, STATUS_UP_TO_DATE)
+
+
+class IfcExportQueue(object):
+	"""
+	Export queue for a list of RVT files.
+
+	- files: selected RVT files (all sessions must select the same list)
+	- out_folder: folder of the IFC files and of the journals
+	- options: JSON-serialisable export options (JSON settings, view name, ...);
+	  a change invalidates the previous exports
+	- shard: (index, count) as returned by parse_shard
+	- resume: skip files already exported with the same source and options
+	"""
+
+	def __init__(self, files, out_folder, options, shard=(0, 1), resume=True):
+		self.files = list(files)
+		self.out_folder = out_folder
+		self.options_signature = job_journal.options_hash(options)
+		self.shard_index, self.shard_count = shard
+		self.resume = resume
+		self.journal = job_journal.JobJournal(journal_path(out_folder, self.shard_index, self.shard_count))
+
+	def jobs(self):
+		"""Return the files handled by this session."""
+		return shard_files(self.files, self.shard_index, self.shard_count)
+
+	def is_up_to_date(self, state, rvt_file):
+		"""True if the IFC of 'rvt_file' still exists and matches the source and options."""
+		if not os.path.isfile(os.path.join(self.out_folder, output_name(rvt_file))):
+			return False
+		return state.is_completed(
+			rvt_file, job_journal.source_fingerprint(rvt_file), self.options_signature,
+			fingerprint_field='source'
+		)
+
+	def run(self, export_file, on_progress=None):
+		"""
+		Export every job and return the list of ExportResult.
+
+		export_file(rvt_file, out_folder, out_name) does the actual export and
+		returns (status, view_name), status being STATUS_EXPORTED, STATUS_NO_VIEW
+		or STATUS_FAILED. An exception is recorded as STATUS_FAILED and the
+		queue goes on with the next file.
+		on_progress(done, total) is called after every file.
+		"""
+		jobs = self.jobs()
+		state = read_state(self.out_folder) if self.resume else None
+		results = []
+		for done, rvt_file in enumerate(jobs, 1):
+			out_name = output_name(rvt_file)
+			out_path = os.path.join(self.out_folder, out_name)
+			if state is not None and self.is_up_to_date(state, rvt_file):
+				results.append(ExportResult(
+					rvt_file, STATUS_UP_TO_DATE, out_path, size=os.path.getsize(out_path)
+				))
+			else:
+				results.append(self._export_one(export_file, rvt_file, out_name, out_path))
+			if on_progress is not None:
+				on_progress(done, len(jobs))
+		return results
+
+	def _export_one(self, export_file, rvt_file, out_name, out_path):
+		# The fingerprint is taken before opening: a file saved during the
+		# export will be exported again on the next run
+		source = job_journal.source_fingerprint(rvt_file)
+		started = self.journal.start(rvt_file, options=self.options_signature)
+		view_name, message = '', ''
+		try:
+			status, view_name = export_file(rvt_file, self.out_folder, out_name)
+		except Exception as export_error:
+			status, message = STATUS_FAILED, str(export_error)
+		duration = round(time.time() - started, 3)
+
+		if status == STATUS_EXPORTED and os.path.isfile(out_path):
+			size = os.path.getsize(out_path)
+			self.journal.finish(
+				rvt_file, started, job_journal.OUTCOME_OK, options=self.options_signature,
+				source=source, status=status, out_path=out_path, size=size, view=view_name
+			)
+			return ExportResult(rvt_file, status, out_path, view_name, duration, size)
+
+		if status == STATUS_EXPORTED:
+			status, message = STATUS_FAILED, 'Export returned no file'
+		self.journal.finish(
+			rvt_file, started, job_journal.OUTCOME_ERROR, options=self.options_signature,
+			source=source, status=status, view=view_name, message=message
+		)
+		return ExportResult(rvt_file, status, None, view_name, duration, None, message)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+workset_cache.py - Which worksets to open before an IFC export.
+
+After a model has been opened, the names of the user worksets visible in the
+export view are stored in a local JSON, keyed by model path and by the
+'View Name contains' text. On the next run the workset list read with
+WorksharingUtils.GetUserWorksetInfo (before opening) is matched against the
+stored names, and only those worksets are opened. Anything unknown (no entry,
+a renamed or deleted workset) falls back to opening all worksets.
+
+Pure Python: no Revit API imports. Workset previews only need .Id and .Name.
+"""
+
+import io
+import json
+import os
+
+import job_journal
+
+
+CACHE_VERSION = 1
+
+
+class WorksetCache(object):
+	"""
+	Local JSON of the worksets visible in the export view of each model:
+	{'version': 1, 'models': {model key: {view filter: [workset names]}}}
+	"""
+
+	def __init__(self, path):
+		self.path = path
+		self._models = None
+
+	@property
+	def models(self):
+		if self._models is None:
+			self._models = self._load()
+		return self._models
+
+	def _load(self):
+		"""Return the stored models, or an empty dict if the file is missing or corrupted."""
+		if not self.path or not os.path.exists(self.path):
+			return {}
+		try:
+			with io.open(self.path, 'r', encoding='utf-8') as f:
+				data = json.load(f)
+		except (IOError, OSError, ValueError):
+			return {}
+		if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+			return {}
+		models = data.get('models')
+		return models if isinstance(models, dict) else {}
+
+	def get(self, rvt_file, view_filter):
+		"""Return the cached visible workset names, or None on a cache miss."""
+		names = self.models.get(job_journal.job_key(rvt_file), {}).get(view_filter)
+		if not isinstance(names, list) or not names:
+			return None
+		return names
+
+	def store(self, rvt_file, view_filter, names):
+		"""Remember the visible workset names and rewrite the file."""
+		entry = self.models.setdefault(job_journal.job_key(rvt_file), {})
+		entry[view_filter] = sorted(set(names))
+		self.save()
+
+	def forget(self, rvt_file, view_filter):
+		"""Drop a stale entry."""
+		entry = self.models.get(job_journal.job_key(rvt_file), {})
+		if entry.pop(view_filter, None) is not None:
+			self.save()
+
+	def export(self, rvt_file, view_filter, read_previews, export_once):
+		"""
+		Export with only the cached worksets open, reopening on a stale entry.
+
+		- read_previews(): user worksets of the model before opening it (see
+		  worksets_to_open), or None when they cannot be read; only called on
+		  a cache hit
+		- export_once(workset_ids): opens the model with those worksets (None =
+		  all) and exports it; returns None when the export view shows worksets
+		  that were not opened
+
+		A stale entry is forgotten and the model exported again with all
+		worksets open. Return the result of the last export_once call.
+		"""
+		workset_ids = None
+		cached_names = self.get(rvt_file, view_filter)
+		if cached_names is not None:
+			previews = read_previews()
+			if previews is not None:
+				workset_ids = worksets_to_open(previews, cached_names)
+		result = export_once(workset_ids)
+		if result is None and workset_ids is not None:
+			self.forget(rvt_file, view_filter)
+			result = export_once(None)
+		return result
+
+	def save(self):
+		folder = os.path.dirname(self.path)
+		if folder and not os.path.exists(folder):
+			os.makedirs(folder)
+
+		# Write to a temporary file first, so a crash never leaves half a JSON
+		tmp_path = self.path + '.tmp'
+		text = json.dumps({'version': CACHE_VERSION, 'models': self.models}, indent=2, sort_keys=True)
+		if isinstance(text, bytes):
+			text = text.decode('utf-8')
+		with io.open(tmp_path, 'w', encoding='utf-8') as f:
+			f.write(text)
+		if os.path.exists(self.path):
+			os.remove(self.path)
+		os.rename(tmp_path, self.path)
+
+
+def worksets_to_open(previews, cached_names):
+	"""
+	Decide which worksets to open.
+
+	- previews: user worksets of the model (objects with .Id and .Name),
+	  as returned by WorksharingUtils.GetUserWorksetInfo
+	- cached_names: names returned by WorksetCache.get (None on a miss)
+
+	Return the list of preview Ids to open, or None to open all worksets.
+	"""
+	if not cached_names:
+		return None
+	ids_by_name = dict((preview.Name, preview.Id) for preview in previews)
+	if not ids_by_name:
+		return None
+	ids = []
+	for name in cached_names:
+		if name not in ids_by_name:
+			# Renamed or deleted since the cache was written
+			return None
+		ids.append(ids_by_name[name])
+	if len(ids) == len(ids_by_name):
+		return None
+	return ids
+
+
+def missing_worksets(visible_names, opened_names):
+	"""
+	Return the sorted names visible in the export view but not opened.
+	Not empty means the cache was stale and the model must be reopened
+	with all worksets.
+	"""
+	return sorted(set(visible_names) - set(opened_names))
@@ -8,7 +8,10 @@ __doc__ = "Extracts geometric quantities (length, area, volume, thickness, etc.)
 
 import clr
 import csv
+import gzip
+import io
 import os
+import sys
 from datetime import datetime
 
 clr.AddReference('RevitAPI')
@@ -19,6 +22,9 @@ from pyrevit import revit, DB, forms, script
 
 # Import System for BuiltInCategory conversion
 import System
+from System.Collections.Generic import List
+
+from parquet_writer import ParquetWriter, TYPE_DOUBLE, TYPE_INT64, TYPE_STRING
 
 # Conversion constants (feet to meters)
 FEET_TO_METERS = 0.3048
@@ -202,61 +208,78 @@ def build_geometric_params_map():
     return params_map
 
 
-def is_element_from_link_or_import(element):
-    """
-    Checks if an element comes from a link (Revit or CAD/DWG) or is an import.
-    Returns True if the element is from a link/import, False otherwise.
-    """
+# Keywords identifying link/import categories and families
+IMPORT_KEYWORDS = [".dwg", ".dxf", ".dgn", ".sat", ".skp", "import", "link", "cad"]
+
+
+def category_is_import(category):
+    """Returns True if the category name contains a link/import keyword."""
     try:
-        # Check if it's an ImportInstance (DWG, DXF, SAT, etc.)
-        if isinstance(element, ImportInstance):
-            return True
-        
-        # Check if it's a RevitLinkInstance
-        if isinstance(element, RevitLinkInstance):
+        cat_name = category.Name.lower()
+        return any(x in cat_name for x in IMPORT_KEYWORDS)
+    except:
+        return False
+
+
+def type_is_import(elem_type):
+    """Returns True if the element type belongs to an "Import Symbol" family."""
+    if elem_type is None:
+        return False
+    try:
+        family = getattr(elem_type, 'Family', None)
+        if family and "import" in family.Name.lower():
             return True
-        
-        # Check if element's document is linked
-        if hasattr(element, 'Document') and element.Document:
-            if element.Document.IsLinked:
-                return True
-        
-        # Check category for import/link related keywords
-        if element.Category:
-            cat_name = element.Category.Name.lower()
-            # Check for DWG, import, link keywords
-            if any(x in cat_name for x in [".dwg", ".dxf", ".dgn", ".sat", ".skp", 
-                                            "import", "link", "cad"]):
+    except:
+        pass
+    try:
+        family_param = elem_type.get_Parameter(BuiltInParameter.SYMBOL_FAMILY_NAME_PARAM)
+        if family_param and family_param.HasValue:
+            family_name = family_param.AsString()
+            if family_name and "import" in family_name.lower():
                 return True
-            
-            # Check if it's an "Import Symbol" family
-            try:
-                if hasattr(element, 'Symbol') and element.Symbol:
-                    family_name = element.Symbol.Family.Name if element.Symbol.Family else ""
-                    if "import" in family_name.lower():
-                        return True
-            except:
-                pass
-        
-        # Check family name for import symbols
-        try:
-            elem_type = element.Document.GetElement(element.GetTypeId())
-            if elem_type:
-                type_name = elem_type.Name if hasattr(elem_type, 'Name') else ""
-                family_param = elem_type.get_Parameter(BuiltInParameter.SYMBOL_FAMILY_NAME_PARAM)
-                if family_param and family_param.HasValue:
-                    family_name = family_param.AsString()
-                    if family_name and "import" in family_name.lower():
-                        return True
-        except:
-            pass
-            
     except:
         pass
-    
     return False
 
 
+class ImportVerdicts(object):
+    """
+    Cheap link/import predicate: the expensive checks (category name keywords,
+    family name of the type) are evaluated once per category and once per type,
+    then looked up. ImportInstance and RevitLinkInstance elements are already
+    excluded by the collector (see collect_element_ids_by_category).
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.doc_is_linked = bool(doc.IsLinked)
+        self._categories = {}
+        self._types = {}
+
+    def is_import(self, element):
+        """Returns True if the element comes from a link or is an import."""
+        if self.doc_is_linked:
+            return True
+        try:
+            category = element.Category
+            if category:
+                cat_key = get_element_id_value(category.Id)
+                verdict = self._categories.get(cat_key)
+                if verdict is None:
+                    verdict = self._categories[cat_key] = category_is_import(category)
+                if verdict:
+                    return True
+            
+            type_id = element.GetTypeId()
+            type_key = get_element_id_value(type_id)
+            verdict = self._types.get(type_key)
+            if verdict is None:
+                verdict = self._types[type_key] = type_is_import(self.doc.GetElement(type_id))
+            return verdict
+        except:
+            return False
+
+
 # Categories to exclude
 def get_excluded_categories():
     """Builds the list of excluded categories safely."""
@@ -326,17 +349,22 @@ def get_param_value_from_element(element, builtin_param):
     Returns the numeric value (Double) or None if not found/invalid.
     """
     try:
-        param = element.get_Parameter(builtin_param)
-        if param and param.HasValue:
-            if param.StorageType == StorageType.Double:
-                return param.AsDouble()
-            elif param.StorageType == StorageType.Integer:
-                return float(param.AsInteger())
+        return numeric_param_value(element.get_Parameter(builtin_param))
     except:
         pass
     return None
 
 
+def numeric_param_value(param):
+    """Numeric value (Double) of a Parameter, None if missing, empty or not numeric."""
+    if param and param.HasValue:
+        if param.StorageType == StorageType.Double:
+            return param.AsDouble()
+        elif param.StorageType == StorageType.Integer:
+            return float(param.AsInteger())
+    return None
+
+
 def get_geometric_value(element, elem_type, builtin_params_list):
     """
     Searches for a geometric value trying a list of BuiltInParameters.
@@ -359,6 +387,118 @@ def get_geometric_value(element, elem_type, builtin_params_list):
     return None
 
 
+def has_numeric_param(element, builtin_param):
+    """Returns True if the element exposes the BuiltInParameter as Double or Integer."""
+    try:
+        param = element.get_Parameter(builtin_param)
+        if param:
+            return param.StorageType in (StorageType.Double, StorageType.Integer)
+    except:
+        pass
+    return False
+
+
+class GeometricResolver(object):
+    """
+    Resolution plan cache for the geometric quantities.
+
+    The first time a (category, type) pair is seen, the BuiltInParameters of
+    each quantity that actually exist on the instance are recorded: later
+    elements of the same pair only read those (usually one or two instead of
+    the whole candidate list). Type-level values do not change between
+    instances, so they are computed once per type id.
+    The result is the same as get_geometric_value: first non-zero instance
+    value in priority order, then first non-zero type value.
+
+    Instances of a pair normally expose the same BuiltInParameters, so all
+    the planned ones are read on every instance. When one is missing, the
+    instance has another parameter set: the pair is marked as
+    mixed and its instances are resolved one by one over the whole
+    candidate list, as get_geometric_value does. Candidates missing on the
+    first instance are not read again on the others of the pair.
+    """
+
+    # Plan of the (category, type) pairs whose instances differ
+    MIXED = 'mixed'
+
+    def __init__(self, params_map):
+        self.params_map = params_map
+        self._instance_plans = {}
+        self._type_values = {}
+
+    def _plan_key(self, element, elem_type):
+        try:
+            cat_key = get_element_id_value(element.Category.Id) if element.Category else None
+        except:
+            cat_key = None
+        type_key = get_element_id_value(elem_type.Id) if elem_type else None
+        return (cat_key, type_key)
+
+    def _instance_plan(self, key, element):
+        plan = self._instance_plans.get(key)
+        if plan is None:
+            plan = {}
+            for geom_name, builtin_list in self.params_map.items():
+                plan[geom_name] = [bp for bp in builtin_list if has_numeric_param(element, bp)]
+            self._instance_plans[key] = plan
+        return plan
+
+    def _type_values_for(self, elem_type):
+        key = get_element_id_value(elem_type.Id)
+        values = self._type_values.get(key)
+        if values is None:
+            values = {}
+            for geom_name, builtin_list in self.params_map.items():
+                values[geom_name] = get_geometric_value(elem_type, None, builtin_list)
+            self._type_values[key] = values
+        return values
+
+    def resolve(self, element, elem_type):
+        """Returns { quantity: value or None } for the element."""
+        key = self._plan_key(element, elem_type)
+        plan = self._instance_plan(key, element)
+        if plan is not self.MIXED:
+            data = self._resolve_with(element, elem_type, plan, strict=True)
+            if data is not None:
+                return data
+            self._instance_plans[key] = self.MIXED
+        return self._resolve_with(element, elem_type, self.params_map, strict=False)
+
+    def _resolve_with(self, element, elem_type, candidates, strict):
+        """
+        Resolves the element with the given { quantity: candidate list }.
+        If 'strict', every candidate is read and must exist on the element:
+        None is returned as soon as one is missing.
+        """
+        type_values = None
+        data = {}
+        for geom_name, builtin_list in candidates.items():
+            value = None
+            for bp in builtin_list:
+                try:
+                    param = element.get_Parameter(bp)
+                except:
+                    param = None
+                if param is None and strict:
+                    return None
+                if value is not None:
+                    continue
+                try:
+                    candidate = numeric_param_value(param)
+                except:
+                    candidate = None
+                if candidate is not None and candidate != 0:
+                    value = candidate
+                    if not strict:
+                        break
+            if value is None and elem_type:
+                if type_values is None:
+                    type_values = self._type_values_for(elem_type)
+                value = type_values[geom_name]
+            data[geom_name] = value
+        return data
+
+
 def get_param_value_by_name(element, param_name):
     """Extracts the value of a parameter via LookupParameter."""
     try:
@@ -443,7 +583,7 @@ def get_element_name(element):
 
 
 def get_model_categories(doc, excluded_categories):
-    """Gets all valid Model categories from the document."""
+    """Gets all valid Model categories from the document (empty ones included)."""
     categories = []
     
     for cat in doc.Settings.Categories:
@@ -462,20 +602,55 @@ def get_model_categories(doc, excluded_categories):
             
             # Exclude categories containing link/import keywords in name
             cat_name_lower = cat.Name.lower()
-            if any(x in cat_name_lower for x in [".dwg", ".dxf", ".dgn", ".sat", ".skp",
-                                                  "import", "link", "cad", ".rvt"]):
+            if any(x in cat_name_lower for x in IMPORT_KEYWORDS + [".rvt"]):
                 continue
             
-            # Verify there are elements in this category
-            collector = FilteredElementCollector(doc).OfCategoryId(cat.Id).WhereElementIsNotElementType()
-            if collector.GetElementCount() > 0:
-                categories.append(cat)
+            categories.append(cat)
         except:
             continue
     
     return sorted(categories, key=lambda x: x.Name)
 
 
+def collect_element_ids_by_category(doc, categories):
+    """
+    Collects the elements of all the categories with a single collector
+    (ImportInstance and RevitLinkInstance excluded) and buckets their ids by
+    category id. Returns { category id value: [ElementId] }: only the ids are
+    kept, the elements are fetched again one category at a time while the
+    rows are written (see iter_element_groups).
+    """
+    buckets = {}
+    if not categories:
+        return buckets
+    
+    categories_ids = List[ElementId]()
+    for cat in categories:
+        categories_ids.Add(cat.Id)
+    
+    collector = FilteredElementCollector(doc).WhereElementIsNotElementType() \
+        .WherePasses(ElementMulticategoryFilter(categories_ids)) \
+        .WherePasses(ElementClassFilter(ImportInstance, True)) \
+        .WherePasses(ElementClassFilter(RevitLinkInstance, True))
+    
+    for elem in collector:
+        try:
+            cat_key = get_element_id_value(elem.Category.Id)
+        except:
+            continue
+        buckets.setdefault(cat_key, []).append(elem.Id)
+    
+    return buckets
+
+
+def iter_elements(doc, element_ids):
+    """Yields the elements of 'element_ids' one at a time."""
+    for element_id in element_ids:
+        elem = doc.GetElement(element_id)
+        if elem is not None:
+            yield elem
+
+
 def get_assembly_instances(doc):
     """Gets all Assembly instances from the document."""
     assemblies = []
@@ -487,11 +662,15 @@ def get_assembly_instances(doc):
     return assemblies
 
 
-def extract_geometric_data(element, elem_type, params_map):
+def extract_geometric_data(element, elem_type, params_map, resolver=None):
     """
     Extracts all geometric data from an element.
     Uses the logic: first instance, then type, otherwise empty.
+    If a GeometricResolver is given, its cached resolution plan is used.
     """
+    if resolver is not None:
+        return resolver.resolve(element, elem_type)
+    
     data = {}
     
     for geom_name, builtin_list in params_map.items():
@@ -554,12 +733,245 @@ def get_central_model_name(doc):
         return title
 
 
+# Geometric quantity -> output column (in output order)
+GEOMETRIC_COLUMNS = [
+    ("Length", "Length_m"),
+    ("Width", "Width_m"),
+    ("Height", "Height_m"),
+    ("Depth", "Depth_m"),
+    ("Thickness", "Thickness_m"),
+    ("Diameter", "Diameter_m"),
+    ("Perimeter", "Perimeter_m"),
+    ("Area", "Area_m2"),
+    ("Volume", "Volume_m3"),
+]
+
+
+def build_row(elem, category_name, doc, params_map, resolver, extra_params):
+    """Builds the output row (dict column -> value) of a single element."""
+    # Get element type
+    elem_type = None
+    try:
+        type_id = elem.GetTypeId()
+        if type_id and type_id != ElementId.InvalidElementId:
+            elem_type = doc.GetElement(type_id)
+    except:
+        pass
+    
+    # Basic data
+    row = {
+        "ID": get_element_id_value(elem.Id),
+        "Category": category_name,
+        "Name": get_element_name(elem),
+    }
+    
+    # Geometric data
+    geo_data = extract_geometric_data(elem, elem_type, params_map, resolver)
+    for geom_name, column in GEOMETRIC_COLUMNS:
+        value = geo_data.get(geom_name)
+        row[column] = convert_to_meters(value, geom_name.lower()) if value else ""
+    
+    # Extra parameters
+    for param_name in extra_params:
+        value = get_param_value_by_name(elem, param_name)
+        if value is not None:
+            try:
+                value = round(float(value), 3)
+            except:
+                pass
+        row[param_name] = value if value is not None else ""
+    
+    return row
+
+
+def iter_element_groups(doc, categories, element_ids_by_category):
+    """
+    Yields (category name, elements) for every category and finally for the
+    Assemblies, which need a dedicated collector. The elements of a category
+    are fetched from its bucket of ids as they are consumed, and the bucket
+    is released as soon as it has been handed out.
+    """
+    for cat in categories:
+        element_ids = element_ids_by_category.pop(get_element_id_value(cat.Id), [])
+        yield cat.Name, iter_elements(doc, element_ids)
+    yield "Assemblies", get_assembly_instances(doc)
+
+
+def iter_takeoff_rows(doc, groups, import_verdicts, params_map, resolver, extra_params, stats, output):
+    """
+    Single row generator shared by categories and Assemblies.
+    Updates stats['processed'] / stats['skipped'] and prints a summary line
+    per category.
+    """
+    for category_name, elements in groups:
+        category_processed = 0
+        category_skipped = 0
+        try:
+            for elem in elements:
+                try:
+                    # Skip elements from links or imports
+                    if import_verdicts.is_import(elem):
+                        category_skipped += 1
+                        stats['skipped'] += 1
+                        continue
+                    
+                    row = build_row(elem, category_name, doc, params_map, resolver, extra_params)
+                except Exception as e:
+                    continue
+                
+                stats['processed'] += 1
+                category_processed += 1
+                yield row
+        except Exception as e:
+            output.print_md("  - Error in category {}: {}".format(category_name, str(e)))
+            continue
+        
+        if category_processed > 0 or category_skipped > 0:
+            msg = "- **{}**: {} elements".format(category_name, category_processed)
+            if category_skipped > 0:
+                msg += " ({} skipped - links/imports)".format(category_skipped)
+            output.print_md(msg)
+
+
+# =============================================================================
+# STREAMING CSV OUTPUT
+# =============================================================================
+
+OUTPUT_CSV = "CSV"
+OUTPUT_GZIP = "CSV compressed (.csv.gz)"
+OUTPUT_CHUNKED = "CSV split in files of 1M rows"
+OUTPUT_PARQUET = "Parquet (typed columns)"
+
+# Rows per file in chunked mode (Excel limit is 1,048,576)
+CHUNK_ROWS = 1000000
+
+# The csv module of Python 2 (IronPython) writes byte strings to binary
+# files; CPython 3 (tests) writes the same UTF-8 text through text files
+PY2 = sys.version_info[0] == 2
+
+
+def format_csv_value(value):
+    """Formats a value for the CSV: empty for None, decimal comma for floats."""
+    if value is None or value == "":
+        return ""
+    elif isinstance(value, float):
+        return str(value).replace('.', ',')
+    elif not PY2:
+        return str(value)
+    else:
+        try:
+            return str(value).encode('utf-8')
+        except:
+            return str(value)
+
+
+class QtoCsvWriter(object):
+    """
+    Writes rows to the CSV as they come, with a fixed column order, so that
+    memory does not grow with the number of elements.
+    mode: OUTPUT_CSV, OUTPUT_GZIP (single .csv.gz) or OUTPUT_CHUNKED
+    (one file with header every 'chunk_rows' rows: *_part001.csv, ...).
+    """
+    
+    def __init__(self, filepath, headers, mode=OUTPUT_CSV, chunk_rows=CHUNK_ROWS):
+        self.filepath = filepath
+        self.headers = list(headers)
+        self.mode = mode
+        self.chunk_rows = chunk_rows
+        self.paths = []
+        self.rows_written = 0
+        self._file = None
+        self._writer = None
+        self._rows_in_file = 0
+    
+    def _next_path(self):
+        if self.mode == OUTPUT_GZIP:
+            return self.filepath + ".gz"
+        if self.mode == OUTPUT_CHUNKED:
+            base, ext = os.path.splitext(self.filepath)
+            return "{}_part{:03d}{}".format(base, len(self.paths) + 1, ext)
+        return self.filepath
+    
+    def _open_next(self):
+        self.close()
+        path = self._next_path()
+        if PY2:
+            self._file = gzip.open(path, 'wb') if self.mode == OUTPUT_GZIP else open(path, 'wb')
+        elif self.mode == OUTPUT_GZIP:
+            self._file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        else:
+            self._file = io.open(path, 'w', encoding='utf-8', newline='')
+        self.paths.append(path)
+        self._writer = csv.writer(self._file, delimiter=';', lineterminator='\n')
+        self._writer.writerow(self.headers)
+        self._rows_in_file = 0
+    
+    def write(self, row):
+        """Writes a row dict; missing columns are left empty."""
+        if self._file is None or (
+            self.mode == OUTPUT_CHUNKED and self._rows_in_file >= self.chunk_rows
+        ):
+            self._open_next()
+        self._writer.writerow([format_csv_value(row.get(h, "")) for h in self.headers])
+        self._rows_in_file += 1
+        self.rows_written += 1
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+    
+    def __enter__(self):
+        self._open_next()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def qto_parquet_columns(headers):
+    """Parquet column types: integer ID, geometric quantities as doubles, text for the rest."""
+    geometric = set(column for _, column in GEOMETRIC_COLUMNS)
+    columns = []
+    for header in headers:
+        if header == "ID":
+            columns.append((header, TYPE_INT64))
+        elif header in geometric:
+            columns.append((header, TYPE_DOUBLE))
+        else:
+            # Extra parameters may mix numbers and text: kept as text,
+            # numbers with a decimal point
+            columns.append((header, TYPE_STRING))
+    return columns
+
+
+class QtoParquetWriter(ParquetWriter):
+    """
+    Single .parquet file with typed columns (no decimal-comma ambiguity),
+    with the same interface as QtoCsvWriter.
+    """
+    
+    def __init__(self, filepath, headers):
+        ParquetWriter.__init__(self, os.path.splitext(filepath)[0] + ".parquet",
+                               qto_parquet_columns(headers))
+        self.paths = [self.path]
+
+
+def open_takeoff_writer(filepath, headers, output_mode):
+    if output_mode == OUTPUT_PARQUET:
+        return QtoParquetWriter(filepath, headers)
+    return QtoCsvWriter(filepath, headers, mode=output_mode)
+
+
 def main():
     """Main script function."""
     doc = revit.doc
     
     # Build quantities -> BuiltInParameter mapping
     GEOMETRIC_PARAMS_MAP = build_geometric_params_map()
+    GEOMETRIC_RESOLVER = GeometricResolver(GEOMETRIC_PARAMS_MAP)
     EXCLUDED_CATEGORIES = get_excluded_categories()
     
     # Step 1: Ask for extra parameters to extract
@@ -578,13 +990,21 @@ def main():
     if not output_folder:
         forms.alert("No folder selected. Operation cancelled.", exitscript=True)
     
+    output_mode = forms.CommandSwitchWindow.show(
+        [OUTPUT_CSV, OUTPUT_GZIP, OUTPUT_CHUNKED, OUTPUT_PARQUET],
+        message="Select output format:"
+    )
+    
+    if not output_mode:
+        script.exit()
+    
     # Generate filename with new format: YYMMDD_HHMMSS_QTO_NomeFile.csv
     timestamp = datetime.now().strftime("%y%m%d_%H%M%S")
     project_name = get_central_model_name(doc).replace(" ", "_")
     filename = "{}_QTO_{}.csv".format(timestamp, project_name)
     filepath = os.path.join(output_folder, filename)
     
-    # Step 3: Collect data
+    # Step 3: Collect data and stream it into the output file
     output = script.get_output()
     output.print_md("# Quantity Takeoff in progress...")
     
@@ -593,195 +1013,30 @@ def main():
     for param in extra_params:
         headers.append(param)
     
-    rows = []
-    processed_count = 0
-    skipped_count = 0
+    stats = {'processed': 0, 'skipped': 0}
+    import_verdicts = ImportVerdicts(doc)
     categories = get_model_categories(doc, EXCLUDED_CATEGORIES)
+    element_ids_by_category = collect_element_ids_by_category(doc, categories)
+    categories = [c for c in categories if element_ids_by_category.get(get_element_id_value(c.Id))]
     
     output.print_md("Found **{}** categories with elements".format(len(categories)))
     
-    for cat in categories:
-        try:
-            # Collect elements from category
-            collector = FilteredElementCollector(doc).OfCategoryId(cat.Id).WhereElementIsNotElementType()
-            elements = list(collector)
-            
-            if not elements:
-                continue
-            
-            category_processed = 0
-            category_skipped = 0
-            
-            for elem in elements:
-                try:
-                    # Skip elements from links or imports
-                    if is_element_from_link_or_import(elem):
-                        category_skipped += 1
-                        skipped_count += 1
-                        continue
-                    
-                    # Get element type
-                    elem_type = None
-                    try:
-                        type_id = elem.GetTypeId()
-                        if type_id and type_id != ElementId.InvalidElementId:
-                            elem_type = doc.GetElement(type_id)
-                    except:
-                        pass
-                    
-                    # Basic data
-                    elem_id = get_element_id_value(elem.Id)
-                    category_name = cat.Name
-                    elem_name = get_element_name(elem)
-                    
-                    # Geometric data
-                    geo_data = extract_geometric_data(elem, elem_type, GEOMETRIC_PARAMS_MAP)
-                    
-                    # Prepare row
-                    row = {
-                        "ID": elem_id,
-                        "Category": category_name,
-                        "Name": elem_name,
-                        "Length_m": convert_to_meters(geo_data.get("Length"), "length") if geo_data.get("Length") else "",
-                        "Width_m": convert_to_meters(geo_data.get("Width"), "width") if geo_data.get("Width") else "",
-                        "Height_m": convert_to_meters(geo_data.get("Height"), "height") if geo_data.get("Height") else "",
-                        "Depth_m": convert_to_meters(geo_data.get("Depth"), "depth") if geo_data.get("Depth") else "",
-                        "Thickness_m": convert_to_meters(geo_data.get("Thickness"), "thickness") if geo_data.get("Thickness") else "",
-                        "Diameter_m": convert_to_meters(geo_data.get("Diameter"), "diameter") if geo_data.get("Diameter") else "",
-                        "Perimeter_m": convert_to_meters(geo_data.get("Perimeter"), "perimeter") if geo_data.get("Perimeter") else "",
-                        "Area_m2": convert_to_meters(geo_data.get("Area"), "area") if geo_data.get("Area") else "",
-                        "Volume_m3": convert_to_meters(geo_data.get("Volume"), "volume") if geo_data.get("Volume") else "",
-                    }
-                    
-                    # Extra parameters
-                    for param_name in extra_params:
-                        value = get_param_value_by_name(elem, param_name)
-                        if value is not None:
-                            try:
-                                value = round(float(value), 3)
-                            except:
-                                pass
-                        row[param_name] = value if value is not None else ""
-                    
-                    rows.append(row)
-                    processed_count += 1
-                    category_processed += 1
-                    
-                except Exception as e:
-                    continue
-            
-            if category_processed > 0 or category_skipped > 0:
-                msg = "- **{}**: {} elements".format(cat.Name, category_processed)
-                if category_skipped > 0:
-                    msg += " ({} skipped - links/imports)".format(category_skipped)
-                output.print_md(msg)
-                    
-        except Exception as e:
-            output.print_md("  - Error in category {}: {}".format(cat.Name, str(e)))
-            continue
-    
-    # Process Assemblies separately (they need a dedicated collector)
-    try:
-        assemblies = get_assembly_instances(doc)
-        if assemblies:
-            assembly_processed = 0
-            assembly_skipped = 0
-            
-            for elem in assemblies:
-                try:
-                    # Skip elements from links or imports
-                    if is_element_from_link_or_import(elem):
-                        assembly_skipped += 1
-                        skipped_count += 1
-                        continue
-                    
-                    # Get element type
-                    elem_type = None
-                    try:
-                        type_id = elem.GetTypeId()
-                        if type_id and type_id != ElementId.InvalidElementId:
-                            elem_type = doc.GetElement(type_id)
-                    except:
-                        pass
-                    
-                    # Basic data
-                    elem_id = get_element_id_value(elem.Id)
-                    category_name = "Assemblies"
-                    elem_name = get_element_name(elem)
-                    
-                    # Geometric data
-                    geo_data = extract_geometric_data(elem, elem_type, GEOMETRIC_PARAMS_MAP)
-                    
-                    # Prepare row
-                    row = {
-                        "ID": elem_id,
-                        "Category": category_name,
-                        "Name": elem_name,
-                        "Length_m": convert_to_meters(geo_data.get("Length"), "length") if geo_data.get("Length") else "",
-                        "Width_m": convert_to_meters(geo_data.get("Width"), "width") if geo_data.get("Width") else "",
-                        "Height_m": convert_to_meters(geo_data.get("Height"), "height") if geo_data.get("Height") else "",
-                        "Depth_m": convert_to_meters(geo_data.get("Depth"), "depth") if geo_data.get("Depth") else "",
-                        "Thickness_m": convert_to_meters(geo_data.get("Thickness"), "thickness") if geo_data.get("Thickness") else "",
-                        "Diameter_m": convert_to_meters(geo_data.get("Diameter"), "diameter") if geo_data.get("Diameter") else "",
-                        "Perimeter_m": convert_to_meters(geo_data.get("Perimeter"), "perimeter") if geo_data.get("Perimeter") else "",
-                        "Area_m2": convert_to_meters(geo_data.get("Area"), "area") if geo_data.get("Area") else "",
-                        "Volume_m3": convert_to_meters(geo_data.get("Volume"), "volume") if geo_data.get("Volume") else "",
-                    }
-                    
-                    # Extra parameters
-                    for param_name in extra_params:
-                        value = get_param_value_by_name(elem, param_name)
-                        if value is not None:
-                            try:
-                                value = round(float(value), 3)
-                            except:
-                                pass
-                        row[param_name] = value if value is not None else ""
-                    
-                    rows.append(row)
-                    processed_count += 1
-                    assembly_processed += 1
-                    
-                except Exception as e:
-                    continue
-            
-            if assembly_processed > 0 or assembly_skipped > 0:
-                msg = "- **Assemblies**: {} elements".format(assembly_processed)
-                if assembly_skipped > 0:
-                    msg += " ({} skipped - links/imports)".format(assembly_skipped)
-                output.print_md(msg)
-    except Exception as e:
-        output.print_md("  - Error processing Assemblies: {}".format(str(e)))
-    
-    # Step 4: Write CSV file
-    output.print_md("\n## Writing CSV file...")
+    groups = iter_element_groups(doc, categories, element_ids_by_category)
+    rows = iter_takeoff_rows(doc, groups, import_verdicts, GEOMETRIC_PARAMS_MAP,
+                             GEOMETRIC_RESOLVER, extra_params, stats, output)
     
     try:
-        # Use newline='' to prevent extra blank rows on Windows
-        with open(filepath, 'wb') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers, delimiter=';', 
-                                   lineterminator='\n')
-            writer.writeheader()
+        with open_takeoff_writer(filepath, headers, output_mode) as writer:
             for row in rows:
-                row_str = {}
-                for k, v in row.items():
-                    if v is None or v == "":
-                        row_str[k] = ""
-                    elif isinstance(v, float):
-                        row_str[k] = str(v).replace('.', ',')
-                    else:
-                        try:
-                            row_str[k] = str(v).encode('utf-8')
-                        except:
-                            row_str[k] = str(v)
-                writer.writerow(row_str)
+                writer.write(row)
         
         output.print_md("\n---")
         output.print_md("## Export completed!")
-        output.print_md("- **Elements processed:** {}".format(processed_count))
-        if skipped_count > 0:
-            output.print_md("- **Elements skipped (links/imports):** {}".format(skipped_count))
-        output.print_md("- **File saved:** {}".format(filepath))
+        output.print_md("- **Elements processed:** {}".format(stats['processed']))
+        if stats['skipped'] > 0:
+            output.print_md("- **Elements skipped (links/imports):** {}".format(stats['skipped']))
+        for path in writer.paths:
+            output.print_md("- **File saved:** {}".format(path))
             
     except Exception as e:
         forms.alert("Error writing file:\n{}".format(str(e)), exitscript=True)
@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+"""
+qto_diff.py - Compare two Quantity Takeoff CSV files.
+
+Pure Python (no Revit API), runs under IronPython and CPython:
+
+    python qto_diff.py OLD.csv NEW.csv [-o summary.csv] [-d details.csv]
+
+Rows are matched on the 'ID' column. The result is aggregated per category:
+added, removed, changed and unchanged elements, plus the delta of every
+numeric quantity (sum of the new values minus sum of the old ones). A
+column is a quantity when all its non-empty values, in both files, are
+numbers: text parameters such as Mark get no delta.
+
+Memory stays bounded for multi-million row files: both inputs are first
+streamed into hash partitions on disk (by ID), then each partition of the
+old file is loaded in a dict and the matching partition of the new file is
+streamed against it.
+
+Accepted inputs are the files written by QuantityTakeoff: plain '.csv',
+compressed '.csv.gz' and split files ('*_part001.csv' reads all the parts).
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+import zlib
+from collections import OrderedDict
+
+
+PY2 = sys.version_info[0] == 2
+
+DELIMITER = ';'
+KEY_COLUMN = 'ID'
+CATEGORY_COLUMN = 'Category'
+# Columns never treated as quantities
+TEXT_COLUMNS = (KEY_COLUMN, CATEGORY_COLUMN, 'Name')
+
+STATUS_ADDED = 'added'
+STATUS_REMOVED = 'removed'
+STATUS_CHANGED = 'changed'
+
+# Content of a column, found while partitioning
+KIND_NUMBER = 'number'
+KIND_TEXT = 'text'
+
+# Target size of a single partition, used to choose the partitions number
+PARTITION_BYTES = 32 * 1024 * 1024
+FLOAT_TOLERANCE = 1e-9
+
+
+# =============================================================================
+# CSV I/O
+# =============================================================================
+
+def _open_text(path, mode):
+    """Open a (possibly gzipped) CSV file for the csv module of this Python."""
+    gz = path.lower().endswith('.gz')
+    if PY2:
+        return gzip.open(path, mode + 'b') if gz else open(path, mode + 'b')
+    if gz:
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return io.open(path, mode, encoding='utf-8', newline='')
+
+
+def input_paths(path):
+    """
+    Expand '*_part001.csv' to all the consecutive parts written by
+    QuantityTakeoff in chunked mode; any other path is returned as is.
+    """
+    match = re.match(r'^(.*_part)(\d{3})(\.csv(?:\.gz)?)$', path, re.IGNORECASE)
+    if not match or int(match.group(2)) != 1:
+        return [path]
+    prefix, suffix = match.group(1), match.group(3)
+    paths = []
+    number = 1
+    while True:
+        part = '{}{:03d}{}'.format(prefix, number, suffix)
+        if not os.path.exists(part):
+            break
+        paths.append(part)
+        number += 1
+    return paths
+
+
+def iter_csv(path):
+    """Yield (headers, row list) for every data row of a takeoff CSV (or its parts)."""
+    for part in input_paths(path):
+        with _open_text(part, 'r') as f:
+            reader = csv.reader(f, delimiter=DELIMITER)
+            try:
+                headers = next(reader)
+            except StopIteration:
+                continue
+            for row in reader:
+                if row:
+                    yield headers, row
+
+
+def iter_csv_plain(path):
+    """Yield (None, row) for every row of a header-less partition file."""
+    with _open_text(path, 'r') as f:
+        for row in csv.reader(f, delimiter=DELIMITER):
+            if row:
+                yield None, row
+
+
+def read_headers(path):
+    """Return the header row of a takeoff CSV (or of its first part)."""
+    for part in input_paths(path):
+        with _open_text(part, 'r') as f:
+            for row in csv.reader(f, delimiter=DELIMITER):
+                return row
+    return []
+
+
+def parse_number(text):
+    """Parse a decimal-comma number as written by QuantityTakeoff. None if not numeric."""
+    if text is None:
+        return None
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        return float(text.replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def format_number(value):
+    """Format a delta with decimal comma, like QuantityTakeoff."""
+    return ('%.3f' % value).replace('.', ',')
+
+
+# =============================================================================
+# PARTITIONING
+# =============================================================================
+
+def partition_index(key, partitions):
+    """Stable partition of an ID (independent from Python hash randomisation)."""
+    if not isinstance(key, bytes):
+        key = key.encode('utf-8')
+    return (zlib.crc32(key) & 0xffffffff) % partitions
+
+
+def choose_partitions(paths, partition_bytes=PARTITION_BYTES):
+    """Number of partitions so that each one is about 'partition_bytes' on disk."""
+    total = 0
+    for path in paths:
+        for part in input_paths(path):
+            if os.path.exists(part):
+                size = os.path.getsize(part)
+                # Compressed takeoffs expand roughly ten times
+                total += size * 10 if part.lower().endswith('.gz') else size
+    return max(1, int(total // partition_bytes) + 1)
+
+
+def spill_partitions(path, columns, folder, name, partitions, kinds=None):
+    """
+    Stream a takeoff into 'partitions' CSV files in 'folder', rows normalised
+    to 'columns' order. Return the list of partition paths.
+    If given, 'kinds' (one entry per column) is updated with the values seen:
+    KIND_NUMBER once a number was found, KIND_TEXT once any other non-empty
+    value was found (KIND_TEXT is final).
+    """
+    paths = [os.path.join(folder, '{}_{:04d}.csv'.format(name, i)) for i in range(partitions)]
+    handles = [_open_text(p, 'w') for p in paths]
+    try:
+        writers = [csv.writer(h, delimiter=DELIMITER, lineterminator='\n') for h in handles]
+        positions = None
+        last_headers = None
+        for headers, row in iter_csv(path):
+            if headers is not last_headers:
+                index = dict((h, i) for i, h in enumerate(headers))
+                positions = [index.get(c) for c in columns]
+                last_headers = headers
+            values = [row[i] if i is not None and i < len(row) else '' for i in positions]
+            if kinds is not None:
+                _update_kinds(kinds, values)
+            key = values[0]
+            writers[partition_index(key, partitions)].writerow(values)
+    finally:
+        for h in handles:
+            h.close()
+    return paths
+
+
+def _update_kinds(kinds, values):
+    for i, value in enumerate(values):
+        if kinds[i] == KIND_TEXT or not value.strip():
+            continue
+        kinds[i] = KIND_NUMBER if parse_number(value) is not None else KIND_TEXT
+
+
+# =============================================================================
+# DIFF
+# =============================================================================
+
+class CategoryDiff(object):
+    """Counters and per-quantity deltas of a single category."""
+
+    def __init__(self, quantities):
+        self.added = 0
+        self.removed = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.deltas = OrderedDict((q, 0.0) for q in quantities)
+
+    def add_values(self, values, sign):
+        for quantity, value in values.items():
+            if value is not None:
+                self.deltas[quantity] += sign * value
+
+
+class DiffResult(object):
+    """Result of a takeoff comparison, aggregated per category."""
+
+    def __init__(self, quantities):
+        self.quantities = list(quantities)
+        self.categories = OrderedDict()
+
+    def category(self, name):
+        diff = self.categories.get(name)
+        if diff is None:
+            diff = self.categories[name] = CategoryDiff(self.quantities)
+        return diff
+
+    def totals(self):
+        total = CategoryDiff(self.quantities)
+        for diff in self.categories.values():
+            total.added += diff.added
+            total.removed += diff.removed
+            total.changed += diff.changed
+            total.unchanged += diff.unchanged
+            for quantity, delta in diff.deltas.items():
+                total.deltas[quantity] += delta
+        return total
+
+    def summary_rows(self):
+        """Header + one row per category (sorted by name) + TOTAL row."""
+        headers = ['Category', 'Added', 'Removed', 'Changed', 'Unchanged']
+        headers += ['Delta_' + q for q in self.quantities]
+        rows = [headers]
+        for name in sorted(self.categories):
+            rows.append(self._row(name, self.categories[name]))
+        rows.append(self._row('TOTAL', self.totals()))
+        return rows
+
+    def _row(self, name, diff):
+        return (
+            [name, str(diff.added), str(diff.removed), str(diff.changed), str(diff.unchanged)]
+            + [format_number(diff.deltas[q]) for q in self.quantities]
+        )
+
+
+def _quantity_values(values, quantity_positions):
+    numbers = OrderedDict()
+    for quantity, position in quantity_positions:
+        numbers[quantity] = parse_number(values[position])
+    return numbers
+
+
+def _values_differ(old, new):
+    old_number, new_number = parse_number(old), parse_number(new)
+    if old_number is not None and new_number is not None:
+        return abs(old_number - new_number) > FLOAT_TOLERANCE
+    return (old or '').strip() != (new or '').strip()
+
+
+def diff_takeoffs(old_path, new_path, partitions=None, work_folder=None, details_callback=None):
+    """
+    Compare two takeoff CSV files and return a DiffResult.
+
+    details_callback(element_id, category, status, column, old, new, delta),
+    if given, is called for every added/removed element (column None) and for
+    every changed column of a changed element.
+    """
+    old_headers = read_headers(old_path)
+    new_headers = read_headers(new_path)
+    if KEY_COLUMN not in old_headers or KEY_COLUMN not in new_headers:
+        raise ValueError("Both files need an '{}' column".format(KEY_COLUMN))
+
+    # Union of the columns, ID first, in order of appearance
+    columns = [KEY_COLUMN]
+    for header in list(new_headers) + list(old_headers):
+        if header not in columns:
+            columns.append(header)
+    category_position = columns.index(CATEGORY_COLUMN) if CATEGORY_COLUMN in columns else None
+
+    if partitions is None:
+        partitions = choose_partitions([old_path, new_path])
+
+    folder = tempfile.mkdtemp(prefix='qto_diff_', dir=work_folder)
+    try:
+        kinds = [None] * len(columns)
+        old_parts = spill_partitions(old_path, columns, folder, 'old', partitions, kinds)
+        new_parts = spill_partitions(new_path, columns, folder, 'new', partitions, kinds)
+
+        # Quantities: numeric columns only (text parameters get no delta)
+        quantities = [
+            c for c, kind in zip(columns, kinds)
+            if kind == KIND_NUMBER and c not in TEXT_COLUMNS
+        ]
+        quantity_positions = [(q, columns.index(q)) for q in quantities]
+        result = DiffResult(quantities)
+
+        for old_part, new_part in zip(old_parts, new_parts):
+            # Only one partition of the old takeoff is held in memory
+            old_rows = {}
+            for _, values in iter_csv_plain(old_part):
+                old_rows[values[0]] = values
+
+            for _, new_values in iter_csv_plain(new_part):
+                key = new_values[0]
+                category = new_values[category_position] if category_position is not None else ''
+                old_values = old_rows.pop(key, None)
+                diff = result.category(category)
+
+                if old_values is None:
+                    diff.added += 1
+                    diff.add_values(_quantity_values(new_values, quantity_positions), 1)
+                    if details_callback:
+                        details_callback(key, category, STATUS_ADDED, None, None, None, None)
+                    continue
+
+                changed_columns = [
+                    i for i in range(1, len(columns))
+                    if _values_differ(old_values[i], new_values[i])
+                ]
+                if not changed_columns:
+                    diff.unchanged += 1
+                    continue
+
+                diff.changed += 1
+                diff.add_values(_quantity_values(new_values, quantity_positions), 1)
+                diff.add_values(_quantity_values(old_values, quantity_positions), -1)
+                if details_callback:
+                    for i in changed_columns:
+                        old_number = parse_number(old_values[i])
+                        new_number = parse_number(new_values[i])
+                        delta = None
+                        if columns[i] in quantities:
+                            delta = (new_number or 0.0) - (old_number or 0.0)
+                        details_callback(key, category, STATUS_CHANGED, columns[i],
+                                         old_values[i], new_values[i], delta)
+
+            # Whatever is left in the old partition has been removed
+            for key, old_values in old_rows.items():
+                category = old_values[category_position] if category_position is not None else ''
+                diff = result.category(category)
+                diff.removed += 1
+                diff.add_values(_quantity_values(old_values, quantity_positions), -1)
+                if details_callback:
+                    details_callback(key, category, STATUS_REMOVED, None, None, None, None)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return result
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def write_rows(path, rows):
+    with _open_text(path, 'w') as f:
+        writer = csv.writer(f, delimiter=DELIMITER, lineterminator='\n')
+        for row in rows:
+            writer.writerow(row)
+
+
+def print_rows(rows, stream=None):
+    stream = stream or sys.stdout
+    widths = [max(len(r[i]) for r in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        stream.write('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip() + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Compare two Quantity Takeoff CSV files, matching rows on the ID column.')
+    parser.add_argument('old', help='previous takeoff (.csv, .csv.gz or *_part001.csv)')
+    parser.add_argument('new', help='current takeoff (.csv, .csv.gz or *_part001.csv)')
+    parser.add_argument('-o', '--output', help='write the per-category summary to this CSV')
+    parser.add_argument('-d', '--details', help='write added/removed/changed elements to this CSV')
+    parser.add_argument('-p', '--partitions', type=int, default=None,
+                        help='number of on-disk partitions (default: from file size)')
+    parser.add_argument('--work-folder', default=None,
+                        help='folder for the temporary partitions (default: system temp)')
+    args = parser.parse_args(argv)
+
+    details_file = None
+    details_callback = None
+    if args.details:
+        details_file = _open_text(args.details, 'w')
+        details_writer = csv.writer(details_file, delimiter=DELIMITER, lineterminator='\n')
+        details_writer.writerow(['ID', 'Category', 'Status', 'Column', 'Old', 'New', 'Delta'])
+
+        def details_callback(key, category, status, column, old, new, delta):
+            details_writer.writerow([
+                key, category, status, column or '', old or '', new or '',
+                format_number(delta) if delta is not None else '',
+            ])
+
+    try:
+        result = diff_takeoffs(args.old, args.new, partitions=args.partitions,
+                               work_folder=args.work_folder, details_callback=details_callback)
+    finally:
+        if details_file is not None:
+            details_file.close()
+
+    rows = result.summary_rows()
+    if args.output:
+        write_rows(args.output, rows)
+    else:
+        print_rows(rows)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,15 +3,98 @@ import pyrevit
 from pyrevit import revit, DB, script
 from pyrevit import forms
 from rpw.ui.forms import TaskDialog, SelectFromList
-from itertools import combinations
+import broad_phase
+import join_graph
 
 doc = __revit__.ActiveUIDocument.Document
+jgu = DB.JoinGeometryUtils
+
+# Bounding boxes closer than this (feet, about 3 mm) still count as touching
+BOX_TOLERANCE = 0.01
+# Pairs processed per transaction (all in one undo step)
+CHUNK_SIZE = 200
+
+#DEFINITIONS
+def get_id_value(eid):
+	"""Return the integer value of an ElementId (works in Revit 2022-2026+)."""
+	try:
+		return eid.Value
+	except AttributeError:
+		return eid.IntegerValue
+
+def get_box(element):
+	bbox = element.get_BoundingBox(None)
+	if bbox is None:
+		return None
+	return ((bbox.Min.X, bbox.Min.Y, bbox.Min.Z), (bbox.Max.X, bbox.Max.Y, bbox.Max.Z))
+
+def candidate_pairs(elements, tolerance):
+	"""
+	Pairs of elements whose bounding boxes overlap (elements that are apart
+	cannot be joined). Elements without a bounding box are paired with all
+	the others, as before.
+	"""
+	boxes = [get_box(e) for e in elements]
+	pairs = set(broad_phase.overlapping_pairs(boxes, tolerance))
+	for i, box in enumerate(boxes):
+		if box is None:
+			pairs.update((min(i, j), max(i, j)) for j in range(len(elements)) if j != i)
+	return [(elements[i], elements[j]) for i, j in sorted(pairs)]
+
+def joined_pairs(elements):
+	"""
+	Pairs of selected elements that are joined, each once: one
+	GetJoinedElements call per element instead of one check per pair.
+	"""
+	by_id = dict((get_id_value(e.Id), e) for e in elements)
+	keys = [get_id_value(e.Id) for e in elements]
+
+	def get_joined(key):
+		try:
+			return [get_id_value(i) for i in jgu.GetJoinedElements(doc, by_id[key])]
+		except Exception:
+			return []
+
+	return [(by_id[a], by_id[b]) for a, b in join_graph.join_edges(keys, get_joined)]
+
+def join_pair(a, b):
+	if jgu.AreElementsJoined(doc, a, b):
+		return False
+	jgu.JoinGeometry(doc, a, b)
+	return True
+
+def unjoin_pair(a, b):
+	jgu.UnjoinGeometry(doc, a, b)
+	return True
+
+def switch_pair(a, b):
+	jgu.SwitchJoinOrder(doc, a, b)
+	return True
+
+def run_in_chunks(pairs, action):
+	"""
+	Apply action(a, b) to the pairs, CHUNK_SIZE pairs per transaction inside
+	one transaction group. Return the number of pairs it changed.
+	"""
+	done = 0
+	with revit.TransactionGroup('JoinUtils'):
+		with forms.ProgressBar(title='Join Utils ({value} of {max_value} pairs)',
+							   cancellable=True) as pb:
+			for start in range(0, len(pairs), CHUNK_SIZE):
+				if pb.cancelled:
+					break
+				with revit.Transaction('JoinUtils', swallow_errors=True):
+					for a, b in pairs[start:start + CHUNK_SIZE]:
+						try:
+							if action(a, b):
+								done += 1
+						except:	pass
+				pb.update_progress(min(start + CHUNK_SIZE, len(pairs)), len(pairs))
+	return done
 
 #CODE
-##Get selected items and their combination
+##Get selected items
 elements = list(revit.get_selection())
-comb_elements = list(combinations(elements, 2))
-
 
 sfl_join = 'Join'
 sfl_unjoin = 'Unjoin'
@@ -23,35 +106,18 @@ operation = SelectFromList(
 	[sfl_join, sfl_unjoin, sfl_switch]
 )
 
-##Switch the join order of joined elements
+##Join the pairs that can touch, unjoin/switch the pairs already joined
 nStart = len(elements)
-eElems = 0
-
-with revit.Transaction('JoinUtils', swallow_errors=True):
-	jgu = DB.JoinGeometryUtils
-	for couple in comb_elements:
-		if operation == sfl_join:
-			try:
-				if not jgu.AreElementsJoined(doc,couple[0],couple[1]):
-					jgu.JoinGeometry(doc,couple[0],couple[1])
-					eElems += 1
-			except:	pass
-		elif operation == sfl_unjoin:
-			try:
-				if jgu.AreElementsJoined(doc,couple[0],couple[1]):
-					jgu.UnjoinGeometry(doc,couple[0],couple[1])
-					eElems += 1
-			except:	pass
-		else:
-			try:
-				if jgu.AreElementsJoined(doc,couple[0],couple[1]):
-					jgu.SwitchJoinOrder(doc,couple[0],couple[1])
-					eElems += 1
-			except:	pass
+if operation == sfl_join:
+	eElems = run_in_chunks(candidate_pairs(elements, BOX_TOLERANCE), join_pair)
+elif operation == sfl_unjoin:
+	eElems = run_in_chunks(joined_pairs(elements), unjoin_pair)
+else:
+	eElems = run_in_chunks(joined_pairs(elements), switch_pair)
 
 ##Create output message
 if operation == sfl_join:
-	msg = '{} Elements Selected\n{} Elements Joined'.format(str(nStart),'[]')
+	msg = '{} Elements Selected\n{} Elements Joined'.format(str(nStart),str(eElems))
 elif operation == sfl_unjoin:
 	msg = '{} Elements Selected\n{} Elements Unjoined'.format(str(nStart),str(eElems))
 elif operation == sfl_switch:	
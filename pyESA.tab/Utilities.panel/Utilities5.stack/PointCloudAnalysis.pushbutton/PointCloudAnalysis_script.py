@@ -17,6 +17,7 @@ import os
 import math
 import codecs
 import datetime
+import tempfile
 import clr
 
 clr.AddReference('RevitAPI')
@@ -30,6 +31,7 @@ from Autodesk.Revit.DB import (
     Transaction,
     Element,
     Face,
+    PlanarFace,
     Plane,
     UV,
     XYZ,
@@ -37,6 +39,8 @@ from Autodesk.Revit.DB import (
     UnitUtils,
     LabelUtils,
     PointCloudInstance,
+    ExternalFileUtils,
+    ModelPathUtils,
 )
 from Autodesk.Revit.DB.PointClouds import PointCloudFilterFactory
 from Autodesk.Revit.DB.Analysis import (
@@ -54,6 +58,7 @@ from Autodesk.Revit.DB.Analysis import (
 )
 from Autodesk.Revit.UI.Selection import ObjectType
 from Autodesk.Revit.Exceptions import OperationCanceledException
+from System import Environment
 from System.Collections.Generic import List
 
 from System.Windows import Window
@@ -62,6 +67,13 @@ from System.IO import StreamReader
 
 from pyrevit import forms, script
 
+import adaptive_grid
+import cloud_sampling
+import cloud_stats
+import filter_space
+import reduction_pool
+import sample_cache
+
 # Revit >= 2021 uses ForgeTypeId units, older versions DisplayUnitType
 try:
     from Autodesk.Revit.DB import SpecTypeId, UnitTypeId
@@ -77,6 +89,10 @@ SCHEMA_NAME = "PointCloud Deviation"
 STYLE_NAME = "ESA PointCloud Deviation"
 
 QUALITY_ORDER = ['fast', 'medium', 'high', 'all']
+# Sampling density: GetPoints thins the cloud to grid / sqrt(N), so a
+# cell holds up to about N points where the scan is denser than that and
+# every point elsewhere. No per-cell cap: all the points returned are
+# accumulated.
 QUALITY_POINTS = {'fast': 10, 'medium': 200, 'high': 1000}
 # 'all': no practical cap and a tiny average spacing, so GetPoints
 # effectively returns every cloud point inside the cell box.
@@ -101,6 +117,17 @@ GRADIENTS = [
 ]
 GRADIENT_MAP = dict(GRADIENTS)
 DEFAULT_GRADIENT = GRADIENTS[0][0]
+# Per-cell value shown on the AVF map and in the histogram:
+# label -> CellStats attribute
+DISPLAY_MEASURES = [
+    ('Average deviation', 'mean'),
+    ('Median deviation', 'median'),
+    ('Standard deviation', 'std'),
+    ('P95 |deviation|', 'p95'),
+    ('Cell size', 'size'),
+]
+DISPLAY_MEASURE_MAP = dict(DISPLAY_MEASURES)
+DEFAULT_DISPLAY = DISPLAY_MEASURES[0][0]
 HISTOGRAM_MIN_BINS = 5
 HISTOGRAM_MAX_BINS = 30
 
@@ -175,6 +202,8 @@ class AnalysisParamsForm(Window):
         self.txt_tolerance = root.FindName('txt_tolerance')
         self.cmb_quality = root.FindName('cmb_quality')
         self.cmb_gradient = root.FindName('cmb_gradient')
+        self.cmb_display = root.FindName('cmb_display')
+        self.chk_adaptive = root.FindName('chk_adaptive')
         self.chk_csv = root.FindName('chk_csv')
         self.btn_ok = root.FindName('btn_ok')
         self.btn_cancel = root.FindName('btn_cancel')
@@ -195,6 +224,10 @@ class AnalysisParamsForm(Window):
             self.cmb_gradient.Items.Add(gradient_name)
         self.cmb_gradient.SelectedItem = DEFAULT_GRADIENT
 
+        for measure_label, _ in DISPLAY_MEASURES:
+            self.cmb_display.Items.Add(measure_label)
+        self.cmb_display.SelectedItem = DEFAULT_DISPLAY
+
         self.btn_ok.Click += self.OnOk
         self.btn_cancel.Click += self.OnCancel
 
@@ -223,6 +256,8 @@ class AnalysisParamsForm(Window):
             'tolerance': to_internal(tolerance),
             'quality': self.cmb_quality.SelectedItem,
             'gradient': self.cmb_gradient.SelectedItem,
+            'display': self.cmb_display.SelectedItem,
+            'adaptive': bool(self.chk_adaptive.IsChecked),
             'export_csv': bool(self.chk_csv.IsChecked),
         }
         self.Close()
@@ -233,14 +268,6 @@ class AnalysisParamsForm(Window):
 
 # ---------------------------------------------------------------- geometry helpers
 
-def frange_centers(start, end, step):
-    """Yield cell-center values from start to end with the given step."""
-    value = start + step * 0.5
-    while value < end:
-        yield value
-        value += step
-
-
 def transform_plane(xform, plane):
     """Return the plane mapped through the given transform."""
     normal = xform.OfVector(plane.Normal).Normalize()
@@ -260,25 +287,49 @@ def box_planes(bmin, bmax):
     ]
 
 
-def cell_planes(face, uvp, grid, offset):
-    """Six inward-facing planes of a box centered on the face cell,
+def oriented_planes(face, uvp, half_u, half_v, offset):
+    """Six inward-facing planes of a box centered on the face at uvp,
     oriented along the face normal (works on any face orientation)."""
     deriv = face.ComputeDerivatives(uvp)
     normal = face.ComputeNormal(uvp)
     tang_u = deriv.BasisX.Normalize()
     tang_v = normal.CrossProduct(tang_u).Normalize()
     center = deriv.Origin
-    half = grid * 0.5
     return [
-        Plane.CreateByNormalAndOrigin(tang_u, center.Subtract(tang_u.Multiply(half))),
-        Plane.CreateByNormalAndOrigin(tang_u.Negate(), center.Add(tang_u.Multiply(half))),
-        Plane.CreateByNormalAndOrigin(tang_v, center.Subtract(tang_v.Multiply(half))),
-        Plane.CreateByNormalAndOrigin(tang_v.Negate(), center.Add(tang_v.Multiply(half))),
+        Plane.CreateByNormalAndOrigin(tang_u, center.Subtract(tang_u.Multiply(half_u))),
+        Plane.CreateByNormalAndOrigin(tang_u.Negate(), center.Add(tang_u.Multiply(half_u))),
+        Plane.CreateByNormalAndOrigin(tang_v, center.Subtract(tang_v.Multiply(half_v))),
+        Plane.CreateByNormalAndOrigin(tang_v.Negate(), center.Add(tang_v.Multiply(half_v))),
         Plane.CreateByNormalAndOrigin(normal, center.Subtract(normal.Multiply(offset))),
         Plane.CreateByNormalAndOrigin(normal.Negate(), center.Add(normal.Multiply(offset))),
     ]
 
 
+def tile_planes(face, u0, u1, v0, v1, offset):
+    """Six inward-facing planes of a slab covering the UV rectangle of
+    the face, +/-offset along its normal. Oriented box on planar faces,
+    world-aligned box around the sampled tile on the other faces,
+    padded by the sagitta of the samples (see cloud_sampling.tile_box)."""
+    if isinstance(face, PlanarFace):
+        uvp = UV((u0 + u1) * 0.5, (v0 + v1) * 0.5)
+        return oriented_planes(face, uvp, (u1 - u0) * 0.5, (v1 - v0) * 0.5,
+                               offset)
+    steps = cloud_sampling.TILE_BOX_STEPS
+    rows = []
+    for a in range(steps + 1):
+        u_par = u0 + (u1 - u0) * a / float(steps)
+        row = []
+        for b in range(steps + 1):
+            v_par = v0 + (v1 - v0) * b / float(steps)
+            try:
+                row.append(xyz_tuple(face.Evaluate(UV(u_par, v_par))))
+            except Exception:
+                row.append(None)
+        rows.append(row)
+    bmin, bmax = cloud_sampling.tile_box(rows, offset)
+    return box_planes(XYZ(*bmin), XYZ(*bmax))
+
+
 def get_cloud_points(pcl, planes, avg_dist, max_points):
     plane_list = List[Plane](planes)
     pc_filter = PointCloudFilterFactory.CreateMultiPlaneFilter(plane_list)
@@ -310,101 +361,412 @@ def face_model_bbox(face, margin):
     return bmin, bmax
 
 
-def detect_filter_space(pcl, total_transform, face, margin):
-    """Return the transform to apply to filter planes (or None).
+def filter_space_cache():
+    return filter_space.FilterSpaceCache(script.get_universal_data_file(
+        file_id='PointCloudAnalysis_filterspace', file_ext='json'))
+
+
+def detect_filter_space(pcl, total_transform, faces, margin):
+    """Return (transform to apply to filter planes or None,
+    filter_space.Detection or None).
 
     The Revit API is ambiguous on whether PointCloudInstance.GetPoints
     applies the filter in model or in cloud coordinates: the same box is
-    tested in both spaces around the first face, and the space that
-    returns more points wins. With an identity transform both are equal
-    and None (model space) is returned.
+    tested in both spaces around a few faces and the majority wins (see
+    filter_space). The decision is cached per point cloud type, Revit
+    version and transform class. With an identity transform both spaces
+    are equal and None (model space) is returned without probing.
     """
     if total_transform.IsIdentity:
-        return None
-    bmin, bmax = face_model_bbox(face, margin)
-    planes_model = box_planes(bmin, bmax)
+        return None, None
     inverse = total_transform.Inverse
-    planes_cloud = [transform_plane(inverse, p) for p in planes_model]
     probe_dist = meters_to_internal(0.05)
-    count_model = count_cloud_points(pcl, planes_model, probe_dist, 100)
-    count_cloud = count_cloud_points(pcl, planes_cloud, probe_dist, 100)
-    if count_cloud > count_model:
-        return inverse
-    return None
+
+    def probe(face):
+        try:
+            bmin, bmax = face_model_bbox(face, margin)
+        except Exception:
+            return None
+        planes_model = box_planes(bmin, bmax)
+        planes_cloud = [transform_plane(inverse, p) for p in planes_model]
+        return (count_cloud_points(pcl, planes_model, probe_dist, 100),
+                count_cloud_points(pcl, planes_cloud, probe_dist, 100))
+
+    cloud_type = doc.GetElement(pcl.GetTypeId())
+    xform_class = filter_space.transform_class(
+        xyz_tuple(total_transform.Origin), xyz_tuple(total_transform.BasisX),
+        xyz_tuple(total_transform.BasisY), xyz_tuple(total_transform.BasisZ))
+    key = filter_space.FilterSpaceCache.key(
+        Element.Name.GetValue(cloud_type) if cloud_type is not None else '',
+        __revit__.Application.VersionNumber, xform_class)
+    detection = filter_space.detect(filter_space_cache(), key, faces, probe)
+    if detection.space == filter_space.SPACE_CLOUD:
+        return inverse, detection
+    return None, detection
+
+
+def print_filter_space(detection):
+    if detection is None:
+        return
+    space_label = ("point cloud" if detection.space == filter_space.SPACE_CLOUD
+                   else "model")
+    if detection.cached:
+        print("Cloud filter applied in {0} coordinates (cached "
+              "decision).".format(space_label))
+        return
+    print("Cloud filter applied in {0} coordinates (faces voting model: "
+          "{1}, point cloud: {2}).".format(
+              space_label, detection.votes.get(filter_space.SPACE_MODEL, 0),
+              detection.votes.get(filter_space.SPACE_CLOUD, 0)))
+    for index, (count_model, count_cloud) in detection.probes:
+        print("  Probe on face {0}: {1} points in model space, {2} in "
+              "point cloud space".format(index + 1, count_model, count_cloud))
 
 
 # ---------------------------------------------------------------- analysis
 
 def quality_settings(quality, grid):
-    """Return (max points per cell, average sampling distance)."""
+    """Return (points per cell at the sampling spacing, average sampling
+    distance)."""
     if quality in QUALITY_POINTS:
         max_points = QUALITY_POINTS[quality]
         return max_points, grid / math.sqrt(max_points)
     return ALL_POINTS_CAP, meters_to_internal(ALL_AVG_DIST_M)
 
 
+def xyz_tuple(xyz):
+    return (xyz.X, xyz.Y, xyz.Z)
+
+
+def plane_frame(face, total_transform):
+    """Analytic cloud-to-(u, v, distance) map of a planar face, None for
+    other faces (or an unexpected parametrization)."""
+    if not isinstance(face, PlanarFace):
+        return None
+    uvp = UV(0.0, 0.0)
+    deriv = face.ComputeDerivatives(uvp)
+    x_axis = deriv.BasisX
+    y_axis = deriv.BasisY
+    if (abs(x_axis.GetLength() - 1.0) > 1e-9
+            or abs(y_axis.GetLength() - 1.0) > 1e-9
+            or abs(x_axis.DotProduct(y_axis)) > 1e-9):
+        return None
+    basis = (xyz_tuple(total_transform.BasisX),
+             xyz_tuple(total_transform.BasisY),
+             xyz_tuple(total_transform.BasisZ))
+    return cloud_sampling.PlaneFrame.compose(
+        xyz_tuple(deriv.Origin), xyz_tuple(x_axis), xyz_tuple(y_axis),
+        xyz_tuple(face.ComputeNormal(uvp)), basis,
+        xyz_tuple(total_transform.Origin))
+
+
+def face_uv_loops(face):
+    """Face boundary as UV polylines (one per edge), None if the edges
+    cannot be tessellated on the face."""
+    loops = []
+    try:
+        for edge_loop in face.EdgeLoops:
+            for edge in edge_loop:
+                loops.append([(uv.U, uv.V) for uv in edge.TessellateOnFace(face)])
+    except Exception:
+        return None
+    return loops or None
+
+
+def face_samples(face, total_transform, cloud_points, offset):
+    """Map cloud points to (u, v, signed distance) on the face, once per
+    point. Points outside the +/-offset slab are dropped."""
+    for cloud_pt in cloud_points:
+        model_pt = total_transform.OfPoint(
+            XYZ(cloud_pt.X, cloud_pt.Y, cloud_pt.Z))
+        projection = face.Project(model_pt)
+        if projection is None:
+            continue
+        uv = projection.UVPoint
+        normal = face.ComputeNormal(uv)
+        distance = normal.DotProduct(model_pt.Subtract(projection.XYZPoint))
+        if abs(distance) <= offset:
+            yield uv.U, uv.V, distance
+
+
+def cell_value(stats, size, attr):
+    """Displayed value of a cell: a CellStats attribute or the cell size."""
+    if attr == 'size':
+        return size
+    return getattr(stats, attr)
+
+
+def sample_tiles(pcl, total_transform, to_cloud, face, frame, cells, tiles,
+                 offset, avg_dist, tolerance, pool, recorder=None):
+    """Query the cloud once per tile of cells and return
+    ({cell: CellStats}, number of queries). A tile whose query hits the
+    point cap is split in four and queried again.
+
+    This (API) thread only queries and copies coordinates, the binning
+    and statistics of each tile run on the pool (see reduction_pool).
+    Results are merged in tile order."""
+    jobs = []
+    summaries = {}
+    queries = 0
+    merged = [0]
+
+    def merge_next():
+        stats, tile_recorder = jobs[merged[0]].result()
+        jobs[merged[0]] = None
+        merged[0] += 1
+        summaries.update(stats)
+        if recorder is not None:
+            recorder.extend(tile_recorder)
+
+    pending = list(reversed(tiles))
+    while pending:
+        tile = pending.pop()
+        u0, u1, v0, v1 = cells.tile_bounds(tile)
+        try:
+            planes = tile_planes(face, u0, u1, v0, v1, offset)
+        except Exception:
+            continue
+        if to_cloud is not None:
+            planes = [transform_plane(to_cloud, p) for p in planes]
+        cloud_points = get_cloud_points(pcl, planes, avg_dist, ALL_POINTS_CAP)
+        queries += 1
+        if cloud_points.Count >= ALL_POINTS_CAP:
+            parts = cloud_sampling.split_tile(tile)
+            if parts:
+                pending.extend(reversed(parts))
+                continue
+
+        if frame is not None:
+            xs, ys, zs = reduction_pool.copy_points(cloud_points)
+            samples = frame.samples(xs, ys, zs, offset)
+        else:
+            # Project and ComputeNormal are API calls: map on this thread
+            samples = list(face_samples(
+                face, total_transform, cloud_points, offset))
+        jobs.append(pool.submit(
+            reduction_pool.reduce_tile, cells, tile, samples, tolerance,
+            recorder is not None))
+        # Do not run too far ahead of the workers (memory)
+        while len(jobs) - merged[0] > 2 * pool.workers:
+            merge_next()
+
+    while merged[0] < len(jobs):
+        merge_next()
+    return summaries, queries
+
+
+def cached_stats(cells, cache_entry, offset, tolerance):
+    """{cell: CellStats} from the samples of a cache entry."""
+    accumulators = cloud_stats.CellAccumulators(tolerance)
+    cloud_sampling.bin_tile(
+        cells, (0, cells.nu, 0, cells.nv), cache_entry.samples(offset),
+        accumulators)
+    return accumulators.cells
+
+
+class FaceInside(object):
+    """Inside tests of cells against the face boundary. On planar faces
+    only cells the tessellated boundary may cross call IsInside, the
+    others are classified with an even-odd test."""
+
+    def __init__(self, face, frame):
+        self.face = face
+        self.loops = face_uv_loops(face) if frame is not None else None
+        self._boundary = {}
+
+    def boundary(self, cells):
+        if self.loops is None:
+            return None
+        if cells.grid not in self._boundary:
+            self._boundary[cells.grid] = cloud_sampling.boundary_cells(
+                cells, self.loops)
+        return self._boundary[cells.grid]
+
+    def _is_inside(self, u_par, v_par):
+        try:
+            return bool(self.face.IsInside(UV(u_par, v_par)))
+        except Exception:
+            return False
+
+    def center(self, cells, i, j):
+        """True if the center of cell (i, j) lies on the face."""
+        u_par, v_par = cells.center(i, j)
+        boundary = self.boundary(cells)
+        if boundary is None or (i, j) in boundary:
+            return self._is_inside(u_par, v_par)
+        return cloud_sampling.point_in_loops(u_par, v_par, self.loops)
+
+    def crossed(self, cells, i, j):
+        """True if the face boundary may cross cell (i, j): by the
+        tessellated boundary, or by center and corners disagreeing."""
+        boundary = self.boundary(cells)
+        if boundary is not None:
+            return (i, j) in boundary
+        u0, u1, v0, v1 = cells.tile_bounds((i, i + 1, j, j + 1))
+        results = set(self._is_inside(u_par, v_par) for u_par, v_par in (
+            (u0, v0), (u0, v1), (u1, v0), (u1, v1),
+            ((u0 + u1) * 0.5, (v0 + v1) * 0.5)))
+        return len(results) > 1
+
+
+def face_grid(face, grid):
+    """Uniform cloud_sampling.CellGrid over the UV box of a face."""
+    bb = face.GetBoundingBox()
+    return cloud_sampling.CellGrid(
+        bb.Min.U, bb.Max.U, bb.Min.V, bb.Max.V, grid)
+
+
 def analyze_face(pcl, total_transform, to_cloud, face, grid, offset,
-                 avg_dist, max_points, tolerance):
+                 quality, tolerance, pool, adaptive=False, cache_entry=None,
+                 recorder=None):
     """Sample the face on a UV grid and return per-cell UVs, centers
-    (model XYZ), average signed distances (internal units), cloud
-    point counts and the number of points within +/-tolerance."""
+    (model XYZ), cloud_stats.CellStats of the signed distances and cell
+    sizes (internal units), and the numbers of cells, empty cells and
+    point cloud queries.
+
+    The cloud is queried once per tile of cells (see cloud_sampling);
+    a tile whose query hits the point cap is split in four and queried
+    again. On planar faces points are mapped with plane_frame instead of
+    Project/ComputeNormal.
+
+    In adaptive mode the face starts from a coarse grid and cells are
+    split (see adaptive_grid) down to the given grid, each level queried
+    at its own sampling spacing.
+
+    With a sample_cache.CacheEntry the cloud is not queried at all; with
+    a recorder the samples are also collected for the cache (uniform
+    mode only: the adaptive levels sample at different spacings)."""
+    if adaptive:
+        bb = face.GetBoundingBox()
+        grids = adaptive_grid.level_grids(
+            bb.Min.U, bb.Max.U, bb.Min.V, bb.Max.V, grid)
+        recorder = None
+    else:
+        grids = [face_grid(face, grid)]
+    frame = plane_frame(face, total_transform)
+    inside = FaceInside(face, frame)
+    queries = [0]
+
+    def evaluate(level, nodes):
+        cells = grids[level]
+        if cache_entry is not None:
+            return cached_stats(cells, cache_entry, offset, tolerance)
+        max_points, avg_dist = quality_settings(quality, cells.grid)
+        if level == len(grids) - 1:
+            expected = max_points if max_points < ALL_POINTS_CAP else 0
+            tile_points = (reduction_pool.PARALLEL_TILE_POINTS
+                           if pool.parallel else ALL_POINTS_CAP)
+            tiles = cloud_sampling.plan_tiles(
+                cells.nu, cells.nv, expected, tile_points)
+        else:
+            tiles = adaptive_grid.sibling_tiles(nodes)
+        summaries, n_queries = sample_tiles(
+            pcl, total_transform, to_cloud, face, frame, cells, tiles,
+            offset, avg_dist, tolerance, pool, recorder)
+        queries[0] += n_queries
+        return summaries
+
+    rule = adaptive_grid.RefinementRule(tolerance)
+
+    def should_split(level, cell, stats, neighbours):
+        # Crossed cells split even when empty: part of them may lie off
+        # the face (or past the face box, on the coarser grids)
+        return (rule.split(stats, neighbours)
+                or inside.crossed(grids[level], cell[0], cell[1]))
+
     uvs = []
     centers = []
-    values = []
-    counts = []
+    cell_stats = []
+    sizes = []
     cells_total = 0
     cells_empty = 0
-    points_within = 0
+    for level, (i, j), stats in adaptive_grid.refine(
+            grids, evaluate, should_split):
+        cells = grids[level]
+        if not inside.center(cells, i, j):
+            continue
+        cells_total += 1
+        if stats is None:
+            cells_empty += 1
+            continue
+        uvp = UV(*cells.center(i, j))
+        uvs.append(uvp)
+        centers.append(face.Evaluate(uvp))
+        cell_stats.append(stats)
+        sizes.append(cells.grid)
+
+    return (uvs, centers, cell_stats, sizes, cells_total, cells_empty,
+            queries[0])
+
+
+def cache_folder():
+    temp = os.environ.get('TEMP') or tempfile.gettempdir()
+    return os.path.join(temp, 'pyESA_PointCloudAnalysis')
+
+
+def format_numbers(values):
+    return ','.join('{0:.9g}'.format(v) for v in values)
+
+
+def point_cloud_stamp(pcl):
+    """'type id:mtime:size' of the point cloud file, None if the file
+    cannot be found (the cache is then not used)."""
+    cloud_type = doc.GetElement(pcl.GetTypeId())
+    if cloud_type is None:
+        return None
+    path = None
+    try:
+        file_ref = ExternalFileUtils.GetExternalFileReference(doc, cloud_type.Id)
+        path = ModelPathUtils.ConvertModelPathToUserVisiblePath(
+            file_ref.GetAbsolutePath())
+    except Exception:
+        try:
+            path = cloud_type.GetPath()
+        except Exception:
+            path = None
+    if not path or not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    return '{0}:{1:.3f}:{2}'.format(
+        get_id_value(cloud_type.Id), stat.st_mtime, stat.st_size)
 
-    bb = face.GetBoundingBox()
-    for u_par in frange_centers(bb.Min.U, bb.Max.U, grid):
-        for v_par in frange_centers(bb.Min.V, bb.Max.V, grid):
-            uvp = UV(u_par, v_par)
-            try:
-                if not face.IsInside(uvp):
-                    continue
-                planes = cell_planes(face, uvp, grid, offset)
-            except Exception:
-                continue
-            cells_total += 1
-
-            if to_cloud is not None:
-                planes = [transform_plane(to_cloud, p) for p in planes]
-
-            distances = []
-            for cloud_pt in get_cloud_points(pcl, planes, avg_dist, max_points):
-                model_pt = total_transform.OfPoint(
-                    XYZ(cloud_pt.X, cloud_pt.Y, cloud_pt.Z))
-                projection = face.Project(model_pt)
-                if projection is None:
-                    continue
-                normal = face.ComputeNormal(projection.UVPoint)
-                distances.append(
-                    normal.DotProduct(model_pt.Subtract(projection.XYZPoint)))
-
-            if distances:
-                uvs.append(uvp)
-                centers.append(face.Evaluate(uvp))
-                values.append(sum(distances) / len(distances))
-                counts.append(len(distances))
-                points_within += sum(
-                    1 for d in distances if abs(d) <= tolerance)
-            else:
-                cells_empty += 1
 
-    return (uvs, centers, values, counts, cells_total, cells_empty,
-            points_within)
+def transform_signature(xform):
+    return format_numbers(
+        [c for xyz in (xform.Origin, xform.BasisX, xform.BasisY, xform.BasisZ)
+         for c in (xyz.X, xyz.Y, xyz.Z)])
+
+
+def face_signature(reference, face):
+    """Stable reference of the face plus its current position, so a
+    moved or reshaped element does not reuse stale samples."""
+    bb = face.GetBoundingBox()
+    numbers = [face.Area]
+    for uvp in (bb.Min, bb.Max):
+        point = face.Evaluate(uvp)
+        numbers.extend((point.X, point.Y, point.Z))
+    normal = face.ComputeNormal(bb.Min)
+    numbers.extend((normal.X, normal.Y, normal.Z))
+    return '{0}|{1}|{2}'.format(
+        doc.PathName, reference.ConvertToStableRepresentation(doc),
+        format_numbers(numbers))
 
 
 # ---------------------------------------------------------------- AVF display
 
-def get_result_schema_index(sfm):
+def get_result_schema_index(sfm, measure):
+    """One result schema per displayed measure (the average keeps the
+    original schema name)."""
+    name = SCHEMA_NAME
+    if measure != DEFAULT_DISPLAY:
+        name = "{0} - {1}".format(SCHEMA_NAME, measure)
     for idx in sfm.GetRegisteredResults():
-        if sfm.GetResultSchema(idx).Name == SCHEMA_NAME:
+        if sfm.GetResultSchema(idx).Name == name:
             return idx
     schema = AnalysisResultSchema(
-        SCHEMA_NAME,
-        "Average signed distance between point cloud and surface")
+        name,
+        "{0} of the signed distances between point cloud and surface"
+        .format(measure))
     label = length_unit_label()
     if label:
         try:
@@ -452,7 +814,7 @@ def update_display_style(stops):
         doc, STYLE_NAME, surface_settings, color_settings, legend_settings)
 
 
-def show_results(view, face_results, stops):
+def show_results(view, face_results, stops, measure):
     """Draw the AVF colored map on the view. Values in document units."""
     t = Transaction(doc, "PointCloud Analysis")
     t.Start()
@@ -464,7 +826,7 @@ def show_results(view, face_results, stops):
         # Remove primitives left over from previous runs
         sfm.Clear()
 
-        schema_idx = get_result_schema_index(sfm)
+        schema_idx = get_result_schema_index(sfm, measure)
         view.AnalysisDisplayStyleId = update_display_style(stops).Id
 
         for reference, uvs, values in face_results:
@@ -498,17 +860,15 @@ def gradient_hex(stops, t):
     return '#{0:02x}{1:02x}{2:02x}'.format(rgb[0], rgb[1], rgb[2])
 
 
-def histogram_bins(values, lo, hi):
+def histogram_bins(sketch, lo, hi):
     """Number of histogram bins via the Freedman-Diaconis rule
     (Sturges as fallback when the IQR is degenerate), clamped so the
-    bar labels stay readable."""
-    n = len(values)
+    bar labels stay readable. Quartiles come from a
+    cloud_stats.QuantileSketch of the values, not from a full sort."""
+    n = sketch.count
     if n < 2:
         return HISTOGRAM_MIN_BINS
-    ordered = sorted(values)
-    q1 = ordered[int(round(0.25 * (n - 1)))]
-    q3 = ordered[int(round(0.75 * (n - 1)))]
-    iqr = q3 - q1
+    iqr = sketch.quantile(0.75) - sketch.quantile(0.25)
     if iqr > 1e-12:
         bin_width = 2.0 * iqr / (n ** (1.0 / 3.0))
         bins = int(math.ceil((hi - lo) / bin_width))
@@ -517,7 +877,7 @@ def histogram_bins(values, lo, hi):
     return max(HISTOGRAM_MIN_BINS, min(HISTOGRAM_MAX_BINS, bins))
 
 
-def print_histogram(output, values, counts, stops, unit):
+def print_histogram(output, values, counts, sketch, stops, unit, measure):
     """Bar chart in the pyRevit output window: deviation bins on the
     x axis, number of cloud points per bin on the y axis (each cell
     weighted by the cloud points it contains), point count above bars.
@@ -528,7 +888,7 @@ def print_histogram(output, values, counts, stops, unit):
     hi = max(values)
     if hi - lo < 1e-9:
         hi = lo + 1e-9
-    n_bins = histogram_bins(values, lo, hi)
+    n_bins = histogram_bins(sketch, lo, hi)
     width = (hi - lo) / n_bins
 
     point_bins = [0] * n_bins
@@ -600,7 +960,7 @@ def print_histogram(output, values, counts, stops, unit):
     html = (
         '<div style="margin-top:15px;">'
         '<p style="font-weight:bold;margin-bottom:12px;">'
-        'Deviation distribution [{unit}] - {total_pts} cloud points '
+        '{measure} distribution [{unit}] - {total_pts} cloud points '
         'in {total_cells} cells</p>'
         '<div style="height:{plot_h}px;font-size:0;line-height:0;'
         'border-bottom:2px solid #999;border-left:2px solid #999;">'
@@ -608,12 +968,14 @@ def print_histogram(output, values, counts, stops, unit):
         '<div style="font-size:0;line-height:0;margin-top:2px;">'
         '{axis_labels}</div>'
         '<p style="margin-top:8px;">'
-        'X axis: average deviation [{unit}] at the center of each bar '
+        'X axis: {measure_lower} [{unit}] at the center of each bar '
         'interval, rounded to 1 mm. Above each bar: cells in that '
         'interval; at the top of the bar, in italic: cloud points (p). '
         'Hover the bars for details.</p>'
         '</div>').format(
             unit=unit,
+            measure=measure,
+            measure_lower=measure.lower(),
             total_pts=sum(point_bins),
             total_cells=len(values),
             plot_h=plot_height,
@@ -644,11 +1006,14 @@ def export_csv(rows, unit):
         return '{0:.4f}'.format(value).replace('.', ',')
 
     lines = ['ElementId;Face;Cell X [{0}];Cell Y [{0}];Cell Z [{0}];'
-             'Avg deviation [{0}];Cloud points'.format(unit)]
+             'Avg deviation [{0}];Cloud points;Median deviation [{0}];'
+             'Std deviation [{0}];P95 |deviation| [{0}];'
+             'Cell size [{0}]'.format(unit)]
     for row in rows:
-        lines.append('{0};{1};{2};{3};{4};{5};{6}'.format(
+        lines.append('{0};{1};{2};{3};{4};{5};{6};{7};{8};{9};{10}'.format(
             row[0], row[1], num(row[2]), num(row[3]), num(row[4]),
-            num(row[5]), row[6]))
+            num(row[5]), row[6], num(row[7]), num(row[8]), num(row[9]),
+            num(row[10])))
 
     stream = codecs.open(path, 'w', 'utf-8-sig')
     try:
@@ -730,58 +1095,103 @@ def main():
     grid = params['grid']
     offset = params['offset']
     stops = GRADIENT_MAP[params['gradient']]
+    measure = params['display']
+    measure_attr = DISPLAY_MEASURE_MAP[measure]
     max_points, avg_dist = quality_settings(params['quality'], grid)
 
     total_transform = pcl.GetTotalTransform()
-    to_cloud = detect_filter_space(
-        pcl, total_transform, faces[0][1], offset + grid)
+    # Filter space is only probed when a face has to query the cloud
+    to_cloud = None
+    space_detected = False
+    detection = None
+    cloud_stamp = point_cloud_stamp(pcl)
+    cache = sample_cache.SampleCache(cache_folder())
+    transform_key = transform_signature(total_transform)
+    cached_faces = 0
 
     print("PointCloud Analysis")
     print("Point cloud: {0}".format(Element.Name.GetValue(pcl)))
     if params['quality'] == 'all':
         print("Quality: all (every cloud point in each cell)")
     else:
-        print("Quality: {0} ({1} points per cell max)".format(
-            params['quality'], max_points))
-    if to_cloud is not None:
-        print("Cloud filter applied in point cloud coordinates "
-              "(non-identity cloud transform detected).")
+        print("Quality: {0} (cloud thinned to a {1:.4g} {2} spacing, "
+              "up to about {3} points per cell on a dense cloud)".format(
+                  params['quality'], from_internal(avg_dist), unit,
+                  max_points))
+    if params['adaptive']:
+        print("Adaptive grid: cells from {0:g} down to {1:g} [{2}]".format(
+            from_internal(grid * 2 ** adaptive_grid.DEFAULT_LEVELS),
+            from_internal(grid), unit))
     print("")
 
     face_results = []
     all_values = []
     all_counts = []
+    value_sketch = cloud_stats.QuantileSketch()
     csv_rows = []
     total_cells = 0
     empty_cells = 0
     within_total = 0
-    with forms.ProgressBar(title="Analyzing face {value} of {max_value}",
-                           cancellable=True) as progress:
+    total_queries = 0
+    # Workers for the point-to-cell reduction; the API thread keeps one core
+    with reduction_pool.ReductionPool(Environment.ProcessorCount - 1) as pool, \
+            forms.ProgressBar(title="Analyzing face {value} of {max_value}",
+                              cancellable=True) as progress:
         for i, (reference, face) in enumerate(faces):
             if progress.cancelled:
                 script.exit()
             progress.update_progress(i + 1, len(faces))
-            (uvs, centers, values, counts, n_cells, n_empty,
-             n_within) = analyze_face(
+            key = entry = recorder = None
+            bounds = face_grid(face, grid).bounds
+            if cloud_stamp is not None:
+                key = sample_cache.cache_key(
+                    cloud_stamp, transform_key,
+                    face_signature(reference, face), params['quality'])
+                entry = cache.load(key)
+                if (entry is not None
+                        and not entry.covers(offset, avg_dist, bounds)):
+                    entry = None
+            if entry is None:
+                if not space_detected:
+                    to_cloud, detection = detect_filter_space(
+                        pcl, total_transform, [f for _, f in faces],
+                        offset + grid)
+                    space_detected = True
+                if key is not None and not params['adaptive']:
+                    recorder = sample_cache.SampleRecorder()
+            else:
+                cached_faces += 1
+            (uvs, centers, cell_stats, sizes, n_cells, n_empty,
+             n_queries) = analyze_face(
                 pcl, total_transform, to_cloud, face,
-                grid, offset, avg_dist, max_points, params['tolerance'])
+                grid, offset, params['quality'], params['tolerance'],
+                pool, params['adaptive'], entry, recorder)
+            if recorder is not None:
+                cache.store(key, recorder, offset=offset, avg_dist=avg_dist,
+                            bounds=list(bounds))
+            total_queries += n_queries
             total_cells += n_cells
             empty_cells += n_empty
-            within_total += n_within
+            within_total += sum(stats.within for stats in cell_stats)
             if uvs:
-                display_values = [from_internal(v) for v in values]
+                display_values = [from_internal(cell_value(stats, size, measure_attr))
+                                  for stats, size in zip(cell_stats, sizes)]
                 all_values.extend(display_values)
-                all_counts.extend(counts)
+                all_counts.extend(stats.count for stats in cell_stats)
+                value_sketch.extend(display_values)
                 face_results.append((reference, uvs, display_values))
                 elem_id = get_id_value(reference.ElementId)
-                for center, value, count in zip(
-                        centers, display_values, counts):
+                for center, stats, size in zip(centers, cell_stats, sizes):
                     csv_rows.append((
                         elem_id, i + 1,
                         from_internal(center.X),
                         from_internal(center.Y),
                         from_internal(center.Z),
-                        value, count))
+                        from_internal(stats.mean), stats.count,
+                        from_internal(stats.median),
+                        from_internal(stats.std),
+                        from_internal(stats.p95),
+                        from_internal(size)))
 
     if not face_results:
         forms.alert(
@@ -791,7 +1201,7 @@ def main():
         script.exit()
 
     try:
-        show_results(view, face_results, stops)
+        show_results(view, face_results, stops, measure)
     except Exception as ex:
         forms.alert(
             "Could not display the analysis on the active view:\n{0}\n\n"
@@ -799,13 +1209,20 @@ def main():
             title="PointCloud Analysis")
         script.exit()
 
-    print("Faces analyzed: {0}".format(len(faces)))
+    print_filter_space(detection)
+    print("Reduction threads: {0}".format(pool.workers))
+    print("Faces analyzed: {0} ({1} from the sample cache)".format(
+        len(faces), cached_faces))
+    if cloud_stamp is None:
+        print("Sample cache not used: point cloud file not found.")
     print("Cells evaluated: {0} (no cloud points in {1})".format(
         total_cells, empty_cells))
     print("Cloud points analyzed: {0}".format(sum(all_counts)))
-    print("Deviation [{0}]  min: {1:.3f}   max: {2:.3f}   avg: {3:.3f}".format(
-        unit, min(all_values), max(all_values),
-        sum(all_values) / len(all_values)))
+    print("Point cloud queries: {0}".format(total_queries))
+    print("{0} [{1}]  min: {2:.3f}   max: {3:.3f}   avg: {4:.3f}   "
+          "median: {5:.3f}".format(
+              measure, unit, min(all_values), max(all_values),
+              sum(all_values) / len(all_values), value_sketch.quantile(0.5)))
 
     tol_display = from_internal(params['tolerance'])
     total_points = sum(all_counts)
@@ -815,7 +1232,8 @@ def main():
               100.0 * within_total / total_points,
               within_total, total_points))
 
-    print_histogram(output, all_values, all_counts, stops, unit)
+    print_histogram(output, all_values, all_counts, value_sketch, stops,
+                    unit, measure)
 
     if params['export_csv']:
         try:
@@ -834,4 +1252,5 @@ def main():
                 print("Could not open the CSV automatically: {0}".format(ex))
 
 
-main()
+if __name__ == '__main__':
+    main()
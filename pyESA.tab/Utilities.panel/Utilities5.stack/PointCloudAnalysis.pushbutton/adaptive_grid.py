@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Adaptive (quadtree) cell refinement for PointCloudAnalysis
+(no Revit API imports).
+
+The face is first evaluated on a coarse grid, 2 ** levels times the
+user's grid. A cell is split in four only where the cloud says the
+surface is not uniform there; its children are evaluated on the next
+finer grid, down to the user's grid. All levels share the same UV
+origin, so the children of cell (i, j) are (2i + di, 2j + dj); the
+coarser grids are rounded up to whole parents of the user's cells, so
+they may reach past the face box.
+"""
+
+from cloud_sampling import CellGrid
+
+
+DEFAULT_LEVELS = 3
+
+# Split when the point spread exceeds this fraction of the tolerance
+STD_FACTOR = 0.5
+# Split when between this fraction and its complement of the points is
+# out of tolerance: a cell that is entirely out (or entirely in) is
+# uniform, smaller cells would only repeat the same value
+EXCEED_FRACTION = 0.05
+# Cells with fewer points are too noisy to decide on
+MIN_POINTS = 5
+
+
+def level_grids(u_min, u_max, v_min, v_max, grid, levels=DEFAULT_LEVELS):
+    """CellGrids from the user's grid (index 0) to the coarsest one.
+    Every cell of the user's grid has its ancestor on each coarser grid."""
+    finest = CellGrid(u_min, u_max, v_min, v_max, grid)
+    grids = [finest]
+    for level in range(1, levels + 1):
+        factor = 2 ** level
+        size = grid * factor
+        nu = -(-finest.nu // factor)
+        nv = -(-finest.nv // factor)
+        grids.append(CellGrid(u_min, u_min + nu * size,
+                              v_min, v_min + nv * size, size))
+    return grids
+
+
+def children(grids, level, cell):
+    """Cells of grids[level - 1] covered by cell of grids[level]."""
+    finer = grids[level - 1]
+    i, j = cell
+    return [(ci, cj)
+            for ci in (2 * i, 2 * i + 1) if ci < finer.nu
+            for cj in (2 * j, 2 * j + 1) if cj < finer.nv]
+
+
+def sibling_tiles(cells):
+    """Group cells in 2 x 2 blocks (children of the same parent), as
+    (i0, i1, j0, j1) tiles with the end excluded."""
+    blocks = {}
+    for i, j in cells:
+        blocks.setdefault((i // 2, j // 2), []).append((i, j))
+    tiles = []
+    for key in sorted(blocks):
+        members = blocks[key]
+        tiles.append((min(c[0] for c in members), max(c[0] for c in members) + 1,
+                      min(c[1] for c in members), max(c[1] for c in members) + 1))
+    return tiles
+
+
+def neighbour_means(means, cell):
+    i, j = cell
+    found = []
+    for key in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)):
+        if key in means:
+            found.append(means[key])
+    return found
+
+
+class RefinementRule(object):
+    """Decides whether a cell is split, from its CellStats and the means
+    of its evaluated neighbours on the same level."""
+
+    def __init__(self, tolerance, std_factor=STD_FACTOR,
+                 exceed_fraction=EXCEED_FRACTION, min_points=MIN_POINTS):
+        self.tolerance = tolerance
+        self.std_factor = std_factor
+        self.exceed_fraction = exceed_fraction
+        self.min_points = min_points
+
+    def split(self, stats, neighbours):
+        if stats is None or stats.count < self.min_points:
+            return False
+        if stats.std > self.tolerance * self.std_factor:
+            return True
+        outside = 1.0 - float(stats.within) / stats.count
+        if self.exceed_fraction < outside < 1.0 - self.exceed_fraction:
+            return True
+        for mean in neighbours:
+            if abs(stats.mean - mean) > self.tolerance:
+                return True
+        return False
+
+
+def refine(grids, evaluate, should_split):
+    """Run the quadtree from the coarsest grid down.
+
+    evaluate(level, cells) returns {cell: stats} for the cells of
+    grids[level] that got points; should_split(level, cell, stats,
+    neighbour_means) decides on each of them (stats may be None).
+    Return the leaves as (level, cell, stats) in evaluation order."""
+    level = len(grids) - 1
+    nodes = list(grids[level].indices())
+    leaves = []
+    while nodes:
+        stats = evaluate(level, nodes)
+        means = dict((cell, s.mean) for cell, s in stats.items())
+        next_nodes = []
+        for cell in nodes:
+            cell_stats = stats.get(cell)
+            if level > 0 and should_split(
+                    level, cell, cell_stats, neighbour_means(means, cell)):
+                next_nodes.extend(children(grids, level, cell))
+            else:
+                leaves.append((level, cell, cell_stats))
+        nodes = next_nodes
+        level -= 1
+    return leaves
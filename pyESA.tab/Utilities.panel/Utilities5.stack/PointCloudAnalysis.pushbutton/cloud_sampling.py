@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Point sampling helpers for PointCloudAnalysis (no Revit API imports).
+
+Instead of one GetPoints query per grid cell, the face is covered by a
+few tiles (whole blocks of cells) and each tile is queried once. The
+returned points are mapped to UV once and binned into cells with an
+integer hash grid keyed on (floor(u / grid), floor(v / grid)) and fed
+to per-cell accumulators (see cloud_stats).
+"""
+
+import math
+
+
+def frange_centers(start, end, step):
+    """Yield cell-center values from start to end with the given step."""
+    value = start + step * 0.5
+    while value < end:
+        yield value
+        value += step
+
+
+class CellGrid(object):
+    """Uniform grid of cells over the UV bounding box of a face.
+
+    Cell (i, j) is centered on (u_centers[i], v_centers[j]): the same
+    centers the per-cell sampling used, in the same u-major order.
+    """
+
+    def __init__(self, u_min, u_max, v_min, v_max, grid):
+        self.u_min = u_min
+        self.v_min = v_min
+        self.grid = grid
+        self.u_centers = list(frange_centers(u_min, u_max, grid))
+        self.v_centers = list(frange_centers(v_min, v_max, grid))
+
+    @property
+    def nu(self):
+        return len(self.u_centers)
+
+    @property
+    def nv(self):
+        return len(self.v_centers)
+
+    def center(self, i, j):
+        return self.u_centers[i], self.v_centers[j]
+
+    def index(self, u, v):
+        """Return the (i, j) cell containing (u, v), None outside the grid."""
+        i = int(math.floor((u - self.u_min) / self.grid))
+        j = int(math.floor((v - self.v_min) / self.grid))
+        if 0 <= i < self.nu and 0 <= j < self.nv:
+            return i, j
+        return None
+
+    def indices(self):
+        """All cells, u-major."""
+        for i in range(self.nu):
+            for j in range(self.nv):
+                yield i, j
+
+    @property
+    def bounds(self):
+        """UV bounds (u0, u1, v0, v1) covered by the cells: the face box
+        rounded down to whole cells."""
+        return self.tile_bounds((0, self.nu, 0, self.nv))
+
+    def tile_bounds(self, tile):
+        """UV bounds (u0, u1, v0, v1) of a tile (i0, i1, j0, j1), end excluded."""
+        i0, i1, j0, j1 = tile
+        return (self.u_min + self.grid * i0, self.u_min + self.grid * i1,
+                self.v_min + self.grid * j0, self.v_min + self.grid * j1)
+
+
+def plan_tiles(nu, nv, expected_per_cell, point_cap):
+    """Split the nu x nv cells in square tiles of cells whose expected
+    number of points stays below point_cap. Tiles are (i0, i1, j0, j1)
+    with the end excluded, u-major. With expected_per_cell <= 0 the whole
+    face is a single tile (it is split later if the query saturates)."""
+    if nu <= 0 or nv <= 0:
+        return []
+    if expected_per_cell <= 0:
+        return [(0, nu, 0, nv)]
+    cells_per_tile = max(1, point_cap // expected_per_cell)
+    side = max(1, int(math.sqrt(cells_per_tile)))
+    tiles = []
+    for i0 in range(0, nu, side):
+        for j0 in range(0, nv, side):
+            tiles.append((i0, min(nu, i0 + side), j0, min(nv, j0 + side)))
+    return tiles
+
+
+def split_tile(tile):
+    """Split a tile in (up to) four quadrants, None for a single cell."""
+    i0, i1, j0, j1 = tile
+    if i1 - i0 <= 1 and j1 - j0 <= 1:
+        return None
+    im = (i0 + i1 + 1) // 2 if i1 - i0 > 1 else i1
+    jm = (j0 + j1 + 1) // 2 if j1 - j0 > 1 else j1
+    parts = []
+    for a, b in ((i0, im), (im, i1)):
+        for c, d in ((j0, jm), (jm, j1)):
+            if a < b and c < d:
+                parts.append((a, b, c, d))
+    return parts
+
+
+TILE_BOX_STEPS = 8
+
+
+def tile_box(rows, offset):
+    """World-aligned (min, max) box around the points of a tile of a
+    curved face, sampled on a regular (steps + 1) x (steps + 1) grid
+    (rows of (x, y, z) tuples, None where the face cannot be evaluated).
+
+    The surface bulges out of the box of its samples between them. That
+    bulge is bounded by the sagitta of every pair of consecutive steps,
+    measured as the distance from the middle sample to the midpoint of
+    its neighbours, so the box is padded by the largest one (plus the
+    offset). Raises ValueError if no point was evaluated."""
+    points = [p for row in rows for p in row if p is not None]
+    if not points:
+        raise ValueError("no point of the tile could be evaluated")
+
+    def sagitta(a, m, b):
+        if a is None or m is None or b is None:
+            return 0.0
+        return math.sqrt(sum((m[k] - (a[k] + b[k]) * 0.5) ** 2
+                             for k in range(3)))
+
+    pad = 0.0
+    for i, row in enumerate(rows):
+        for j in range(1, len(row) - 1):
+            pad = max(pad, sagitta(row[j - 1], row[j], row[j + 1]))
+        if 0 < i < len(rows) - 1:
+            for j, point in enumerate(row):
+                pad = max(pad, sagitta(rows[i - 1][j], point,
+                                       rows[i + 1][j]))
+    margin = offset + pad
+    return (tuple(min(p[k] for p in points) - margin for k in range(3)),
+            tuple(max(p[k] for p in points) + margin for k in range(3)))
+
+
+def tile_contains(tile, cell):
+    i0, i1, j0, j1 = tile
+    return i0 <= cell[0] < i1 and j0 <= cell[1] < j1
+
+
+def bin_tile(cells, tile, samples, accumulators, recorder=None):
+    """Bin (u, v, value) samples of a tile query into the accumulators
+    (anything with add(cell, value)), and into the recorder if given
+    (anything with add(u, v, value)).
+    Samples falling in cells outside the tile are dropped: those cells
+    get them from their own tile query. Return the number of samples kept."""
+    kept = 0
+    for u, v, value in samples:
+        cell = cells.index(u, v)
+        if cell is None or not tile_contains(tile, cell):
+            continue
+        accumulators.add(cell, value)
+        if recorder is not None:
+            recorder.add(u, v, value)
+        kept += 1
+    return kept
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+class PlaneFrame(object):
+    """Affine map from cloud coordinates to (u, v, signed distance) on a
+    planar face: the face frame composed with the cloud transform, i.e.
+    the top three rows of a 4x4 matrix. Replaces OfPoint / Project /
+    ComputeNormal (three API calls) with nine multiply-adds per point."""
+
+    def __init__(self, rows):
+        self.rows = [tuple(float(c) for c in row) for row in rows]
+
+    @classmethod
+    def compose(cls, origin, x_axis, y_axis, normal, basis, translation):
+        """Frame of a plane (origin, orthonormal x/y axes, unit normal, in
+        model space) seen from a cloud whose transform maps c to
+        basis[0] * c.x + basis[1] * c.y + basis[2] * c.z + translation.
+        All arguments are (x, y, z) tuples, basis is a triple of them."""
+        shift = tuple(t - o for t, o in zip(translation, origin))
+        rows = []
+        for axis in (x_axis, y_axis, normal):
+            rows.append((_dot(axis, basis[0]), _dot(axis, basis[1]),
+                         _dot(axis, basis[2]), _dot(axis, shift)))
+        return cls(rows)
+
+    def apply(self, x, y, z):
+        (ux, uy, uz, uw), (vx, vy, vz, vw), (nx, ny, nz, nw) = self.rows
+        return (ux * x + uy * y + uz * z + uw,
+                vx * x + vy * y + vz * z + vw,
+                nx * x + ny * y + nz * z + nw)
+
+    def samples(self, xs, ys, zs, offset):
+        """Yield (u, v, distance) for the points (three sequences of
+        coordinates) within +/-offset of the plane."""
+        (ux, uy, uz, uw), (vx, vy, vz, vw), (nx, ny, nz, nw) = self.rows
+        for x, y, z in zip(xs, ys, zs):
+            distance = nx * x + ny * y + nz * z + nw
+            if -offset <= distance <= offset:
+                yield (ux * x + uy * y + uz * z + uw,
+                       vx * x + vy * y + vz * z + vw,
+                       distance)
+
+
+def point_in_loops(u, v, loops):
+    """Even-odd test of (u, v) against UV polylines that together close
+    the face boundary (outer loop and holes alike). Only the set of
+    segments matters, not their order or direction."""
+    inside = False
+    for loop in loops:
+        count = len(loop)
+        for k in range(1, count):
+            u0, v0 = loop[k - 1]
+            u1, v1 = loop[k]
+            if (v0 > v) != (v1 > v):
+                if u < u0 + (v - v0) * (u1 - u0) / (v1 - v0):
+                    inside = not inside
+    return inside
+
+
+def boundary_cells(cells, loops):
+    """Cells a boundary polyline may cross. Segments are walked in steps
+    of half a cell and the 3x3 block around every step is marked, so no
+    crossed cell is missed (a few extra ones are harmless)."""
+    marked = set()
+    step = cells.grid * 0.5
+    for loop in loops:
+        count = len(loop)
+        for k in range(1, count):
+            u0, v0 = loop[k - 1]
+            u1, v1 = loop[k]
+            n = int(math.hypot(u1 - u0, v1 - v0) / step) + 1
+            for s in range(n + 1):
+                t = float(s) / n
+                i = int(math.floor((u0 + (u1 - u0) * t - cells.u_min) / cells.grid))
+                j = int(math.floor((v0 + (v1 - v0) * t - cells.v_min) / cells.grid))
+                for di in (-1, 0, 1):
+                    for dj in (-1, 0, 1):
+                        marked.add((i + di, j + dj))
+    return marked
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""Streaming statistics for PointCloudAnalysis (no Revit API imports).
+
+CellStats summarizes the signed distances of a cell in constant memory:
+Welford mean and variance, RMS, min/max, points within tolerance and P2
+estimates (Jain & Chlamtac) of the median and of the 95th percentile of
+the absolute deviation. QuantileSketch is a mergeable KLL sketch used
+for the quartiles of the histogram instead of sorting every value.
+"""
+
+import math
+import random
+
+
+class P2Quantile(object):
+    """P2 estimate of the p-quantile of a stream with five markers.
+    Exact while fewer than five values have been seen."""
+
+    def __init__(self, p):
+        self.p = p
+        self._initial = []
+        self._heights = None
+        self._positions = None
+        self._desired = None
+        self._increments = (0.0, p / 2.0, p, (1.0 + p) / 2.0, 1.0)
+
+    def add(self, value):
+        if self._heights is None:
+            self._initial.append(value)
+            if len(self._initial) == 5:
+                self._initial.sort()
+                p = self.p
+                self._heights = self._initial
+                self._positions = [1, 2, 3, 4, 5]
+                self._desired = [1.0, 1.0 + 2.0 * p, 1.0 + 4.0 * p,
+                                 3.0 + 2.0 * p, 5.0]
+            return
+
+        q = self._heights
+        n = self._positions
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if ((d >= 1 and n[i + 1] - n[i] > 1)
+                    or (d <= -1 and n[i - 1] - n[i] < -1)):
+                step = 1 if d > 0 else -1
+                height = self._parabolic(i, step)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = self._linear(i, step)
+                q[i] = height
+                n[i] += step
+
+    def _parabolic(self, i, d):
+        q = self._heights
+        n = self._positions
+        return q[i] + float(d) / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def _linear(self, i, d):
+        q = self._heights
+        n = self._positions
+        return q[i] + d * (q[i + d] - q[i]) / float(n[i + d] - n[i])
+
+    def value(self):
+        """Current estimate, None if nothing was added."""
+        if self._heights is not None:
+            return self._heights[2]
+        if not self._initial:
+            return None
+        ordered = sorted(self._initial)
+        return ordered[int(round(self.p * (len(ordered) - 1)))]
+
+
+class CellStats(object):
+    """Constant-memory summary of the signed distances of one cell."""
+
+    __slots__ = ('tolerance', 'count', 'mean', '_m2', '_sum_sq', 'min',
+                 'max', 'within', '_median', '_p95')
+
+    def __init__(self, tolerance):
+        self.tolerance = tolerance
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._sum_sq = 0.0
+        self.min = None
+        self.max = None
+        self.within = 0
+        self._median = P2Quantile(0.5)
+        self._p95 = P2Quantile(0.95)
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self._sum_sq += value * value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if abs(value) <= self.tolerance:
+            self.within += 1
+        self._median.add(value)
+        self._p95.add(abs(value))
+
+    @property
+    def std(self):
+        """Sample standard deviation (0 with fewer than two values)."""
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self._m2 / (self.count - 1))
+
+    @property
+    def rms(self):
+        if not self.count:
+            return 0.0
+        return math.sqrt(self._sum_sq / self.count)
+
+    @property
+    def median(self):
+        return self._median.value()
+
+    @property
+    def p95(self):
+        """95th percentile of the absolute deviation."""
+        return self._p95.value()
+
+
+class CellAccumulators(object):
+    """One CellStats per cell, created on the first value."""
+
+    def __init__(self, tolerance):
+        self.tolerance = tolerance
+        self.cells = {}
+
+    def add(self, cell, value):
+        stats = self.cells.get(cell)
+        if stats is None:
+            stats = self.cells[cell] = CellStats(self.tolerance)
+        stats.add(value)
+
+    def pop(self, cell):
+        """Return and forget the stats of a cell, None if it got no value."""
+        return self.cells.pop(cell, None)
+
+
+class QuantileSketch(object):
+    """KLL quantile sketch: about k retained values whatever the stream
+    length, rank error around 1.7 / k. Sketches can be merged, so each
+    face can keep its own and the run combines them."""
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.count = 0
+        self._levels = [[]]
+        self._rng = random.Random(seed)
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def add(self, value):
+        self._levels[0].append(value)
+        self.count += 1
+        self._compress()
+
+    def extend(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for level, items in enumerate(other._levels):
+            self._levels[level].extend(items)
+        self.count += other.count
+        self._compress()
+
+    def _retained(self):
+        return sum(len(items) for items in self._levels)
+
+    def _compress(self):
+        while self._retained() > sum(
+                self._capacity(h) for h in range(len(self._levels))):
+            for level, items in enumerate(self._levels):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self._levels):
+                        self._levels.append([])
+                    items.sort()
+                    # An odd item out stays at this level
+                    keep = items.pop() if len(items) % 2 else None
+                    start = self._rng.randint(0, 1)
+                    self._levels[level + 1].extend(items[start::2])
+                    self._levels[level] = [keep] if keep is not None else []
+                    break
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1), None when empty."""
+        weighted = []
+        for level, items in enumerate(self._levels):
+            weight = 1 << level
+            weighted.extend((value, weight) for value in items)
+        if not weighted:
+            return None
+        weighted.sort()
+        total = sum(weight for _, weight in weighted)
+        target = q * total
+        running = 0
+        for value, weight in weighted:
+            running += weight
+            if running >= target:
+                return value
+        return weighted[-1][0]
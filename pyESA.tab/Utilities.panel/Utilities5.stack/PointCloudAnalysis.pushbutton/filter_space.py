@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Which space PointCloudInstance.GetPoints applies its filter in
+(no Revit API imports).
+
+The Revit API does not say whether the planes of a point cloud filter
+are read in model or in cloud coordinates. The same box is probed in
+both spaces around a few faces; each face votes for the space that
+returned more points and the majority wins (model space on a tie). The
+decision is stored in a local JSON keyed by point cloud type, Revit
+version and transform class, so later runs do not probe at all.
+"""
+
+import io
+import json
+import os
+
+
+CACHE_VERSION = 1
+
+SPACE_MODEL = 'model'
+SPACE_CLOUD = 'cloud'
+
+# Faces probed when there is no cache entry
+MAX_PROBE_FACES = 5
+
+_EPS = 1e-9
+
+
+def transform_class(origin, basis_x, basis_y, basis_z):
+    """'identity', 'translation', 'rotation_z' (plan rotation, any
+    translation) or 'general', from (x, y, z) tuples."""
+    if (_close(basis_x, (1, 0, 0)) and _close(basis_y, (0, 1, 0))
+            and _close(basis_z, (0, 0, 1))):
+        if _close(origin, (0, 0, 0)):
+            return 'identity'
+        return 'translation'
+    if _close(basis_z, (0, 0, 1)):
+        return 'rotation_z'
+    return 'general'
+
+
+def _close(a, b):
+    return all(abs(x - y) <= _EPS for x, y in zip(a, b))
+
+
+def vote(probes):
+    """Majority of (count_model, count_cloud) probes. Return the space
+    and the votes as {space: n}; faces with equal counts abstain."""
+    votes = {SPACE_MODEL: 0, SPACE_CLOUD: 0}
+    for count_model, count_cloud in probes:
+        if count_cloud > count_model:
+            votes[SPACE_CLOUD] += 1
+        elif count_model > count_cloud:
+            votes[SPACE_MODEL] += 1
+    if votes[SPACE_CLOUD] > votes[SPACE_MODEL]:
+        return SPACE_CLOUD, votes
+    return SPACE_MODEL, votes
+
+
+def probe_faces(faces, probe, max_faces=MAX_PROBE_FACES):
+    """Probe up to max_faces faces, evenly spaced over the list.
+    probe(face) returns (count_model, count_cloud), or None if the face
+    cannot be probed. Return the list of (face index, counts)."""
+    count = min(max_faces, len(faces))
+    results = []
+    for index in [k * len(faces) // count for k in range(count)]:
+        counts = probe(faces[index])
+        if counts is not None:
+            results.append((index, counts))
+    return results
+
+
+class Detection(object):
+    """Outcome of detect(): the space, whether it came from the cache,
+    and the probes (face index, (count_model, count_cloud)) if any."""
+
+    def __init__(self, space, cached, probes=None, votes=None):
+        self.space = space
+        self.cached = cached
+        self.probes = probes or []
+        self.votes = votes or {}
+
+
+def detect(cache, key, faces, probe, max_faces=MAX_PROBE_FACES):
+    """Cached space for the key, or the majority vote of the probes
+    (stored in the cache only if at least one face voted)."""
+    space = cache.get(key)
+    if space is not None:
+        return Detection(space, True)
+    probes = probe_faces(faces, probe, max_faces)
+    space, votes = vote([counts for _, counts in probes])
+    if votes[SPACE_MODEL] or votes[SPACE_CLOUD]:
+        cache.store(key, space, votes)
+    return Detection(space, False, probes, votes)
+
+
+class FilterSpaceCache(object):
+    """Local JSON of the detected spaces:
+    {'version': 1, 'spaces': {key: {'space': ..., 'votes': {...}}}}"""
+
+    def __init__(self, path):
+        self.path = path
+        self._spaces = None
+
+    @staticmethod
+    def key(cloud_type, revit_version, xform_class):
+        return u'{0}|{1}|{2}'.format(cloud_type, revit_version, xform_class)
+
+    @property
+    def spaces(self):
+        if self._spaces is None:
+            self._spaces = self._load()
+        return self._spaces
+
+    def _load(self):
+        """Return the stored spaces, or an empty dict if the file is missing or corrupted."""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with io.open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+            return {}
+        spaces = data.get('spaces')
+        return spaces if isinstance(spaces, dict) else {}
+
+    def get(self, key):
+        entry = self.spaces.get(key)
+        if not isinstance(entry, dict):
+            return None
+        space = entry.get('space')
+        if space not in (SPACE_MODEL, SPACE_CLOUD):
+            return None
+        return space
+
+    def store(self, key, space, votes):
+        self.spaces[key] = {'space': space, 'votes': votes}
+        try:
+            self.save()
+        except (IOError, OSError):
+            pass
+
+    def save(self):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        # Write to a temporary file first, so a crash never leaves half a JSON
+        tmp_path = self.path + '.tmp'
+        text = json.dumps({'version': CACHE_VERSION, 'spaces': self.spaces},
+                          indent=2, sort_keys=True)
+        if isinstance(text, bytes):
+            text = text.decode('utf-8')
+        with io.open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(tmp_path, self.path)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Worker threads for the point-to-cell reduction of PointCloudAnalysis
+(no Revit API imports).
+
+The Revit API thread only queries the cloud and copies coordinates into
+plain arrays of doubles; mapping to (u, v, distance), binning and the
+per-cell statistics of each tile run on worker threads. IronPython has
+no GIL, so the workers run truly in parallel there (under CPython they
+still work, just without the speedup). Results are collected in
+submission order, so the output does not depend on thread timing. With
+one worker everything runs inline on the calling thread.
+"""
+
+import array
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+import cloud_sampling
+import cloud_stats
+import sample_cache
+
+
+# Smaller tiles when reducing in parallel, so a face gives the workers
+# more than one job
+PARALLEL_TILE_POINTS = 200000
+
+
+def default_workers():
+    try:
+        import multiprocessing
+        return max(1, multiprocessing.cpu_count() - 1)
+    except (ImportError, NotImplementedError):
+        return 1
+
+
+def copy_points(cloud_points):
+    """Copy the X, Y, Z of the cloud points into three arrays of doubles."""
+    xs = array.array('d')
+    ys = array.array('d')
+    zs = array.array('d')
+    for point in cloud_points:
+        xs.append(point.X)
+        ys.append(point.Y)
+        zs.append(point.Z)
+    return xs, ys, zs
+
+
+def reduce_tile(cells, tile, samples, tolerance, record=False):
+    """Bin the (u, v, distance) samples of a tile and return
+    ({cell: CellStats}, SampleRecorder or None)."""
+    accumulators = cloud_stats.CellAccumulators(tolerance)
+    recorder = sample_cache.SampleRecorder() if record else None
+    cloud_sampling.bin_tile(cells, tile, samples, accumulators, recorder)
+    return accumulators.cells, recorder
+
+
+class Job(object):
+    """Result of a submitted call, available through result()."""
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+
+    def run(self):
+        try:
+            self._value = self.func(*self.args)
+        except Exception as error:
+            self._error = error
+        self._done.set()
+
+    def result(self):
+        """Wait for the call and return its value (or raise its error)."""
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class ReductionPool(object):
+    """Fixed set of daemon worker threads fed from a queue. With
+    workers <= 1 submit() runs the call at once (serial fallback)."""
+
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = default_workers()
+        self.workers = max(1, workers)
+        self._queue = None
+        self._threads = []
+        if self.workers > 1:
+            self._queue = queue.Queue()
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._work)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    @property
+    def parallel(self):
+        return self._queue is not None
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.run()
+
+    def submit(self, func, *args):
+        job = Job(func, args)
+        if self._queue is None:
+            job.run()
+        else:
+            self._queue.put(job)
+        return job
+
+    def close(self):
+        """Stop the workers once the queued jobs are done."""
+        if self._queue is None:
+            return
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._queue = None
+        self._threads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
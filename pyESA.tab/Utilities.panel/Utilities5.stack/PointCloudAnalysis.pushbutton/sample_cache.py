@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""On-disk cache of sampled cloud points for PointCloudAnalysis
+(no Revit API imports).
+
+For every analyzed face the (u, v, signed distance) of the cloud points
+in the +/-offset slab are stored in one file: a small JSON header, then
+the three arrays of doubles compressed with zlib. The file name is the
+SHA-1 of the key parts (cloud type, cloud file mtime, transform, face,
+quality), so a rerun that only changes grid size, tolerance or gradient
+finds the points without querying the cloud, as long as the cells of
+the new grid stay within the UV bounds the entry was recorded over. The
+folder is kept under
+max_bytes by deleting the least recently used files.
+"""
+
+import array
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+
+
+PY2 = sys.version_info[0] == 2
+
+CACHE_VERSION = 1
+MAGIC = b'PCAC'
+_HEADER = struct.Struct('<4sI')
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Faces with more sampled points than this are not cached (memory)
+MAX_FACE_POINTS = 4000000
+
+
+def cache_key(*parts):
+    """SHA-1 of the key parts (any values with a stable str())."""
+    sha = hashlib.sha1()
+    for part in (CACHE_VERSION,) + parts:
+        sha.update(u'{0}\x1f'.format(part).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def _to_bytes(values):
+    if sys.byteorder != 'little':
+        values = array.array('d', values)
+        values.byteswap()
+    if PY2:
+        return values.tostring()
+    return values.tobytes()
+
+
+def _from_bytes(data):
+    values = array.array('d')
+    if PY2:
+        values.fromstring(data)
+    else:
+        values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+class SampleRecorder(object):
+    """Collects (u, v, distance) samples in three arrays of doubles.
+    Stops collecting (overflow) past max_points."""
+
+    def __init__(self, max_points=MAX_FACE_POINTS):
+        self.max_points = max_points
+        self.u = array.array('d')
+        self.v = array.array('d')
+        self.d = array.array('d')
+        self.overflow = False
+
+    def __len__(self):
+        return len(self.d)
+
+    def add(self, u, v, distance):
+        if self.overflow:
+            return
+        if len(self.d) >= self.max_points:
+            self.overflow = True
+            self.u = self.v = self.d = array.array('d')
+            return
+        self.u.append(u)
+        self.v.append(v)
+        self.d.append(distance)
+
+    def extend(self, other):
+        """Append the samples of another recorder (None is ignored)."""
+        if other is None or self.overflow:
+            return
+        if other.overflow or len(self) + len(other) > self.max_points:
+            self.overflow = True
+            self.u = self.v = self.d = array.array('d')
+            return
+        self.u.extend(other.u)
+        self.v.extend(other.v)
+        self.d.extend(other.d)
+
+
+class CacheEntry(object):
+    """Samples of one face plus the settings they were taken with."""
+
+    def __init__(self, meta, u, v, d):
+        self.meta = meta
+        self.u = u
+        self.v = v
+        self.d = d
+
+    def covers(self, offset, avg_dist, bounds=None):
+        """True if the entry was sampled at least as deep and as dense,
+        and over the UV bounds (u0, u1, v0, v1) if given: the recording
+        run only kept the samples of its own grid cells."""
+        if not (self.meta.get('offset', 0.0) >= offset * (1.0 - 1e-9)
+                and self.meta.get('avg_dist', float('inf'))
+                <= avg_dist * (1.0 + 1e-9)):
+            return False
+        if bounds is None:
+            return True
+        stored = self.meta.get('bounds')
+        if stored is None:
+            return False
+        u0, u1, v0, v1 = bounds
+        slack = 1e-9 * max(1.0, u1 - u0, v1 - v0)
+        return (stored[0] <= u0 + slack and stored[1] >= u1 - slack
+                and stored[2] <= v0 + slack and stored[3] >= v1 - slack)
+
+    def samples(self, offset):
+        """Yield the (u, v, distance) samples within +/-offset."""
+        for u, v, d in zip(self.u, self.v, self.d):
+            if -offset <= d <= offset:
+                yield u, v, d
+
+
+class SampleCache(object):
+    """Folder of cached faces with size-bounded LRU eviction (by file
+    access time, refreshed on every hit)."""
+
+    def __init__(self, folder, max_bytes=DEFAULT_MAX_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.folder, key + '.pcac')
+
+    def load(self, key):
+        """Return the CacheEntry of the key, None if missing or unreadable."""
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            magic, meta_len = _HEADER.unpack_from(data, 0)
+            if magic != MAGIC:
+                return None
+            start = _HEADER.size
+            meta = json.loads(data[start:start + meta_len].decode('utf-8'))
+            payload = zlib.decompress(data[start + meta_len:])
+            count = meta['count']
+            size = count * 8
+            if len(payload) != 3 * size:
+                return None
+            entry = CacheEntry(
+                meta,
+                _from_bytes(payload[:size]),
+                _from_bytes(payload[size:2 * size]),
+                _from_bytes(payload[2 * size:]))
+        except (IOError, OSError, ValueError, KeyError, struct.error,
+                zlib.error):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry
+
+    def store(self, key, recorder, **meta):
+        """Write the recorded samples of a face, then evict old files.
+        Return False if the recorder overflowed or the write failed."""
+        if recorder.overflow:
+            return False
+        meta = dict(meta, count=len(recorder), version=CACHE_VERSION)
+        meta_bytes = json.dumps(meta, sort_keys=True).encode('utf-8')
+        payload = zlib.compress(
+            _to_bytes(recorder.u) + _to_bytes(recorder.v)
+            + _to_bytes(recorder.d), 6)
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        try:
+            if not os.path.isdir(self.folder):
+                os.makedirs(self.folder)
+            with open(tmp_path, 'wb') as f:
+                f.write(_HEADER.pack(MAGIC, len(meta_bytes)))
+                f.write(meta_bytes)
+                f.write(payload)
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            return False
+        self.evict(keep=path)
+        return True
+
+    def evict(self, keep=None):
+        """Delete the least recently used files until the folder is
+        under max_bytes (the file just written is never deleted)."""
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return
+        files = []
+        total = 0
+        for name in names:
+            if not name.endswith('.pcac'):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((max(stat.st_atime, stat.st_mtime), path,
+                          stat.st_size))
+            total += stat.st_size
+        files.sort()
+        for _, path, size in files:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
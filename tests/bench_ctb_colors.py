@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Colour matching of DwgToRevit on 10k layer subcategories: a linear scan of
+the CTB in CIELAB for every colour against ColorMatcher (exact lookup,
+then the grid of CTB colours and the per-colour cache), and the
+deduplication of the subcategories shared by several DWGs.
+
+    python -m tests.bench_ctb_colors [subcategories]
+"""
+
+import collections
+import random
+import sys
+import time
+
+from tests import conftest  # noqa: F401 (puts the script folders on sys.path)
+from tests.test_ctb_colors import brute_force, ctb_colors_rgb
+
+import ctb_colors
+
+
+SubCategory = collections.namedtuple('SubCategory', 'Id Name')
+
+
+def timed(function, *args):
+    start = time.time()
+    result = function(*args)
+    return result, time.time() - start
+
+
+def main(argv):
+    count = int(float(argv[1])) if len(argv) > 1 else 10000
+    rng = random.Random(0)
+    ctb = ctb_colors_rgb()
+    # Layers mostly use CTB colours, some arbitrary RGB ones (often repeated)
+    custom = [[rng.randrange(256) for _ in range(3)] for _ in range(count // 20)]
+    colors = [list(rng.choice(ctb)) if rng.random() < 0.7 else list(rng.choice(custom))
+              for _ in range(count)]
+    # The same layer subcategories come back from several DWGs
+    sub_cats = [SubCategory(rng.randrange(int(count * 0.8)), 'Layer') for _ in range(count)]
+
+    scan, t_scan = timed(lambda: [brute_force(ctb, rgb) for rgb in colors])
+    matched, t_matcher = timed(lambda: ctb_colors.ColorMatcher(ctb).match_all(colors))
+    unique, t_unique = timed(ctb_colors.unique_by_id, sub_cats, lambda sc: sc.Id)
+    assert matched == scan
+
+    print('{0} subcategories, {1} CTB rows'.format(count, len(ctb)))
+    print('{0:<26}{1:>12}'.format('step', 'time [s]'))
+    for label, elapsed in (('linear Lab scan', t_scan), ('ColorMatcher', t_matcher),
+                           ('unique_by_id ({0} kept)'.format(len(unique)), t_unique)):
+        print('{0:<26}{1:>12.3f}'.format(label, elapsed))
+    print('not found: {0}'.format(sum(1 for index in matched if index is None)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
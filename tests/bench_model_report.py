@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Model Report chapter 06: list.index classification vs dictionary.
+
+    python -m tests.bench_model_report [warnings]
+"""
+import random
+import sys
+import time
+
+from tests import conftest  # noqa: F401 (puts the script folders on sys.path)
+
+import model_report
+
+from tests.test_model_report import Warning, level_of, old_classify, synthetic
+
+
+def timed(function, *args):
+    start = time.time()
+    result = function(*args)
+    return result, time.time() - start
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 20000
+    rows, warnings = synthetic(random.Random(1), count)
+    # ClassifiedWarnings.csv size: a few hundred descriptions
+    rows += [['Extra {}'.format(i), '03_Low'] for i in range(400)]
+
+    Warning.calls = 0
+    old, old_time = timed(old_classify, warnings, rows, level_of)
+    old_calls = Warning.calls
+    Warning.calls = 0
+    new, new_time = timed(
+        lambda: model_report.classify_warnings(
+            warnings, model_report.warning_classes(rows), level_of))
+    assert new == old
+    print('{} warnings, {} classified descriptions'.format(count, len(rows)))
+    print('list.index : {:.3f}s, {} API calls'.format(old_time, old_calls))
+    print('dictionary : {:.3f}s, {} API calls'.format(new_time, Warning.calls))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
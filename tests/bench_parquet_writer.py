@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Size and time of the QuantityTakeoff export written as CSV (csv module,
+as QtoCsvWriter) and as Parquet (parquet_writer), on synthetic
+quantity-takeoff rows. The read column times pyarrow when it is installed.
+
+    python -m tests.bench_parquet_writer [rows]
+"""
+
+import csv
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from tests import conftest  # noqa: F401 (puts the script folders on sys.path)
+
+import parquet_writer
+from parquet_writer import TYPE_DOUBLE, TYPE_INT64, TYPE_STRING
+
+try:
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa_csv = pq = None
+
+
+COLUMNS = [('ElementId', TYPE_INT64), ('Category', TYPE_STRING),
+           ('Family', TYPE_STRING), ('Type', TYPE_STRING),
+           ('Level', TYPE_STRING), ('Length', TYPE_DOUBLE),
+           ('Area', TYPE_DOUBLE), ('Volume', TYPE_DOUBLE),
+           ('Count', TYPE_INT64), ('Comments', TYPE_STRING)]
+
+
+def qto_rows(count, rng):
+    categories = ['Walls', 'Floors', 'Structural Columns', 'Doors', 'Windows']
+    levels = ['Level {0:02d}'.format(i) for i in range(12)]
+    for index in range(count):
+        category = categories[index % len(categories)]
+        family = '{0} family {1}'.format(category, rng.randrange(8))
+        yield [100000 + index, category, family,
+               '{0} - type {1}'.format(family, rng.randrange(25)),
+               rng.choice(levels),
+               round(rng.uniform(0.5, 30.0), 4),
+               round(rng.uniform(0.1, 120.0), 4),
+               None if category in ('Doors', 'Windows') else round(rng.uniform(0.01, 40.0), 4),
+               1, rng.choice(['', '', '', 'to check'])]
+
+
+def write_csv(path, rows):
+    with io.open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow([name for name, _ in COLUMNS])
+        for row in rows:
+            writer.writerow(['' if v is None else v for v in row])
+
+
+def write_parquet(path, rows):
+    with parquet_writer.ParquetWriter(path, COLUMNS) as writer:
+        for row in rows:
+            writer.write_values(row)
+
+
+def timed(function, *args):
+    start = time.time()
+    function(*args)
+    return time.time() - start
+
+
+def main(argv):
+    count = int(float(argv[1])) if len(argv) > 1 else 200000
+    folder = tempfile.mkdtemp()
+    try:
+        results = []
+        for label, writer, reader in (
+                ('CSV', write_csv,
+                 pa_csv and (lambda p: pa_csv.read_csv(
+                     p, parse_options=pa_csv.ParseOptions(delimiter=';')))),
+                ('Parquet', write_parquet, pq and pq.read_table)):
+            path = os.path.join(folder, 'qto.' + label.lower())
+            t_write = timed(writer, path, qto_rows(count, random.Random(0)))
+            t_read = timed(reader, path) if reader else None
+            results.append((label, os.path.getsize(path), t_write, t_read))
+    finally:
+        shutil.rmtree(folder)
+
+    print('{0} rows'.format(count))
+    print('{0:<10}{1:>12}{2:>8}{3:>12}{4:>12}'.format(
+        'format', 'size [MB]', 'ratio', 'write [s]', 'read [s]'))
+    csv_size = results[0][1]
+    for label, size, t_write, t_read in results:
+        print('{0:<10}{1:>12.1f}{2:>8.2f}{3:>12.2f}{4:>12}'.format(
+            label, size / 1e6, float(size) / csv_size, t_write,
+            '-' if t_read is None else '{0:.2f}'.format(t_read)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
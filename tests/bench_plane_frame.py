@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput of the planar-face sampling of PointCloudAnalysis on the fake
+Revit API: PlaneFrame against the Transform.OfPoint + Face.Project +
+ComputeNormal path, and point_in_loops / boundary_cells on a face with
+openings. The fake API is pure Python, so the API column is a lower bound
+of the Revit cost per point.
+
+    python -m tests.bench_plane_frame [points]
+"""
+
+import math
+import random
+import sys
+import time
+
+from tests import conftest  # noqa: F401 (puts the script folders on sys.path)
+from tests import point_cloud_fakes as fakes
+
+import cloud_sampling
+
+
+def timed(function, *args):
+    start = time.time()
+    result = function(*args)
+    return result, time.time() - start
+
+
+def main(argv):
+    count = int(float(argv[1])) if len(argv) > 1 else 200000
+    pca = fakes.load_script()
+    rng = random.Random(0)
+    face = fakes.PlanarFace((120.0, -35.0, 4.0), (math.cos(0.7), math.sin(0.7), 0.0),
+                            (0.0, 0.0, 1.0), 40.0, 10.0,
+                            holes=[(4, 8, 0, 7), (20, 26, 3, 7)])
+    transform = fakes.Transform.rotation_z(0.52, (25.0, -4.0, 1.2))
+    inverse = transform.Inverse
+    points = [inverse.OfPoint(face.point(rng.uniform(0.0, 40.0),
+                                         rng.uniform(0.0, 10.0),
+                                         rng.gauss(0.0, 0.05)))
+              for _ in range(count)]
+    xs = [p.X for p in points]
+    ys = [p.Y for p in points]
+    zs = [p.Z for p in points]
+
+    frame = pca.plane_frame(face, transform)
+    fast, t_frame = timed(lambda: list(frame.samples(xs, ys, zs, 0.3)))
+    slow, t_api = timed(lambda: list(pca.face_samples(face, transform, points, 0.3)))
+    by_uv = dict(((round(u, 6), round(v, 6)), d) for u, v, d in fast)
+    max_error = max(abs(by_uv[(round(u, 6), round(v, 6))] - d) for u, v, d in slow)
+
+    loops = [[(uv.U, uv.V) for uv in edge.TessellateOnFace(face)]
+             for loop in face.EdgeLoops for edge in loop]
+    _, t_loops = timed(lambda: [cloud_sampling.point_in_loops(u, v, loops)
+                                for u, v, _ in fast])
+    cells = cloud_sampling.CellGrid(0.0, 40.0, 0.0, 10.0, 0.1)
+    marked, t_cells = timed(cloud_sampling.boundary_cells, cells, loops)
+
+    print('{0:<28}{1:>12}{2:>20}'.format('step', 'time [s]', 'points / s'))
+    for label, elapsed, n in (('Project + ComputeNormal', t_api, count),
+                              ('PlaneFrame.samples', t_frame, count),
+                              ('point_in_loops', t_loops, len(fast))):
+        print('{0:<28}{1:>12.3f}{2:>20.0f}'.format(label, elapsed, n / elapsed))
+    print('{0:<28}{1:>12.3f}{2:>20}'.format(
+        'boundary_cells', t_cells, '{0}/{1} cells'.format(
+            len(marked), cells.nu * cells.nv)))
+    print('max |d| difference: {0:.2e} over {1} points'.format(max_error, len(slow)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
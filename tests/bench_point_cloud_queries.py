@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Point cloud queries of PointCloudAnalysis on the fake Revit API: the
+number of GetPoints calls made per face by the tiled sampling, against
+the one query per cell on the face the per-cell sampling made.
+
+    python -m tests.bench_point_cloud_queries [points per face]
+"""
+
+import math
+import random
+import sys
+import time
+
+from tests import conftest  # noqa: F401 (puts the script folders on sys.path)
+from tests import point_cloud_fakes as fakes
+
+import reduction_pool
+
+
+def scenarios():
+    """(label, face, grid in metres) of the benchmark."""
+    wall = fakes.PlanarFace((0, 0, 0), (1, 0, 0), (0, 0, 1), 40.0, 10.0)
+    openings = fakes.PlanarFace((0, 0, 0), (1, 0, 0), (0, 0, 1), 40.0, 10.0,
+                                holes=[(4, 8, 0, 7), (20, 26, 3, 7)])
+    column = fakes.CylindricalFace(
+        1.5, 2.0 * math.pi, 10.0, fakes.Transform.rotation_z(0.3))
+    return [
+        ('wall 40x10 ft', wall, 0.3),
+        ('wall 40x10 ft', wall, 0.1),
+        ('wall + openings', openings, 0.1),
+        ('column r 1.5 ft', column, 0.1),
+    ]
+
+
+def face_cloud(face, count, rng):
+    bb = face.GetBoundingBox()
+    points = []
+    while len(points) < count:
+        uv = fakes.UV(rng.uniform(bb.Min.U, bb.Max.U),
+                      rng.uniform(bb.Min.V, bb.Max.V))
+        if face.IsInside(uv):
+            points.append(tuple(face.point(uv.U, uv.V, rng.gauss(0.0, 0.01))))
+    return fakes.cloud_from_model(points, spacing=0.05)
+
+
+def main(argv):
+    count = int(float(argv[1])) if len(argv) > 1 else 20000
+    pca = fakes.load_script()
+    rng = random.Random(0)
+    # The per-cell sampling made one query per cell on the face
+    print('{0:<18}{1:>9}{2:>18}{3:>15}{4:>10}'.format(
+        'face', 'grid [m]', 'per-cell queries', 'tiled queries', 'time [s]'))
+    for label, face, grid_m in scenarios():
+        cloud = face_cloud(face, count, rng)
+        grid = pca.meters_to_internal(grid_m)
+        start = time.time()
+        with reduction_pool.ReductionPool(1) as pool:
+            result = pca.analyze_face(
+                cloud, cloud.GetTotalTransform(), None, face, grid,
+                pca.meters_to_internal(0.1), 'high', 0.05, pool)
+        elapsed = time.time() - start
+        print('{0:<18}{1:>9g}{2:>18}{3:>15}{4:>10.2f}'.format(
+            label, grid_m, result[4], result[6], elapsed))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
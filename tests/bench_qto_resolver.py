@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+get_Parameter calls and time of the geometric quantities of QuantityTakeoff
+on the fake Revit API: get_geometric_value over the whole candidate lists
+against the GeometricResolver plans, on a model whose instances share the
+parameter set of their (category, type) pair and on one where a share of
+them has another set (resolved one by one).
+
+    python -m tests.bench_qto_resolver [elements]
+"""
+
+import random
+import sys
+import time
+
+from tests import conftest  # noqa: F401 (puts the script folders on sys.path)
+from tests import qto_fakes as fakes
+
+
+def build_model(params_map, count, mixed_share, rng):
+    """Document with 'count' instances over 40 types of 8 categories."""
+    doc = fakes.Document()
+    pairs = []
+    for index in range(40):
+        category = fakes.Category(index % 8 + 1, 'Category {0}'.format(index % 8))
+        # One or two existing candidates per quantity, often not the first
+        params = {}
+        for bps in params_map.values():
+            for bp in rng.sample(bps, min(len(bps), rng.choice([1, 2]))):
+                params[bp] = rng.choice([0.0, rng.uniform(0.1, 30.0)])
+        pairs.append((category, doc.add_type(100 + index, category), params))
+    elements = []
+    for index in range(count):
+        category, elem_type, params = pairs[index % len(pairs)]
+        params = dict(params)
+        if index >= len(pairs) and rng.random() < mixed_share:
+            params.pop(rng.choice(sorted(params)))
+        elements.append(doc.add_instance(10000 + index, category, elem_type, params=params))
+    return doc, elements
+
+
+def measure(doc, elements, resolve):
+    doc.parameter_reads = 0
+    start = time.time()
+    for element in elements:
+        resolve(element, doc.GetElement(element.GetTypeId()))
+    return doc.parameter_reads, time.time() - start
+
+
+def main(argv):
+    count = int(float(argv[1])) if len(argv) > 1 else 100000
+    qto = fakes.load_script()
+    params_map = qto.build_geometric_params_map()
+    print('{0:<14}{1:<14}{2:>16}{3:>12}{4:>10}'.format(
+        'model', 'path', 'get_Parameter', 'per elem', 'time [s]'))
+    for label, mixed_share in (('same sets', 0.0), ('10% differ', 0.1)):
+        doc, elements = build_model(params_map, count, mixed_share, random.Random(0))
+        resolver = qto.GeometricResolver(params_map)
+        for path, resolve in (
+                ('candidates', lambda e, t: qto.extract_geometric_data(e, t, params_map)),
+                ('resolver', resolver.resolve)):
+            reads, elapsed = measure(doc, elements, resolve)
+            print('{0:<14}{1:<14}{2:>16}{3:>12.1f}{4:>10.2f}'.format(
+                label, path, reads, float(reads) / count, elapsed))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
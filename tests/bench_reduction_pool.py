@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Speedup of the tile reduction of PointCloudAnalysis (binning and
+CellStats on worker threads) against one thread. Only pure modules are
+imported, so it also runs under IronPython, which has no GIL: that is
+where the speedup shows. Under CPython the workers share the GIL and the
+ratio stays near 1.
+
+    python -m tests.bench_reduction_pool [points] [workers ...]
+    ipy -m tests.bench_reduction_pool [points] [workers ...]
+"""
+
+import random
+import sys
+import time
+
+from tests import conftest  # noqa: F401 (puts the script folders on sys.path)
+
+import cloud_sampling
+import reduction_pool
+
+
+def tile_jobs(count, rng, grid=0.1,
+              point_cap=reduction_pool.PARALLEL_TILE_POINTS):
+    """(cells, [(tile, samples)]) of a 40 x 10 face with count samples,
+    each tile holding the samples its own query would return."""
+    cells = cloud_sampling.CellGrid(0.0, 40.0, 0.0, 10.0, grid)
+    per_cell = float(count) / (cells.nu * cells.nv)
+    tiles = cloud_sampling.plan_tiles(cells.nu, cells.nv, per_cell, point_cap)
+    samples = dict((tile, []) for tile in tiles)
+    index = {}
+    for tile in tiles:
+        i0, i1, j0, j1 = tile
+        for i in range(i0, i1):
+            for j in range(j0, j1):
+                index[(i, j)] = tile
+    for _ in range(count):
+        u, v = rng.uniform(0.0, 40.0), rng.uniform(0.0, 10.0)
+        cell = cells.index(u, v)
+        if cell is not None:
+            samples[index[cell]].append((u, v, rng.gauss(0.0, 0.01)))
+    return cells, [(tile, samples[tile]) for tile in tiles]
+
+
+def run(workers, cells, jobs):
+    start = time.time()
+    summaries = {}
+    with reduction_pool.ReductionPool(workers) as pool:
+        pending = [pool.submit(reduction_pool.reduce_tile, cells, tile,
+                               samples, 0.02)
+                   for tile, samples in jobs]
+        for job in pending:
+            summaries.update(job.result()[0])
+    return time.time() - start, summaries
+
+
+def main(argv):
+    count = int(float(argv[1])) if len(argv) > 1 else 1000000
+    workers = [int(w) for w in argv[2:]] or [1, 2, 4,
+                                             reduction_pool.default_workers()]
+    cells, jobs = tile_jobs(count, random.Random(0))
+    print('{0} samples, {1} tiles, {2} cells'.format(
+        count, len(jobs), cells.nu * cells.nv))
+    print('{0:>8}{1:>12}{2:>10}'.format('workers', 'time [s]', 'speedup'))
+    serial = None
+    reference = None
+    # The first run (one worker) is the reference
+    for n in sorted(set(workers) | set([1])):
+        elapsed, summaries = run(n, cells, jobs)
+        if serial is None:
+            serial, reference = elapsed, summaries
+        same = all(summaries[c].mean == reference[c].mean
+                   and summaries[c].count == reference[c].count
+                   for c in reference) and len(summaries) == len(reference)
+        print('{0:>8}{1:>12.2f}{2:>10.2f}{3}'.format(
+            n, elapsed, serial / elapsed, '' if same else '  (DIFFERENT)'))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
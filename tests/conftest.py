@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the pure-Python helpers of the extension (the modules without
+Revit API imports). Run from the repository root with: python -m pytest
+"""
+
+import os
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Folders whose modules are imported by the tests, as pyRevit puts them
+# on sys.path when a script runs
+MODULE_FOLDERS = (
+    'lib',
+    'pyESA.tab/Coordination.panel/Coordination1.stack/ModelCleanup.pushbutton',
+    'pyESA.tab/Coordination.panel/ModelReport.pushbutton',
+    'pyESA.tab/Import-Export.panel/DwgToRevit.pushbutton',
+    'pyESA.tab/Import-Export.panel/ExportSchedules.pushbutton',
+    'pyESA.tab/Import-Export.panel/IfcExport.pushbutton',
+    'pyESA.tab/Import-Export.panel/QuantityTakeoff.pushbutton',
+    'pyESA.tab/Utilities.panel/Utilities5.stack/PointCloudAnalysis.pushbutton',
+)
+
+for folder in MODULE_FOLDERS:
+    path = os.path.join(ROOT, *folder.split('/'))
+    if path not in sys.path:
+        sys.path.insert(0, path)
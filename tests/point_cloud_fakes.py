@@ -0,0 +1,585 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal stand-ins for the Revit API used by PointCloudAnalysis, so that
+the script can be imported and its analysis functions run with CPython.
+
+Only what the script touches is modelled: XYZ, UV, Plane, Transform,
+planar and cylindrical faces (parametrised like Revit's: UV in internal
+units, unit tangents) and a PointCloudInstance whose GetPoints applies a
+multi-plane filter (a point passes when it is on the positive side of
+every plane), either in model or in cloud coordinates, thins the points
+with the average distance and stops at the point cap.
+
+    script = point_cloud_fakes.load_script()
+"""
+
+import importlib.util
+import math
+import os
+import sys
+import tempfile
+import types
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_PATH = os.path.join(
+    ROOT, 'pyESA.tab', 'Utilities.panel', 'Utilities5.stack',
+    'PointCloudAnalysis.pushbutton', 'PointCloudAnalysis_script.py')
+
+FEET_PER_METER = 1.0 / 0.3048
+
+
+# =============================================================================
+# GEOMETRY
+# =============================================================================
+
+class XYZ(object):
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.X, self.Y, self.Z = float(x), float(y), float(z)
+
+    def __iter__(self):
+        return iter((self.X, self.Y, self.Z))
+
+    def __getitem__(self, index):
+        return (self.X, self.Y, self.Z)[index]
+
+    def __repr__(self):
+        return 'XYZ({0:.6g}, {1:.6g}, {2:.6g})'.format(self.X, self.Y, self.Z)
+
+    def Add(self, other):
+        return XYZ(self.X + other.X, self.Y + other.Y, self.Z + other.Z)
+
+    def Subtract(self, other):
+        return XYZ(self.X - other.X, self.Y - other.Y, self.Z - other.Z)
+
+    def Multiply(self, factor):
+        return XYZ(self.X * factor, self.Y * factor, self.Z * factor)
+
+    def Negate(self):
+        return XYZ(-self.X, -self.Y, -self.Z)
+
+    def DotProduct(self, other):
+        return self.X * other.X + self.Y * other.Y + self.Z * other.Z
+
+    def CrossProduct(self, other):
+        return XYZ(self.Y * other.Z - self.Z * other.Y,
+                   self.Z * other.X - self.X * other.Z,
+                   self.X * other.Y - self.Y * other.X)
+
+    def GetLength(self):
+        return math.sqrt(self.DotProduct(self))
+
+    def Normalize(self):
+        return self.Multiply(1.0 / self.GetLength())
+
+
+XYZ.Zero = XYZ(0, 0, 0)
+XYZ.BasisX = XYZ(1, 0, 0)
+XYZ.BasisY = XYZ(0, 1, 0)
+XYZ.BasisZ = XYZ(0, 0, 1)
+
+
+class UV(object):
+
+    def __init__(self, u=0.0, v=0.0):
+        self.U, self.V = float(u), float(v)
+
+
+class BoundingBoxUV(object):
+
+    def __init__(self, u_min, v_min, u_max, v_max):
+        self.Min = UV(u_min, v_min)
+        self.Max = UV(u_max, v_max)
+
+
+class Plane(object):
+
+    def __init__(self, normal, origin):
+        self.Normal = normal
+        self.Origin = origin
+
+    @staticmethod
+    def CreateByNormalAndOrigin(normal, origin):
+        return Plane(normal.Normalize(), origin)
+
+
+class Transform(object):
+    """Rigid transform: basis vectors (columns) and origin."""
+
+    def __init__(self, basis_x=None, basis_y=None, basis_z=None, origin=None):
+        self.BasisX = basis_x or XYZ.BasisX
+        self.BasisY = basis_y or XYZ.BasisY
+        self.BasisZ = basis_z or XYZ.BasisZ
+        self.Origin = origin or XYZ.Zero
+
+    @classmethod
+    def rotation_z(cls, angle, origin=(0.0, 0.0, 0.0)):
+        c, s = math.cos(angle), math.sin(angle)
+        return cls(XYZ(c, s, 0), XYZ(-s, c, 0), XYZ(0, 0, 1), XYZ(*origin))
+
+    @property
+    def IsIdentity(self):
+        return all(abs(a - b) < 1e-12 for a, b in zip(
+            tuple(self.BasisX) + tuple(self.BasisY) + tuple(self.BasisZ)
+            + tuple(self.Origin), (1, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0)))
+
+    def OfVector(self, v):
+        return XYZ(*[self.BasisX[k] * v.X + self.BasisY[k] * v.Y
+                     + self.BasisZ[k] * v.Z for k in range(3)])
+
+    def OfPoint(self, p):
+        return self.OfVector(p).Add(self.Origin)
+
+    @property
+    def Inverse(self):
+        # Rotation part is orthonormal: the inverse is its transpose
+        bx, by, bz = self.BasisX, self.BasisY, self.BasisZ
+        inverse = Transform(XYZ(bx.X, by.X, bz.X), XYZ(bx.Y, by.Y, bz.Y),
+                            XYZ(bx.Z, by.Z, bz.Z))
+        inverse.Origin = inverse.OfVector(self.Origin).Negate()
+        return inverse
+
+
+class IntersectionResult(object):
+
+    def __init__(self, uv, point):
+        self.UVPoint = uv
+        self.XYZPoint = point
+
+
+class _Edge(object):
+
+    def __init__(self, uvs):
+        self._uvs = uvs
+
+    def TessellateOnFace(self, face):
+        return [UV(u, v) for u, v in self._uvs]
+
+
+class Face(object):
+    pass
+
+
+class PlanarFace(Face):
+    """Rectangle [0, width] x [0, height] of the plane through origin
+    spanned by the orthonormal x_axis and y_axis, with rectangular holes
+    (u0, u1, v0, v1). The normal is x_axis x y_axis."""
+
+    def __init__(self, origin, x_axis, y_axis, width, height, holes=()):
+        self.origin = XYZ(*origin)
+        self.x_axis = XYZ(*x_axis).Normalize()
+        self.y_axis = XYZ(*y_axis).Normalize()
+        self.normal = self.x_axis.CrossProduct(self.y_axis)
+        self.width = float(width)
+        self.height = float(height)
+        self.holes = list(holes)
+
+    @property
+    def Area(self):
+        return self.width * self.height - sum(
+            (u1 - u0) * (v1 - v0) for u0, u1, v0, v1 in self.holes)
+
+    @property
+    def EdgeLoops(self):
+        loops = [[(0, 0), (self.width, 0), (self.width, self.height),
+                  (0, self.height)]]
+        loops += [[(u0, v0), (u0, v1), (u1, v1), (u1, v0)]
+                  for u0, u1, v0, v1 in self.holes]
+        return [[_Edge([loop[k], loop[(k + 1) % len(loop)]])
+                 for k in range(len(loop))] for loop in loops]
+
+    def GetBoundingBox(self):
+        return BoundingBoxUV(0.0, 0.0, self.width, self.height)
+
+    def IsInside(self, uv):
+        if not (0 <= uv.U <= self.width and 0 <= uv.V <= self.height):
+            return False
+        for u0, u1, v0, v1 in self.holes:
+            if u0 < uv.U < u1 and v0 < uv.V < v1:
+                return False
+        return True
+
+    def Evaluate(self, uv):
+        return self.origin.Add(self.x_axis.Multiply(uv.U)).Add(
+            self.y_axis.Multiply(uv.V))
+
+    def point(self, u, v, distance=0.0):
+        """Model point at (u, v) and signed distance along the normal."""
+        return self.Evaluate(UV(u, v)).Add(self.normal.Multiply(distance))
+
+    def ComputeNormal(self, uv):
+        return self.normal
+
+    def ComputeDerivatives(self, uv):
+        return Transform(self.x_axis, self.y_axis, self.normal,
+                         self.Evaluate(uv))
+
+    def Project(self, point):
+        rel = point.Subtract(self.origin)
+        uv = UV(rel.DotProduct(self.x_axis), rel.DotProduct(self.y_axis))
+        if not self.IsInside(uv):
+            return None
+        return IntersectionResult(uv, self.Evaluate(uv))
+
+
+class CylindricalFace(Face):
+    """Part of a cylinder: u is the arc length from the frame x axis,
+    in [0, radius * sweep], v the height along the axis, in [0, height].
+    The normal points outwards."""
+
+    def __init__(self, radius, sweep, height, transform=None):
+        self.radius = float(radius)
+        self.sweep = float(sweep)
+        self.height = float(height)
+        self.transform = transform or Transform()
+        self.EdgeLoops = []
+
+    @property
+    def Area(self):
+        return self.radius * self.sweep * self.height
+
+    def GetBoundingBox(self):
+        return BoundingBoxUV(0.0, 0.0, self.radius * self.sweep, self.height)
+
+    def IsInside(self, uv):
+        return (0 <= uv.U <= self.radius * self.sweep
+                and 0 <= uv.V <= self.height)
+
+    def _radial(self, u):
+        angle = u / self.radius
+        return XYZ(math.cos(angle), math.sin(angle), 0.0)
+
+    def Evaluate(self, uv):
+        local = self._radial(uv.U).Multiply(self.radius).Add(
+            XYZ(0, 0, uv.V))
+        return self.transform.OfPoint(local)
+
+    def point(self, u, v, distance=0.0):
+        return self.Evaluate(UV(u, v)).Add(
+            self.ComputeNormal(UV(u, v)).Multiply(distance))
+
+    def ComputeNormal(self, uv):
+        return self.transform.OfVector(self._radial(uv.U))
+
+    def ComputeDerivatives(self, uv):
+        radial = self._radial(uv.U)
+        tangent = XYZ(-radial.Y, radial.X, 0.0)
+        return Transform(self.transform.OfVector(tangent),
+                         self.transform.OfVector(XYZ.BasisZ),
+                         self.transform.OfVector(radial), self.Evaluate(uv))
+
+    def Project(self, point):
+        local = self.transform.Inverse.OfPoint(point)
+        angle = math.atan2(local.Y, local.X) % (2.0 * math.pi)
+        uv = UV(angle * self.radius, local.Z)
+        if not self.IsInside(uv):
+            return None
+        return IntersectionResult(uv, self.Evaluate(uv))
+
+
+# =============================================================================
+# POINT CLOUD
+# =============================================================================
+
+class CloudPoint(object):
+    __slots__ = ('X', 'Y', 'Z')
+
+    def __init__(self, x, y, z):
+        self.X, self.Y, self.Z = x, y, z
+
+
+class PointCollection(list):
+
+    @property
+    def Count(self):
+        return len(self)
+
+
+class PointCloudFilter(object):
+
+    def __init__(self, planes):
+        self.planes = [((p.Normal.X, p.Normal.Y, p.Normal.Z),
+                        (p.Origin.X, p.Origin.Y, p.Origin.Z))
+                       for p in planes]
+
+    def passes(self, x, y, z):
+        for (nx, ny, nz), (ox, oy, oz) in self.planes:
+            if nx * (x - ox) + ny * (y - oy) + nz * (z - oz) < 0:
+                return False
+        return True
+
+
+class PointCloudFilterFactory(object):
+
+    @staticmethod
+    def CreateMultiPlaneFilter(planes):
+        return PointCloudFilter(list(planes))
+
+
+class ElementId(object):
+
+    def __init__(self, value):
+        self.Value = value
+
+    def __repr__(self):
+        return str(self.Value)
+
+
+class PointCloudType(object):
+
+    def __init__(self, name):
+        self.Name = name
+        self.Id = ElementId(2)
+
+
+class PointCloudInstance(object):
+    """Fake linked cloud. points are (x, y, z) in cloud coordinates,
+    transform maps them to the model. filter_space is the space in which
+    GetPoints reads the filter planes: 'model' or 'cloud'. spacing is the
+    average distance of the scan: a query asking for a larger average
+    distance gets every (avg_dist / spacing) ** 2-th point."""
+
+    MAX_POINTS = 999999
+
+    def __init__(self, points, transform=None, filter_space='model',
+                 spacing=0.01, name='Scan'):
+        self.Name = name
+        self.Id = ElementId(1)
+        self.cloud_type = PointCloudType(name + ' type')
+        self.transform = transform or Transform()
+        self.filter_space = filter_space
+        self.spacing = spacing
+        self.queries = 0
+        self.points = [tuple(p) for p in points]
+        if filter_space == 'model':
+            self._filtered = [tuple(self.transform.OfPoint(XYZ(*p)))
+                              for p in self.points]
+        else:
+            self._filtered = self.points
+
+    def GetTotalTransform(self):
+        return self.transform
+
+    def GetTypeId(self):
+        return self.cloud_type.Id
+
+    def GetPoints(self, pc_filter, avg_dist, max_points):
+        if max_points > self.MAX_POINTS:
+            raise ValueError('numPoints out of range')
+        self.queries += 1
+        stride = max(1, int((avg_dist / self.spacing) ** 2))
+        result = PointCollection()
+        passed = 0
+        for (fx, fy, fz), (x, y, z) in zip(self._filtered, self.points):
+            if not pc_filter.passes(fx, fy, fz):
+                continue
+            passed += 1
+            if (passed - 1) % stride:
+                continue
+            result.append(CloudPoint(x, y, z))
+            if len(result) >= max_points:
+                break
+        return result
+
+
+def cloud_from_model(model_points, transform=None, **kwargs):
+    """PointCloudInstance from points given in model coordinates."""
+    transform = transform or Transform()
+    inverse = transform.Inverse
+    points = [tuple(inverse.OfPoint(XYZ(*p))) for p in model_points]
+    return PointCloudInstance(points, transform, **kwargs)
+
+
+# =============================================================================
+# MODULES
+# =============================================================================
+
+class _Placeholder(object):
+    """Any Revit/.NET class the script imports but the tests never use."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class _GenericList(object):
+    """System.Collections.Generic.List: List[T](items) is a plain list."""
+
+    def __getitem__(self, item_type):
+        return lambda items=(): list(items)
+
+
+class _NameProperty(object):
+    """Element.Name.GetValue(element), as used from IronPython."""
+
+    def GetValue(self, element):
+        return element.Name
+
+
+class Element(object):
+    Name = _NameProperty()
+
+
+class _Unit(object):
+
+    def __init__(self, label, feet_per_unit):
+        self.label = label
+        self.feet_per_unit = feet_per_unit
+
+
+class UnitTypeId(object):
+    Meters = _Unit('m', FEET_PER_METER)
+    Feet = _Unit('ft', 1.0)
+
+
+class SpecTypeId(object):
+    Length = 'length'
+
+
+class UnitUtils(object):
+
+    @staticmethod
+    def ConvertToInternalUnits(value, unit):
+        return value * unit.feet_per_unit
+
+    @staticmethod
+    def ConvertFromInternalUnits(value, unit):
+        return value / unit.feet_per_unit
+
+
+class LabelUtils(object):
+
+    @staticmethod
+    def GetLabelForUnit(unit):
+        return unit.label
+
+
+class _FormatOptions(object):
+
+    def __init__(self, unit):
+        self._unit = unit
+
+    def GetUnitTypeId(self):
+        return self._unit
+
+
+class _Units(object):
+
+    def __init__(self, unit):
+        self._unit = unit
+
+    def GetFormatOptions(self, spec):
+        return _FormatOptions(self._unit)
+
+
+class FakeDocument(object):
+
+    def __init__(self, unit=UnitTypeId.Meters):
+        self.PathName = os.path.join(tempfile.gettempdir(), 'model.rvt')
+        self.elements = {}
+        self._units = _Units(unit)
+
+    def GetUnits(self):
+        return self._units
+
+    def GetElement(self, element_id):
+        return self.elements.get(getattr(element_id, 'Value', element_id))
+
+
+class FakeRevit(object):
+    """The __revit__ object of a pyRevit script."""
+
+    def __init__(self, document):
+        self.ActiveUIDocument = types.SimpleNamespace(Document=document)
+        self.Application = types.SimpleNamespace(VersionNumber='2024')
+
+
+class _ScriptModule(types.ModuleType):
+
+    data_folder = tempfile.gettempdir()
+
+    def get_universal_data_file(self, file_id, file_ext):
+        return os.path.join(self.data_folder, '{0}.{1}'.format(file_id, file_ext))
+
+    def exit(self):
+        raise SystemExit()
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def _placeholders(*names):
+    return dict((name, type(name, (_Placeholder,), {})) for name in names)
+
+
+def install_modules():
+    """Put the fake clr, Autodesk.Revit, System and pyrevit modules in
+    sys.modules (once)."""
+    if 'Autodesk.Revit.DB' in sys.modules:
+        return
+    db = _module(
+        'Autodesk.Revit.DB',
+        XYZ=XYZ, UV=UV, Plane=Plane, Transform=Transform, Face=Face,
+        PlanarFace=PlanarFace, Element=Element, UnitUtils=UnitUtils,
+        LabelUtils=LabelUtils, SpecTypeId=SpecTypeId, UnitTypeId=UnitTypeId,
+        PointCloudInstance=PointCloudInstance, ElementId=ElementId,
+        **_placeholders('FilteredElementCollector', 'Transaction', 'Color',
+                        'ExternalFileUtils', 'ModelPathUtils'))
+    db.PointClouds = _module('Autodesk.Revit.DB.PointClouds',
+                             PointCloudFilterFactory=PointCloudFilterFactory)
+    db.Analysis = _module('Autodesk.Revit.DB.Analysis', **_placeholders(
+        'SpatialFieldManager', 'AnalysisResultSchema', 'FieldDomainPointsByUV',
+        'FieldValues', 'ValueAtPoint', 'AnalysisDisplayStyle',
+        'AnalysisDisplayColoredSurfaceSettings', 'AnalysisDisplayColorSettings',
+        'AnalysisDisplayColorEntry', 'AnalysisDisplayStyleColorSettingsType',
+        'AnalysisDisplayLegendSettings'))
+    selection = _module('Autodesk.Revit.UI.Selection', **_placeholders('ObjectType'))
+    exceptions = _module('Autodesk.Revit.Exceptions',
+                         OperationCanceledException=type(
+                             'OperationCanceledException', (Exception,), {}))
+    generic = _module('System.Collections.Generic', List=_GenericList())
+    pyrevit_script = _ScriptModule('pyrevit.script')
+    pyrevit_forms = _module('pyrevit.forms', alert=lambda *a, **k: None)
+    modules = {
+        'clr': _module('clr', AddReference=lambda name: None),
+        'Autodesk': _module('Autodesk'),
+        'Autodesk.Revit': _module('Autodesk.Revit'),
+        'Autodesk.Revit.DB': db,
+        'Autodesk.Revit.DB.PointClouds': db.PointClouds,
+        'Autodesk.Revit.DB.Analysis': db.Analysis,
+        'Autodesk.Revit.UI': _module('Autodesk.Revit.UI', Selection=selection),
+        'Autodesk.Revit.UI.Selection': selection,
+        'Autodesk.Revit.Exceptions': exceptions,
+        'System': _module('System', Environment=types.SimpleNamespace(
+            ProcessorCount=os.cpu_count() or 1)),
+        'System.Collections': _module('System.Collections', Generic=generic),
+        'System.Collections.Generic': generic,
+        'System.Windows': _module('System.Windows', Window=_Placeholder),
+        'System.Windows.Markup': _module('System.Windows.Markup',
+                                         **_placeholders('XamlReader')),
+        'System.IO': _module('System.IO', **_placeholders('StreamReader')),
+        'pyrevit': _module('pyrevit', forms=pyrevit_forms, script=pyrevit_script),
+        'pyrevit.forms': pyrevit_forms,
+        'pyrevit.script': pyrevit_script,
+    }
+    sys.modules.update(modules)
+
+
+_SCRIPT = {}
+
+
+def load_script():
+    """Import PointCloudAnalysis_script on the fake API (once). Its
+    document is script.doc (a FakeDocument in metres)."""
+    if 'module' not in _SCRIPT:
+        install_modules()
+        spec = importlib.util.spec_from_file_location(
+            'PointCloudAnalysis_script', SCRIPT_PATH)
+        module = importlib.util.module_from_spec(spec)
+        module.__revit__ = FakeRevit(FakeDocument())
+        spec.loader.exec_module(module)
+        _SCRIPT['module'] = module
+    return _SCRIPT['module']
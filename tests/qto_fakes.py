@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal stand-ins for the Revit API used by QuantityTakeoff, so that the
+script can be imported and its collection, resolution and output
+functions run with CPython.
+
+Elements carry their parameters in a dict keyed by BuiltInParameter (a
+plain string here) or by name, and count their get_Parameter calls, so
+the tests can compare the number of API reads of two code paths.
+
+    script = qto_fakes.load_script()
+"""
+
+import importlib.util
+import os
+import sys
+import types
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_PATH = os.path.join(
+    ROOT, 'pyESA.tab', 'Import-Export.panel', 'QuantityTakeoff.pushbutton',
+    'QuantityTakeoff_script.py')
+
+
+class _Enum(object):
+    """BuiltInParameter / BuiltInCategory: every member is its own name."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, member):
+        if member.startswith('_'):
+            raise AttributeError(member)
+        return member
+
+
+BuiltInParameter = _Enum('BuiltInParameter')
+BuiltInCategory = _Enum('BuiltInCategory')
+
+
+class StorageType(object):
+    Double = 'Double'
+    Integer = 'Integer'
+    String = 'String'
+    ElementId = 'ElementId'
+
+
+class CategoryType(object):
+    Model = 'Model'
+    Annotation = 'Annotation'
+
+
+class ElementId(object):
+
+    def __init__(self, value):
+        self.Value = value
+
+    def __eq__(self, other):
+        return isinstance(other, ElementId) and other.Value == self.Value
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.Value)
+
+    def __repr__(self):
+        return 'ElementId({0})'.format(self.Value)
+
+
+ElementId.InvalidElementId = ElementId(-1)
+
+
+class Parameter(object):
+
+    def __init__(self, value, storage=None):
+        if storage is None:
+            storage = {float: StorageType.Double, int: StorageType.Integer}.get(
+                type(value), StorageType.String)
+        self.value = value
+        self.StorageType = storage
+
+    @property
+    def HasValue(self):
+        return self.value is not None
+
+    def AsDouble(self):
+        return float(self.value)
+
+    def AsInteger(self):
+        return int(self.value)
+
+    def AsString(self):
+        return self.value
+
+    def AsValueString(self):
+        return None if self.value is None else str(self.value)
+
+
+class Category(object):
+
+    def __init__(self, id_value, name, category_type=CategoryType.Model):
+        self.Id = ElementId(id_value)
+        self.Name = name
+        self.CategoryType = category_type
+
+
+class Element(object):
+    """Instance or type. params: { BuiltInParameter or name: value or Parameter }."""
+
+    def __init__(self, doc, id_value, category=None, type_id=None, name='', params=None):
+        self.Document = doc
+        self.Id = ElementId(id_value)
+        self.Category = category
+        self._type_id = type_id or ElementId.InvalidElementId
+        self.Name = name
+        self.params = dict((key, value if isinstance(value, Parameter) else Parameter(value))
+                           for key, value in (params or {}).items())
+        self.is_type = False
+
+    def get_Parameter(self, builtin_param):
+        self.Document.parameter_reads += 1
+        return self.params.get(builtin_param)
+
+    def LookupParameter(self, name):
+        return self.params.get(name)
+
+    def GetTypeId(self):
+        return self._type_id
+
+
+class ImportInstance(Element):
+    pass
+
+
+class RevitLinkInstance(Element):
+    pass
+
+
+class AssemblyInstance(Element):
+    pass
+
+
+class Document(object):
+    """Holds the elements; parameter_reads counts get_Parameter calls."""
+
+    def __init__(self, categories=()):
+        self.IsLinked = False
+        self.IsWorkshared = False
+        self.Title = 'Model.rvt'
+        self.Settings = types.SimpleNamespace(Categories=list(categories))
+        self.elements = {}
+        self.parameter_reads = 0
+
+    def add(self, element):
+        self.elements[element.Id.Value] = element
+        return element
+
+    def add_type(self, id_value, category, name='', params=None):
+        element = self.add(Element(self, id_value, category, name=name, params=params))
+        element.is_type = True
+        return element
+
+    def add_instance(self, id_value, category, elem_type=None, name='', params=None, cls=Element):
+        type_id = elem_type.Id if elem_type is not None else None
+        return self.add(cls(self, id_value, category, type_id, name, params))
+
+    def GetElement(self, element_id):
+        return self.elements.get(element_id.Value)
+
+
+class ElementMulticategoryFilter(object):
+
+    def __init__(self, category_ids):
+        self.values = set(i.Value for i in category_ids)
+
+    def passes(self, element):
+        return element.Category is not None and element.Category.Id.Value in self.values
+
+
+class ElementClassFilter(object):
+
+    def __init__(self, cls, inverted=False):
+        self.cls = cls
+        self.inverted = inverted
+
+    def passes(self, element):
+        return isinstance(element, self.cls) != self.inverted
+
+
+class FilteredElementCollector(object):
+    """Iterates the elements of the document in id order; counts iterations."""
+
+    iterations = 0
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.filters = []
+
+    def WhereElementIsNotElementType(self):
+        self.filters.append(lambda element: not element.is_type)
+        return self
+
+    def WherePasses(self, element_filter):
+        self.filters.append(element_filter.passes)
+        return self
+
+    def OfClass(self, cls):
+        self.filters.append(lambda element: isinstance(element, cls))
+        return self
+
+    def __iter__(self):
+        FilteredElementCollector.iterations += 1
+        for key in sorted(self.doc.elements):
+            element = self.doc.elements[key]
+            if all(passes(element) for passes in self.filters):
+                yield element
+
+
+class _GenericList(object):
+    """System.Collections.Generic.List: List[T]() is a list with Add."""
+
+    def __getitem__(self, item_type):
+        return _List
+
+
+class _List(list):
+
+    def Add(self, item):
+        self.append(item)
+
+
+class _Output(object):
+    """pyrevit output: keeps the markdown lines."""
+
+    def __init__(self):
+        self.lines = []
+
+    def print_md(self, text):
+        self.lines.append(text)
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def fake_modules():
+    db = _module(
+        'Autodesk.Revit.DB',
+        BuiltInParameter=BuiltInParameter, BuiltInCategory=BuiltInCategory,
+        StorageType=StorageType, CategoryType=CategoryType, ElementId=ElementId,
+        FilteredElementCollector=FilteredElementCollector,
+        ElementMulticategoryFilter=ElementMulticategoryFilter,
+        ElementClassFilter=ElementClassFilter, ImportInstance=ImportInstance,
+        RevitLinkInstance=RevitLinkInstance, AssemblyInstance=AssemblyInstance,
+        ModelPathUtils=object())
+    db.__all__ = [name for name in vars(db) if not name.startswith('_')]
+    generic = _module('System.Collections.Generic', List=_GenericList())
+    pyrevit_script = _module('pyrevit.script', get_output=_Output)
+    pyrevit_forms = _module('pyrevit.forms')
+    return {
+        'clr': _module('clr', AddReference=lambda name: None),
+        'Autodesk': _module('Autodesk'),
+        'Autodesk.Revit': _module('Autodesk.Revit', DB=db),
+        'Autodesk.Revit.DB': db,
+        'System': _module('System'),
+        'System.Collections': _module('System.Collections', Generic=generic),
+        'System.Collections.Generic': generic,
+        'pyrevit': _module('pyrevit', revit=_module('pyrevit.revit'), DB=db,
+                           forms=pyrevit_forms, script=pyrevit_script),
+        'pyrevit.forms': pyrevit_forms,
+        'pyrevit.script': pyrevit_script,
+    }
+
+
+_SCRIPT = {}
+
+
+def load_script():
+    """Import QuantityTakeoff_script on the fake API (once). The fake
+    modules are only in sys.modules while the script is imported, so they
+    never mix with the PointCloudAnalysis fakes."""
+    if 'module' not in _SCRIPT:
+        modules = fake_modules()
+        saved = dict((name, sys.modules.get(name)) for name in modules)
+        sys.modules.update(modules)
+        try:
+            spec = importlib.util.spec_from_file_location('QuantityTakeoff_script', SCRIPT_PATH)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        finally:
+            for name, previous in saved.items():
+                if previous is None:
+                    sys.modules.pop(name, None)
+                else:
+                    sys.modules[name] = previous
+        _SCRIPT['module'] = module
+    return _SCRIPT['module']
+
+
+def output():
+    return _Output()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""Synthetic point clouds and a benchmark of the PointCloudAnalysis
+reduction, runnable without Revit (no Revit API imports; also under
+IronPython).
+
+Scenarios are a plane, a wall with openings and a cylinder, with a known
+deviation field (an offset plus a local bulge), Gaussian noise, a point
+density and a rigid cloud transform. Points are generated tile by tile,
+as a GetPoints query per tile would return them, in cloud coordinates.
+They then go through the same code as the tool: copy_points,
+PlaneFrame (or a reference cylinder mapping), reduce_tile and CellStats.
+Each cell mean is compared with the noise-free deviation of its points
+(tests/test_synthetic_cloud.py bounds the error).
+
+    python -m tests.synthetic_cloud [points] [workers]
+"""
+
+import math
+import random
+import sys
+import time
+
+from tests import conftest  # noqa: F401 (puts the script folders on sys.path)
+
+import cloud_sampling
+import reduction_pool
+
+
+class RigidTransform(object):
+    """Cloud to model transform: rotation about Z by angle, then
+    translation, with the basis vectors as Revit's Transform gives them."""
+
+    def __init__(self, angle=0.0, translation=(0.0, 0.0, 0.0)):
+        c, s = math.cos(angle), math.sin(angle)
+        self.basis = ((c, s, 0.0), (-s, c, 0.0), (0.0, 0.0, 1.0))
+        self.origin = tuple(float(t) for t in translation)
+
+    def to_cloud(self, point):
+        """Model point to cloud coordinates (inverse transform)."""
+        rel = [p - o for p, o in zip(point, self.origin)]
+        return tuple(sum(axis[k] * rel[k] for k in range(3))
+                     for axis in self.basis)
+
+
+def bulge_field(offset=0.0, center=(0.0, 0.0), radius=0.0, height=0.0):
+    """Deviation field: constant offset plus a paraboloid bump."""
+    def field(u, v):
+        value = offset
+        if radius > 0:
+            r = math.hypot(u - center[0], v - center[1])
+            if r < radius:
+                value += height * (1.0 - (r / radius) ** 2)
+        return value
+    return field
+
+
+class WallScenario(object):
+    """Vertical plane y = 0 seen from -Y (u along X, v along Z), size
+    width x height, with rectangular openings (u0, u1, v0, v1)."""
+
+    name = 'wall'
+
+    def __init__(self, width, height, field, openings=()):
+        self.u_min, self.u_max = 0.0, float(width)
+        self.v_min, self.v_max = 0.0, float(height)
+        self.field = field
+        self.openings = list(openings)
+
+    def frame_axes(self):
+        return (0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 0.0, 1.0), \
+            (0.0, -1.0, 0.0)
+
+    def on_surface(self, u, v):
+        for u0, u1, v0, v1 in self.openings:
+            if u0 <= u < u1 and v0 <= v < v1:
+                return False
+        return True
+
+    def model_point(self, u, v, d):
+        return (u, -d, v)
+
+    def mapper(self, xform):
+        origin, x_axis, y_axis, normal = self.frame_axes()
+        frame = cloud_sampling.PlaneFrame.compose(
+            origin, x_axis, y_axis, normal, xform.basis, xform.origin)
+        return frame.samples
+
+
+class CylinderScenario(WallScenario):
+    """Cylinder of the given radius around the Z axis; u is the arc
+    length, v the height, the distance is positive outwards. Mapped
+    with a reference implementation (the tool uses Project there)."""
+
+    name = 'cylinder'
+
+    def __init__(self, radius, height, field):
+        WallScenario.__init__(self, 2.0 * math.pi * radius, height, field)
+        self.radius = float(radius)
+
+    def model_point(self, u, v, d):
+        angle = u / self.radius
+        r = self.radius + d
+        return (r * math.cos(angle), r * math.sin(angle), v)
+
+    def mapper(self, xform):
+        radius = self.radius
+        basis, origin = xform.basis, xform.origin
+
+        def samples(xs, ys, zs, offset):
+            for cx, cy, cz in zip(xs, ys, zs):
+                x = basis[0][0] * cx + basis[1][0] * cy + basis[2][0] * cz + origin[0]
+                y = basis[0][1] * cx + basis[1][1] * cy + basis[2][1] * cz + origin[1]
+                z = basis[0][2] * cx + basis[1][2] * cy + basis[2][2] * cz + origin[2]
+                d = math.hypot(x, y) - radius
+                if -offset <= d <= offset:
+                    angle = math.atan2(y, x) % (2.0 * math.pi)
+                    yield angle * radius, z, d
+        return samples
+
+
+class _Point(object):
+    __slots__ = ('X', 'Y', 'Z')
+
+    def __init__(self, xyz):
+        self.X, self.Y, self.Z = xyz
+
+
+def tile_points(scenario, xform, cells, tile, density, noise, rng, truth):
+    """Cloud points of a tile (as GetPoints would return them) and, in
+    truth, the noise-free deviation sums per cell."""
+    u0, u1, v0, v1 = cells.tile_bounds(tile)
+    u1 = min(u1, scenario.u_max)
+    v1 = min(v1, scenario.v_max)
+    count = int(density * max(0.0, u1 - u0) * max(0.0, v1 - v0))
+    points = []
+    for _ in range(count):
+        u = rng.uniform(u0, u1)
+        v = rng.uniform(v0, v1)
+        if not scenario.on_surface(u, v):
+            continue
+        d = scenario.field(u, v)
+        cell = cells.index(u, v)
+        total, n = truth.get(cell, (0.0, 0))
+        truth[cell] = (total + d, n + 1)
+        points.append(_Point(xform.to_cloud(
+            scenario.model_point(u, v, d + rng.gauss(0.0, noise)))))
+    return points
+
+
+def run(scenario, xform, grid, density, noise, offset, tolerance,
+        workers=1, seed=0):
+    """Run the reduction on a scenario and return a dict of figures."""
+    rng = random.Random(seed)
+    cells = cloud_sampling.CellGrid(scenario.u_min, scenario.u_max,
+                                    scenario.v_min, scenario.v_max, grid)
+    tile_cap = (reduction_pool.PARALLEL_TILE_POINTS if workers > 1
+                else 999999)
+    points_per_cell = max(1, int(density * grid * grid))
+    tiles = cloud_sampling.plan_tiles(cells.nu, cells.nv, points_per_cell,
+                                      tile_cap)
+    mapper = scenario.mapper(xform)
+    truth = {}
+    summaries = {}
+    n_points = 0
+    # Time of copy, mapping, binning and statistics only (not of the
+    # generation). With workers > 1 the reduction overlaps the generation
+    # of the next tiles, so points/s is an upper bound there.
+    reduce_time = 0.0
+    with reduction_pool.ReductionPool(workers) as pool:
+        jobs = []
+        for tile in tiles:
+            points = tile_points(scenario, xform, cells, tile, density, noise,
+                                 rng, truth)
+            n_points += len(points)
+            start = time.time()
+            xs, ys, zs = reduction_pool.copy_points(points)
+            jobs.append(pool.submit(
+                reduction_pool.reduce_tile, cells, tile,
+                mapper(xs, ys, zs, offset), tolerance))
+            reduce_time += time.time() - start
+        start = time.time()
+        for job in jobs:
+            summaries.update(job.result()[0])
+        reduce_time += time.time() - start
+
+    errors = []
+    for cell, (total, n) in truth.items():
+        stats = summaries.get(cell)
+        if stats is not None:
+            errors.append(stats.mean - total / n)
+    return {
+        'scenario': scenario.name,
+        'points': n_points,
+        'queries': len(tiles),
+        'cells': len(summaries),
+        'empty_cells': cells.nu * cells.nv - len(summaries),
+        'points_per_s': n_points / reduce_time if reduce_time else 0.0,
+        'max_error': max(abs(e) for e in errors) if errors else 0.0,
+        'rms_error': (math.sqrt(sum(e * e for e in errors) / len(errors))
+                      if errors else 0.0),
+    }
+
+
+def scenarios(total_points):
+    """Plane, wall with openings and cylinder of about total_points each
+    (lengths in metres, deviations of a few centimetres)."""
+    bump = bulge_field(0.005, (6.0, 1.5), 1.0, 0.03)
+    plane = WallScenario(12.0, 3.0, bump)
+    plane.name = 'plane'
+    wall = WallScenario(12.0, 3.0, bump,
+                        openings=[(1.0, 2.2, 0.0, 2.1), (8.0, 9.5, 0.9, 2.1)])
+    wall.name = 'wall+openings'
+    cylinder = CylinderScenario(0.5, 3.0, bulge_field(-0.01, (1.0, 1.5), 0.4, 0.02))
+    result = []
+    for scenario in (plane, wall, cylinder):
+        area = ((scenario.u_max - scenario.u_min)
+                * (scenario.v_max - scenario.v_min))
+        result.append((scenario, total_points / area))
+    return result
+
+
+def main(argv):
+    total_points = int(float(argv[1])) if len(argv) > 1 else 100000
+    workers = int(argv[2]) if len(argv) > 2 else 1
+    xform = RigidTransform(math.radians(30.0), (250.0, -40.0, 12.0))
+    print('{0:<15}{1:>10}{2:>9}{3:>8}{4:>8}{5:>12}{6:>11}{7:>11}'.format(
+        'scenario', 'points', 'queries', 'cells', 'empty', 'points/s',
+        'max err', 'rms err'))
+    for scenario, density in scenarios(total_points):
+        figures = run(scenario, xform, grid=0.3, density=density,
+                      noise=0.003, offset=0.1, tolerance=0.01,
+                      workers=workers)
+        print('{scenario:<15}{points:>10}{queries:>9}{cells:>8}'
+              '{empty_cells:>8}{points_per_s:>12.0f}{max_error:>11.5f}'
+              '{rms_error:>11.5f}'.format(**figures))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
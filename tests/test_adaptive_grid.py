@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+import adaptive_grid
+import reduction_pool
+
+from tests import point_cloud_fakes as fakes
+
+
+@pytest.fixture(scope='module')
+def pca():
+    return fakes.load_script()
+
+
+def _reached(grids):
+    """Finest cells reached when every cell is split."""
+    leaves = adaptive_grid.refine(
+        grids, lambda level, cells: {}, lambda *args: True)
+    assert all(level == 0 for level, _, _ in leaves)
+    return set(cell for _, cell, _ in leaves)
+
+
+@pytest.mark.parametrize('u_max, v_max, grid, levels', [
+    (1.0, 1.0, 0.1, 3),
+    (3.0, 2.9, 0.25, 3),
+    (7.3, 0.4, 0.3, 3),
+    (2.0, 2.0, 0.5, 2),
+    (1.0, 1.0, 0.1, 5),
+])
+def test_every_finest_cell_is_reachable(u_max, v_max, grid, levels):
+    grids = adaptive_grid.level_grids(-0.5, u_max - 0.5, 2.0, 2.0 + v_max,
+                                      grid, levels)
+    finest = grids[0]
+    assert _reached(grids) == set(finest.indices())
+    for level, cells in enumerate(grids[1:], 1):
+        assert cells.grid == pytest.approx(grid * 2 ** level)
+        assert (cells.u_min, cells.v_min) == (finest.u_min, finest.v_min)
+        assert cells.nu == -(-finest.nu // 2 ** level)
+        assert cells.nv == -(-finest.nv // 2 ** level)
+
+
+def test_children_stay_on_the_finer_grid():
+    grids = adaptive_grid.level_grids(0.0, 1.0, 0.0, 1.0, 0.1)
+    # 10 x 10 cells, the coarsest 0.8 grid is 2 x 2
+    assert [(g.nu, g.nv) for g in grids] == [(10, 10), (5, 5), (3, 3), (2, 2)]
+    assert adaptive_grid.children(grids, 3, (0, 1)) \
+        == [(0, 2), (1, 2)]
+    assert adaptive_grid.children(grids, 3, (1, 1)) == [(2, 2)]
+    assert adaptive_grid.children(grids, 1, (4, 4)) \
+        == [(8, 8), (8, 9), (9, 8), (9, 9)]
+    assert adaptive_grid.children(grids, 2, (2, 0)) == [(4, 0), (4, 1)]
+
+
+def test_adaptive_face_keeps_the_points_of_the_far_cells(pca):
+    # 3.0 x 2.9 at 0.25: the uncovered coarse grid stopped at 2.0 x 2.0
+    rng = random.Random(8)
+    face = fakes.PlanarFace((0, 0, 0), (1, 0, 0), (0, 0, 1), 3.0, 2.9)
+    samples = []
+    for _ in range(6000):
+        u, v = rng.uniform(0.0, 3.0), rng.uniform(0.0, 2.9)
+        # A step in the far corner so that the cells there get split
+        d = 0.08 if u > 2.2 and v > 2.1 else 0.0
+        samples.append((u, v, d + rng.gauss(0.0, 0.002)))
+    cloud = fakes.cloud_from_model(
+        [tuple(face.point(u, v, d)) for u, v, d in samples])
+    with reduction_pool.ReductionPool(1) as pool:
+        uvs, _, stats, sizes, n_cells, n_empty, _ = pca.analyze_face(
+            cloud, cloud.GetTotalTransform(), None, face, 0.25, 0.3, 'all',
+            0.02, pool, adaptive=True)
+
+    # Every point is binned: the coarse cells reach past the face box
+    assert sum(s.count for s in stats) == len(samples)
+    assert n_empty == 0
+    assert sum(size * size for size in sizes) >= 3.0 * 2.75
+    assert min(sizes) == 0.25
+    far = [s for uv, s in zip(uvs, stats) if uv.U > 2.5 and uv.V > 2.5]
+    assert far and all(abs(s.mean - 0.08) < 0.005 for s in far)
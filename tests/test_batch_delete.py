@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+
+import pytest
+
+import batch_delete
+
+
+class Deleter(object):
+    """delete_batch failing when the batch holds an undeletable id."""
+
+    def __init__(self, undeletable=()):
+        self.undeletable = set(undeletable)
+        self.calls = []
+
+    def __call__(self, batch):
+        self.calls.append(list(batch))
+        bad = self.undeletable.intersection(batch)
+        if bad:
+            raise RuntimeError('cannot delete {0}'.format(min(bad)))
+
+
+def test_everything_deleted_in_one_call():
+    deleter = Deleter()
+    assert batch_delete.bisect_delete(range(100), deleter) == (list(range(100)), [])
+    assert len(deleter.calls) == 1
+
+
+def test_empty_list_makes_no_call():
+    deleter = Deleter()
+    assert batch_delete.bisect_delete([], deleter) == ([], [])
+    assert deleter.calls == []
+
+
+@pytest.mark.parametrize('count', [2, 3, 17, 1000, 4096])
+def test_one_undeletable_id_is_isolated_in_log_calls(count):
+    for bad in (0, count // 3, count - 1):
+        deleter = Deleter([bad])
+        deleted, failed = batch_delete.bisect_delete(list(range(count)), deleter)
+        assert deleted == [i for i in range(count) if i != bad]
+        assert failed == [(bad, 'cannot delete {0}'.format(bad))]
+        assert len(deleter.calls) <= 2 * math.ceil(math.log(count, 2)) + 1
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_several_failures_stay_within_the_bound(seed):
+    rng = random.Random(seed)
+    ids = list(range(2000))
+    bad = set(rng.sample(ids, rng.randint(1, 12)))
+    deleter = Deleter(bad)
+    deleted, failed = batch_delete.bisect_delete(ids, deleter)
+    assert sorted(deleted) == sorted(set(ids) - bad)
+    assert deleted == sorted(deleted)
+    assert sorted(i for i, _ in failed) == sorted(bad)
+    assert len(deleter.calls) <= 2 * len(bad) * math.ceil(math.log(len(ids), 2)) + 1
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+import broad_phase
+
+
+def _brute_force(boxes, tolerance=0.0):
+    pairs = []
+    for i, a in enumerate(boxes):
+        for j in range(i + 1, len(boxes)):
+            b = boxes[j]
+            if a is None or b is None:
+                continue
+            if all(a[0][k] - tolerance <= b[1][k] + tolerance
+                   and b[0][k] - tolerance <= a[1][k] + tolerance
+                   for k in range(3)):
+                pairs.append((i, j))
+    return pairs
+
+
+def _random_boxes(rng, count, extent, size):
+    boxes = []
+    for _ in range(count):
+        low = tuple(rng.uniform(0.0, e) for e in extent)
+        high = tuple(l + rng.uniform(0.0, size) for l in low)
+        boxes.append((low, high))
+    return boxes
+
+
+@pytest.mark.parametrize('seed, extent, tolerance', [
+    (0, (100.0, 100.0, 10.0), 0.0),
+    (1, (100.0, 100.0, 10.0), 0.5),
+    # Thin along x: the sweep runs along y
+    (2, (1.0, 200.0, 3.0), 0.1),
+    # Everything piled up: most pairs overlap
+    (3, (5.0, 5.0, 5.0), 0.0),
+])
+def test_matches_brute_force(seed, extent, tolerance):
+    rng = random.Random(seed)
+    boxes = _random_boxes(rng, 400, extent, 4.0)
+    pairs = broad_phase.overlapping_pairs(boxes, tolerance)
+    assert pairs == _brute_force(boxes, tolerance)
+    assert all(i < j for i, j in pairs)
+
+
+def test_touching_boxes_overlap_and_tolerance_closes_gaps():
+    boxes = [((0, 0, 0), (1, 1, 1)),
+             ((1, 0, 0), (2, 1, 1)),        # shares a face with 0
+             ((2.3, 0, 0), (3, 1, 1)),      # 0.3 from 1
+             ((0, 0, 1.25), (1, 1, 2))]     # 0.25 above 0 and 1
+    assert broad_phase.overlapping_pairs(boxes) == [(0, 1)]
+    # Each box grows by the tolerance: a gap closes at half its width
+    assert broad_phase.overlapping_pairs(boxes, 0.125) \
+        == [(0, 1), (0, 3), (1, 3)]
+    assert broad_phase.overlapping_pairs(boxes, 0.15) \
+        == [(0, 1), (0, 3), (1, 2), (1, 3)]
+    assert broad_phase.overlapping_pairs(boxes, 0.15) \
+        == _brute_force(boxes, 0.15)
+
+
+def test_boxes_apart_on_a_cross_axis_do_not_overlap():
+    # Spread along x, so x is the sweep axis: the first two boxes share
+    # their x interval and are only apart in z
+    boxes = [((0, 0, 0), (1, 1, 1)), ((0, 0, 5), (1, 1, 6)),
+             ((0.5, 0.5, 0.5), (0.6, 0.6, 5.5)), ((40, 0, 0), (41, 1, 1))]
+    assert broad_phase.overlapping_pairs(boxes) == [(0, 2), (1, 2)]
+    assert broad_phase.overlapping_pairs(boxes, 2.0) \
+        == [(0, 1), (0, 2), (1, 2)]
+
+
+def test_none_boxes_are_ignored_but_keep_their_index():
+    boxes = [None, ((0, 0, 0), (1, 1, 1)), None, ((0.5, 0.5, 0.5), (2, 2, 2)),
+             None]
+    assert broad_phase.overlapping_pairs(boxes) == [(1, 3)]
+    assert broad_phase.overlapping_pairs([None, None]) == []
+    assert broad_phase.overlapping_pairs([None, ((0, 0, 0), (1, 1, 1))]) == []
+    assert broad_phase.overlapping_pairs([]) == []
+
+
+def test_identical_and_degenerate_boxes():
+    point = ((1.0, 1.0, 1.0), (1.0, 1.0, 1.0))
+    boxes = [point, point, ((0, 0, 0), (2, 2, 2)), ((3, 3, 3), (3, 3, 3))]
+    assert broad_phase.overlapping_pairs(boxes) == [(0, 1), (0, 2), (1, 2)]
+    assert broad_phase.overlapping_pairs(boxes, 0.5) \
+        == _brute_force(boxes, 0.5) == [(0, 1), (0, 2), (1, 2), (2, 3)]
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+
+import pytest
+
+import cleanup_plan
+
+
+def test_resolve_keep_delete_rules():
+    ids = [1, 2, 3, 4, 5]
+    even = lambda elemid: elemid % 2 == 0
+    # No parameter name: keep everything
+    assert cleanup_plan.resolve_keep_delete(ids, '', ['x'], even, [9]) \
+        == ({1, 2, 3, 4, 5}, set())
+    # Parameter name without values: keep only keep_ids
+    assert cleanup_plan.resolve_keep_delete(ids, 'Keep', [], even, [1]) \
+        == ({1}, {2, 3, 4, 5})
+    assert cleanup_plan.resolve_keep_delete(ids, 'Keep', None, even) \
+        == (set(), {1, 2, 3, 4, 5})
+    # Parameter name and values: keep_ids plus the matching ids
+    assert cleanup_plan.resolve_keep_delete(ids, 'Keep', ['yes'], even, [1]) \
+        == ({1, 2, 4}, {3, 5})
+
+
+def test_resolve_keep_delete_calls_the_predicate_once_per_id():
+    calls = []
+    cleanup_plan.resolve_keep_delete(
+        [1, 2, 2, 3], 'Keep', ['yes'], lambda elemid: calls.append(elemid))
+    assert sorted(calls) == [1, 2, 3]
+
+
+def test_plan_counts():
+    plan = cleanup_plan.CleanupPlan('a.rvt')
+    plan.model_elements = 1000
+    plan.sheets_delete = {1, 2}
+    plan.worksets_delete = ['ws']
+    plan.elements_count = 40
+    counts = plan.counts()
+    assert sorted(counts) == sorted(cleanup_plan.PLAN_KEYS)
+    assert (counts['sheets'], counts['worksets'], counts['elements']) \
+        == (2, 1, 40)
+    # RVT < 2023: the collected elements count too
+    plan.elements_delete = list(range(55))
+    assert plan.counts()['elements'] == 55
+
+
+TRUE_COEFFICIENTS = {
+    'base': 45.0, 'model_elements': 0.0004, 'sheets': 0.2, 'views': 0.08,
+    'viewtemplates': 0.05, 'paramfilters': 0.01, 'worksets': 5.0,
+    'elements': 0.01, 'purge': 0.02,
+}
+
+
+def _runs(count, rng, noise=0.0):
+    records = []
+    for _ in range(count):
+        counts = {
+            'model_elements': rng.randint(20000, 400000),
+            'sheets': rng.randint(0, 300), 'views': rng.randint(0, 1500),
+            'viewtemplates': rng.randint(0, 100),
+            'paramfilters': rng.randint(0, 80), 'worksets': rng.randint(0, 6),
+            'elements': rng.randint(0, 50000), 'purge': rng.randint(0, 3000),
+        }
+        duration = TRUE_COEFFICIENTS['base'] + sum(
+            TRUE_COEFFICIENTS[k] * counts[k] for k in cleanup_plan.PLAN_KEYS)
+        records.append({'file': 'm.rvt', 'counts': counts,
+                        'version': cleanup_plan.HISTORY_VERSION,
+                        'duration': duration * (1.0 + rng.gauss(0.0, noise))})
+    return records
+
+
+def test_estimator_defaults_without_history():
+    estimator = cleanup_plan.RunTimeEstimator.calibrate([])
+    assert estimator.runs == 0
+    assert estimator.coefficients == cleanup_plan.DEFAULT_COEFFICIENTS
+    assert estimator.estimate({}) == cleanup_plan.DEFAULT_COEFFICIENTS['base']
+    assert estimator.estimate({'sheets': 10, 'worksets': 2}) \
+        == pytest.approx(30.0 + 0.5 + 4.0)
+
+
+def test_calibrate_learns_the_coefficients_of_past_runs():
+    rng = random.Random(1)
+    records = _runs(80, rng, noise=0.02)
+    estimator = cleanup_plan.RunTimeEstimator.calibrate(records)
+    assert estimator.runs == 80
+    # The elements coefficient leaves its prior
+    assert estimator.coefficients['elements'] \
+        == pytest.approx(TRUE_COEFFICIENTS['elements'], rel=0.2)
+    for record in _runs(20, rng):
+        assert estimator.estimate(record['counts']) \
+            == pytest.approx(record['duration'], rel=0.1)
+    assert all(v >= 0.0 for v in estimator.coefficients.values())
+
+
+def test_few_runs_stay_close_to_the_prior():
+    records = _runs(2, random.Random(2))
+    estimator = cleanup_plan.RunTimeEstimator.calibrate(records)
+    default = cleanup_plan.RunTimeEstimator()
+    counts = records[0]['counts']
+    # Between the prior estimate and the observed duration
+    low, high = sorted((default.estimate(counts), records[0]['duration']))
+    assert low * 0.9 <= estimator.estimate(counts) <= high * 1.1
+
+
+def test_run_history_round_trip(tmp_path):
+    path = str(tmp_path / 'sub' / 'history.json')
+    history = cleanup_plan.RunHistory(path, max_records=3)
+    assert history.load() == []
+    for index in range(5):
+        history.append(u'Mödell_{0}.rvt'.format(index),
+                       {'sheets': index, 'elements': 10 * index,
+                        'unknown': 7}, 12.5 + index)
+    records = cleanup_plan.RunHistory(path).load()
+    assert [r['file'] for r in records] \
+        == [u'Mödell_2.rvt', u'Mödell_3.rvt', u'Mödell_4.rvt']
+    assert records[-1]['counts'] == dict(
+        (k, {'sheets': 4, 'elements': 40}.get(k, 0))
+        for k in cleanup_plan.PLAN_KEYS)
+    assert records[-1]['duration'] == 16.5
+    assert records[-1]['version'] == cleanup_plan.HISTORY_VERSION
+    assert not (tmp_path / 'sub' / 'history.json.tmp').exists()
+
+    estimator = cleanup_plan.RunTimeEstimator.calibrate(records)
+    assert estimator.runs == 3
+
+
+def test_run_history_skips_corrupt_and_uncounted_records(tmp_path):
+    path = tmp_path / 'history.json'
+    path.write_text('{not json')
+    assert cleanup_plan.RunHistory(str(path)).load() == []
+
+    counts = dict((k, 0) for k in cleanup_plan.PLAN_KEYS)
+    old_workset_run = dict(counts, worksets=2)
+    path.write_text(json.dumps({'runs': [
+        {'file': 'a', 'counts': counts, 'duration': 10.0},
+        # Version 1 run that deleted worksets: elements were not counted
+        {'file': 'b', 'counts': old_workset_run, 'duration': 90.0},
+        {'file': 'c', 'counts': old_workset_run, 'duration': 90.0,
+         'version': cleanup_plan.HISTORY_VERSION},
+        {'file': 'd', 'counts': counts, 'duration': -1},
+        {'file': 'e', 'counts': 'bad', 'duration': 3},
+        'junk',
+    ]}))
+    assert [r['file'] for r in cleanup_plan.RunHistory(str(path)).load()] \
+        == ['a', 'c']
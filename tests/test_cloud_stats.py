@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+
+import pytest
+
+import cloud_stats
+
+
+def _distributions():
+    rng = random.Random(11)
+    yield 'normal', [rng.gauss(0.01, 0.004) for _ in range(20000)]
+    yield 'lognormal', [rng.lognormvariate(-4.0, 0.8) for _ in range(20000)]
+    yield 'uniform', [rng.uniform(-0.05, 0.05) for _ in range(20000)]
+    # Scan noise plus 5 % far outliers (people, furniture behind a wall)
+    yield 'outliers', [rng.gauss(0.0, 0.003) if rng.random() > 0.05
+                       else rng.uniform(0.1, 0.5) for _ in range(20000)]
+
+
+DISTRIBUTIONS = list(_distributions())
+
+
+def _rank(values, estimate):
+    """Fraction of the values at or below the estimate; a rank measure
+    stays meaningful when a quantile falls in a gap of the distribution
+    (noise against far outliers)."""
+    below = sum(1 for v in values if v < estimate)
+    at = sum(1 for v in values if v == estimate)
+    return (below + 0.5 * at) / float(len(values))
+
+
+@pytest.mark.parametrize('label, values', DISTRIBUTIONS)
+@pytest.mark.parametrize('p', [0.05, 0.5, 0.95])
+def test_p2_quantile_rank_error(label, values, p):
+    estimate = cloud_stats.P2Quantile(p)
+    for value in values:
+        estimate.add(value)
+    assert abs(_rank(values, estimate.value()) - p) < 0.01
+
+
+def test_p2_quantile_is_exact_below_five_values():
+    estimate = cloud_stats.P2Quantile(0.5)
+    assert estimate.value() is None
+    for value in (3.0, 1.0, 2.0):
+        estimate.add(value)
+    assert estimate.value() == 2.0
+
+
+@pytest.mark.parametrize('label, values', DISTRIBUTIONS)
+def test_cell_stats_match_the_exact_statistics(label, values):
+    tolerance = 0.005
+    stats = cloud_stats.CellStats(tolerance)
+    for value in values:
+        stats.add(value)
+
+    n = len(values)
+    mean = sum(values) / n
+    std = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+    assert stats.count == n
+    assert stats.mean == pytest.approx(mean, rel=1e-9, abs=1e-15)
+    assert stats.std == pytest.approx(std, rel=1e-9)
+    assert stats.rms == pytest.approx(
+        math.sqrt(sum(v * v for v in values) / n), rel=1e-9)
+    assert (stats.min, stats.max) == (min(values), max(values))
+    assert stats.within == sum(1 for v in values if abs(v) <= tolerance)
+    assert abs(_rank(values, stats.median) - 0.5) < 0.01
+    assert abs(_rank([abs(v) for v in values], stats.p95) - 0.95) < 0.01
+
+
+def test_cell_stats_of_a_single_value():
+    stats = cloud_stats.CellStats(0.01)
+    stats.add(-0.02)
+    assert (stats.mean, stats.std, stats.rms) == (-0.02, 0.0, 0.02)
+    assert (stats.median, stats.p95, stats.within) == (-0.02, 0.02, 0)
+
+
+def _rank_error(sketch, values):
+    return max(abs(_rank(values, sketch.quantile(q)) - q)
+               for q in [i / 20.0 for i in range(1, 20)])
+
+
+@pytest.mark.parametrize('label, values', DISTRIBUTIONS)
+def test_quantile_sketch_rank_error(label, values):
+    sketch = cloud_stats.QuantileSketch(k=200)
+    sketch.extend(values)
+    assert sketch.count == len(values)
+    assert sketch._retained() < 1000
+    assert _rank_error(sketch, values) < 0.01
+
+
+def test_merged_sketches_keep_the_rank_error():
+    values = DISTRIBUTIONS[1][1]
+    merged = cloud_stats.QuantileSketch(k=200, seed=1)
+    for start in range(0, len(values), 3000):
+        part = cloud_stats.QuantileSketch(k=200, seed=start)
+        part.extend(values[start:start + 3000])
+        merged.merge(part)
+    assert merged.count == len(values)
+    assert _rank_error(merged, values) < 0.01
+    assert cloud_stats.QuantileSketch().quantile(0.5) is None
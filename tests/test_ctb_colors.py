@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import collections
+import csv
+import io
+import os
+import random
+
+import pytest
+
+import ctb_colors
+from tests import conftest
+
+
+CTB_PATH = os.path.join(conftest.ROOT, 'pyESA.tab', 'Import-Export.panel',
+                        'DwgToRevit.pushbutton', 'ESA_CTB1_Arc.csv')
+
+
+def ctb_colors_rgb():
+    """Color_RGB column of the bundled CTB, parsed as DwgToRevit does."""
+    with io.open(CTB_PATH, encoding='utf-8') as f:
+        rows = list(csv.reader(f, delimiter=';'))[1:]
+    return [[int(c) for c in row[1].split(',')] if ',' in row[1] else row[1] for row in rows]
+
+
+def brute_force(colors, rgb, max_delta_e=ctb_colors.MAX_DELTA_E):
+    """Exact match (last row wins), else the nearest colour, ties to the lower index."""
+    last = dict((tuple(c), i) for i, c in enumerate(colors)
+                if isinstance(c, list) and len(c) == 3)
+    if tuple(rgb) in last:
+        return last[tuple(rgb)]
+    lab = ctb_colors.rgb_to_lab(rgb)
+    best = None
+    for color, index in sorted(last.items(), key=lambda item: item[1]):
+        distance = ctb_colors.delta_e(lab, ctb_colors.rgb_to_lab(color))
+        if distance < max_delta_e and (best is None or distance < best[0]):
+            best = (distance, index)
+    return None if best is None else best[1]
+
+
+def last_row(colors, rgb):
+    return max(i for i, c in enumerate(colors) if c == list(rgb))
+
+
+@pytest.fixture(scope='module')
+def ctb():
+    return ctb_colors_rgb()
+
+
+def test_exact_rgb_hits_the_last_row_of_the_bundled_ctb(ctb):
+    matcher = ctb_colors.ColorMatcher(ctb)
+    repeated = [rgb for rgb, n in collections.Counter(tuple(c) for c in ctb).items() if n > 1]
+    assert repeated
+    for index, color in enumerate(ctb):
+        assert matcher.match(color) == last_row(ctb, color)
+        assert ctb[matcher.match(color)] == color
+    assert matcher.match_all([ctb[0], ctb[-1]]) == [last_row(ctb, ctb[0]), len(ctb) - 1]
+
+
+def test_nearest_matches_brute_force_across_grid_cells(ctb):
+    rng = random.Random(3)
+    matcher = ctb_colors.ColorMatcher(ctb)
+    cell = matcher._cell
+    crossed = 0
+    queries = [[rng.randrange(256) for _ in range(3)] for _ in range(1500)]
+    # Small offsets of CTB colours, whose nearest CTB colour is often in the
+    # next grid cell
+    for color in ctb[::3]:
+        for _ in range(6):
+            queries.append([min(255, max(0, c + rng.randint(-9, 9))) for c in color])
+    for rgb in queries:
+        expected = brute_force(ctb, rgb)
+        assert matcher.match(rgb) == expected, rgb
+        if expected is not None and cell(ctb_colors.rgb_to_lab(rgb)) \
+                != cell(ctb_colors.rgb_to_lab(ctb[expected])):
+            crossed += 1
+    assert crossed > 50
+
+
+def test_colours_on_cell_edges():
+    # Greys whose L* spans several cells around a CTB grey
+    colors = [[120, 120, 120], [0, 0, 255]]
+    matcher = ctb_colors.ColorMatcher(colors, max_delta_e=10.0)
+    greys = [[grey] * 3 for grey in range(95, 146)]
+    assert len(set(matcher._cell(ctb_colors.rgb_to_lab(rgb)) for rgb in greys)) >= 3
+    for rgb in greys:
+        assert matcher.match(rgb) == brute_force(colors, rgb, 10.0)
+    # Exactly max_delta_e away is not a match
+    far = ctb_colors.ColorMatcher([[0, 0, 0]], max_delta_e=ctb_colors.delta_e(
+        ctb_colors.rgb_to_lab([0, 0, 0]), ctb_colors.rgb_to_lab([10, 10, 10])))
+    assert far.match([10, 10, 10]) is None
+    assert far.match([9, 9, 9]) == 0
+
+
+def test_ties_go_to_the_lower_index():
+    colors = [[100, 100, 100], [100, 100, 100], [0, 0, 0]]
+    matcher = ctb_colors.ColorMatcher(colors)
+    # Exact: the last row wins, as the old nested loop did
+    assert matcher.match([100, 100, 100]) == 1
+    assert matcher.match([101, 101, 101]) == 1
+
+
+def test_rows_without_rgb_are_ignored_and_zero_delta_is_exact_only():
+    colors = ['', [255, 0, 0], 'ByLayer', [1, 2], [0, 0, 255]]
+    assert ctb_colors.ColorMatcher(colors).match_all(
+        [[255, 0, 0], [250, 2, 2], [0, 0, 250], [0, 255, 0]]) == [1, 1, 4, None]
+    exact_only = ctb_colors.ColorMatcher(colors, max_delta_e=0)
+    assert exact_only.match_all([[255, 0, 0], [250, 2, 2]]) == [1, None]
+
+
+class SubCategory(object):
+
+    def __init__(self, value, name):
+        self.Id = collections.namedtuple('ElementId', 'Value')(value)
+        self.Name = name
+
+
+def test_unique_by_id_keeps_the_first_subcategory_in_order():
+    a, b, c = SubCategory(1, 'A'), SubCategory(2, 'B'), SubCategory(3, 'C')
+    shared = SubCategory(2, 'B from the second DWG')
+    items = [a, b, c, shared, a, SubCategory(4, 'D')]
+    unique = ctb_colors.unique_by_id(items, lambda sc: sc.Id.Value)
+    assert [sc.Name for sc in unique] == ['A', 'B', 'C', 'D']
+    assert unique[1] is b
+    assert ctb_colors.unique_by_id([], lambda sc: sc.Id.Value) == []
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+
+import pytest
+
+import filter_space
+
+from tests import point_cloud_fakes as fakes
+
+
+@pytest.fixture(scope='module')
+def pca():
+    return fakes.load_script()
+
+
+@pytest.mark.parametrize('n_faces, max_faces, expected', [
+    (7, 5, [0, 1, 2, 4, 5]),
+    (12, 5, [0, 2, 4, 7, 9]),
+    (10, 5, [0, 2, 4, 6, 8]),
+    (3, 5, [0, 1, 2]),
+    (1, 5, [0]),
+    (0, 5, []),
+])
+def test_probed_faces_are_evenly_spaced(n_faces, max_faces, expected):
+    probed = filter_space.probe_faces(
+        list(range(n_faces)), lambda face: (face, 0), max_faces)
+    assert [index for index, _ in probed] == expected
+
+
+def test_faces_that_cannot_be_probed_are_skipped():
+    probed = filter_space.probe_faces(
+        list(range(7)), lambda face: None if face == 2 else (1, 0))
+    assert [index for index, _ in probed] == [0, 1, 4, 5]
+
+
+def test_vote_and_cache(tmp_path):
+    assert filter_space.vote([(5, 2), (0, 9), (1, 8)])[0] \
+        == filter_space.SPACE_CLOUD
+    assert filter_space.vote([(3, 3), (4, 4)]) \
+        == (filter_space.SPACE_MODEL, {'model': 0, 'cloud': 0})
+
+    path = str(tmp_path / 'spaces.json')
+    cache = filter_space.FilterSpaceCache(path)
+    probes = []
+    detection = filter_space.detect(
+        cache, 'k', list(range(4)),
+        lambda face: probes.append(face) or (0, 10))
+    assert (detection.space, detection.cached) == ('cloud', False)
+    assert probes == [0, 1, 2, 3]
+    # Read back from disk, nothing probed again
+    detection = filter_space.detect(
+        filter_space.FilterSpaceCache(path), 'k', list(range(4)),
+        lambda face: pytest.fail('probed a cached key'))
+    assert (detection.space, detection.cached) == ('cloud', True)
+
+
+def _walls(count=7):
+    """Planar faces in a row, each 4 x 3 ft, in model coordinates."""
+    return [fakes.PlanarFace((6.0 * k, 0.0, 0.0), (1, 0, 0), (0, 0, 1),
+                             4.0, 3.0) for k in range(count)]
+
+
+def _scan(faces, transform, convention, rng, per_face=200):
+    points = []
+    for face in faces:
+        for _ in range(per_face):
+            points.append(tuple(face.point(rng.uniform(0.0, 4.0),
+                                           rng.uniform(0.0, 3.0),
+                                           rng.gauss(0.0, 0.01))))
+    return fakes.cloud_from_model(points, transform,
+                                  filter_space=convention, spacing=0.2)
+
+
+@pytest.fixture
+def detect(pca, monkeypatch, tmp_path):
+    path = str(tmp_path / 'filterspace.json')
+    monkeypatch.setattr(pca, 'filter_space_cache',
+                        lambda: filter_space.FilterSpaceCache(path))
+
+    def run(cloud, faces):
+        pca.doc.elements[cloud.cloud_type.Id.Value] = cloud.cloud_type
+        return pca.detect_filter_space(
+            cloud, cloud.GetTotalTransform(), faces, 0.5)
+    return run
+
+
+@pytest.mark.parametrize('convention', ['model', 'cloud'])
+@pytest.mark.parametrize('transform', [
+    fakes.Transform.rotation_z(math.radians(30), (120.0, -40.0, 3.0)),
+    fakes.Transform.rotation_z(0.0, (500.0, 250.0, 0.0)),
+])
+def test_detects_the_convention_of_the_cloud(detect, convention, transform):
+    faces = _walls()
+    cloud = _scan(faces, transform, convention, random.Random(9))
+    to_cloud, detection = detect(cloud, faces)
+
+    assert detection.space == convention
+    assert not detection.cached
+    assert [index for index, _ in detection.probes] == [0, 1, 2, 4, 5]
+    # Two queries (model box, cloud box) per probed face
+    assert cloud.queries == 10
+    if convention == 'cloud':
+        probe = fakes.XYZ(3.0, 1.0, 2.0)
+        assert tuple(to_cloud.OfPoint(probe)) == pytest.approx(
+            tuple(transform.Inverse.OfPoint(probe)))
+    else:
+        assert to_cloud is None
+
+    # The decision is cached: a second cloud of the same type is not probed
+    again = _scan(faces, transform, convention, random.Random(10))
+    to_cloud_again, detection = detect(again, faces)
+    assert detection.cached and detection.space == convention
+    assert again.queries == 0
+    assert (to_cloud_again is None) == (to_cloud is None)
+
+
+def test_identity_transform_is_not_probed(detect):
+    faces = _walls(3)
+    cloud = _scan(faces, fakes.Transform(), 'cloud', random.Random(11))
+    assert detect(cloud, faces) == (None, None)
+    assert cloud.queries == 0
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+import glob
+import os
+
+import pytest
+
+import ifc_queue
+import job_journal
+
+
+class Crash(BaseException):
+    """Revit going down mid-export: not caught by the queue."""
+
+
+class FakeExporter(object):
+    """export_file of IfcExportQueue.run writing a small IFC per file."""
+
+    def __init__(self, fail=(), raise_on=(), crash_on=()):
+        self.fail = set(fail)
+        self.raise_on = set(raise_on)
+        self.crash_on = set(crash_on)
+        self.calls = []
+
+    def __call__(self, rvt_file, out_folder, out_name):
+        name = os.path.basename(rvt_file)
+        self.calls.append(name)
+        if name in self.crash_on:
+            raise Crash(name)
+        if name in self.raise_on:
+            raise RuntimeError('cannot open ' + name)
+        if name in self.fail:
+            return ifc_queue.STATUS_FAILED, '3D IFC'
+        with open(os.path.join(out_folder, out_name), 'w') as f:
+            f.write('ISO-10303-21; ' + name)
+        return ifc_queue.STATUS_EXPORTED, '3D IFC'
+
+
+def _rvt_files(folder, count):
+    files = []
+    for index in range(count):
+        path = os.path.join(str(folder), 'model_{:02d}.rvt'.format(index))
+        with open(path, 'w') as f:
+            f.write('rvt' * (index + 1))
+        files.append(path)
+    return files
+
+
+def _queue(folder, files, shard=(0, 1), options=None):
+    return ifc_queue.IfcExportQueue(files, str(folder), options or {'view': '3D IFC'}, shard=shard)
+
+
+@pytest.mark.parametrize('text, shard', [
+    ('', (0, 1)), (None, (0, 1)), ('1/1', (0, 1)), (' 2/3 ', (1, 3))])
+def test_parse_shard(text, shard):
+    assert ifc_queue.parse_shard(text) == shard
+
+
+@pytest.mark.parametrize('text', ['3', '0/2', '3/2', '1/0', 'a/b', '1/2/3'])
+def test_parse_shard_rejects_bad_text(text):
+    with pytest.raises(ValueError):
+        ifc_queue.parse_shard(text)
+
+
+@pytest.mark.parametrize('count', [1, 2, 3, 7])
+def test_shards_partition_the_files_whatever_their_order(tmp_path, count):
+    files = _rvt_files(tmp_path, 20)
+    reordered = files[7:] + files[:7]
+    shards = [ifc_queue.shard_files(files, index, count) for index in range(count)]
+    assert sorted(sum(shards, [])) == sorted(files)
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
+    for index, shard in enumerate(shards):
+        # Same split in every session, in the order of the selection
+        assert sorted(ifc_queue.shard_files(reordered, index, count)) == sorted(shard)
+        assert shard == [f for f in files if f in shard]
+
+
+def test_sharded_sessions_export_every_file_once_and_skip_each_other(tmp_path):
+    files = _rvt_files(tmp_path, 9)
+    exporter = FakeExporter()
+    for index in range(3):
+        _queue(tmp_path, files, shard=(index, 3)).run(exporter)
+    assert sorted(exporter.calls) == sorted(os.path.basename(f) for f in files)
+    assert len(glob.glob(str(tmp_path / 'IfcExport_journal_shard*of3.jsonl'))) == 3
+
+    # An unsharded run reads every shard journal
+    results = _queue(tmp_path, files).run(exporter)
+    assert [r.status for r in results] == [ifc_queue.STATUS_UP_TO_DATE] * 9
+    assert len(exporter.calls) == 9
+
+
+def test_resume_after_a_crash_exports_only_the_unfinished_files(tmp_path):
+    files = _rvt_files(tmp_path, 5)
+    with pytest.raises(Crash):
+        _queue(tmp_path, files).run(FakeExporter(crash_on=['model_02.rvt']))
+    state = ifc_queue.read_state(str(tmp_path))
+    assert state.status(files[2]) == 'interrupted'
+
+    exporter = FakeExporter()
+    results = _queue(tmp_path, files).run(exporter)
+    assert exporter.calls == ['model_02.rvt', 'model_03.rvt', 'model_04.rvt']
+    assert [r.status for r in results] == [ifc_queue.STATUS_UP_TO_DATE] * 2 \
+        + [ifc_queue.STATUS_EXPORTED] * 3
+    assert all(r.ok and r.size > 0 for r in results)
+
+
+def test_changed_source_mtime_or_size_is_exported_again(tmp_path):
+    files = _rvt_files(tmp_path, 3)
+    _queue(tmp_path, files).run(FakeExporter())
+
+    stat = os.stat(files[0])
+    os.utime(files[0], (stat.st_atime, stat.st_mtime + 10))
+    with open(files[1], 'a') as f:
+        f.write('saved again')
+    exporter = FakeExporter()
+    results = _queue(tmp_path, files).run(exporter)
+    assert exporter.calls == ['model_00.rvt', 'model_01.rvt']
+    assert results[2].status == ifc_queue.STATUS_UP_TO_DATE
+
+
+def test_changed_options_missing_ifc_or_no_resume_export_again(tmp_path):
+    files = _rvt_files(tmp_path, 2)
+    _queue(tmp_path, files).run(FakeExporter())
+
+    exporter = FakeExporter()
+    _queue(tmp_path, files, options={'view': 'Other'}).run(exporter)
+    assert exporter.calls == ['model_00.rvt', 'model_01.rvt']
+
+    os.remove(str(tmp_path / 'model_01.ifc'))
+    exporter = FakeExporter()
+    _queue(tmp_path, files, options={'view': 'Other'}).run(exporter)
+    assert exporter.calls == ['model_01.rvt']
+
+    exporter = FakeExporter()
+    queue = ifc_queue.IfcExportQueue(files, str(tmp_path), {'view': 'Other'}, resume=False)
+    queue.run(exporter)
+    assert exporter.calls == ['model_00.rvt', 'model_01.rvt']
+
+
+def test_failures_are_recorded_and_retried(tmp_path):
+    files = _rvt_files(tmp_path, 3)
+    progress = []
+    results = _queue(tmp_path, files).run(
+        FakeExporter(fail=['model_00.rvt'], raise_on=['model_01.rvt']),
+        on_progress=lambda done, total: progress.append((done, total)))
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    assert [r.status for r in results] == [ifc_queue.STATUS_FAILED] * 2 \
+        + [ifc_queue.STATUS_EXPORTED]
+    assert results[1].message == 'cannot open model_01.rvt'
+    assert results[0].out_path is None and results[0].size is None
+    state = ifc_queue.read_state(str(tmp_path))
+    assert state.status(files[1]) == job_journal.OUTCOME_ERROR
+
+    exporter = FakeExporter()
+    _queue(tmp_path, files).run(exporter)
+    assert exporter.calls == ['model_00.rvt', 'model_01.rvt']
+
+
+def test_exported_status_without_a_file_is_a_failure(tmp_path):
+    files = _rvt_files(tmp_path, 1)
+    results = _queue(tmp_path, files).run(
+        lambda rvt_file, out_folder, out_name: (ifc_queue.STATUS_EXPORTED, '3D IFC'))
+    assert results[0].status == ifc_queue.STATUS_FAILED
+    assert results[0].message == 'Export returned no file'
+
+
+class FakeDocument(object):
+
+    def __init__(self):
+        self.closed = []
+
+    def Close(self, save):
+        self.closed.append(save)
+
+
+def test_with_document_closes_without_saving_on_return_and_on_exception():
+    doc = FakeDocument()
+    assert ifc_queue.with_document(lambda: doc, lambda d: (ifc_queue.STATUS_EXPORTED, d)) \
+        == (ifc_queue.STATUS_EXPORTED, doc)
+    assert doc.closed == [False]
+
+    def export(d):
+        raise RuntimeError('export failed')
+
+    doc = FakeDocument()
+    with pytest.raises(RuntimeError):
+        ifc_queue.with_document(lambda: doc, export)
+    assert doc.closed == [False]
+
+
+def test_queue_closes_the_document_of_a_failed_export(tmp_path):
+    files = _rvt_files(tmp_path, 2)
+    documents = []
+
+    def open_document():
+        documents.append(FakeDocument())
+        return documents[-1]
+
+    def export(doc):
+        raise RuntimeError('Export threw')
+
+    results = _queue(tmp_path, files).run(
+        lambda rvt_file, out_folder, out_name: ifc_queue.with_document(open_document, export))
+    assert [r.status for r in results] == [ifc_queue.STATUS_FAILED] * 2
+    assert [d.closed for d in documents] == [[False], [False]]
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import job_journal
+
+
+def _journal(tmp_path):
+    return job_journal.JobJournal(str(tmp_path / 'journal.jsonl'))
+
+
+def test_status_follows_the_last_event(tmp_path):
+    journal = _journal(tmp_path)
+    assert journal.state().status('a.rvt') == 'new'
+
+    started = journal.start('a.rvt')
+    assert journal.state().status('a.rvt') == 'interrupted'
+
+    journal.mark_timeout('a.rvt', started, 60)
+    assert journal.state().status('a.rvt') == 'hung'
+
+    journal.finish('a.rvt', started, job_journal.OUTCOME_ERROR)
+    assert journal.state().status('a.rvt') == 'error'
+
+    started = journal.start('a.rvt')
+    journal.finish('a.rvt', started, job_journal.OUTCOME_OK)
+    assert journal.state().status('a.rvt') == 'ok'
+
+
+def test_truncated_last_line_is_ignored_and_repaired(tmp_path):
+    journal = _journal(tmp_path)
+    started = journal.start('a.rvt')
+    journal.finish('a.rvt', started, job_journal.OUTCOME_OK, hash='h1')
+    with open(journal.path, 'a') as f:
+        f.write('{"event": "start", "job": "b.r')
+
+    assert len(journal.read()) == 2
+    journal.start('c.rvt')
+    records = journal.read()
+    assert len(records) == 3
+    assert records[-1]['file'] == 'c.rvt'
+
+
+def test_is_completed_checks_outcome_hash_and_options(tmp_path):
+    journal = _journal(tmp_path)
+    started = journal.start('a.rvt')
+    journal.finish('a.rvt', started, job_journal.OUTCOME_OK,
+                   options='opt1', hash='h1')
+    state = journal.state()
+
+    assert state.is_completed('a.rvt', 'h1', 'opt1')
+    assert not state.is_completed('a.rvt', 'h2', 'opt1')
+    assert not state.is_completed('a.rvt', 'h1', 'opt2')
+    assert not state.is_completed('a.rvt', None, 'opt1')
+    assert not state.is_completed('b.rvt', 'h1', 'opt1')
+
+    # A run started after the completed one makes the job incomplete again
+    journal.start('a.rvt')
+    assert not journal.state().is_completed('a.rvt', 'h1', 'opt1')
+
+
+def test_callable_hash_is_only_called_for_completed_jobs(tmp_path):
+    journal = _journal(tmp_path)
+    started = journal.start('ok.rvt')
+    journal.finish('ok.rvt', started, job_journal.OUTCOME_OK,
+                   options='opt', hash='h1')
+    started = journal.start('failed.rvt')
+    journal.finish('failed.rvt', started, job_journal.OUTCOME_ERROR,
+                   options='opt')
+    state = journal.state()
+
+    calls = []
+
+    def current_hash(value):
+        def compute():
+            calls.append(value)
+            return value
+        return compute
+
+    assert not state.is_completed('new.rvt', current_hash('h1'), 'opt')
+    assert not state.is_completed('failed.rvt', current_hash('h1'), 'opt')
+    assert not state.is_completed('ok.rvt', current_hash('h1'), 'other')
+    assert calls == []
+
+    assert state.is_completed('ok.rvt', current_hash('h1'), 'opt')
+    assert calls == ['h1']
+
+
+def test_file_hash_and_options_hash(tmp_path):
+    path = tmp_path / 'model.rvt'
+    path.write_bytes(b'x' * 3000)
+    first = job_journal.file_hash(str(path), chunk_size=1024)
+    assert first == job_journal.file_hash(str(path))
+    path.write_bytes(b'x' * 2999 + b'y')
+    assert job_journal.file_hash(str(path)) != first
+    assert job_journal.file_hash(str(tmp_path / 'missing.rvt')) is None
+
+    assert (job_journal.options_hash({'a': 1, 'b': [1, 2]})
+            == job_journal.options_hash({'b': [1, 2], 'a': 1}))
+
+
+def test_watchdog_fires_after_timeout():
+    fired = threading.Event()
+    watchdog = job_journal.Watchdog(0.05, fired.set).start()
+    assert fired.wait(2.0)
+    assert watchdog.fired
+    watchdog.cancel()
+
+
+def test_watchdog_cancelled_or_disabled_never_fires():
+    calls = []
+    with job_journal.Watchdog(0.2, lambda: calls.append(1)) as watchdog:
+        pass
+    time.sleep(0.3)
+    assert calls == [] and not watchdog.fired
+
+    watchdog = job_journal.Watchdog(0, lambda: calls.append(1)).start()
+    assert watchdog._timer is None
+    watchdog.cancel()
+
+
+def test_watchdog_swallows_callback_errors():
+    done = threading.Event()
+
+    def on_timeout():
+        done.set()
+        raise RuntimeError('journal not writable')
+
+    watchdog = job_journal.Watchdog(0.01, on_timeout).start()
+    assert done.wait(2.0)
+    time.sleep(0.05)
+    assert watchdog.fired
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import random
+
+import join_graph
+
+
+class ElementId(object):
+
+    def __init__(self, value):
+        self.Value = value
+
+
+class Element(object):
+
+    def __init__(self, value):
+        self.Id = ElementId(value)
+
+
+class FakeJoinGeometryUtils(object):
+    """GetJoinedElements over a set of joined id pairs, counting calls."""
+
+    def __init__(self, joins):
+        self.joins = set(frozenset(pair) for pair in joins)
+        self.calls = {}
+
+    def GetJoinedElements(self, doc, element):
+        value = element.Id.Value
+        self.calls[value] = self.calls.get(value, 0) + 1
+        return [ElementId(other) for pair in sorted(self.joins, key=sorted)
+                for other in pair if value in pair and other != value]
+
+
+def _joined_pairs(jgu, elements):
+    """The JoinUtils call pattern: ids as keys, one API call per element."""
+    by_id = dict((e.Id.Value, e) for e in elements)
+    keys = [e.Id.Value for e in elements]
+
+    def get_joined(key):
+        return [i.Value for i in jgu.GetJoinedElements(None, by_id[key])]
+
+    return join_graph.join_edges(keys, get_joined)
+
+
+def test_one_call_per_element_and_each_edge_once():
+    elements = [Element(v) for v in (30, 10, 20, 40)]
+    jgu = FakeJoinGeometryUtils([(10, 20), (30, 10), (20, 40), (30, 40)])
+    edges = _joined_pairs(jgu, elements)
+
+    assert jgu.calls == {10: 1, 20: 1, 30: 1, 40: 1}
+    # Each join once, first element first in selection order
+    assert edges == [(30, 10), (30, 40), (10, 20), (20, 40)]
+
+
+def test_partners_outside_the_selection_are_ignored():
+    elements = [Element(v) for v in (1, 2, 3)]
+    jgu = FakeJoinGeometryUtils([(1, 2), (1, 99), (3, 98), (97, 96)])
+    assert _joined_pairs(jgu, elements) == [(1, 2)]
+    assert sorted(jgu.calls) == [1, 2, 3]
+
+
+def test_one_sided_and_repeated_join_lists_give_one_edge():
+    lists = {'a': ['b', 'b', 'c'], 'b': [], 'c': ['a', 'a']}
+    calls = []
+
+    def get_joined(key):
+        calls.append(key)
+        return lists[key]
+
+    assert join_graph.join_edges(['a', 'b', 'c'], get_joined) \
+        == [('a', 'b'), ('a', 'c')]
+    assert calls == ['a', 'b', 'c']
+    assert join_graph.join_edges([], get_joined) == []
+
+
+def test_matches_the_pairwise_check_on_a_random_model():
+    rng = random.Random(3)
+    values = list(range(100, 400))
+    joins = set()
+    while len(joins) < 600:
+        a, b = rng.sample(values, 2)
+        joins.add((a, b))
+    selection = rng.sample(values, 150)
+    jgu = FakeJoinGeometryUtils(joins)
+    edges = _joined_pairs(jgu, [Element(v) for v in selection])
+
+    # What one AreElementsJoined call per pair found
+    expected = [(a, b) for i, a in enumerate(selection)
+                for b in selection[i + 1:]
+                if frozenset((a, b)) in jgu.joins]
+    assert edges == expected
+    assert len(edges) == len(set(frozenset(e) for e in edges))
+    assert len(jgu.calls) == 150 and set(jgu.calls.values()) == {1}
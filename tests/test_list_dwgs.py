@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+ListDWGs_script on a stub document that counts its API calls. The script
+is imported with no open document, so its entry point only shows a
+dialog; the tests then point its 'doc' at a stub.
+"""
+import importlib.util
+import math
+import os
+import sys
+import types
+
+import pytest
+
+from tests import conftest
+
+
+SCRIPT_PATH = os.path.join(conftest.ROOT, 'pyESA.tab', 'Import-Export.panel',
+                           'DWGManage.pushbutton', 'ListDWGs_script.py')
+
+
+class ElementId(object):
+
+    def __init__(self, value):
+        self.IntegerValue = value
+
+    def __eq__(self, other):
+        return isinstance(other, ElementId) and other.IntegerValue == self.IntegerValue
+
+    def __hash__(self):
+        return hash(self.IntegerValue)
+
+
+class NetList(list):
+    """List[ElementId]() with Add and Count."""
+
+    def Add(self, item):
+        self.append(item)
+
+    @property
+    def Count(self):
+        return len(self)
+
+
+class GenericList(object):
+
+    def __getitem__(self, item_type):
+        return NetList
+
+
+class SubTransaction(object):
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.started = self.ended = False
+
+    def Start(self):
+        self.doc.sub_transactions += 1
+        self.started = True
+
+    def Commit(self):
+        self.ended = True
+
+    def RollBack(self):
+        self.doc.rollbacks += 1
+        self.ended = True
+
+    def HasStarted(self):
+        return self.started
+
+    def HasEnded(self):
+        return self.ended
+
+
+class Tooltip(object):
+
+    def __init__(self, creator):
+        self.Creator = creator
+
+
+class WorksharingUtils(object):
+
+    @staticmethod
+    def GetWorksharingTooltipInfo(doc, element_id):
+        doc.tooltip_reads += 1
+        creator = doc.creators[element_id.IntegerValue]
+        if creator is None:
+            raise RuntimeError('not workshared')
+        return Tooltip(creator)
+
+
+class Parameter(object):
+
+    def __init__(self, value):
+        self.value = value
+
+    def AsString(self):
+        return self.value
+
+
+class ImportInstance(object):
+
+    def __init__(self, value, name, workset_id=1, level_id=10, linked=False):
+        self.Id = ElementId(value)
+        self.Parameter = {'IMPORT_SYMBOL_NAME': Parameter(name)}
+        self.IsLinked = linked
+        self.WorksetId = ElementId(workset_id)
+        self.LevelId = ElementId(level_id)
+
+    def GetTransform(self):
+        return types.SimpleNamespace(Origin=types.SimpleNamespace(Z=3.28084))
+
+
+class Level(object):
+
+    def __init__(self, value, name):
+        self.Id = ElementId(value)
+        self.Name = name
+
+
+class FilteredElementCollector(object):
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.cls = None
+
+    def OfClass(self, cls):
+        self.cls = cls
+        return self
+
+    def WhereElementIsNotElementType(self):
+        return self
+
+    def ToElements(self):
+        return [e for e in self.doc.elements.values() if isinstance(e, self.cls)]
+
+
+class Document(object):
+    """
+    Stub document. Delete fails as a whole if the batch holds an element in
+    'undeletable', and also removes the 'dependents' of what it deletes.
+    """
+
+    def __init__(self, elements=(), undeletable=(), dependents=None, creators=None):
+        self.elements = dict((e.Id.IntegerValue, e) for e in elements)
+        self.undeletable = set(undeletable)
+        self.dependents = dependents or {}
+        self.creators = creators or {}
+        self.sub_transactions = self.rollbacks = self.tooltip_reads = 0
+        self.delete_calls = self.failed_deletes = 0
+        self.passed = []
+
+    def GetElement(self, element_id):
+        return self.elements.get(element_id.IntegerValue)
+
+    def Delete(self, ids):
+        self.delete_calls += 1
+        values = [i.IntegerValue for i in ids]
+        self.passed.extend(values)
+        bad = self.undeletable.intersection(values)
+        if bad:
+            self.failed_deletes += 1
+            raise RuntimeError('element {0} cannot be deleted'.format(min(bad)))
+        for value in values:
+            self.elements.pop(value, None)
+            for dependent in self.dependents.get(value, ()):
+                self.elements.pop(dependent, None)
+
+    def GetWorksetTable(self):
+        names = {1: 'Workset1', 2: 'View "Level 1"'}
+        return types.SimpleNamespace(GetWorkset=lambda i: types.SimpleNamespace(
+            Name=names[i.IntegerValue]))
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def _placeholder(name):
+    return type(name, (object,), {'__init__': lambda self, *args, **kwargs: None})
+
+
+def _fake_modules(dialogs):
+    db = _module(
+        'Autodesk.Revit.DB', FilteredElementCollector=FilteredElementCollector,
+        ImportInstance=ImportInstance, Level=Level,
+        BuiltInParameter=types.SimpleNamespace(IMPORT_SYMBOL_NAME='IMPORT_SYMBOL_NAME'),
+        WorksharingUtils=WorksharingUtils, Transaction=_placeholder('Transaction'),
+        SubTransaction=SubTransaction, ElementId=ElementId,
+        UnitUtils=types.SimpleNamespace(ConvertFromInternalUnits=lambda v, unit: v * 0.3048),
+        UnitTypeId=types.SimpleNamespace(Meters='m'))
+    ui = _module('Autodesk.Revit.UI', TaskDialog=types.SimpleNamespace(
+        Show=lambda title, text: dialogs.append((title, text))))
+    windows = _module('System.Windows', Window=_placeholder('Window'),
+                      **dict((n, _placeholder(n)) for n in (
+                          'MessageBox', 'MessageBoxButton', 'MessageBoxResult')))
+    return {
+        'clr': _module('clr', AddReference=lambda name: None),
+        'Autodesk': _module('Autodesk'),
+        'Autodesk.Revit': _module('Autodesk.Revit'),
+        'Autodesk.Revit.DB': db,
+        'Autodesk.Revit.UI': ui,
+        'System': _module('System'),
+        'System.Collections': _module('System.Collections'),
+        'System.Collections.Generic': _module('System.Collections.Generic', List=GenericList()),
+        'System.Collections.ObjectModel': _module(
+            'System.Collections.ObjectModel', ObservableCollection=GenericList()),
+        'System.Windows': windows,
+        'System.Windows.Markup': _module('System.Windows.Markup',
+                                         XamlReader=_placeholder('XamlReader')),
+        'System.IO': _module('System.IO', StreamReader=_placeholder('StreamReader')),
+    }
+
+
+@pytest.fixture(scope='module')
+def script():
+    dialogs = []
+    modules = _fake_modules(dialogs)
+    saved = dict((name, sys.modules.get(name)) for name in modules)
+    sys.modules.update(modules)
+    try:
+        spec = importlib.util.spec_from_file_location('ListDWGs_script', SCRIPT_PATH)
+        module = importlib.util.module_from_spec(spec)
+        module.__revit__ = types.SimpleNamespace(
+            ActiveUIDocument=types.SimpleNamespace(Document=None))
+        spec.loader.exec_module(module)
+    finally:
+        for name, previous in saved.items():
+            if previous is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = previous
+    assert dialogs == [('DWG Manage', 'No document is open.')]
+    yield module
+    module.doc = None
+
+
+def _dwgs(count):
+    return [ImportInstance(1000 + i, 'Plan {0}.dwg'.format(i), workset_id=1 + i % 2)
+            for i in range(count)]
+
+
+@pytest.mark.parametrize('count', [1, 2, 64, 1000])
+def test_one_undeletable_dwg_is_isolated_in_log_sub_transactions(script, count):
+    dwgs = _dwgs(count)
+    bad = dwgs[count // 2].Id
+    script.doc = Document(dwgs, undeletable=[bad.IntegerValue])
+    deleted, failed = script.delete_elements([d.Id for d in dwgs])
+
+    assert deleted == [d.Id for d in dwgs if d.Id != bad]
+    assert [(eid, message) for eid, message in failed] == [
+        (bad, 'element {0} cannot be deleted'.format(bad.IntegerValue))]
+    assert list(script.doc.elements) == [bad.IntegerValue]
+    bound = 2 * math.ceil(math.log(count, 2)) + 1
+    assert script.doc.sub_transactions == script.doc.delete_calls <= bound
+    # Every failed SubTransaction is rolled back
+    assert script.doc.rollbacks == script.doc.failed_deletes > 0
+
+
+def test_clean_deletion_is_one_sub_transaction(script):
+    dwgs = _dwgs(500)
+    script.doc = Document(dwgs)
+    deleted, failed = script.delete_elements([d.Id for d in dwgs])
+    assert len(deleted) == 500 and failed == []
+    assert (script.doc.sub_transactions, script.doc.delete_calls, script.doc.rollbacks) == (1, 1, 0)
+
+
+def test_elements_already_gone_are_not_passed_to_delete(script):
+    dwgs = _dwgs(8)
+    # Deleting the first DWG also removes the sixth one, which comes in a
+    # later batch because the last DWG fails
+    script.doc = Document(dwgs, undeletable=[1007], dependents={1000: [1005]})
+    deleted, failed = script.delete_elements([d.Id for d in dwgs])
+    assert [eid.IntegerValue for eid, _ in failed] == [1007]
+    # Only in the first, failed, batch of all the DWGs
+    assert script.doc.passed.count(1005) == 1
+    assert script.doc.elements.keys() == {1007}
+    assert script.doc.rollbacks == script.doc.failed_deletes
+    assert script.doc.sub_transactions == script.doc.delete_calls
+
+
+def test_created_by_is_read_lazily_once_per_row(script):
+    dwgs = _dwgs(5) + [ImportInstance(2000, 'Linked.dwg', linked=True)]
+    creators = dict((d.Id.IntegerValue, 'user{0}'.format(i)) for i, d in enumerate(dwgs))
+    creators[1003] = None
+    script.doc = Document(dwgs + [Level(10, 'Level 1')], creators=creators)
+
+    rows = script.collect_dwg_rows()
+    assert [row.DwgName for row in rows] == ['Plan {0}.dwg'.format(i) for i in range(5)]
+    assert script.doc.tooltip_reads == 0
+    assert rows[1].WorksetName == 'View "Level 1"' and rows[1].ViewSpecific == 'YES'
+    assert rows[0].HostedLevel == 'Level 1' and rows[0].OffsetZ == '1.000 m (3.281 ft)'
+
+    assert [rows[0].CreatedBy, rows[0].CreatedBy] == ['user0', 'user0']
+    assert script.doc.tooltip_reads == 1
+    # A failed read is kept as N/A and not retried
+    assert [rows[3].CreatedBy, rows[3].CreatedBy] == ['N/A', 'N/A']
+    assert script.doc.tooltip_reads == 2
+    assert [row.CreatedBy for row in rows] == ['user0', 'user1', 'user2', 'N/A', 'user4']
+    assert script.doc.tooltip_reads == 5
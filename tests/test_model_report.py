@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+import random
+
+import model_report
+
+
+class ElementId(object):
+    def __init__(self, value):
+        self.IntegerValue = value
+
+
+class Category(object):
+    def __init__(self, name):
+        self.Name = name
+
+
+class Element(object):
+    """Element stub counting its Dispose() calls."""
+
+    def __init__(self, workset_id, category_name):
+        self.WorksetId = ElementId(workset_id)
+        self.Category = Category(category_name)
+        self.disposed = 0
+
+    def Dispose(self):
+        self.disposed += 1
+
+
+class Workset(object):
+    def __init__(self, workset_id, name):
+        self.Id = ElementId(workset_id)
+        self.Name = name
+
+
+class Collector(object):
+    """FilteredElementCollector stub counting its passes."""
+
+    passes = 0
+
+    def __init__(self, elems):
+        self.elems = elems
+
+    def __iter__(self):
+        Collector.passes += 1
+        return iter(self.elems)
+
+
+class Warning(object):
+    """FailureMessage stub counting the API calls."""
+
+    calls = 0
+
+    def __init__(self, description, element_ids):
+        self.description = description
+        self.element_ids = [ElementId(x) for x in element_ids]
+
+    def GetDescriptionText(self):
+        Warning.calls += 1
+        return self.description
+
+    def GetFailingElements(self):
+        Warning.calls += 1
+        return self.element_ids
+
+
+def old_categories_rows(chapter, user_worksets, elems, safe_str):
+    """Chapter 04 before the matrix: one collector per user workset."""
+    worksets_categories = []
+    for uw in user_worksets:
+        elems_worksets = Collector([e for e in elems
+                                    if e.WorksetId.IntegerValue == uw.Id.IntegerValue])
+        elems_category_name = []
+        for ew in elems_worksets:
+            if ew.Category.Name not in elems_category_name:
+                elems_category_name.append(safe_str(ew.Category.Name))
+                ew.Dispose()
+        worksets_categories.append(elems_category_name)
+    rows = []
+    for uw, w_categories in zip(user_worksets, worksets_categories):
+        for wc in w_categories:
+            rows.append((chapter, 'Categories per Workset', '', uw.Id.IntegerValue,
+                         'Workset Name', safe_str(uw.Name), 'Category Name', wc))
+    return rows
+
+
+def synthetic_model(rng, count):
+    categories = ['Walls', 'Doors', 'Floors', 'Text Notes', 'Generic Models']
+    # Workset 9 holds elements but is not a user workset (e.g. a view workset)
+    worksets = [Workset(i, 'Workset {}'.format(i)) for i in (4, 1, 7, 2)]
+    elems = [Element(rng.choice((1, 2, 4, 7, 9)), rng.choice(categories))
+             for _ in range(count)]
+    return worksets, elems
+
+
+def old_classify(warnings, rows, element_level):
+    """Chapter 06 before the dictionary: zip(*rows) and list.index."""
+    warnings_data = list(zip(*rows))
+    wd_description = list(warnings_data[0])
+    result = []
+    for wrn in warnings:
+        desc = wrn.GetDescriptionText()
+        if desc in wd_description:
+            score = warnings_data[1][wd_description.index(desc)]
+        else:
+            score = '04_Unclassified'
+        elements = ';'.join([str(x.IntegerValue) for x in wrn.GetFailingElements()])
+        if len(wrn.GetFailingElements()) > 0:
+            level = element_level(wrn.GetFailingElements()[0])
+        else:
+            level = 'Undefined'
+        result.append((desc, score, elements, level))
+    return result
+
+
+def synthetic(rng, count):
+    descriptions = ['Warning {}'.format(i) for i in range(300)]
+    # Duplicated descriptions: the first classification wins
+    rows = [[d, '0{}_Class'.format(rng.randint(1, 3)), 'note']
+            for d in descriptions[:200]]
+    rows += [[d, '09_Duplicate', 'note'] for d in descriptions[:20]]
+    warnings = []
+    for _ in range(count):
+        ids = [rng.randint(1000, 1500) for _ in range(rng.randint(0, 3))]
+        warnings.append(Warning(rng.choice(descriptions), ids))
+    return rows, warnings
+
+
+def level_of(elem_id):
+    return 'Level {}'.format(elem_id.IntegerValue % 7)
+
+
+def test_categories_per_workset_matches_the_collector_per_workset():
+    worksets, elems = synthetic_model(random.Random(27), 5000)
+    expected = old_categories_rows('04 WORKSETS', worksets, elems, str)
+    for elem in elems:
+        elem.disposed = 0
+
+    Collector.passes = 0
+    matrix = model_report.worksets_categories(Collector(elems), str)
+    rows = model_report.categories_per_workset_rows(
+        '04 WORKSETS', worksets, matrix, str)
+
+    assert Collector.passes == 1
+    assert [row[:8] for row in rows] == expected
+    assert [row[8:11] for row in rows] == [('', '', 'Nr Elements')] * len(rows)
+    for row in rows:
+        assert row[11] == sum(1 for e in elems
+                              if e.WorksetId.IntegerValue == row[3]
+                              and e.Category.Name == row[7])
+    assert all(elem.disposed == 1 for elem in elems)
+
+
+def test_worksets_categories_matrix_in_first_seen_order():
+    elems = [Element(2, 'Walls'), Element(1, 'Doors'), Element(2, 'Floors'),
+             Element(2, 'Walls'), Element(1, 'Doors')]
+    matrix = model_report.worksets_categories(elems, str.upper)
+    assert list(matrix.items()) == [
+        (2, model_report.OrderedDict([('WALLS', 2), ('FLOORS', 1)])),
+        (1, model_report.OrderedDict([('DOORS', 2)]))]
+
+
+def test_workset_without_elements_has_no_rows():
+    matrix = model_report.worksets_categories([Element(1, 'Walls')], str)
+    rows = model_report.categories_per_workset_rows(
+        '04', [Workset(3, 'Empty'), Workset(1, 'Shared')], matrix, str)
+    assert rows == [('04', 'Categories per Workset', '', 1, 'Workset Name',
+                     'Shared', 'Category Name', 'Walls', '', '', 'Nr Elements', 1)]
+
+
+def test_classify_warnings_matches_the_list_index_lookup():
+    rows, warnings = synthetic(random.Random(28), 3000)
+    expected = old_classify(warnings, rows, level_of)
+
+    got = model_report.classify_warnings(
+        warnings, model_report.warning_classes(rows), level_of)
+
+    assert got == expected
+    assert set(r[1] for r in got) >= set(['04_Unclassified', '01_Class'])
+    assert '09_Duplicate' not in set(r[1] for r in got)
+
+
+def test_levels_and_api_calls_once_per_element_and_warning():
+    rows, warnings = synthetic(random.Random(7), 2000)
+    looked_up = []
+
+    def level(elem_id):
+        looked_up.append(elem_id.IntegerValue)
+        return level_of(elem_id)
+
+    Warning.calls = 0
+    model_report.classify_warnings(warnings, {}, level)
+
+    assert Warning.calls == 2 * len(warnings)
+    assert len(looked_up) == len(set(looked_up))
+    assert set(looked_up) == set(w.element_ids[0].IntegerValue
+                                 for w in warnings if w.element_ids)
+
+
+def test_warning_classes_skips_rows_without_classification():
+    classes = model_report.warning_classes(
+        [['A', '01_Critical'], ['B'], [], ['A', '02_High'], ['C', '03_Low', 'x']])
+    assert classes == {'A': '01_Critical', 'C': '03_Low'}
+
+
+def test_no_warnings():
+    assert model_report.classify_warnings([], {'A': '01_Critical'}, level_of) == []
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+import random
+import struct
+
+import pytest
+
+import parquet_writer
+from parquet_writer import TYPE_DOUBLE, TYPE_INT64, TYPE_STRING
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+needs_pyarrow = pytest.mark.skipif(pq is None, reason='pyarrow not installed')
+
+
+# Thrift compact protocol and RLE / bit-packing hybrid decoders, so the
+# file layout is checked without pyarrow
+
+class _Reader(object):
+
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+
+    def byte(self):
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def varint(self):
+        shift = result = 0
+        while True:
+            b = self.byte()
+            result |= (b & 0x7F) << shift
+            if not b & 0x80:
+                return result
+            shift += 7
+
+    def zigzag(self):
+        n = self.varint()
+        return (n >> 1) ^ -(n & 1)
+
+    def value(self, ttype):
+        if ttype in (1, 2):
+            return ttype == 1
+        if ttype == 3:
+            return self.byte()
+        if ttype in (4, 5, 6):
+            return self.zigzag()
+        if ttype == 8:
+            size = self.varint()
+            self.pos += size
+            return self.data[self.pos - size:self.pos]
+        if ttype == 9:
+            header = self.byte()
+            size, elem_type = header >> 4, header & 0x0F
+            if size == 15:
+                size = self.varint()
+            return [self.value(elem_type) for _ in range(size)]
+        if ttype == 12:
+            return self.struct()
+        raise ValueError(ttype)
+
+    def struct(self):
+        fields = {}
+        last_id = 0
+        while True:
+            header = self.byte()
+            if header == 0:
+                return fields
+            delta, ttype = header >> 4, header & 0x0F
+            field_id = last_id + delta if delta else self.zigzag()
+            fields[field_id] = self.value(ttype)
+            last_id = field_id
+
+
+def decode_hybrid(data, bit_width, count):
+    reader = _Reader(data)
+    values = []
+    while len(values) < count:
+        header = reader.varint()
+        if header & 1:
+            bits = 0
+            acc = 0
+            for _ in range((header >> 1) * bit_width):
+                acc |= reader.byte() << bits
+                bits += 8
+            for k in range((header >> 1) * 8):
+                values.append((acc >> (k * bit_width)) & ((1 << bit_width) - 1))
+        else:
+            value = 0
+            for k in range((bit_width + 7) // 8):
+                value |= reader.byte() << (8 * k)
+            values.extend([value] * (header >> 1))
+    return values[:count]
+
+
+def read_footer(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[:4] == data[-4:] == parquet_writer.MAGIC
+    size = struct.unpack('<i', data[-8:-4])[0]
+    return data, _Reader(data, len(data) - 8 - size).struct()
+
+
+def _write(path, columns, rows, row_group_rows=parquet_writer.ROW_GROUP_ROWS):
+    with parquet_writer.ParquetWriter(str(path), columns, row_group_rows) as writer:
+        for row in rows:
+            writer.write_values(row)
+    return writer
+
+
+COLUMNS = [('ID', TYPE_INT64), ('Category', TYPE_STRING),
+           ('Volume', TYPE_DOUBLE), ('Comment', TYPE_STRING)]
+
+
+def _rows(count, rng):
+    categories = [u'Walls', u'Floors', u'Türen', u'Fenêtres', u'窓', u'Columns']
+    rows = []
+    for index in range(count):
+        rows.append([
+            index if index % 17 else None,
+            rng.choice(categories),
+            None if index % 11 == 0 else rng.uniform(-5.0, 500.0),
+            rng.choice([u'', None, u'ok', u'to check ✓', u'x' * 300])
+            if index % 3 else u'unique {0}'.format(index),
+        ])
+    return rows
+
+
+def _expected(rows):
+    # '' is written as a null
+    return [[None if v == '' else v for v in row] for row in rows]
+
+
+@pytest.mark.parametrize('width', [1, 2, 3, 7, 8, 12, 20])
+def test_hybrid_round_trip(width):
+    rng = random.Random(width)
+    values = []
+    while len(values) < 3000:
+        value = rng.randrange(1 << width)
+        values.extend([value] * rng.choice([1, 1, 2, 5, 8, 9, 40]))
+    encoded = parquet_writer.encode_hybrid(values, width)
+    assert decode_hybrid(encoded, width, len(values)) == values
+
+
+def test_footer_decodes_by_hand(tmp_path):
+    path = tmp_path / 'qto.parquet'
+    rows = _rows(2500, random.Random(1))
+    _write(path, COLUMNS, rows, row_group_rows=1000)
+    data, footer = read_footer(str(path))
+
+    assert footer[3] == 2500
+    assert footer[6] == parquet_writer.CREATED_BY.encode('utf-8')
+    schema = footer[2]
+    assert schema[0][5] == len(COLUMNS)
+    assert [e[4].decode('utf-8') for e in schema[1:]] == [n for n, _ in COLUMNS]
+    assert [e[1] for e in schema[1:]] == [2, 6, 5, 6]
+    assert all(e[3] == 1 for e in schema[1:])          # OPTIONAL
+
+    row_groups = footer[4]
+    assert [g[3] for g in row_groups] == [1000, 1000, 500]
+    for group_index, group in enumerate(row_groups):
+        for (name, ptype), chunk in zip(COLUMNS, group[1]):
+            meta = chunk[3]
+            assert meta[3] == [name.encode('utf-8')]
+            assert meta[5] == group[3]
+            page = _Reader(data, meta[9])
+            header = page.struct()
+            assert header[1] == 0                      # data page
+            assert header[5][1] == group[3]
+            if ptype == TYPE_STRING:
+                assert meta[11] < meta[9]
+                assert _Reader(data, meta[11]).struct()[1] == 2
+                assert meta[2] == [2, 3]               # PLAIN_DICTIONARY, RLE
+            else:
+                assert 11 not in meta
+                assert meta[2] == [0, 3]               # PLAIN, RLE
+            # Definition levels: 1 where the value is present
+            levels_size = struct.unpack_from('<i', data, page.pos)[0]
+            levels = decode_hybrid(data[page.pos + 4:page.pos + 4 + levels_size],
+                                   1, group[3])
+            column = [names for names, _ in COLUMNS].index(name)
+            chunk_rows = _expected(rows)[group_index * 1000:][:group[3]]
+            assert levels == [0 if r[column] is None else 1 for r in chunk_rows]
+
+
+def test_empty_file_has_a_schema_and_no_row_group(tmp_path):
+    path = tmp_path / 'empty.parquet'
+    writer = _write(path, COLUMNS, [])
+    assert writer.rows_written == 0
+    _, footer = read_footer(str(path))
+    assert footer[3] == 0
+    assert footer.get(4, []) == []
+    if pq is not None:
+        table = pq.read_table(str(path))
+        assert table.num_rows == 0
+        assert table.column_names == [n for n, _ in COLUMNS]
+
+
+def test_unsupported_column_type_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        parquet_writer.ParquetWriter(str(tmp_path / 'x.parquet'), [('A', 'bool')])
+
+
+@needs_pyarrow
+@pytest.mark.parametrize('count, row_group_rows', [
+    (1, 100), (999, 1000), (2500, 1000), (5000, 100000)])
+def test_pyarrow_round_trip(tmp_path, count, row_group_rows):
+    path = str(tmp_path / 'qto.parquet')
+    rows = _rows(count, random.Random(count))
+    _write(path, COLUMNS, rows, row_group_rows)
+
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_rows == count
+    assert parquet.metadata.num_row_groups == -(-count // row_group_rows)
+    table = parquet.read()
+    assert [str(t) for t in table.schema.types] == ['int64', 'string', 'double', 'string']
+    got = [list(r.values()) for r in table.to_pylist()]
+    assert got == _expected(rows)
+
+
+@needs_pyarrow
+def test_pyarrow_sees_dictionary_and_plain_pages(tmp_path):
+    path = str(tmp_path / 'qto.parquet')
+    _write(path, COLUMNS, _rows(300, random.Random(2)))
+    group = pq.ParquetFile(path).metadata.row_group(0)
+    for index, (_, ptype) in enumerate(COLUMNS):
+        column = group.column(index)
+        if ptype == TYPE_STRING:
+            assert column.has_dictionary_page
+            assert 'PLAIN_DICTIONARY' in column.encodings
+        else:
+            assert not column.has_dictionary_page
+            assert 'PLAIN' in column.encodings
+        assert column.compression == 'UNCOMPRESSED'
+
+
+@needs_pyarrow
+@pytest.mark.parametrize('distinct', [1, 2, 255, 256, 70000])
+def test_pyarrow_reads_every_dictionary_width(tmp_path, distinct):
+    path = str(tmp_path / 'dict.parquet')
+    values = [u'v{0}'.format(i % distinct) for i in range(max(distinct, 300))]
+    _write(path, [('S', TYPE_STRING)], [[v] for v in values])
+    assert pq.read_table(path).column('S').to_pylist() == values
+
+
+@needs_pyarrow
+def test_pyarrow_reads_all_null_columns_and_strings_as_numbers(tmp_path):
+    path = str(tmp_path / 'nulls.parquet')
+    rows = [[None, '', None], ['3', '2.5', None], [None, None, '']]
+    _write(path, [('I', TYPE_INT64), ('D', TYPE_DOUBLE), ('S', TYPE_STRING)], rows)
+    assert pq.read_table(path).to_pylist() == [
+        {'I': None, 'D': None, 'S': None},
+        {'I': 3, 'D': 2.5, 'S': None},
+        {'I': None, 'D': None, 'S': None},
+    ]
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import random
+import sys
+import types
+
+import pytest
+
+import placement_index
+from placement_index import PlacementIndex
+
+
+class ElementId(object):
+    """Revit 2024+ ElementId (.Value)."""
+
+    def __init__(self, value):
+        self.Value = value
+
+
+class OldElementId(object):
+    """Revit <= 2023 ElementId (.IntegerValue)."""
+
+    def __init__(self, value):
+        self.IntegerValue = value
+
+
+class Viewport(object):
+
+    def __init__(self, sheet, view):
+        self.SheetId = ElementId(sheet)
+        self.ViewId = ElementId(view)
+
+
+class ScheduleSheetInstance(object):
+
+    def __init__(self, sheet, schedule):
+        self.OwnerViewId = ElementId(sheet)
+        self.ScheduleId = ElementId(schedule)
+
+
+class FilteredElementCollector(object):
+    """Counts the collectors; a second argument scopes it to one sheet."""
+
+    calls = []
+
+    def __init__(self, doc, sheet_id=None):
+        self.doc = doc
+        self.sheet_id = sheet_id
+        FilteredElementCollector.calls.append(sheet_id)
+
+    def OfClass(self, cls):
+        self.cls = cls
+        return self
+
+    def ToElements(self):
+        if self.sheet_id is None:
+            elements = self.doc.elements
+        else:
+            elements = self.doc.by_sheet.get(self.sheet_id.Value, ())
+        return [e for e in elements if isinstance(e, self.cls)]
+
+
+def _document(sheets, seed=0):
+    """Sheets with a few views each, legends and schedules on many sheets,
+    a revision schedule on every sheet."""
+    rng = random.Random(seed)
+    elements = []
+    by_sheet = {}
+    view = 100000
+    legends = list(range(90000, 90040))
+    schedules = list(range(80000, 80300))
+    for sheet in range(1, sheets + 1):
+        start = len(elements)
+        for _ in range(rng.randint(0, 4)):
+            view += 1
+            elements.append(Viewport(sheet, view))
+        if rng.random() < 0.3:
+            elements.append(Viewport(sheet, rng.choice(legends)))
+        for schedule in rng.sample(schedules, rng.randint(0, 2)):
+            elements.append(ScheduleSheetInstance(sheet, schedule))
+        elements.append(ScheduleSheetInstance(sheet, 70000))
+        by_sheet[sheet] = elements[start:]
+    return types.SimpleNamespace(elements=elements, by_sheet=by_sheet,
+                                 sheets=list(range(1, sheets + 1)))
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = types.SimpleNamespace(FilteredElementCollector=FilteredElementCollector,
+                               Viewport=Viewport, ScheduleSheetInstance=ScheduleSheetInstance)
+    monkeypatch.setitem(sys.modules, 'pyrevit', types.SimpleNamespace(DB=db))
+    FilteredElementCollector.calls = []
+    return db
+
+
+def _per_sheet_placements(doc):
+    """The per-sheet queries the index replaced: {sheet: set of views}."""
+    placed = {}
+    for sheet in doc.sheets:
+        views = placed.setdefault(sheet, set())
+        for vp in FilteredElementCollector(doc, ElementId(sheet)).OfClass(Viewport).ToElements():
+            views.add(vp.ViewId.Value)
+        for ssi in FilteredElementCollector(doc, ElementId(sheet)).OfClass(
+                ScheduleSheetInstance).ToElements():
+            views.add(ssi.ScheduleId.Value)
+    return placed
+
+
+def test_3k_sheets_in_two_collectors_match_the_per_sheet_queries(fake_db):
+    doc = _document(3000)
+    index = PlacementIndex.from_document(doc)
+    assert FilteredElementCollector.calls == [None, None]
+
+    placed = _per_sheet_placements(doc)
+    assert len(FilteredElementCollector.calls) == 2 + 2 * 3000
+    for sheet, views in placed.items():
+        assert index.views_on_sheet(ElementId(sheet)) == views
+    assert index.placed_view_ids() == set().union(*placed.values())
+
+    view_sheets = {}
+    for sheet, views in placed.items():
+        for view in views:
+            view_sheets.setdefault(view, set()).add(sheet)
+    for view, sheets in view_sheets.items():
+        assert index.sheets_of_view(view) == sheets
+        assert index.is_on_sheet(ElementId(view))
+    assert len(index.sheets_of_view(70000)) == 3000
+
+    keep = random.Random(1).sample(doc.sheets, 500)
+    assert index.views_on_sheets([ElementId(s) for s in keep]) \
+        == set().union(*(placed[s] for s in keep))
+
+
+def test_lookups_accept_any_id_kind_and_return_copies():
+    index = PlacementIndex.from_elements([Viewport(1, 10), Viewport(2, 10)],
+                                         [ScheduleSheetInstance(1, 20)])
+    for sheet in (1, ElementId(1), OldElementId(1)):
+        assert index.views_on_sheet(sheet) == {10, 20}
+    assert index.sheets_of_view(OldElementId(10)) == {1, 2}
+    assert not index.is_on_sheet(30)
+    assert index.views_on_sheet(99) == set()
+    assert index.sheets_of_view(99) == set()
+    assert index.views_on_sheets([]) == set()
+
+    index.views_on_sheet(1).add(99)
+    index.sheets_of_view(10).clear()
+    index.placed_view_ids().clear()
+    assert index.views_on_sheet(1) == {10, 20}
+    assert index.sheets_of_view(10) == {1, 2}
+    assert index.placed_view_ids() == {10, 20}
+
+
+def test_id_value():
+    assert placement_index.id_value(ElementId(5)) == 5
+    assert placement_index.id_value(OldElementId(6)) == 6
+    assert placement_index.id_value(7) == 7
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+
+import pytest
+
+import cloud_sampling
+
+from tests import point_cloud_fakes as fakes
+
+
+@pytest.fixture(scope='module')
+def pca():
+    return fakes.load_script()
+
+
+def _noisy_plane(rng, count, noise, face, transform):
+    """Cloud coordinates of points around a planar face."""
+    inverse = transform.Inverse
+    points = []
+    for _ in range(count):
+        model = face.point(rng.uniform(-1.0, face.width + 1.0),
+                           rng.uniform(-1.0, face.height + 1.0),
+                           rng.gauss(0.0, noise))
+        points.append(inverse.OfPoint(model))
+    return points
+
+
+@pytest.mark.parametrize('angle, normal_tilt', [
+    (0.0, 0.0), (0.7, 0.0), (2.3, 0.4), (-1.1, 1.2)])
+def test_plane_frame_matches_project_and_compute_normal(pca, angle, normal_tilt):
+    rng = random.Random(int(angle * 100))
+    x_axis = (math.cos(angle), math.sin(angle), 0.0)
+    y_axis = (-math.sin(angle) * math.sin(normal_tilt),
+              math.cos(angle) * math.sin(normal_tilt), math.cos(normal_tilt))
+    face = fakes.PlanarFace((1200.0, -350.0, 45.0), x_axis, y_axis, 8.0, 3.0)
+    transform = fakes.Transform.rotation_z(0.52, (250.0, -40.0, 12.0))
+    points = _noisy_plane(rng, 3000, 0.05, face, transform)
+    xs = [p.X for p in points]
+    ys = [p.Y for p in points]
+    zs = [p.Z for p in points]
+
+    frame = pca.plane_frame(face, transform)
+    fast = list(frame.samples(xs, ys, zs, 0.1))
+    reference = list(pca.face_samples(face, transform, points, 0.1))
+
+    # Project drops the points off the face, the frame keeps the whole
+    # plane: compare the points the face keeps
+    by_uv = dict(((round(u, 6), round(v, 6)), d) for u, v, d in fast)
+    assert len(reference) > 1000
+    max_error = 0.0
+    for u, v, d in reference:
+        fast_d = by_uv[(round(u, 6), round(v, 6))]
+        max_error = max(max_error, abs(fast_d - d))
+    assert max_error < 1e-12
+
+
+def test_plane_frame_apply_inverts_the_face_parametrisation():
+    frame = cloud_sampling.PlaneFrame.compose(
+        (10.0, 20.0, 30.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0), (1.0, 0.0, 0.0),
+        ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0)), (0.0, 0.0, 0.0))
+    assert frame.apply(10.5, 22.0, 33.0) == pytest.approx((2.0, 3.0, 0.5))
+    assert list(frame.samples([10.5, 11.0], [22.0, 22.0], [33.0, 33.0], 0.6)) \
+        == [pytest.approx((2.0, 3.0, 0.5))]
+
+
+def _loops(face):
+    return [[(uv.U, uv.V) for uv in edge.TessellateOnFace(face)]
+            for loop in face.EdgeLoops for edge in loop]
+
+
+def test_point_in_loops_matches_is_inside():
+    rng = random.Random(5)
+    face = fakes.PlanarFace((0, 0, 0), (1, 0, 0), (0, 0, 1), 10.0, 6.0,
+                            holes=[(1.0, 3.0, 0.5, 4.5), (6.0, 9.0, 2.0, 3.0)])
+    loops = _loops(face)
+    for _ in range(20000):
+        u, v = rng.uniform(-1.0, 11.0), rng.uniform(-1.0, 7.0)
+        assert cloud_sampling.point_in_loops(u, v, loops) \
+            == face.IsInside(fakes.UV(u, v))
+
+
+def test_boundary_cells_contain_every_crossed_cell():
+    rng = random.Random(6)
+    # Slanted triangle with a hole, on a grid whose origin is off the corners
+    loops = [[(0.3, 0.2), (9.7, 1.1)], [(9.7, 1.1), (4.1, 7.9)],
+             [(4.1, 7.9), (0.3, 0.2)],
+             [(3.0, 2.0), (5.0, 2.5), (4.0, 4.0), (3.0, 2.0)]]
+    cells = cloud_sampling.CellGrid(0.0, 10.0, 0.0, 8.0, 0.37)
+    marked = cloud_sampling.boundary_cells(cells, loops)
+
+    for i, j in cells.indices():
+        if (i, j) in marked:
+            continue
+        # Unmarked cells lie entirely on one side of the boundary
+        u0, u1, v0, v1 = cells.tile_bounds((i, i + 1, j, j + 1))
+        inside = set()
+        for _ in range(20):
+            inside.add(cloud_sampling.point_in_loops(
+                rng.uniform(u0, u1), rng.uniform(v0, v1), loops))
+        for u, v in ((u0, v0), (u0, v1), (u1, v0), (u1, v1)):
+            inside.add(cloud_sampling.point_in_loops(u, v, loops))
+        assert len(inside) == 1, (i, j)
+
+    # Dense walk along the segments: every cell they touch is marked
+    for loop in loops:
+        for (a, b), (c, d) in zip(loop, loop[1:]):
+            for s in range(1001):
+                t = s / 1000.0
+                cell = cells.index(a + (c - a) * t, b + (d - b) * t)
+                assert cell is None or cell in marked
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import codecs
+import math
+import random
+
+import pytest
+
+import cloud_stats
+import reduction_pool
+
+from tests import point_cloud_fakes as fakes
+
+
+@pytest.fixture(scope='module')
+def pca():
+    return fakes.load_script()
+
+
+def _sketch(values):
+    sketch = cloud_stats.QuantileSketch()
+    sketch.extend(values)
+    return sketch
+
+
+def _freedman_diaconis(values):
+    ordered = sorted(values)
+    n = len(ordered)
+    iqr = ordered[int(0.75 * (n - 1))] - ordered[int(0.25 * (n - 1))]
+    width = 2.0 * iqr / n ** (1.0 / 3.0)
+    return int(math.ceil((ordered[-1] - ordered[0]) / width))
+
+
+@pytest.mark.parametrize('n', [50, 400, 3000])
+def test_histogram_bins_follow_freedman_diaconis(pca, n):
+    rng = random.Random(n)
+    values = [rng.gauss(0.0, 0.01) for _ in range(n)]
+    bins = pca.histogram_bins(_sketch(values), min(values), max(values))
+    exact = max(pca.HISTOGRAM_MIN_BINS,
+                min(pca.HISTOGRAM_MAX_BINS, _freedman_diaconis(values)))
+    assert abs(bins - exact) <= max(1, 0.1 * exact)
+
+
+def test_histogram_bins_fallbacks(pca):
+    # Degenerate IQR: Sturges, log2(n) + 1
+    values = [0.0] * 60 + [0.5, -0.5]
+    assert pca.histogram_bins(_sketch(values), -0.5, 0.5) \
+        == int(math.ceil(math.log(62, 2))) + 1
+    assert pca.histogram_bins(_sketch([0.1]), 0.1, 0.1) \
+        == pca.HISTOGRAM_MIN_BINS
+    # A wide range with a narrow core is clamped
+    rng = random.Random(1)
+    values = [rng.gauss(0.0, 0.001) for _ in range(5000)] + [-1.0, 1.0]
+    assert pca.histogram_bins(_sketch(values), -1.0, 1.0) \
+        == pca.HISTOGRAM_MAX_BINS
+
+
+def test_export_csv_uses_excel_conventions(pca, monkeypatch, tmp_path):
+    monkeypatch.setenv('TEMP', str(tmp_path))
+    rows = [(101, 1, 1.5, -2.25, 0.0, 0.0123, 42, 0.011, 0.002, 0.02, 0.3),
+            (101, 2, 10.0, 3.0, 1.0, -0.5, 7, -0.45, 0.1, 0.6, 0.15)]
+    path = pca.export_csv(rows, 'm')
+
+    assert path.startswith(str(tmp_path))
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data.startswith(codecs.BOM_UTF8)
+    lines = data[len(codecs.BOM_UTF8):].decode('utf-8').split('\r\n')
+    assert lines[0].split(';') == [
+        'ElementId', 'Face', 'Cell X [m]', 'Cell Y [m]', 'Cell Z [m]',
+        'Avg deviation [m]', 'Cloud points', 'Median deviation [m]',
+        'Std deviation [m]', 'P95 |deviation| [m]', 'Cell size [m]']
+    assert lines[1] == ('101;1;1,5000;-2,2500;0,0000;0,0123;42;0,0110;'
+                        '0,0020;0,0200;0,3000')
+    assert lines[2].split(';')[5:7] == ['-0,5000', '7']
+    assert len(lines) == 3
+
+
+def test_analyze_face_with_an_opening(pca):
+    rng = random.Random(21)
+    face = fakes.PlanarFace((5.0, 2.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0),
+                            4.0, 3.0, holes=[(1.0, 2.0, 0.0, 2.0)])
+    model = []
+    while len(model) < 6000:
+        u, v = rng.uniform(0.0, 4.0), rng.uniform(0.0, 3.0)
+        if face.IsInside(fakes.UV(u, v)):
+            # 1 cm in front on the left half, 2 cm behind on the right
+            d = 0.01 if u < 2.0 else -0.02
+            model.append(tuple(face.point(u, v, d + rng.gauss(0.0, 0.001))))
+    transform = fakes.Transform.rotation_z(1.1, (40.0, -7.0, 0.5))
+    cloud = fakes.cloud_from_model(model, transform, spacing=0.05)
+    with reduction_pool.ReductionPool(1) as pool:
+        uvs, centers, stats, sizes, n_cells, n_empty, queries = \
+            pca.analyze_face(cloud, transform, None, face, 0.5, 0.1,
+                             'all', 0.015, pool)
+
+    # 8 x 6 cells, 2 x 4 of them in the opening
+    assert (n_cells, n_empty, queries) == (40, 0, 1)
+    assert sum(s.count for s in stats) == len(model)
+    for uv, center, s in zip(uvs, centers, stats):
+        assert not 1.0 < uv.U < 2.0 or uv.V > 2.0
+        assert tuple(center) == pytest.approx(tuple(face.Evaluate(uv)))
+        expected = 0.01 if uv.U < 2.0 else -0.02
+        assert s.mean == pytest.approx(expected, abs=0.001)
+        assert s.within == (s.count if expected > 0 else 0)
+    assert sizes == [0.5] * 40
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+
+import pytest
+
+import cloud_sampling
+import reduction_pool
+
+from tests import point_cloud_fakes as fakes
+
+
+@pytest.fixture(scope='module')
+def pca():
+    return fakes.load_script()
+
+
+def _inside(planes, point, tolerance=1e-9):
+    return all(p.Normal.DotProduct(point.Subtract(p.Origin)) >= -tolerance
+               for p in planes)
+
+
+def _wall_cloud(face, count, rng, deviation=0.02, **kwargs):
+    """Cloud on a planar face with a known deviation; returns the fake
+    cloud and the number of points per (u, v) cell for the given grid."""
+    samples = []
+    for _ in range(count):
+        u = rng.uniform(0.0, face.width)
+        v = rng.uniform(0.0, face.height)
+        d = deviation + rng.gauss(0.0, 0.003)
+        samples.append((u, v, d))
+    points = [tuple(face.point(u, v, d)) for u, v, d in samples]
+    kwargs.setdefault('spacing', 0.05)
+    return fakes.cloud_from_model(points, **kwargs), samples
+
+
+def _analyze(pca, cloud, face, grid, quality='high', offset=0.3,
+             to_cloud=None):
+    with reduction_pool.ReductionPool(1) as pool:
+        return pca.analyze_face(cloud, cloud.GetTotalTransform(), to_cloud,
+                                face, grid, offset, quality, 0.05, pool)
+
+
+def test_curved_tile_box_covers_the_bulge(pca):
+    # Half cylinder turned 45 degrees: the 3 x 3 samples of the tile sit
+    # at 0, 90 and 180 degrees and the surface bulges between them
+    radius, offset = 3.0, 0.1
+    face = fakes.CylindricalFace(
+        radius, math.pi, 2.0, fakes.Transform.rotation_z(math.radians(45)))
+    u1, v1 = radius * math.pi, 2.0
+    planes = pca.tile_planes(face, 0.0, u1, 0.0, v1, offset)
+
+    for a in range(181):
+        for b in range(3):
+            u, v = u1 * a / 180.0, v1 * b / 2.0
+            for distance in (-offset, 0.0, offset):
+                assert _inside(planes, face.point(u, v, distance))
+
+    # What the box of the 3 x 3 samples alone misses
+    samples = [face.Evaluate(fakes.UV(u1 * a / 2.0, v1 * b / 2.0))
+               for a in range(3) for b in range(3)]
+    y_max = max(p.Y for p in samples) + offset
+    missed = max(face.point(u1 * a / 180.0, 0.0, offset).Y - y_max
+                 for a in range(181))
+    assert missed > 0.25 * radius
+
+
+def test_tile_box_of_a_flat_tile_is_not_padded():
+    rows = [[(0.1 * a, 0.2 * b, 1.0) for b in range(9)] for a in range(9)]
+    bmin, bmax = cloud_sampling.tile_box(rows, 0.05)
+    assert bmin == pytest.approx((-0.05, -0.05, 0.95))
+    assert bmax == pytest.approx((0.85, 1.65, 1.05))
+    rows[4][4] = None
+    assert cloud_sampling.tile_box(rows, 0.05)[1] == pytest.approx(bmax)
+    with pytest.raises(ValueError):
+        cloud_sampling.tile_box([[None]], 0.05)
+
+
+def test_planar_face_is_queried_once_per_tile(pca):
+    rng = random.Random(1)
+    face = fakes.PlanarFace((10.0, -4.0, 2.0), (0.6, 0.8, 0.0), (0.0, 0.0, 1.0),
+                            6.0, 4.0)
+    cloud, samples = _wall_cloud(
+        face, 4000, rng, transform=fakes.Transform.rotation_z(0.4, (3.0, 1.0, 0.0)))
+    uvs, centers, stats, sizes, n_cells, n_empty, queries = _analyze(
+        pca, cloud, face, 0.5)
+
+    # 12 x 8 cells, one query instead of one per cell
+    assert (n_cells, n_empty) == (96, 0)
+    assert queries == cloud.queries == 1
+    expected = {}
+    for u, v, _ in samples:
+        key = (int(u // 0.5), int(v // 0.5))
+        expected[key] = expected.get(key, 0) + 1
+    found = dict(((int(uv.U // 0.5), int(uv.V // 0.5)), s.count)
+                 for uv, s in zip(uvs, stats))
+    assert found == expected
+    assert all(abs(s.mean - 0.02) < 0.003 for s in stats)
+
+
+def test_saturated_tiles_are_split_and_nothing_is_lost(pca, monkeypatch):
+    rng = random.Random(2)
+    face = fakes.PlanarFace((0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 0.0, 1.0),
+                            6.0, 4.0)
+    cloud, samples = _wall_cloud(face, 3000, rng)
+    full = _analyze(pca, cloud, face, 0.5, quality='all')
+    assert full[6] == 1
+
+    monkeypatch.setattr(pca, 'ALL_POINTS_CAP', 250)
+    split = _analyze(pca, cloud, face, 0.5, quality='all')
+    assert split[6] > 4
+    assert sum(s.count for s in split[2]) == sum(s.count for s in full[2]) \
+        == len(samples)
+
+
+def test_curved_face_keeps_every_point_of_large_tiles(pca):
+    rng = random.Random(3)
+    radius = 3.0
+    face = fakes.CylindricalFace(
+        radius, math.pi, 2.0, fakes.Transform.rotation_z(math.radians(45)))
+    points = []
+    for _ in range(3000):
+        u = rng.uniform(0.0, radius * math.pi)
+        v = rng.uniform(0.0, 2.0)
+        points.append(tuple(face.point(u, v, rng.uniform(-0.05, 0.05))))
+    cloud = fakes.cloud_from_model(points)
+    uvs, _, stats, _, n_cells, n_empty, queries = _analyze(
+        pca, cloud, face, 0.5, quality='all')
+    assert queries == 1
+    assert sum(s.count for s in stats) == len(points)
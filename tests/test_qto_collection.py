@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from tests import qto_fakes as fakes
+
+
+@pytest.fixture(scope='module')
+def qto():
+    return fakes.load_script()
+
+
+def _model(qto, seed, count=600):
+    rng = random.Random(seed)
+    categories = [fakes.Category(1, 'Walls'), fakes.Category(2, 'Floors'),
+                  fakes.Category(3, 'Doors'), fakes.Category(4, 'Generic Models'),
+                  fakes.Category(5, 'Empty'),
+                  fakes.Category(6, 'Tags', fakes.CategoryType.Annotation),
+                  fakes.Category(7, 'Imports in Families')]
+    doc = fakes.Document(categories)
+    params_map = qto.build_geometric_params_map()
+    types = []
+    for index in range(12):
+        category = rng.choice(categories[:4])
+        family = 'Import Symbol' if index % 5 == 0 else 'Family {0}'.format(index)
+        types.append(doc.add_type(100 + index, category, name='Type {0}'.format(index), params={
+            'SYMBOL_FAMILY_NAME_PARAM': family,
+            params_map['Width'][0]: rng.uniform(0.1, 1.0)}))
+    for index in range(count):
+        elem_type = rng.choice(types + [None])
+        category = rng.choice(categories[:4] + categories[5:] + [None])
+        cls = rng.choice([fakes.Element] * 8 + [fakes.ImportInstance, fakes.RevitLinkInstance])
+        doc.add_instance(1000 + index, category, elem_type, name='E{0}'.format(index), params={
+            params_map['Length'][rng.randrange(3)]: rng.uniform(0.5, 20.0),
+            params_map['Area'][0]: rng.choice([0.0, 12.5]),
+            'Mark': 'M{0}'.format(index)}, cls=cls)
+    for index in range(5):
+        doc.add_instance(5000 + index, None, name='Assembly {0}'.format(index),
+                         cls=fakes.AssemblyInstance)
+    return doc, params_map
+
+
+def _new_rows(qto, doc, params_map, extra_params):
+    categories = qto.get_model_categories(doc, qto.get_excluded_categories())
+    element_ids = qto.collect_element_ids_by_category(doc, categories)
+    categories = [c for c in categories if element_ids.get(c.Id.Value)]
+    groups = qto.iter_element_groups(doc, categories, element_ids)
+    stats = {'processed': 0, 'skipped': 0}
+    rows = list(qto.iter_takeoff_rows(
+        doc, groups, qto.ImportVerdicts(doc), params_map,
+        qto.GeometricResolver(params_map), extra_params, stats, fakes.output()))
+    return rows, stats
+
+
+def _reference_rows(qto, doc, params_map, extra_params):
+    """One collector per category and the link/import checks on every element."""
+    rows = []
+    stats = {'processed': 0, 'skipped': 0}
+    categories = qto.get_model_categories(doc, qto.get_excluded_categories())
+    groups = []
+    for cat in categories:
+        elements = [e for _, e in sorted(doc.elements.items())
+                    if not e.is_type and e.Category is cat
+                    and not isinstance(e, (fakes.ImportInstance, fakes.RevitLinkInstance))]
+        if elements:
+            groups.append((cat.Name, elements))
+    groups.append(('Assemblies', [e for _, e in sorted(doc.elements.items())
+                                  if isinstance(e, fakes.AssemblyInstance)]))
+    for name, elements in groups:
+        for elem in elements:
+            elem_type = doc.GetElement(elem.GetTypeId())
+            if doc.IsLinked or (elem.Category and qto.category_is_import(elem.Category)) \
+                    or qto.type_is_import(elem_type):
+                stats['skipped'] += 1
+                continue
+            stats['processed'] += 1
+            rows.append(qto.build_row(elem, name, doc, params_map, None, extra_params))
+    return rows, stats
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_single_collector_rows_match_per_category_collectors(qto, seed):
+    doc, params_map = _model(qto, seed)
+    new_rows, new_stats = _new_rows(qto, doc, params_map, ['Mark'])
+    reference_rows, reference_stats = _reference_rows(qto, doc, params_map, ['Mark'])
+    assert new_rows == reference_rows
+    assert new_stats == reference_stats
+    assert new_stats['skipped'] > 0
+    assert any(row['Category'] == 'Assemblies' for row in new_rows)
+
+
+def test_buckets_hold_ids_from_one_collector_pass(qto):
+    doc, _ = _model(qto, 0)
+    categories = qto.get_model_categories(doc, qto.get_excluded_categories())
+    assert [c.Name for c in categories] == ['Doors', 'Empty', 'Floors', 'Generic Models', 'Walls']
+
+    fakes.FilteredElementCollector.iterations = 0
+    element_ids = qto.collect_element_ids_by_category(doc, categories)
+    assert fakes.FilteredElementCollector.iterations == 1
+    assert sorted(element_ids) == [1, 2, 3, 4]
+    for ids in element_ids.values():
+        assert all(isinstance(i, fakes.ElementId) for i in ids)
+        elements = [doc.GetElement(i) for i in ids]
+        assert all(type(e) is fakes.Element and not e.is_type for e in elements)
+
+
+def test_groups_fetch_elements_lazily_and_release_buckets(qto):
+    doc, _ = _model(qto, 1)
+    categories = [c for c in doc.Settings.Categories if c.Id.Value in (1, 2)]
+    element_ids = qto.collect_element_ids_by_category(doc, categories)
+    groups = qto.iter_element_groups(doc, categories, element_ids)
+
+    name, elements = next(groups)
+    assert name == categories[0].Name
+    assert 1 not in element_ids and 2 in element_ids
+    first = next(elements)
+    assert first.Category is categories[0]
+    assert len(list(elements)) > 0
+    assert [name for name, _ in groups] == [categories[1].Name, 'Assemblies']
+    assert element_ids == {}
+
+
+def test_no_categories_collects_nothing(qto):
+    doc, _ = _model(qto, 2, count=10)
+    fakes.FilteredElementCollector.iterations = 0
+    assert qto.collect_element_ids_by_category(doc, []) == {}
+    assert fakes.FilteredElementCollector.iterations == 0
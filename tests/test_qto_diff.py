@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import gzip
+
+import qto_diff
+
+
+def _write(path, rows, gz=False):
+    text = '\n'.join(';'.join(row) for row in rows) + '\n'
+    if gz:
+        with gzip.open(str(path), 'wb') as f:
+            f.write(text.encode('utf-8'))
+    else:
+        path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+HEADERS = ['ID', 'Category', 'Name', 'Volume', 'Mark', 'Area']
+
+
+def test_counts_and_deltas_per_category(tmp_path):
+    old = _write(tmp_path / 'old.csv', [
+        HEADERS,
+        ['1', 'Walls', 'W1', '1,500', 'A', '10,000'],
+        ['2', 'Walls', 'W2', '2,000', 'B', ''],
+        ['3', 'Floors', 'F1', '4,000', '', '20,000'],
+        ['4', 'Floors', 'F2', '1,000', 'C', '5,000'],
+    ])
+    new = _write(tmp_path / 'new.csv', [
+        HEADERS,
+        ['1', 'Walls', 'W1', '1,500', 'A', '10,000'],
+        ['2', 'Walls', 'W2', '2,500', 'B2', ''],
+        ['3', 'Floors', 'F1', '4,000', '', '20,000'],
+        ['5', 'Floors', 'F3', '3,000', 'D', '7,000'],
+    ])
+    details = []
+    result = qto_diff.diff_takeoffs(
+        old, new, partitions=3, work_folder=str(tmp_path),
+        details_callback=lambda *args: details.append(args))
+
+    assert result.quantities == ['Volume', 'Area']
+    walls = result.categories['Walls']
+    assert (walls.added, walls.removed, walls.changed, walls.unchanged) == (0, 0, 1, 1)
+    assert abs(walls.deltas['Volume'] - 0.5) < 1e-9
+    floors = result.categories['Floors']
+    assert (floors.added, floors.removed, floors.changed, floors.unchanged) == (1, 1, 0, 1)
+    assert abs(floors.deltas['Volume'] - 2.0) < 1e-9
+    assert abs(floors.deltas['Area'] - 2.0) < 1e-9
+
+    rows = result.summary_rows()
+    assert rows[0] == ['Category', 'Added', 'Removed', 'Changed', 'Unchanged',
+                       'Delta_Volume', 'Delta_Area']
+    assert rows[-1][0] == 'TOTAL' and rows[-1][5] == '2,500'
+
+    changed = dict((d[3], d[6]) for d in details if d[2] == qto_diff.STATUS_CHANGED)
+    assert changed == {'Volume': 0.5, 'Mark': None}
+
+
+def test_text_columns_get_no_delta(tmp_path):
+    # 'Mark' holds a number in the old file but text in the new one,
+    # 'Comments' is always empty: neither is a quantity
+    headers = ['ID', 'Category', 'Mark', 'Comments', 'Length']
+    old = _write(tmp_path / 'old.csv', [
+        headers, ['1', 'Walls', '12', '', '3,000']])
+    new = _write(tmp_path / 'new.csv.gz', [
+        headers, ['1', 'Walls', 'W-12', '', '3,000']], gz=True)
+
+    result = qto_diff.diff_takeoffs(old, new, work_folder=str(tmp_path))
+    assert result.quantities == ['Length']
+    assert result.categories['Walls'].changed == 1
+    assert result.summary_rows()[0][-1] == 'Delta_Length'
+
+
+def test_split_parts_are_read_in_order(tmp_path):
+    _write(tmp_path / 'qto_part001.csv', [HEADERS, ['1', 'Walls', 'W1', '1,0', '', '']])
+    _write(tmp_path / 'qto_part002.csv', [HEADERS, ['2', 'Walls', 'W2', '2,0', '', '']])
+    paths = qto_diff.input_paths(str(tmp_path / 'qto_part001.csv'))
+    assert [p[-7:] for p in paths] == ['001.csv', '002.csv']
+    ids = [row[0] for _, row in qto_diff.iter_csv(paths[0])]
+    assert ids == ['1', '2']
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+import csv
+import gzip
+import io
+import os
+import random
+import tracemalloc
+
+import pytest
+
+from tests import qto_fakes as fakes
+
+
+@pytest.fixture(scope='module')
+def qto():
+    return fakes.load_script()
+
+
+def _headers(qto, extra_params=('Mark', 'Fire Rating')):
+    return list(qto.STANDARD_COLUMNS) + list(extra_params)
+
+
+def _synthetic_rows(qto, count, seed=0):
+    rng = random.Random(seed)
+    names = [u'Basic Wall', u'Mur béton 20 cm', u'Wand; "Typ A"', u'Line\nbreak', u'窓 W1', u'']
+    for index in range(count):
+        row = {'ID': 100000 + index, 'Category': rng.choice([u'Walls', u'Floors', u'Assemblies']),
+               'Name': rng.choice(names)}
+        for _, column in qto.GEOMETRIC_COLUMNS:
+            row[column] = rng.choice(['', round(rng.uniform(0.001, 900.0), 3), 12.0, 1e-05])
+        row['Mark'] = rng.choice(['', None, u'M-{0}'.format(index), 3.5, 7])
+        if index % 4:
+            row['Fire Rating'] = rng.choice([u'EI 60', u'REI 120', ''])
+        yield row
+
+
+def _old_writer(path, headers, rows):
+    """The writer before the streaming one: DictWriter over the collected rows."""
+    with io.open(path, 'w', encoding='utf-8', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=headers, delimiter=';', lineterminator='\n')
+        writer.writeheader()
+        for row in rows:
+            row_str = {}
+            for k, v in row.items():
+                if v is None or v == "":
+                    row_str[k] = ""
+                elif isinstance(v, float):
+                    row_str[k] = str(v).replace('.', ',')
+                else:
+                    row_str[k] = str(v)
+            writer.writerow(row_str)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _write(qto, path, headers, rows, mode, **kwargs):
+    with qto.QtoCsvWriter(path, headers, mode=mode, **kwargs) as writer:
+        for row in rows:
+            writer.write(row)
+    return writer
+
+
+@pytest.fixture
+def reference(qto, tmp_path):
+    headers = _headers(qto)
+    path = str(tmp_path / 'old.csv')
+    _old_writer(path, headers, _synthetic_rows(qto, 500))
+    return headers, _read(path)
+
+
+def test_plain_csv_matches_the_old_writer(qto, tmp_path, reference):
+    headers, expected = reference
+    path = str(tmp_path / 'qto.csv')
+    writer = _write(qto, path, headers, _synthetic_rows(qto, 500), qto.OUTPUT_CSV)
+    assert writer.paths == [path]
+    assert writer.rows_written == 500
+    assert _read(path) == expected
+
+
+def test_gzip_csv_holds_the_old_bytes(qto, tmp_path, reference):
+    headers, expected = reference
+    path = str(tmp_path / 'qto.csv')
+    writer = _write(qto, path, headers, _synthetic_rows(qto, 500), qto.OUTPUT_GZIP)
+    assert writer.paths == [path + '.gz']
+    assert not os.path.exists(path)
+    with gzip.open(path + '.gz', 'rb') as f:
+        assert f.read() == expected
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 250, 499, 500, 1000])
+def test_chunked_csv_splits_the_old_bytes(qto, tmp_path, reference, chunk_rows):
+    headers, expected = reference
+    path = str(tmp_path / 'qto.csv')
+    writer = _write(qto, path, headers, _synthetic_rows(qto, 500), qto.OUTPUT_CHUNKED,
+                    chunk_rows=chunk_rows)
+    parts = -(-500 // chunk_rows)
+    assert writer.paths == [str(tmp_path / 'qto_part{0:03d}.csv'.format(i + 1))
+                            for i in range(parts)]
+    header, body = expected.split(b'\n', 1)
+    joined = b''
+    for part in writer.paths:
+        data = _read(part)
+        assert data.startswith(header + b'\n')
+        joined += data[len(header) + 1:]
+        with io.open(part, encoding='utf-8', newline='') as f:
+            assert len(list(csv.reader(f, delimiter=';'))) - 1 <= chunk_rows
+    assert joined == body
+
+
+def test_empty_export_writes_the_header(qto, tmp_path):
+    headers = _headers(qto, ())
+    for mode in (qto.OUTPUT_CSV, qto.OUTPUT_CHUNKED):
+        path = str(tmp_path / '{0}.csv'.format(len(mode)))
+        writer = _write(qto, path, headers, [], mode)
+        assert [_read(p) for p in writer.paths] == [(';'.join(headers) + '\n').encode('utf-8')]
+
+
+def _old_row(qto, elem, category_name, doc, params_map, resolver, extra_params):
+    """Row of an element as built inline before build_row."""
+    elem_type = None
+    type_id = elem.GetTypeId()
+    if type_id and type_id != fakes.ElementId.InvalidElementId:
+        elem_type = doc.GetElement(type_id)
+    geo_data = qto.extract_geometric_data(elem, elem_type, params_map, resolver)
+    row = {'ID': qto.get_element_id_value(elem.Id), 'Category': category_name,
+           'Name': qto.get_element_name(elem)}
+    for name, column in (('Length', 'Length_m'), ('Width', 'Width_m'), ('Height', 'Height_m'),
+                         ('Depth', 'Depth_m'), ('Thickness', 'Thickness_m'),
+                         ('Diameter', 'Diameter_m'), ('Perimeter', 'Perimeter_m'),
+                         ('Area', 'Area_m2'), ('Volume', 'Volume_m3')):
+        row[column] = qto.convert_to_meters(geo_data.get(name), name.lower()) \
+            if geo_data.get(name) else ""
+    for param_name in extra_params:
+        value = qto.get_param_value_by_name(elem, param_name)
+        if value is not None:
+            try:
+                value = round(float(value), 3)
+            except (TypeError, ValueError):
+                pass
+        row[param_name] = value if value is not None else ""
+    return row
+
+
+def _model(qto, count, seed=0):
+    rng = random.Random(seed)
+    params_map = qto.build_geometric_params_map()
+    categories = [fakes.Category(1, 'Walls'), fakes.Category(2, 'Floors')]
+    doc = fakes.Document(categories)
+    types = [doc.add_type(10 + i, categories[i % 2], name='Type {0}'.format(i), params={
+        'SYMBOL_FAMILY_NAME_PARAM': 'Import Symbol' if i == 3 else 'Basic',
+        params_map['Thickness'][0]: 0.65, 'Fire Rating': u'EI 60'}) for i in range(6)]
+    for index in range(count):
+        elem_type = rng.choice(types)
+        doc.add_instance(1000 + index, elem_type.Category, elem_type,
+                         name=rng.choice(['', u'Mur béton']), params={
+                             params_map['Length'][0]: rng.uniform(1.0, 30.0),
+                             params_map['Area'][0]: rng.choice([0.0, 250.0]),
+                             params_map['Volume'][0]: 3,
+                             'Mark': rng.choice([u'A1', 4.0, 2, None])})
+    return doc, params_map, categories
+
+
+def test_build_row_matches_the_old_inline_row(qto):
+    doc, params_map, categories = _model(qto, 300)
+    resolver = qto.GeometricResolver(params_map)
+    extra_params = ['Mark', 'Fire Rating', 'Missing']
+    for elem in list(doc.elements.values()):
+        if elem.is_type:
+            continue
+        assert qto.build_row(elem, elem.Category.Name, doc, params_map, resolver, extra_params) \
+            == _old_row(qto, elem, elem.Category.Name, doc, params_map, None, extra_params)
+
+
+def test_iter_takeoff_rows_counts_and_reports_per_category(qto):
+    doc, params_map, categories = _model(qto, 300)
+    element_ids = qto.collect_element_ids_by_category(doc, categories)
+    groups = qto.iter_element_groups(doc, categories, element_ids)
+    stats = {'processed': 0, 'skipped': 0}
+    output = fakes.output()
+    rows = list(qto.iter_takeoff_rows(doc, groups, qto.ImportVerdicts(doc), params_map,
+                                      qto.GeometricResolver(params_map), ['Mark'], stats, output))
+    skipped = sum(1 for e in doc.elements.values()
+                  if not e.is_type and e.GetTypeId().Value == 13)
+    assert stats == {'processed': 300 - skipped, 'skipped': skipped}
+    assert len(rows) == stats['processed']
+    assert output.lines[0].startswith('- **Walls**: ')
+    assert output.lines[1] == '- **Floors**: {0} elements ({1} skipped - links/imports)'.format(
+        sum(1 for row in rows if row['Category'] == 'Floors'), skipped)
+    assert len(output.lines) == 2
+
+
+def _peak(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streaming_memory_does_not_grow_with_the_rows(qto, tmp_path):
+    headers = _headers(qto)
+    path = str(tmp_path / 'qto.csv')
+
+    def streamed(count):
+        return _peak(lambda: _write(qto, path, headers, _synthetic_rows(qto, count),
+                                    qto.OUTPUT_CSV))
+
+    def collected(count):
+        return _peak(lambda: _write(qto, path, headers, list(_synthetic_rows(qto, count)),
+                                    qto.OUTPUT_CSV))
+
+    small, large = streamed(1000), streamed(10000)
+    assert large < 2 * small + 256 * 1024
+    assert large * 20 < collected(10000)
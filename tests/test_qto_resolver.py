@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from tests import qto_fakes as fakes
+
+
+@pytest.fixture(scope='module')
+def qto():
+    return fakes.load_script()
+
+
+@pytest.fixture(scope='module')
+def params_map(qto):
+    return qto.build_geometric_params_map()
+
+
+def _reference(qto, params_map, element, elem_type):
+    return qto.extract_geometric_data(element, elem_type, params_map)
+
+
+def _assert_same(qto, params_map, doc, elements):
+    resolver = qto.GeometricResolver(params_map)
+    for element in elements:
+        elem_type = doc.GetElement(element.GetTypeId())
+        assert resolver.resolve(element, elem_type) \
+            == _reference(qto, params_map, element, elem_type), element.Id
+    return resolver
+
+
+def test_swapped_parameters_on_a_later_instance_fall_back(qto, params_map):
+    doc = fakes.Document()
+    walls = fakes.Category(1, 'Walls')
+    wall_type = doc.add_type(10, walls, params={params_map['Width'][0]: 0.8})
+    first, second = params_map['Area'][:2]
+    # The first instance only has the second candidate, the next one only
+    # the first: the plan of the pair cannot be used for it
+    a = doc.add_instance(100, walls, wall_type, params={second: 12.0})
+    b = doc.add_instance(101, walls, wall_type, params={first: 7.0})
+    c = doc.add_instance(102, walls, wall_type, params={first: 3.0, second: 4.0})
+
+    resolver = _assert_same(qto, params_map, doc, [a, b, c])
+    assert resolver.resolve(b, wall_type)['Area'] == 7.0
+    assert resolver.resolve(b, wall_type)['Width'] == 0.8
+    assert resolver._instance_plans[(1, 10)] is qto.GeometricResolver.MIXED
+
+
+def test_missing_zero_empty_and_integer_values(qto, params_map):
+    doc = fakes.Document()
+    floors = fakes.Category(2, 'Floors')
+    length = params_map['Length']
+    floor_type = doc.add_type(20, floors, params={
+        length[1]: 5.0, params_map['Thickness'][0]: 2})
+    elements = [
+        doc.add_instance(200, floors, floor_type, params={length[0]: 0.0, length[1]: 9.0}),
+        doc.add_instance(201, floors, floor_type, params={length[0]: 0.0}),
+        doc.add_instance(202, floors, floor_type, params={
+            length[0]: fakes.Parameter(None, fakes.StorageType.Double), length[1]: 3}),
+        doc.add_instance(203, floors, floor_type, params={
+            length[0]: 'text', length[1]: 0}),
+        doc.add_instance(204, floors, None, params={length[1]: 6.0}),
+    ]
+    _assert_same(qto, params_map, doc, elements)
+    _assert_same(qto, params_map, doc, elements[::-1])
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_random_parameter_sets_resolve_like_get_geometric_value(qto, params_map, seed):
+    rng = random.Random(seed)
+    candidates = sorted(set(bp for bps in params_map.values() for bp in bps))
+    doc = fakes.Document()
+    elements = []
+    for pair in range(6):
+        category = fakes.Category(pair % 3 + 1, 'Category {0}'.format(pair % 3))
+        elem_type = doc.add_type(1000 + pair, category, params=dict(
+            (bp, rng.choice([0.0, 1.5, 2])) for bp in rng.sample(candidates, 10)))
+        base = rng.sample(candidates, 25)
+        for index in range(40):
+            params = {}
+            # Later instances miss some parameters of the pair, and some of
+            # them expose others in exchange
+            kept = base if index == 0 else [bp for bp in base if rng.random() > 0.2]
+            if index and len(kept) < len(base) and rng.random() < 0.5:
+                kept = kept + rng.sample(candidates, 3)
+            for bp in kept:
+                params[bp] = rng.choice([0.0, 0.0, rng.uniform(0.1, 50.0), 3, None, 'x'])
+            elements.append(doc.add_instance(
+                len(doc.elements) + 10000, category, elem_type, params=params))
+    # The first instance of each pair comes first
+    firsts = elements[::40]
+    rest = [e for e in elements if e not in firsts]
+    rng.shuffle(rest)
+    _assert_same(qto, params_map, doc, firsts + rest)
+
+
+def test_same_parameter_sets_read_fewer_parameters(qto, params_map):
+    doc = fakes.Document()
+    walls = fakes.Category(1, 'Walls')
+    wall_type = doc.add_type(10, walls, params={params_map['Width'][-1]: 0.8})
+    elements = [doc.add_instance(100 + i, walls, wall_type, params={
+        params_map['Length'][-1]: 1.0 + i, params_map['Area'][-1]: 2.0 + i})
+        for i in range(200)]
+
+    doc.parameter_reads = 0
+    for element in elements:
+        _reference(qto, params_map, element, wall_type)
+    reference_reads = doc.parameter_reads
+
+    doc.parameter_reads = 0
+    resolver = _assert_same(qto, params_map, doc, elements)
+    doc.parameter_reads = 0
+    for element in elements:
+        resolver.resolve(element, wall_type)
+    assert resolver._instance_plans[(1, 10)] is not qto.GeometricResolver.MIXED
+    # Two planned reads per element against the whole candidate lists
+    assert doc.parameter_reads == 2 * len(elements)
+    assert reference_reads > 20 * doc.parameter_reads
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+import cloud_sampling
+import reduction_pool
+import sample_cache
+
+from tests import point_cloud_fakes as fakes
+
+
+@pytest.fixture(scope='module')
+def pca():
+    return fakes.load_script()
+
+
+def _state(stats):
+    return (stats.count, stats.mean, stats.std, stats.rms, stats.min,
+            stats.max, stats.within, stats.median, stats.p95)
+
+
+def _samples(count, rng):
+    return [(rng.uniform(0.0, 6.0), rng.uniform(0.0, 4.0),
+             rng.gauss(0.01, 0.02)) for _ in range(count)]
+
+
+def _reduce(workers, cells, tiles, samples):
+    merged = {}
+    recorder = sample_cache.SampleRecorder()
+    with reduction_pool.ReductionPool(workers) as pool:
+        jobs = [pool.submit(reduction_pool.reduce_tile, cells, tile,
+                            samples, 0.02, True) for tile in tiles]
+        for job in jobs:
+            stats, tile_recorder = job.result()
+            merged.update(stats)
+            recorder.extend(tile_recorder)
+    return merged, recorder
+
+
+def test_workers_give_the_same_cell_stats_as_one_thread():
+    cells = cloud_sampling.CellGrid(0.0, 6.0, 0.0, 4.0, 0.25)
+    tiles = cloud_sampling.plan_tiles(cells.nu, cells.nv, 100, 3000)
+    assert len(tiles) > 8
+    samples = _samples(10000, random.Random(12))
+
+    serial, serial_recorder = _reduce(1, cells, tiles, samples)
+    threaded, threaded_recorder = _reduce(4, cells, tiles, samples)
+    assert len(serial) == cells.nu * cells.nv
+    assert sorted(serial) == sorted(threaded)
+    for cell in serial:
+        assert _state(serial[cell]) == _state(threaded[cell])
+    assert list(serial_recorder.d) == list(threaded_recorder.d)
+    assert list(serial_recorder.u) == list(threaded_recorder.u)
+
+
+def test_results_come_back_in_submission_order_and_errors_propagate():
+    def slow_then_fast(value):
+        import time
+        time.sleep(0.01 * (5 - value))
+        if value == 3:
+            raise ValueError(value)
+        return value
+
+    with reduction_pool.ReductionPool(3) as pool:
+        assert pool.parallel
+        jobs = [pool.submit(slow_then_fast, value) for value in range(5)]
+        assert [jobs[i].result() for i in (0, 1, 2, 4)] == [0, 1, 2, 4]
+        with pytest.raises(ValueError):
+            jobs[3].result()
+    assert not reduction_pool.ReductionPool(1).parallel
+
+
+def test_analyze_face_is_the_same_with_one_and_four_workers(pca, monkeypatch):
+    rng = random.Random(13)
+    face = fakes.PlanarFace((2.0, 1.0, 0.0), (0.8, 0.6, 0.0), (0.0, 0.0, 1.0),
+                            6.0, 4.0, holes=[(1.0, 2.5, 0.0, 2.0)])
+    points = [tuple(face.point(u, v, d)) for u, v, d in _samples(8000, rng)]
+    # A coarse scan spacing: every point passes GetPoints whatever the
+    # tiling, so the two runs see the same points
+    cloud = fakes.cloud_from_model(
+        points, fakes.Transform.rotation_z(0.3, (5.0, 5.0, 0.0)), spacing=1.0)
+    # Several tiles in the threaded run (the serial run uses one)
+    monkeypatch.setattr(reduction_pool, 'PARALLEL_TILE_POINTS', 30000)
+
+    results = []
+    for workers in (1, 4):
+        recorder = sample_cache.SampleRecorder()
+        with reduction_pool.ReductionPool(workers) as pool:
+            results.append((pca.analyze_face(
+                cloud, cloud.GetTotalTransform(), None, face, 0.25, 0.3,
+                'high', 0.02, pool, recorder=recorder), recorder))
+    (serial, serial_recorder), (threaded, threaded_recorder) = results
+
+    assert serial[6] == 1 and threaded[6] > 4
+    assert [(uv.U, uv.V) for uv in serial[0]] \
+        == [(uv.U, uv.V) for uv in threaded[0]]
+    assert [_state(s) for s in serial[2]] == [_state(s) for s in threaded[2]]
+    assert serial[4:6] == threaded[4:6]
+    assert sorted(zip(serial_recorder.u, serial_recorder.v,
+                      serial_recorder.d)) \
+        == sorted(zip(threaded_recorder.u, threaded_recorder.v,
+                      threaded_recorder.d))
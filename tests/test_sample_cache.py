@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+import cloud_sampling
+import reduction_pool
+import sample_cache
+
+from tests import point_cloud_fakes as fakes
+
+
+@pytest.fixture(scope='module')
+def pca():
+    return fakes.load_script()
+
+
+def _record(pca, face, cloud, grid, offset=0.3):
+    recorder = sample_cache.SampleRecorder()
+    with reduction_pool.ReductionPool(1) as pool:
+        result = pca.analyze_face(
+            cloud, cloud.GetTotalTransform(), None, face, grid, offset,
+            'all', 0.05, pool, recorder=recorder)
+    return result, recorder
+
+
+def _unit_face_cloud(count=2000, seed=4):
+    rng = random.Random(seed)
+    face = fakes.PlanarFace((0, 0, 0), (1, 0, 0), (0, 0, 1), 1.0, 1.0)
+    points = [tuple(face.point(rng.uniform(0.0, 1.0), rng.uniform(0.0, 1.0),
+                               rng.gauss(0.0, 0.01)))
+              for _ in range(count)]
+    return face, fakes.cloud_from_model(points)
+
+
+def test_entry_covers_only_the_bounds_it_was_recorded_over(pca, tmp_path):
+    face, cloud = _unit_face_cloud()
+    # Grid 0.3 on a 1.0 face: three cells, u and v in [0, 0.9)
+    bounds = pca.face_grid(face, 0.3).bounds
+    assert bounds == pytest.approx((0.0, 0.9, 0.0, 0.9))
+    _, recorder = _record(pca, face, cloud, 0.3)
+    assert max(recorder.u) < 0.9 and max(recorder.v) < 0.9
+
+    cache = sample_cache.SampleCache(str(tmp_path))
+    assert cache.store('face', recorder, offset=0.3, avg_dist=0.001,
+                       bounds=list(bounds))
+    entry = cache.load('face')
+    assert entry.covers(0.3, 0.001, bounds)
+    # 0.45: two cells, still within [0, 0.9)
+    assert entry.covers(0.2, 0.01, pca.face_grid(face, 0.45).bounds)
+    # 0.25 and 0.5 reach u = 1.0: the entry would leave their last cells short
+    assert not entry.covers(0.3, 0.001, pca.face_grid(face, 0.25).bounds)
+    assert not entry.covers(0.3, 0.001, pca.face_grid(face, 0.5).bounds)
+    assert not entry.covers(0.4, 0.001, bounds)
+    assert not entry.covers(0.3, 0.0001, bounds)
+
+
+def test_entries_without_bounds_are_not_trusted(tmp_path):
+    recorder = sample_cache.SampleRecorder()
+    recorder.add(0.1, 0.2, 0.003)
+    cache = sample_cache.SampleCache(str(tmp_path))
+    cache.store('old', recorder, offset=0.3, avg_dist=0.001)
+    entry = cache.load('old')
+    assert entry.covers(0.3, 0.001)
+    assert not entry.covers(0.3, 0.001, (0.0, 0.3, 0.0, 0.3))
+
+
+def test_cached_rerun_matches_a_fresh_run(pca, tmp_path):
+    face, cloud = _unit_face_cloud()
+    _, recorder = _record(pca, face, cloud, 0.25)
+    cache = sample_cache.SampleCache(str(tmp_path))
+    cache.store('face', recorder, offset=0.3, avg_dist=0.001,
+                bounds=list(pca.face_grid(face, 0.25).bounds))
+    entry = cache.load('face')
+    assert entry.covers(0.3, 0.001, pca.face_grid(face, 0.5).bounds)
+
+    fresh, _ = _record(pca, face, cloud, 0.5)
+    with reduction_pool.ReductionPool(1) as pool:
+        cached = pca.analyze_face(
+            None, cloud.GetTotalTransform(), None, face, 0.5, 0.3, 'all',
+            0.05, pool, cache_entry=entry)
+    assert cached[6] == 0
+    assert [(uv.U, uv.V) for uv in cached[0]] \
+        == [(uv.U, uv.V) for uv in fresh[0]]
+    assert [s.count for s in cached[2]] == [s.count for s in fresh[2]]
+    assert [s.mean for s in cached[2]] == pytest.approx(
+        [s.mean for s in fresh[2]], abs=1e-12)
+
+
+def test_cell_grid_bounds_are_whole_cells():
+    cells = cloud_sampling.CellGrid(-1.0, 2.0, 0.5, 1.7, 0.4)
+    assert (cells.nu, cells.nv) == (7, 3)
+    assert cells.bounds == pytest.approx((-1.0, 1.8, 0.5, 1.7))
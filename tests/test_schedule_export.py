@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import json
+
+import pytest
+
+import schedule_export
+
+
+def _sources(tables):
+    return [(name, max(len(r) for r in rows), lambda rows=rows: rows)
+            for name, rows in tables]
+
+
+def test_dated_outputs_share_the_document_manifest(tmp_path):
+    folder = str(tmp_path)
+    manifest_file = schedule_export.document_manifest_path(folder, 'Tower: A/B')
+    assert manifest_file.endswith('Tower_ A_B_Schedules.manifest.json')
+
+    day1 = _sources([('Doors', [['D1', '2']]), ('Walls', [['W1', '3']])])
+    entries = schedule_export.export_consolidated(
+        day1, str(tmp_path / '240101_Schedules.csv'), manifest_file=manifest_file)
+    assert [e['changed'] for e in entries] == [True, True]
+
+    # Next day, other output name: only the edited schedule is changed
+    day2 = _sources([('Doors', [['D1', '2']]), ('Walls', [['W1', '4']])])
+    entries = schedule_export.export_consolidated(
+        day2, str(tmp_path / '240102_Schedules.csv'), manifest_file=manifest_file)
+    assert [e['changed'] for e in entries] == [False, True]
+
+    with io.open(manifest_file, encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['output'] == '240102_Schedules.csv'
+    assert [s['name'] for s in data['schedules']] == ['Doors', 'Walls']
+
+
+def test_default_manifest_is_next_to_the_output(tmp_path):
+    out_path = str(tmp_path / 'Schedules.csv')
+    schedule_export.export_consolidated(_sources([('A', [['1']])]), out_path)
+    assert (tmp_path / 'Schedules.manifest.json').exists()
+
+
+def test_csv_rows_are_padded_to_the_widest_schedule(tmp_path):
+    out_path = str(tmp_path / 'Schedules.csv')
+    schedule_export.export_consolidated(
+        _sources([('A', [['a1', 'a2', 'a3']]), ('B', [['b1']])]), out_path)
+    with io.open(out_path, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f, delimiter=';'))
+    assert rows == [
+        ['ScheduleName', 'Row', 'Col1', 'Col2', 'Col3'],
+        ['A', '0', 'a1', 'a2', 'a3'],
+        ['B', '0', 'b1', '', ''],
+    ]
+
+
+@pytest.mark.skipif(schedule_export.sqlite3 is None, reason='no sqlite3')
+def test_sqlite_keeps_unchanged_and_drops_stale_schedules(tmp_path):
+    out_path = str(tmp_path / 'Schedules.sqlite')
+    schedule_export.export_consolidated(
+        _sources([('A', [['1'], ['2']]), ('B', [['3']])]), out_path,
+        schedule_export.FORMAT_SQLITE)
+    schedule_export.export_consolidated(
+        _sources([('A', [['1'], ['2']]), ('C', [['4']])]), out_path,
+        schedule_export.FORMAT_SQLITE)
+
+    conn = schedule_export.sqlite3.connect(out_path)
+    try:
+        rows = sorted(conn.execute('SELECT ScheduleName, Row, Col1 FROM ScheduleRows'))
+    finally:
+        conn.close()
+    assert rows == [('A', 0, '1'), ('A', 1, '2'), ('C', 0, '4')]
+
+
+def _sqlite_rows(path):
+    conn = schedule_export.sqlite3.connect(path)
+    try:
+        return sorted(conn.execute('SELECT ScheduleName, Row, Col1 FROM ScheduleRows'))
+    finally:
+        conn.close()
+
+
+@pytest.mark.skipif(schedule_export.sqlite3 is None, reason='no sqlite3')
+@pytest.mark.parametrize('other_format', [schedule_export.FORMAT_CSV,
+                                          schedule_export.FORMAT_PARQUET])
+def test_sqlite_rewrites_schedules_changed_by_another_format_export(
+        tmp_path, other_format):
+    folder = str(tmp_path)
+    manifest_file = schedule_export.document_manifest_path(folder, 'Tower')
+    sqlite_path = str(tmp_path / '240101_Schedules.sqlite')
+    schedule_export.export_consolidated(
+        _sources([('A', [['1']]), ('B', [['2']])]), sqlite_path,
+        schedule_export.FORMAT_SQLITE, manifest_file=manifest_file)
+
+    # Same day: B is edited and exported to another format first, which
+    # stores the new hash in the shared manifest
+    edited = [('A', [['1']]), ('B', [['2 edited'], ['3']])]
+    other_path = str(tmp_path / ('240101_Schedules'
+                                 + schedule_export.output_extension(other_format)))
+    entries = schedule_export.export_consolidated(
+        _sources(edited), other_path, other_format, manifest_file=manifest_file)
+    assert [e['changed'] for e in entries] == [False, True]
+
+    entries = schedule_export.export_consolidated(
+        _sources(edited), sqlite_path, schedule_export.FORMAT_SQLITE,
+        manifest_file=manifest_file)
+    assert [e['changed'] for e in entries] == [False, False]
+    assert _sqlite_rows(sqlite_path) == [
+        ('A', 0, '1'), ('B', 0, '2 edited'), ('B', 1, '3')]
+
+
+@pytest.mark.skipif(schedule_export.sqlite3 is None, reason='no sqlite3')
+def test_sqlite_keeps_unchanged_rows_by_its_own_digest(tmp_path):
+    out_path = str(tmp_path / 'Schedules.sqlite')
+    schedule_export.export_consolidated(
+        _sources([('A', [['1']])]), out_path, schedule_export.FORMAT_SQLITE)
+    conn = schedule_export.sqlite3.connect(out_path)
+    try:
+        conn.execute("UPDATE ScheduleRows SET Col1 = 'kept' WHERE ScheduleName = 'A'")
+        conn.commit()
+    finally:
+        conn.close()
+    # A new manifest says changed, the database digest says unchanged
+    (tmp_path / 'Schedules.manifest.json').unlink()
+    schedule_export.export_consolidated(
+        _sources([('A', [['1']])]), out_path, schedule_export.FORMAT_SQLITE)
+    assert _sqlite_rows(out_path) == [('A', 0, 'kept')]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import math
+
+import pytest
+
+from tests import synthetic_cloud
+
+
+XFORM = synthetic_cloud.RigidTransform(math.radians(30.0), (250.0, -40.0, 12.0))
+SCENARIOS = synthetic_cloud.scenarios(20000)
+SMALL_SCENARIOS = synthetic_cloud.scenarios(3000)
+
+
+def _run(scenario, density, noise=0.003, workers=1, xform=XFORM):
+    return synthetic_cloud.run(scenario, xform, grid=0.3, density=density,
+                               noise=noise, offset=0.1, tolerance=0.01,
+                               workers=workers)
+
+
+@pytest.mark.parametrize('scenario, density', SCENARIOS,
+                         ids=[s.name for s, _ in SCENARIOS])
+def test_cell_means_recover_the_deviation_field(scenario, density):
+    figures = _run(scenario, density)
+    # About 50 points per cell: the error of a mean is noise / sqrt(50)
+    assert figures['points'] > 15000
+    assert figures['rms_error'] < 0.003 / math.sqrt(50) * 1.5
+    assert figures['max_error'] < 0.003
+
+
+@pytest.mark.parametrize('scenario, density', SMALL_SCENARIOS,
+                         ids=[s.name for s, _ in SMALL_SCENARIOS])
+@pytest.mark.parametrize('xform', [
+    synthetic_cloud.RigidTransform(),
+    XFORM,
+    synthetic_cloud.RigidTransform(math.radians(-135.0), (-3e4, 1e4, -50.0)),
+])
+def test_noise_free_cells_are_exact(scenario, density, xform):
+    figures = _run(scenario, density, noise=0.0, xform=xform)
+    assert figures['max_error'] < 1e-9
+
+
+def test_empty_cells_are_the_openings():
+    by_name = dict((s.name, (s, d)) for s, d in SCENARIOS)
+    plane = _run(*by_name['plane'])
+    wall = _run(*by_name['wall+openings'])
+    # 40 x 10 cells of 0.3 m on 12 x 3 m
+    assert plane['cells'] + plane['empty_cells'] == 400
+    assert plane['empty_cells'] == 0
+    assert wall['cells'] + wall['empty_cells'] == 400
+    # Cells entirely inside the two openings: 3 x 7 and 4 x 4
+    assert wall['empty_cells'] == 3 * 7 + 4 * 4
+    assert wall['points'] < plane['points']
+
+
+def test_worker_threads_give_the_same_figures():
+    scenario, density = SCENARIOS[1]
+    serial = _run(scenario, density)
+    threaded = _run(scenario, density, workers=3)
+    for figures in (serial, threaded):
+        del figures['points_per_s']
+    assert serial == threaded
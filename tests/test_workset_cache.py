@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+import collections
+import json
+import os
+
+import pytest
+
+import workset_cache
+
+
+Preview = collections.namedtuple('Preview', 'Id Name')
+
+
+def _previews(*names):
+    return [Preview(100 + index, name) for index, name in enumerate(names)]
+
+
+def _cache(tmp_path):
+    return workset_cache.WorksetCache(str(tmp_path / 'data' / 'IfcExport_worksets.json'))
+
+
+class FakeModel(object):
+    """
+    Workshared model whose export view shows 'visible' worksets, exported
+    as IfcExport does: the visible worksets are checked against the opened
+    ones when only some were opened, then stored in the cache.
+    """
+
+    def __init__(self, cache, rvt_file, worksets, visible):
+        self.cache = cache
+        self.rvt_file = rvt_file
+        self.previews = _previews(*worksets)
+        self.visible = list(visible)
+        self.opened = []
+        self.preview_reads = 0
+
+    def read_previews(self):
+        self.preview_reads += 1
+        return self.previews
+
+    def export_once(self, workset_ids):
+        if workset_ids is None:
+            opened = [p.Name for p in self.previews]
+        else:
+            opened = [p.Name for p in self.previews if p.Id in workset_ids]
+        self.opened.append(opened)
+        if workset_ids is not None and workset_cache.missing_worksets(self.visible, opened):
+            return None
+        self.cache.store(self.rvt_file, '3D IFC', self.visible)
+        return 'exported'
+
+    def export(self):
+        return self.cache.export(self.rvt_file, '3D IFC', self.read_previews, self.export_once)
+
+
+def test_miss_opens_all_then_hit_opens_the_visible_worksets(tmp_path):
+    cache = _cache(tmp_path)
+    model = FakeModel(cache, 'C:/Models/A.rvt', ['Shared Levels', 'Arch', 'MEP', 'Links'],
+                      ['Arch', 'Shared Levels'])
+    assert model.export() == 'exported'
+    assert model.opened == [['Shared Levels', 'Arch', 'MEP', 'Links']]
+    assert model.preview_reads == 0
+
+    # A new session reads the file
+    model.cache = cache = _cache(tmp_path)
+    model.opened = []
+    assert model.export() == 'exported'
+    assert model.opened == [['Shared Levels', 'Arch']]
+    assert model.preview_reads == 1
+    assert cache.get('C:/Models/A.rvt', '3D IFC') == ['Arch', 'Shared Levels']
+
+
+def test_stale_entry_is_forgotten_and_the_model_reopened_with_all_worksets(tmp_path):
+    cache = _cache(tmp_path)
+    model = FakeModel(cache, 'A.rvt', ['Arch', 'MEP', 'Structure'], ['Arch'])
+    model.export()
+
+    # The view now also shows MEP
+    model.visible = ['Arch', 'MEP']
+    model.opened = []
+    assert model.export() == 'exported'
+    assert model.opened == [['Arch'], ['Arch', 'MEP', 'Structure']]
+    assert cache.get('A.rvt', '3D IFC') == ['Arch', 'MEP']
+
+    model.opened = []
+    model.export()
+    assert model.opened == [['Arch', 'MEP']]
+
+
+@pytest.mark.parametrize('worksets, cached, expected', [
+    (['A', 'B', 'C'], ['A', 'C'], [100, 102]),
+    (['A', 'B', 'C'], ['C'], [102]),
+    (['A', 'B', 'C'], None, None),                # miss
+    (['A', 'B', 'C'], [], None),
+    (['A', 'B', 'C'], ['A', 'B', 'C'], None),     # every workset anyway
+    (['A', 'B2', 'C'], ['A', 'B'], None),         # renamed or deleted
+    ([], ['A'], None),
+])
+def test_worksets_to_open(worksets, cached, expected):
+    assert workset_cache.worksets_to_open(_previews(*worksets), cached) == expected
+
+
+def test_renamed_workset_opens_all_without_a_second_export(tmp_path):
+    cache = _cache(tmp_path)
+    model = FakeModel(cache, 'A.rvt', ['Arch', 'MEP'], ['Arch'])
+    model.export()
+    model.previews = _previews('Architecture', 'MEP')
+    model.visible = ['Architecture']
+    model.opened = []
+    model.export()
+    assert model.opened == [['Architecture', 'MEP']]
+    assert cache.get('A.rvt', '3D IFC') == ['Architecture']
+
+
+def test_unreadable_previews_open_all(tmp_path):
+    cache = _cache(tmp_path)
+    cache.store('A.rvt', '3D IFC', ['Arch'])
+    calls = []
+    result = cache.export('A.rvt', '3D IFC', lambda: None,
+                          lambda ids: calls.append(ids) or 'exported')
+    assert result == 'exported'
+    assert calls == [None]
+
+
+def test_full_open_returning_none_is_not_retried(tmp_path):
+    cache = _cache(tmp_path)
+    calls = []
+    assert cache.export('A.rvt', '3D IFC', lambda: [], lambda ids: calls.append(ids)) is None
+    assert calls == [None]
+
+
+@pytest.mark.parametrize('visible, opened, missing', [
+    (['A', 'B'], ['A', 'B', 'C'], []),
+    (['A', 'B'], ['B'], ['A']),
+    (['C', 'A', 'A'], [], ['A', 'C']),
+    ([], ['A'], []),
+])
+def test_missing_worksets(visible, opened, missing):
+    assert workset_cache.missing_worksets(visible, opened) == missing
+
+
+def test_entries_are_kept_per_model_and_view_filter(tmp_path):
+    cache = _cache(tmp_path)
+    cache.store('A.rvt', '3D IFC', ['Arch', 'Arch', 'MEP'])
+    cache.store('A.rvt', 'Coordination', ['Structure'])
+    cache.store('B.rvt', '3D IFC', [u'Façade'])
+    assert cache.get(os.path.join('.', 'A.rvt'), '3D IFC') == ['Arch', 'MEP']
+
+    cache.forget('A.rvt', '3D IFC')
+    reloaded = _cache(tmp_path)
+    assert reloaded.get('A.rvt', '3D IFC') is None
+    assert reloaded.get('A.rvt', 'Coordination') == ['Structure']
+    assert reloaded.get('B.rvt', '3D IFC') == [u'Façade']
+    assert not os.path.exists(reloaded.path + '.tmp')
+
+
+@pytest.mark.parametrize('content', [
+    '{"version": 1, "models": {"a"',
+    '[1, 2]',
+    '{"version": 99, "models": {}}',
+    '{"version": 1, "models": []}',
+])
+def test_corrupted_or_old_file_is_a_miss(tmp_path, content):
+    cache = _cache(tmp_path)
+    os.makedirs(os.path.dirname(cache.path))
+    with open(cache.path, 'w') as f:
+        f.write(content)
+    assert cache.get('A.rvt', '3D IFC') is None
+    cache.store('A.rvt', '3D IFC', ['Arch'])
+    with open(cache.path) as f:
+        assert json.load(f)['version'] == workset_cache.CACHE_VERSION